@@ -0,0 +1,160 @@
+"""
+比較 WSGI (同步) 與 ASGI (非同步) 部署的吞吐量與延遲。
+
+本腳本只使用標準函式庫，以 asyncio 開啟大量 keep-alive 連線對兩個
+已啟動的伺服器送出相同的請求。``--think-time`` 讓每條連線在兩個請求之間停頓，
+模擬大量同時在線但緩慢的客戶端；``--concurrency`` 遠大於同步 worker 的
+執行緒數時，即可看出等待資料庫的請求佔用執行緒所造成的差異。
+
+使用方式 (以單一 worker 比較)::
+
+    # 同步：gunicorn + 執行緒池
+    gunicorn ninja_shortener.wsgi -w 1 --threads 32 -b 127.0.0.1:8000
+
+    # 非同步：uvicorn (asgi.py 會自動改用 ninja_shortener.urls_async)
+    uvicorn ninja_shortener.asgi:application --workers 1 --port 8001
+
+    python benchmarks/async_vs_sync.py \\
+        --sync-url http://127.0.0.1:8000 --async-url http://127.0.0.1:8001 \\
+        --path /abc1234 --concurrency 1000 --requests 20000 --think-time 0.05
+
+``--path`` 必須是資料庫中存在的 short_code，重定向會回傳 302。
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from urllib.parse import urlsplit
+
+
+def percentile(samples, pct):
+    """回傳已排序樣本的百分位數 (nearest-rank)。"""
+    if not samples:
+        return 0.0
+    index = max(0, min(len(samples) - 1, round(pct / 100 * len(samples)) - 1))
+    return samples[index]
+
+
+async def _read_response(reader):
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('connection closed by server')
+    version, status = status_line.split()[:2]
+    status = int(status)
+    length = 0
+    # HTTP/1.0 預設不保持連線
+    close = version == b'HTTP/1.0'
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        name = name.strip().lower()
+        if name == 'content-length':
+            length = int(value.strip())
+        elif name == 'connection':
+            close = value.strip().lower() != 'keep-alive'
+    if length:
+        await reader.readexactly(length)
+    return status, close
+
+
+async def _worker(base_url, path, method, body, queue, latencies, statuses, think_time):
+    parts = urlsplit(base_url)
+    host, port = parts.hostname, parts.port or 80
+    headers = [f'{method} {path} HTTP/1.1', f'Host: {parts.netloc}', 'Connection: keep-alive']
+    if body is not None:
+        headers += ['Content-Type: application/x-www-form-urlencoded', f'Content-Length: {len(body)}']
+    request = ('\r\n'.join(headers) + '\r\n\r\n').encode('latin-1') + (body or b'')
+
+    reader = writer = None
+    while True:
+        try:
+            queue.get_nowait()
+        except asyncio.QueueEmpty:
+            break
+        if writer is None:
+            reader, writer = await asyncio.open_connection(host, port)
+        if think_time:
+            # 模擬慢速客戶端：連線在兩個請求之間保持開啟但閒置
+            await asyncio.sleep(think_time)
+        start = time.perf_counter()
+        try:
+            writer.write(request)
+            await writer.drain()
+            status, close = await _read_response(reader)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            statuses['error'] = statuses.get('error', 0) + 1
+            writer.close()
+            reader = writer = None
+            continue
+        latencies.append(time.perf_counter() - start)
+        statuses[status] = statuses.get(status, 0) + 1
+        if close:
+            writer.close()
+            reader = writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def run_load(base_url, path, requests, concurrency, method='GET', body=None, think_time=0.0):
+    """
+    對 ``base_url + path`` 送出固定數量的請求並統計結果。
+
+    Returns:
+        dict: 吞吐量 (req/s)、延遲百分位數 (毫秒) 與各狀態碼的數量。
+    """
+    queue = asyncio.Queue()
+    for _ in range(requests):
+        queue.put_nowait(None)
+    latencies, statuses = [], {}
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        _worker(base_url, path, method, body, queue, latencies, statuses, think_time)
+        for _ in range(concurrency)
+    ))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'seconds': elapsed,
+        'throughput': len(latencies) / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'mean_ms': statistics.fmean(latencies) * 1000 if latencies else 0.0,
+        'statuses': statuses,
+    }
+
+
+def format_result(label, result):
+    return (
+        f"{label:<6} {result['throughput']:>10.1f} req/s  "
+        f"p50 {result['p50_ms']:>8.2f} ms  p95 {result['p95_ms']:>8.2f} ms  "
+        f"p99 {result['p99_ms']:>8.2f} ms  statuses {result['statuses']}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sync-url', required=True, help='WSGI 伺服器位址，例如 http://127.0.0.1:8000')
+    parser.add_argument('--async-url', required=True, help='ASGI 伺服器位址，例如 http://127.0.0.1:8001')
+    parser.add_argument('--path', required=True, help='要測試的路徑，例如 /abc1234')
+    parser.add_argument('--method', default='GET')
+    parser.add_argument('--data', default=None, help='POST 的 urlencoded 內容，例如 original_url=https://example.com')
+    parser.add_argument('--requests', type=int, default=10000)
+    parser.add_argument('--concurrency', type=int, default=500)
+    parser.add_argument('--think-time', type=float, default=0.0, help='每條連線在兩個請求之間停頓的秒數')
+    args = parser.parse_args()
+
+    body = args.data.encode() if args.data else None
+    for label, url in (('sync', args.sync_url), ('async', args.async_url)):
+        result = asyncio.run(run_load(
+            url, args.path, args.requests, args.concurrency,
+            method=args.method, body=body, think_time=args.think_time,
+        ))
+        print(format_result(label, result))
+
+
+if __name__ == '__main__':
+    main()
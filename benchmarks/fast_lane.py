@@ -0,0 +1,79 @@
+"""
+比較重定向經過完整 MIDDLEWARE 與快速通道 (ninja_shortener.fastlane) 的每個請求開銷。
+
+本腳本在同一個行程中直接呼叫兩個 WSGI handler，不經過網路與 WSGI 伺服器，
+因此兩者的差異即為快速通道省下的 middleware 開銷。為了讓差異不被資料庫寫入掩蓋，
+建議以 buffered 點擊模式執行，並使用資料庫中存在的 short_code (解析快取命中後不需查詢)。
+
+使用方式::
+
+    DJANGO_SETTINGS_MODULE=ninja_shortener.settings \\
+        python benchmarks/fast_lane.py --path /abc1234 --requests 20000
+
+``--path`` 為不存在的代碼時比較的是 404 回應的開銷。
+"""
+import argparse
+import io
+import os
+import statistics
+import sys
+import time
+from wsgiref.util import setup_testing_defaults
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _environ(path, host):
+    environ = {'PATH_INFO': path, 'HTTP_HOST': host, 'wsgi.input': io.BytesIO()}
+    setup_testing_defaults(environ)
+    return environ
+
+
+def measure(application, path, requests, host='localhost', rounds=5):
+    """
+    以相同的請求呼叫 application，回傳每個請求的耗時 (微秒) 的中位數與狀態碼。
+
+    每輪先暖機，再取多輪的中位數以降低其他行程造成的干擾。
+    """
+    status = None
+
+    def start_response(status_line, headers):
+        nonlocal status
+        status = int(status_line.split()[0])
+
+    def run(count):
+        started = time.perf_counter()
+        for _ in range(count):
+            response = application(_environ(path, host), start_response)
+            response.close()
+        return (time.perf_counter() - started) / count * 1e6
+
+    run(min(requests, 1000))
+    return statistics.median(run(requests) for _ in range(rounds)), status
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--path', required=True, help='要測試的路徑，例如 /abc1234')
+    parser.add_argument('--requests', type=int, default=10000, help='每輪的請求數')
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--host', default='localhost', help='Host 標頭，必須在 ALLOWED_HOSTS 中')
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ninja_shortener.settings')
+    import django
+    django.setup()
+    from django.core.handlers.wsgi import WSGIHandler
+
+    from ninja_shortener.fastlane import FastLaneWSGIHandler
+
+    results = {}
+    for label, handler in (('full', WSGIHandler()), ('fast', FastLaneWSGIHandler())):
+        results[label], status = measure(handler, args.path, args.requests, args.host, args.rounds)
+        print(f'{label:<5} {results[label]:>8.1f} us/request  status {status}')
+    print(f'saved {results["full"] - results["fast"]:>8.1f} us/request '
+          f'({(1 - results["fast"] / results["full"]) * 100:.0f}%)')
+
+
+if __name__ == '__main__':
+    main()
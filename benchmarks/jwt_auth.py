@@ -0,0 +1,74 @@
+"""
+比較 API 的 JWT 驗證在有無使用者快取時，每個請求的查詢數與耗時。
+
+本腳本在行程內建立測試資料庫 (不會動到正式資料)，以同一個 access token
+重複呼叫 ninja_jwt 原本的 ``JWTAuth`` 與 ``shortener.auth.CachedJWTAuth``，
+統計每個請求的平均查詢數與延遲。
+
+使用方式::
+
+    python benchmarks/jwt_auth.py --requests 5000
+
+``DJANGO_SETTINGS_MODULE`` 預設為 ninja_shortener.settings，需要可連線的資料庫。
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ninja_shortener.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.contrib.auth.models import User  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import RequestFactory  # noqa: E402
+from django.test.utils import CaptureQueriesContext, setup_test_environment  # noqa: E402
+from django.test.utils import setup_databases, teardown_databases  # noqa: E402
+from ninja_jwt.authentication import JWTAuth  # noqa: E402
+from ninja_jwt.tokens import RefreshToken  # noqa: E402
+
+from shortener.auth import CachedJWTAuth  # noqa: E402
+
+
+def measure(auth, token, requests):
+    """回傳 (每請求平均查詢數, 每請求平均微秒)。"""
+    request = RequestFactory().post("/api/shorten")
+    auth.authenticate(request, token)  # 暖身，讓快取版本先載入使用者
+    with CaptureQueriesContext(connection) as ctx:
+        started = time.perf_counter()
+        for _ in range(requests):
+            auth.authenticate(request, token)
+        elapsed = time.perf_counter() - started
+    return len(ctx.captured_queries) / requests, elapsed / requests * 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    setup_test_environment()
+    old_config = setup_databases(verbosity=0, interactive=False)
+    try:
+        user = User.objects.create_user(username="bench-jwt", password="bench-password")
+        token = str(RefreshToken.for_user(user).access_token)
+        results = {
+            "JWTAuth": measure(JWTAuth(), token, args.requests),
+            "CachedJWTAuth": measure(CachedJWTAuth(), token, args.requests),
+        }
+    finally:
+        teardown_databases(old_config, verbosity=0)
+
+    for name, (queries, micros) in results.items():
+        print(f"{name:<14} queries/request={queries:.2f}  latency={micros:.1f}us")
+    saved = results["JWTAuth"][0] - results["CachedJWTAuth"][0]
+    print(f"saved {saved:.2f} queries per request")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+import pytest
+from django.core.cache import caches
+
+from shortener.bloom import reset_short_code_filter
+from shortener.cache import reset_resolution_cache
+from shortener.clicks import reset_click_buffer
+from shortener.codes import reset_code_allocator
+from shortener.linkindex import reset_link_index
+from shortener.metrics import reset_gauge_refresh
+from shortener.replicas import reset_replica_health
+
+
+@pytest.fixture(autouse=True)
+def reset_shortener_state():
+    """
+    自動運行的 fixture，清除各 worker 行程內的快取狀態。
+
+    測試資料庫在每個測試後會回滾，但行程內的快取不會，
+    因此需要在測試之間重置，避免讀到上一個測試留下的資料。
+    """
+    reset_resolution_cache()
+    reset_click_buffer()
+    reset_code_allocator()
+    reset_short_code_filter()
+    reset_link_index()
+    reset_replica_health()
+    reset_gauge_refresh()
+    # 速率限制的狀態存放在預設快取中
+    caches["default"].clear()
+    yield
+    reset_resolution_cache()
+    reset_click_buffer()
+    reset_code_allocator()
+    reset_short_code_filter()
+    reset_link_index()
@@ -1,8 +1,21 @@
+from shortener.api import async_router as shortener_async_router
+from shortener.api import rate_limited_handler
 from shortener.api import router as shortener_router
+from shortener.ratelimit import RateLimited
 from ninja_jwt.controller import NinjaJWTDefaultController
 from ninja_extra import NinjaExtraAPI
 
-api = NinjaExtraAPI(urls_namespace="shortener_api")
+from .routing import API_NAMESPACE, ASYNC_API_NAMESPACE
+
+api = NinjaExtraAPI(urls_namespace=API_NAMESPACE)
 api.register_controllers(NinjaJWTDefaultController)
 
 api.add_router("/", shortener_router)
+api.add_exception_handler(RateLimited, rate_limited_handler)
+
+# ASGI 部署使用的非同步 API (見 ninja_shortener/urls_async.py)
+async_api = NinjaExtraAPI(urls_namespace=ASYNC_API_NAMESPACE)
+async_api.register_controllers(NinjaJWTDefaultController)
+
+async_api.add_router("/", shortener_async_router)
+async_api.add_exception_handler(RateLimited, rate_limited_handler)
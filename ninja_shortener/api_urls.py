@@ -0,0 +1,4 @@
+"""/api/ 的 URLconf，由 urls.py 以 lazy_include 在第一次使用 API 時才載入。"""
+from .api import api
+
+urlpatterns = api.urls[0]
@@ -0,0 +1,4 @@
+"""ASGI 部署的 /api/ URLconf，由 urls_async.py 以 lazy_include 在第一次使用 API 時才載入。"""
+from .api import async_api
+
+urlpatterns = async_api.urls[0]
@@ -12,5 +12,17 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ninja_shortener.settings')
+# 使用原生 async 的重定向、建立短網址與 API 視圖，避免每個請求佔用一個執行緒
+os.environ.setdefault('DJANGO_ROOT_URLCONF', 'ninja_shortener.urls_async')
 
 application = get_asgi_application()
+
+# /<short_code> 走只載入精簡 middleware 的快速通道 (SHORTENER_FAST_LANE)
+from .fastlane import fast_lane_asgi  # noqa: E402
+
+application = fast_lane_asgi(application)
+
+# 在背景建立短代碼的 Bloom filter，第一個請求不需等待全表掃描
+from shortener.bloom import prepare_short_code_filter  # noqa: E402
+
+prepare_short_code_filter()
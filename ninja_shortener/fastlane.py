@@ -0,0 +1,160 @@
+"""
+重定向路由的精簡 middleware 快速通道。
+
+完整的 ``MIDDLEWARE`` 包含 session、CSRF、驗證、messages、clickjacking 與開發用的
+BrowserReloadMiddleware，回應一個 302 都用不到。wsgi.py / asgi.py 以 dispatcher 包裝 Django 應用程式：
+單層路徑 (``/<short_code>``) 交給只載入 ``SHORTENER_FAST_LANE`` 的 MIDDLEWARE 的 handler，
+其他路由仍由完整的應用程式處理。
+
+快速通道同樣使用 ROOT_URLCONF 解析路徑並呼叫相同的重定向視圖，並保留 request_started /
+request_finished 訊號 (資料庫連線的管理)。URLconf 中排在重定向路由之前的單層固定路徑
+(例如 ``/metrics``) 不會進入快速通道。
+"""
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.exception import convert_exception_to_response
+from django.core.handlers.wsgi import WSGIHandler
+from django.urls import URLPattern, get_resolver
+from django.utils.module_loading import import_string
+
+REDIRECT_URL_NAME = 'redirect'
+
+DEFAULT_SETTINGS = {
+    'ENABLED': False,
+    'MIDDLEWARE': [
+        'shortener.instrumentation.ServerTimingMiddleware',
+        'shortener.metrics.PrometheusMetricsMiddleware',
+        'shortener.replicas.ReplicaPinningMiddleware',
+        'django.middleware.security.SecurityMiddleware',
+        'django.middleware.common.CommonMiddleware',
+    ],
+}
+
+
+def get_fast_lane_settings():
+    return {**DEFAULT_SETTINGS, **getattr(settings, 'SHORTENER_FAST_LANE', {})}
+
+
+def reserved_paths(urlconf=None):
+    """
+    回傳 URLconf 中排在重定向路由之前的單層固定路徑，這些路徑必須交給完整的應用程式。
+
+    Raises:
+        ImproperlyConfigured: 找不到重定向路由，或重定向路由之前有無法判斷的單層路由。
+    """
+    reserved = set()
+    for pattern in get_resolver(urlconf).url_patterns:
+        if isinstance(pattern, URLPattern) and pattern.name == REDIRECT_URL_NAME:
+            return frozenset(reserved)
+        route = str(pattern.pattern)
+        if '/' in route.rstrip('/'):
+            continue
+        if getattr(pattern.pattern, 'converters', None) or not hasattr(pattern.pattern, '_route'):
+            raise ImproperlyConfigured(f'Route {route!r} before the redirect route may match a short code.')
+        if not route.endswith('/'):
+            reserved.add(route)
+    raise ImproperlyConfigured(f'No URL pattern named {REDIRECT_URL_NAME!r} in the URLconf.')
+
+
+class FastLaneMixin:
+    """只載入 SHORTENER_FAST_LANE 的 MIDDLEWARE 的 handler，其餘流程與 Django 的 handler 相同。"""
+
+    def load_middleware(self, is_async=False):
+        # 與 BaseHandler.load_middleware 相同，只是 middleware 清單不是 settings.MIDDLEWARE
+        self._view_middleware = []
+        self._template_response_middleware = []
+        self._exception_middleware = []
+
+        get_response = self._get_response_async if is_async else self._get_response
+        handler = convert_exception_to_response(get_response)
+        handler_is_async = is_async
+        for middleware_path in reversed(get_fast_lane_settings()['MIDDLEWARE']):
+            middleware = import_string(middleware_path)
+            if not handler_is_async and getattr(middleware, 'sync_capable', True):
+                middleware_is_async = False
+            else:
+                middleware_is_async = getattr(middleware, 'async_capable', False)
+            adapted_handler = self.adapt_method_mode(
+                middleware_is_async, handler, handler_is_async,
+                debug=settings.DEBUG, name=f'middleware {middleware_path}',
+            )
+            try:
+                mw_instance = middleware(adapted_handler)
+            except MiddlewareNotUsed:
+                continue
+
+            if hasattr(mw_instance, 'process_view'):
+                self._view_middleware.insert(0, self.adapt_method_mode(is_async, mw_instance.process_view))
+            if hasattr(mw_instance, 'process_template_response'):
+                self._template_response_middleware.append(
+                    self.adapt_method_mode(is_async, mw_instance.process_template_response)
+                )
+            if hasattr(mw_instance, 'process_exception'):
+                self._exception_middleware.append(self.adapt_method_mode(False, mw_instance.process_exception))
+
+            handler = convert_exception_to_response(mw_instance)
+            handler_is_async = middleware_is_async
+
+        self._middleware_chain = self.adapt_method_mode(is_async, handler, handler_is_async)
+
+
+class FastLaneWSGIHandler(FastLaneMixin, WSGIHandler):
+    pass
+
+
+class FastLaneASGIHandler(FastLaneMixin, ASGIHandler):
+    pass
+
+
+class FastLaneDispatcher:
+    """
+    依路徑選擇快速通道或完整的應用程式。
+
+    Args:
+        application: 完整的 Django WSGI / ASGI 應用程式。
+        fast_application: 快速通道的 handler。
+        reserved (frozenset[str]): 必須交給完整應用程式的單層路徑 (不含開頭的 /)。
+    """
+
+    def __init__(self, application, fast_application, reserved):
+        self.application = application
+        self.fast_application = fast_application
+        self.reserved = reserved
+
+    def is_fast_path(self, path):
+        short_code = path[1:]
+        return bool(short_code) and '/' not in short_code and short_code not in self.reserved
+
+
+class FastLaneWSGI(FastLaneDispatcher):
+    def __call__(self, environ, start_response):
+        if self.is_fast_path(environ.get('PATH_INFO', '')):
+            return self.fast_application(environ, start_response)
+        return self.application(environ, start_response)
+
+
+class FastLaneASGI(FastLaneDispatcher):
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http':
+            path = scope['path']
+            root_path = scope.get('root_path', '')
+            if root_path and path.startswith(root_path):
+                path = path[len(root_path):]
+            if self.is_fast_path(path):
+                return await self.fast_application(scope, receive, send)
+        return await self.application(scope, receive, send)
+
+
+def fast_lane_wsgi(application):
+    """以快速通道包裝 WSGI 應用程式；停用時原樣回傳。"""
+    if not get_fast_lane_settings()['ENABLED']:
+        return application
+    return FastLaneWSGI(application, FastLaneWSGIHandler(), reserved_paths())
+
+
+def fast_lane_asgi(application):
+    """以快速通道包裝 ASGI 應用程式；停用時原樣回傳。"""
+    if not get_fast_lane_settings()['ENABLED']:
+        return application
+    return FastLaneASGI(application, FastLaneASGIHandler(), reserved_paths())
@@ -0,0 +1,25 @@
+"""
+延遲載入的 URL include。
+
+``include()`` 會在載入 URLconf 時立即匯入子模組；API (django-ninja、ninja_jwt 與所有 schema)
+的匯入成本佔啟動時間的大部分，但重定向等其他路由完全用不到。
+``lazy_include`` 回傳與 include() 相同的三元組，只是模組名稱維持字串，
+Django 的 URLResolver 會在第一次解析到此前綴 (或反解 URL) 時才匯入。
+"""
+API_NAMESPACE = 'shortener_api'
+ASYNC_API_NAMESPACE = 'shortener_api_async'
+
+
+def lazy_include(urlconf_module, namespace, app_name='ninja'):
+    """
+    延遲匯入 urlconf_module 的 include()。
+
+    Args:
+        urlconf_module (str): URLconf 模組的路徑。
+        namespace (str): URL namespace；因為不會匯入模組，必須明確指定。
+        app_name (str): application namespace，django-ninja 的 API 為 'ninja'。
+
+    Returns:
+        tuple: 傳給 path() 的 (模組名稱, app_name, namespace)。
+    """
+    return urlconf_module, app_name, namespace
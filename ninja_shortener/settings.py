@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 from datetime import timedelta
 
@@ -53,6 +54,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # 放在最前面以涵蓋其他 middleware 的時間；SHORTENER_SERVER_TIMING 的 SAMPLE_RATE 為 0 時不會載入
+    'shortener.instrumentation.ServerTimingMiddleware',
+    'shortener.metrics.PrometheusMetricsMiddleware',
+    # 寫入後短時間內固定讀主庫；沒有設定副本時不會載入
+    'shortener.replicas.ReplicaPinningMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -63,7 +69,8 @@ MIDDLEWARE = [
     "django_browser_reload.middleware.BrowserReloadMiddleware",
 ]
 
-ROOT_URLCONF = 'ninja_shortener.urls'
+# ASGI 入口 (asgi.py) 會改用 ninja_shortener.urls_async，讓重定向與建立短網址走原生 async 視圖
+ROOT_URLCONF = os.environ.get('DJANGO_ROOT_URLCONF', 'ninja_shortener.urls')
 
 TEMPLATES = [
     {
@@ -104,6 +111,36 @@ DATABASES = {
     }
 }
 
+# 唯讀副本：DATABASE_REPLICA_HOSTS 以逗號分隔多個主機，其餘連線設定與主庫相同
+# 測試時副本鏡像主庫 (TEST MIRROR)，不會另外建立測試資料庫
+for _index, _host in enumerate(filter(None, os.environ.get('DATABASE_REPLICA_HOSTS', '').split(',')), 1):
+    DATABASES[f'replica{_index}'] = {
+        **DATABASES['default'],
+        'HOST': _host.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['shortener.replicas.ReadReplicaRouter']
+
+# 重定向解析、儀表板、匯出與點擊分析讀取副本，寫入與其餘讀取走主庫
+# STICKY_SECONDS：寫入後這段時間內同一個用戶端固定讀主庫 (瀏覽器以 cookie，JWT 用戶端以 CACHE_ALIAS 中的使用者標記)
+# RETRY_INTERVAL：連線失敗的副本暫停使用的秒數；CACHE_ALIAS 需是所有 worker 共用的快取
+SHORTENER_READ_REPLICAS = {
+    'REPLICAS': [alias for alias in DATABASES if alias != 'default'],
+    'STICKY_SECONDS': 10,
+    'RETRY_INTERVAL': 30,
+    'CACHE_ALIAS': 'default',
+}
+
+# Link 表以 short_code 雜湊分割 (僅 PostgreSQL)：新安裝在 migrate 時直接分割，
+# 既有資料以 `python manage.py partition_links` 線上分批遷移
+# 去重不依賴 (owner, url_hash) 的唯一約束 (分割表無法建立)，分割前後都以 advisory lock 保證
+SHORTENER_LINK_PARTITIONING = {
+    'ENABLED': False,
+    'PARTITIONS': 16,
+    'BATCH_SIZE': 10000,
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -156,6 +193,161 @@ INTERNAL_IPS = [
     "127.0.0.1",
 ]
 
+# short_code → original_url 解析快取
+# SHARED_CACHE_ALIAS 設為 CACHES 中的別名 (例如 'default') 即可啟用多 worker 共用的第二層快取
+SHORTENER_RESOLUTION_CACHE = {
+    'ENABLED': True,
+    'MAX_ENTRIES': 10000,  # 行程內 LRU 的筆數上限
+    'TTL': 300,  # 行程內 LRU 的存活秒數
+    'SHARED_CACHE_ALIAS': None,
+    'SHARED_TTL': 3600,
+}
+
+# 重定向的預設快取策略，個別連結可以 redirect_permanent / cache_max_age 覆寫
+# DEFAULT_MAX_AGE 為 None 時不送出 Cache-Control；大於 0 時 CDN 與瀏覽器會在期間內直接重定向，
+# 這些點擊不會回到 Django，需以 `python manage.py ingest_access_logs` 從 CDN 的存取日誌補回
+SHORTENER_REDIRECTS = {
+    'DEFAULT_MAX_AGE': None,
+    'MAX_MAX_AGE': 365 * 24 * 3600,  # API 可設定的 cache_max_age 上限 (秒)
+}
+
+# `python manage.py export_redirect_map` 匯出的重定向對照表
+# TRACK_DELETIONS：刪除連結時記錄短代碼 (DeletedLink)，增量匯出據此移除；未啟用時每次都完整匯出
+SHORTENER_REDIRECT_MAP = {
+    'TRACK_DELETIONS': True,
+}
+
+# 重定向路由 (/<short_code>) 的快速通道：wsgi.py / asgi.py 只以下列 middleware 處理重定向，
+# 略過 session、CSRF、驗證、messages 等重定向用不到的 middleware；其他路由仍使用完整的 MIDDLEWARE
+SHORTENER_FAST_LANE = {
+    'ENABLED': True,
+    'MIDDLEWARE': [
+        'shortener.instrumentation.ServerTimingMiddleware',
+        'shortener.metrics.PrometheusMetricsMiddleware',
+        'shortener.replicas.ReplicaPinningMiddleware',
+        'django.middleware.security.SecurityMiddleware',
+        'django.middleware.common.CommonMiddleware',
+    ],
+}
+
+# 點擊計數模式
+# 'buffered' 會在各 worker 記憶體中累計點擊，達到 BATCH_SIZE 或經過 FLUSH_INTERVAL 秒後批次寫回
+SHORTENER_CLICK_TRACKING = {
+    'MODE': 'immediate',
+    'BATCH_SIZE': 500,
+    'FLUSH_INTERVAL': 5.0,
+    'BACKGROUND_FLUSH': True,
+    # 寫入原始點擊事件，再以 `python manage.py rollup_clicks` 彙總成每小時 / 每天的時間序列
+    # 事件在各 worker 記憶體中累積，依 BATCH_SIZE / FLUSH_INTERVAL 以 bulk_create 批次寫入 (即時模式也是)；
+    # rollup_clicks 彙總後才會刪除事件，啟用前請先排程 (例如 --loop)，否則事件表會持續成長
+    'RECORD_EVENTS': False,
+}
+
+# 短代碼分配器：以 base62 編碼每個 worker 預留的序號區段，建立短網址時不需查詢是否重複
+SHORTENER_SHORT_CODES = {
+    'LENGTH': 7,
+    'ALPHABET': 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789',
+    'OBFUSCATE': True,  # 打亂序號順序，避免代碼可被依序猜測
+    'BLOCK_SIZE': 1000,
+}
+
+# 重複網址去重：啟用後同一擁有者再次縮短相同 (正規化後) 的網址時，回傳既有的短網址
+# 預設規則只合併目的地完全相同的網址。DROP_FRAGMENT、SORT_QUERY、STRIP_TRAILING_SLASH 與
+# DROP_QUERY_PARAMS (例如 utm_*) 會讓不同的網址共用一個短網址，回傳的連結會導向先建立的那個網址；
+# 修改規則後既有的 url_hash 不會重新計算，只影響之後建立的連結
+SHORTENER_DEDUP = {
+    'ENABLED': False,
+    'LOWERCASE_HOST': True,
+    'DROP_DEFAULT_PORT': True,
+    'DROP_FRAGMENT': False,
+    'SORT_QUERY': False,
+    'STRIP_TRAILING_SLASH': False,
+    'DROP_QUERY_PARAMS': [],
+}
+
+# 儀表板游標分頁
+SHORTENER_DASHBOARD = {
+    'PAGE_SIZE': 50,
+    'MAX_PAGE_SIZE': 200,
+}
+
+# 批次建立短網址 API (POST /api/shorten/bulk)
+SHORTENER_BULK = {
+    'MAX_URLS': 50000,  # 單一請求可提交的網址上限
+    'CHUNK_SIZE': 1000,  # 每次 bulk_create 的筆數
+}
+
+# API 的 JWT 驗證會快取 token 對應的使用者，存活時間不超過 token 的剩餘有效期
+# 多個 worker 時請將 CACHE_ALIAS 指向共用快取，停用帳號才能立即對所有 worker 生效
+SHORTENER_JWT_USER_CACHE = {
+    'ENABLED': True,
+    'CACHE_ALIAS': 'default',
+    'MAX_TTL': None,  # 秒，None 表示以 token 的剩餘有效期為準
+}
+
+# 建立短網址的速率限制 (token bucket)，依登入使用者或 IP 分開計算，超過時回傳 429
+# 狀態存放在 CACHE_ALIAS 指定的快取；預設的 LocMemCache 只在單一行程內有效，多個 worker 時
+# 每個 worker 各自計算 (實際上限為 worker 數倍)。正式環境請指向共用快取 (例如 Redis)，
+# 否則 system check 會提出 shortener.W001 警告
+SHORTENER_RATE_LIMITS = {
+    'ENABLED': True,
+    'CACHE_ALIAS': 'default',
+    'IP_META_KEY': 'REMOTE_ADDR',
+    'RATES': {
+        'shorten': {'RATE': 1.0, 'BURST': 30},  # 每秒補充 1 個，最多連續 30 個
+        'shorten_bulk': {'RATE': 0.1, 'BURST': 5},
+    },
+}
+
+# 以 mmap 共用的唯讀短代碼索引，由 build_link_index 指令定期重新建立
+# 各 worker 共用 page cache，索引命中時重定向不需查詢資料庫；修改或刪除的連結在下次建立後才會反映到其他 worker
+SHORTENER_LINK_INDEX = {
+    'ENABLED': False,
+    'PATH': BASE_DIR / 'link_index.bin',
+    'CHECK_INTERVAL': 5.0,  # 檢查索引檔是否換成新世代的間隔 (秒)
+}
+
+# 每個 worker 內存放所有 short_code 的 Bloom filter，一定不存在的代碼不查詢資料庫直接回傳 404
+# worker 啟動時 (wsgi.py / asgi.py) 在背景建立，完成前所有代碼都查詢資料庫
+# 啟用前必須將 SHARED_CACHE_ALIAS 指向所有 worker 共用的快取 (例如 Redis)：其他 worker 建立連結後
+# 以共用標記通知更新，否則剛建立的連結在其他 worker 會被誤判為 404 (未設定時 filter 不會啟用)
+SHORTENER_BLOOM_FILTER = {
+    'ENABLED': False,
+    'FALSE_POSITIVE_RATE': 0.01,  # 偽陽性率 (仍會查詢資料庫)
+    'MAX_BYTES': 16 * 1024 * 1024,  # 位元陣列的記憶體上限
+    'MIN_CAPACITY': 100000,
+    'REFRESH_INTERVAL': 1.0,
+    'REFRESH_LAG': 60.0,  # 依 updated_at 往回重讀的秒數，涵蓋較晚提交的批次建立與匯入
+    'SHARED_CACHE_ALIAS': None,
+}
+
+# Prometheus 格式的 /metrics 端點；多個 worker 時請設定 PROMETHEUS_MULTIPROC_DIR 環境變數
+# ALLOWED_IPS 為 None 時不限制來源，正式環境建議只開放給監控主機
+SHORTENER_METRICS = {
+    'ENABLED': True,
+    'ALLOWED_IPS': None,
+    'GAUGE_INTERVAL': 5.0,  # gauge 在讀取 /metrics 時更新，其他 worker 在請求結束時最多每幾秒更新一次
+}
+
+# 以 Server-Timing 標頭與 shortener.timing logger (JSON) 回報每個請求的查詢數、DB 時間與快取命中
+# SAMPLE_RATE 為抽樣比例，0 表示停用 (不載入 middleware)
+SHORTENER_SERVER_TIMING = {
+    'SAMPLE_RATE': float(os.environ.get('SHORTENER_SERVER_TIMING_SAMPLE_RATE', '0')),
+    'HEADER': True,
+    'LOG': True,
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'shortener.timing': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
 # Redirects for login and logout
 LOGIN_REDIRECT_URL = 'dashboard'
 LOGOUT_REDIRECT_URL = 'home'
@@ -0,0 +1,42 @@
+"""
+正式環境的設定 (DJANGO_SETTINGS_MODULE=ninja_shortener.settings_production)。
+
+以 ninja_shortener.settings 為基礎：
+- 關閉 DEBUG；DEBUG 會把每個執行過的查詢保留在 connection.queries 中，長時間執行的 worker 記憶體會持續增加。
+- 移除開發用的 django_browser_reload (app、middleware 與 /__reload__/ 路由) 與只提供翻譯的 ninja_jwt app。
+- admin 預設不載入，設定 DJANGO_ADMIN_ENABLED=1 時才載入 (例如只給內部使用的管理用 worker)。
+- 密鑰與主機名稱從環境變數讀取。
+
+tailwind 只保留範本使用的 {% tailwind_css %} 標籤，不會啟動任何建置程序。
+API 的路由、schema 與 ninja_jwt 的驗證在 /api/ 第一次被使用時才會載入，見 ninja_shortener/urls.py。
+"""
+import os
+
+from .settings import *  # noqa: F401,F403
+from .settings import INSTALLED_APPS, MIDDLEWARE
+
+DEBUG = False
+
+SECRET_KEY = os.environ['DJANGO_SECRET_KEY']
+
+ALLOWED_HOSTS = [host.strip() for host in os.environ.get('DJANGO_ALLOWED_HOSTS', '').split(',') if host.strip()]
+
+# 正式環境不載入的 app 與 middleware：
+# - django_browser_reload 只在開發時使用
+# - ninja_jwt 這個 app 只提供翻譯與非資料表的 TokenUser，載入時會匯入 ninja_jwt 的設定；
+#   blacklist 的資料表在 ninja_jwt.token_blacklist，仍然保留
+EXCLUDED_APPS = ['django_browser_reload', 'ninja_jwt']
+EXCLUDED_MIDDLEWARE = ['django_browser_reload.middleware.BrowserReloadMiddleware']
+
+if os.environ.get('DJANGO_ADMIN_ENABLED') != '1':
+    EXCLUDED_APPS.append('django.contrib.admin')
+
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in EXCLUDED_APPS]
+MIDDLEWARE = [middleware for middleware in MIDDLEWARE if middleware not in EXCLUDED_MIDDLEWARE]
+
+# 啟動時間與記憶體的預算，由 shortener/tests/test_startup.py 以新的行程量測
+# IMPORT_SECONDS：匯入 ninja_shortener.wsgi (含 django.setup()) 的秒數；MAX_RSS_MB：匯入後的最大常駐記憶體
+SHORTENER_STARTUP_BUDGET = {
+    'IMPORT_SECONDS': 1.5,
+    'MAX_RSS_MB': 80,
+}
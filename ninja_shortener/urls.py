@@ -14,21 +14,24 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.contrib import admin
+from django.apps import apps
 from django.urls import path, include
 from django.contrib.auth import views as auth_views
-from .api import api
+from .routing import API_NAMESPACE, lazy_include
 from shortener import views as shortener_views
+from shortener.metrics import metrics_view
 from django.conf import settings
 from django.conf.urls.static import static
 
 urlpatterns = [
-    path('admin/', admin.site.urls),
-    path('api/', api.urls),
+    # API 在第一次被使用時才載入 (django-ninja 的路由與 ninja_jwt)，重定向不需要
+    path('api/', lazy_include('ninja_shortener.api_urls', namespace=API_NAMESPACE)),
 
     # UI Views
     path('', shortener_views.home_view, name='home'),
     path('dashboard/', shortener_views.dashboard_view, name='dashboard'),
+    path('dashboard/export.csv', shortener_views.export_links_view, {'fmt': 'csv'}, name='export_links_csv'),
+    path('dashboard/export.ndjson', shortener_views.export_links_view, {'fmt': 'ndjson'}, name='export_links_ndjson'),
     path('shorten/', shortener_views.shorten_url_view, name='shorten_url'),
 
     # Auth
@@ -36,12 +39,22 @@ urlpatterns = [
     path('login/', auth_views.LoginView.as_view(template_name='registration/login.html'), name='login'),
     path('logout/', auth_views.LogoutView.as_view(), name='logout'),
 
+    # Monitoring
+    path('metrics', metrics_view, name='metrics'),
+
     # Redirect
     path('<str:short_code>', shortener_views.redirect_view, name='redirect'),
-
-    path("__reload__/", include("django_browser_reload.urls")),
 ]
 
+# 正式環境的設定 (settings_production) 不載入 admin 與 django_browser_reload
+if apps.is_installed('django.contrib.admin'):
+    from django.contrib import admin
+
+    urlpatterns.insert(0, path('admin/', admin.site.urls))
+
+if apps.is_installed('django_browser_reload'):
+    urlpatterns.append(path("__reload__/", include("django_browser_reload.urls")))
+
 
 if settings.DEBUG:
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
@@ -14,3 +14,13 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ninja_shortener.settings')
 
 application = get_wsgi_application()
+
+# /<short_code> 走只載入精簡 middleware 的快速通道 (SHORTENER_FAST_LANE)
+from .fastlane import fast_lane_wsgi  # noqa: E402
+
+application = fast_lane_wsgi(application)
+
+# 在背景建立短代碼的 Bloom filter，第一個請求不需等待全表掃描
+from shortener.bloom import prepare_short_code_filter  # noqa: E402
+
+prepare_short_code_filter()
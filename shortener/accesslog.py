@@ -0,0 +1,182 @@
+"""
+從 CDN / 反向代理的存取日誌補回點擊數 (ingest_access_logs 指令)。
+
+設定 cache_max_age 的重定向會被 CDN 與瀏覽器快取，期間內的點擊不會回到 Django。
+此模組以串流方式讀取 Common / Combined Log Format 的日誌，將重定向的請求依短代碼累計，
+每批以 flush_click_counts 累加回 click_count (與緩衝模式的點擊寫回相同，擁有者統計一併更新)。
+
+只應匯入由邊緣節點直接回應 (快取命中) 的請求：未命中時請求會轉送到 Django，已經記錄過點擊。
+日誌同時包含兩者時，以 hit_pattern 篩選 (例如 nginx 的 $upstream_cache_status 為 HIT 的行)；
+無法區分時，只匯入 since / until 之間 (確定 Django 沒有回應重定向的期間) 的行。
+
+進度記錄在 AccessLogProgress (以日誌第一行的雜湊識別檔案)，每批的點擊與進度在同一個交易中提交；
+中斷或重新執行同一個檔案時只處理尚未提交的行，不會重複累加。
+"""
+import hashlib
+import re
+from datetime import datetime
+from typing import NamedTuple
+from urllib.parse import unquote, urlsplit
+
+from django.db import transaction
+from django.utils import timezone
+
+from .clicks import flush_click_counts, get_click_settings, write_click_events
+from .importer import batched
+from .models import AccessLogProgress, Link
+
+# Common Log Format：host ident user [time] "request" status size
+# Combined Log Format 在後面多了 "referer" "user-agent"，以前綴比對即可同時支援
+LOG_PATTERN = re.compile(
+    r'^\S+ \S+ \S+ \[(?P<time>[^\]]+)\] "(?P<method>[A-Z]+) (?P<path>\S+)[^"]*" (?P<status>\d{3}) '
+)
+LOG_TIME_FORMAT = '%d/%b/%Y:%H:%M:%S %z'
+
+REDIRECT_STATUSES = frozenset({301, 302, 307, 308})
+
+SHORT_CODE_MAX_LENGTH = Link._meta.get_field('short_code').max_length
+
+
+class IngestStats(NamedTuple):
+    read: int = 0  # 已處理的行數
+    clicks: int = 0  # 累加回 click_count 的點擊數
+    unknown: int = 0  # 找不到對應連結的重定向
+    skipped: int = 0  # 無法解析或不是重定向的行
+
+
+class IngestConflict(Exception):
+    """同一個日誌檔案的另一次執行已經更新進度。"""
+
+
+class LogEntry(NamedTuple):
+    short_code: str
+    clicked_at: datetime
+
+
+def parse_line(line, statuses=REDIRECT_STATUSES, hit_pattern=None):
+    """
+    解析一行存取日誌。
+
+    Args:
+        line (str): 一行 Common / Combined Log Format 的日誌。
+        statuses (set[int]): 視為一次點擊的回應狀態碼。
+        hit_pattern (re.Pattern | None): 若提供，只有符合的行 (例如快取命中) 才算點擊。
+
+    Returns:
+        LogEntry | None: 不是短網址重定向的行回傳 None。
+    """
+    match = LOG_PATTERN.match(line)
+    if match is None or match['method'] != 'GET' or int(match['status']) not in statuses:
+        return None
+    if hit_pattern is not None and not hit_pattern.search(line):
+        return None
+    short_code = unquote(urlsplit(match['path']).path).lstrip('/')
+    if not short_code or '/' in short_code or len(short_code) > SHORT_CODE_MAX_LENGTH:
+        return None
+    try:
+        clicked_at = datetime.strptime(match['time'], LOG_TIME_FORMAT)
+    except ValueError:
+        return None
+    return LogEntry(short_code, clicked_at)
+
+
+def ingest_batch(entries, batch_size=500, record_events=False):
+    """
+    將一批日誌中的點擊累加回資料庫。
+
+    Args:
+        entries (list[LogEntry]): 已解析的重定向。
+        batch_size (int): 每個 UPDATE 最多涵蓋的 Link 數量。
+        record_events (bool): 同時寫入原始點擊事件，讓時間序列包含邊緣節點的點擊。
+
+    Returns:
+        tuple[int, int]: (累加的點擊數, 找不到連結的重定向數)。
+    """
+    pks = dict(
+        Link.objects.filter(short_code__in={entry.short_code for entry in entries}).values_list('short_code', 'pk')
+    )
+    counts = {}
+    events = []
+    for entry in entries:
+        pk = pks.get(entry.short_code)
+        if pk is None:
+            continue
+        count, last = counts.get(pk, (0, entry.clicked_at))
+        counts[pk] = (count + 1, max(last, entry.clicked_at))
+        events.append((pk, entry.clicked_at))
+    if counts:
+        with transaction.atomic():
+            flush_click_counts(counts, batch_size)
+            if record_events:
+                write_click_events(events, batch_size)
+    return len(events), len(entries) - len(events)
+
+
+def log_fingerprint(first_line):
+    """以日誌第一行 (含時間與來源 IP) 的雜湊識別檔案，壓縮或改名後仍相同。"""
+    return hashlib.sha256(first_line.encode('utf-8', 'replace')).hexdigest()
+
+
+def load_progress(source):
+    """回傳 source 已提交的進度，尚未處理過時回傳空的 IngestStats。"""
+    progress = AccessLogProgress.objects.filter(source=source).values(*IngestStats._fields).first()
+    return IngestStats(**progress) if progress else IngestStats()
+
+
+def reset_progress(source):
+    AccessLogProgress.objects.filter(source=source).delete()
+
+
+def in_window(entry, since=None, until=None):
+    """點擊時間是否在 [since, until) 之間，未指定的一端不限制。"""
+    return (since is None or entry.clicked_at >= since) and (until is None or entry.clicked_at < until)
+
+
+def ingest_access_log(lines, batch_size=5000, statuses=REDIRECT_STATUSES, hit_pattern=None,
+                      source=None, name='', on_progress=None, since=None, until=None):
+    """
+    以串流方式匯入存取日誌，每 batch_size 行提交一次。
+
+    Args:
+        lines (iterable[str]): 日誌的每一行。
+        batch_size (int): 每批處理的行數。
+        statuses (set[int]): 視為一次點擊的回應狀態碼。
+        hit_pattern (re.Pattern | None): 只計入符合此正規表示式的行。
+        source (str | None): 日誌檔案的識別 (log_fingerprint)；提供時進度與點擊在同一個交易中記錄，
+            重新執行時略過已提交的行。None 表示不記錄進度。
+        name (str): 記錄在進度中的檔案名稱，方便辨識。
+        on_progress (callable | None): 每批完成後以 IngestStats 呼叫。
+        since (datetime | None): 只計入此時間 (含) 之後的行。
+        until (datetime | None): 只計入此時間之前的行。
+
+    Returns:
+        IngestStats: 累計 (含先前的執行) 的統計。
+
+    Raises:
+        IngestConflict: 同一個檔案同時有另一次執行。
+    """
+    progress = None
+    if source is not None:
+        progress, _ = AccessLogProgress.objects.get_or_create(source=source, defaults={'name': name[:255]})
+    stats = load_progress(source) if progress is not None else IngestStats()
+    record_events = get_click_settings()['RECORD_EVENTS']
+    numbered = ((number, line) for number, line in enumerate(lines, start=1) if number > stats.read)
+    for batch in batched(numbered, batch_size):
+        entries = [
+            entry for _, line in batch
+            if (entry := parse_line(line, statuses, hit_pattern)) and in_window(entry, since, until)
+        ]
+        with transaction.atomic():
+            if progress is not None:
+                # 鎖住進度列：同時處理同一個檔案時，後到的一方在此等待並發現進度已改變
+                read = AccessLogProgress.objects.select_for_update().values_list('read', flat=True).get(pk=progress.pk)
+                if read != stats.read:
+                    raise IngestConflict(f'Another run has already ingested {source} up to line {read}')
+            clicks, unknown = ingest_batch(entries, record_events=record_events) if entries else (0, 0)
+            stats = IngestStats(batch[-1][0], stats.clicks + clicks, stats.unknown + unknown,
+                                stats.skipped + len(batch) - len(entries))
+            if progress is not None:
+                AccessLogProgress.objects.filter(pk=progress.pk).update(**stats._asdict(), updated_at=timezone.now())
+        if on_progress is not None:
+            on_progress(stats)
+    return stats
@@ -0,0 +1,127 @@
+import datetime
+from collections import Counter
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ClickEvent, DailyClickRollup, HourlyClickRollup, Link
+
+GRANULARITIES = {
+    'hour': HourlyClickRollup,
+    'day': DailyClickRollup,
+}
+
+# 未指定查詢範圍時的預設天數
+DEFAULT_RANGE_DAYS = {
+    'hour': 7,
+    'day': 90,
+}
+
+
+def truncate(value, granularity):
+    """將時間截斷到所屬時間桶 (UTC) 的起點。"""
+    value = value.astimezone(datetime.timezone.utc).replace(minute=0, second=0, microsecond=0)
+    if granularity == 'day':
+        value = value.replace(hour=0)
+    return value
+
+
+def _apply_increments(model, increments):
+    """將 (link_id, bucket) → 次數 累加到時間桶表，已存在的桶以 bulk_update 更新。"""
+    if not increments:
+        return
+    link_ids = {link_id for link_id, _ in increments}
+    buckets = {bucket for _, bucket in increments}
+    existing = {
+        (row.link_id, row.bucket): row
+        for row in model.objects.select_for_update().filter(link_id__in=link_ids, bucket__in=buckets)
+    }
+    to_update, to_create = [], []
+    for (link_id, bucket), count in increments.items():
+        row = existing.get((link_id, bucket))
+        if row is None:
+            to_create.append(model(link_id=link_id, bucket=bucket, count=count))
+        else:
+            row.count += count
+            to_update.append(row)
+    model.objects.bulk_update(to_update, ['count'])
+    model.objects.bulk_create(to_create)
+
+
+def rollup_click_events(batch_size=10000):
+    """
+    將一批原始點擊事件彙總進每小時與每天的時間桶，並刪除已彙總的事件。
+
+    彙總與刪除在同一個交易中完成，因此中途失敗不會重複計算。
+    已刪除連結的孤兒事件會直接捨棄。
+
+    Args:
+        batch_size (int): 本批次最多處理的事件數。
+
+    Returns:
+        int: 本批次處理的事件數，0 表示已沒有待處理的事件。
+    """
+    with transaction.atomic():
+        events = list(
+            ClickEvent.objects.select_for_update()
+            .order_by('pk')
+            .values_list('pk', 'link_id', 'clicked_at')[:batch_size]
+        )
+        if not events:
+            return 0
+
+        live_links = set(
+            Link.objects.filter(pk__in={link_id for _, link_id, _ in events})
+            .values_list('pk', flat=True)
+        )
+        for granularity, model in GRANULARITIES.items():
+            increments = Counter(
+                (link_id, truncate(clicked_at, granularity))
+                for _, link_id, clicked_at in events
+                if link_id in live_links
+            )
+            _apply_increments(model, increments)
+
+        ClickEvent.objects.filter(pk__in=[pk for pk, _, _ in events]).delete()
+    return len(events)
+
+
+def resolve_range(granularity, start=None, end=None):
+    """補上預設的查詢範圍並對齊到時間桶。"""
+    end = end or timezone.now()
+    start = start or end - datetime.timedelta(days=DEFAULT_RANGE_DAYS[granularity])
+    return truncate(start, granularity), end
+
+
+def click_series(link_id, granularity='hour', start=None, end=None):
+    """
+    從時間桶表讀取連結的點擊時間序列 (不讀取原始事件)。
+
+    Args:
+        link_id (int): Link 主鍵。
+        granularity (str): 'hour' 或 'day'。
+        start (datetime): 起始時間 (含)，預設依粒度往前推。
+        end (datetime): 結束時間 (不含)，預設為現在。
+
+    Returns:
+        list[tuple[datetime, int]]: 依時間排序的 (時間桶, 點擊數)。
+    """
+    start, end = resolve_range(granularity, start, end)
+    return list(
+        GRANULARITIES[granularity].objects
+        .filter(link_id=link_id, bucket__gte=start, bucket__lt=end)
+        .order_by('bucket')
+        .values_list('bucket', 'count')
+    )
+
+
+async def aclick_series(link_id, granularity='hour', start=None, end=None):
+    """click_series 的非同步版本。"""
+    start, end = resolve_range(granularity, start, end)
+    queryset = (
+        GRANULARITIES[granularity].objects
+        .filter(link_id=link_id, bucket__gte=start, bucket__lt=end)
+        .order_by('bucket')
+        .values_list('bucket', 'count')
+    )
+    return [row async for row in queryset]
@@ -1,31 +1,253 @@
+import json
+from datetime import datetime
+from typing import List, Literal, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.shortcuts import aget_object_or_404, get_object_or_404
 from ninja import ModelSchema, Router, Schema
-from ninja_jwt.authentication import JWTAuth
-from pydantic import HttpUrl
+from ninja.errors import HttpError
+from pydantic import AwareDatetime, Field, HttpUrl, ValidationError
 
+from .analytics import aclick_series, click_series
+from .auth import AsyncCachedJWTAuth, CachedJWTAuth
 from .models import Link
-from .utils import generate_short_code
+from .ratelimit import RateLimited, acheck_rate_limit, check_rate_limit, too_many_requests
+from .redirects import get_redirect_settings
+from .replicas import read_from_replica
+from .stats import aget_owner_stats, get_owner_stats
+from .utils import acreate_link, bulk_create_links, create_link
+
+BULK_DEFAULTS = {
+    'MAX_URLS': 50000,
+    'CHUNK_SIZE': 1000,
+}
 
 router = Router(tags=["shorteners"])
+# 與 router 相同的端點，但使用 async ORM，供 ASGI 部署掛載
+async_router = Router(tags=["shorteners"])
 
 # Input Schema
 class ShortenRequest(Schema):
     original_url: HttpUrl
+    # 到期時間 (需包含時區)，到期後重定向回傳 410
+    expires_at: Optional[AwareDatetime] = None
+    # 以 301 (永久) 取代 302 重定向
+    redirect_permanent: bool = False
+    # 重定向的 Cache-Control max-age (秒)，CDN 與瀏覽器在期間內不會回到伺服器；None 表示使用預設值
+    cache_max_age: Optional[int] = Field(None, ge=0)
+
+class BulkShortenRequest(Schema):
+    # 每個網址會個別以 ShortenRequest 驗證，無效的網址只會讓該筆失敗
+    original_urls: List[str]
+    # 套用到這一批所有連結的到期時間與重定向策略
+    expires_at: Optional[AwareDatetime] = None
+    redirect_permanent: bool = False
+    cache_max_age: Optional[int] = Field(None, ge=0)
 
 # Output Schema
 class LinkSchema(ModelSchema):
     class Meta:
         model = Link
-        exclude = ["id"]
+        exclude = ["id", "url_hash"]
+
+class BulkShortenItem(Schema):
+    index: int
+    original_url: str
+    short_code: Optional[str] = None
+    error: Optional[str] = None
+
+class BulkShortenResponse(Schema):
+    created: int
+    failed: int
+    results: List[BulkShortenItem]
+
+class TopLinkSchema(Schema):
+    short_code: str
+    original_url: str
+    click_count: int
+
+class OwnerStatsSchema(Schema):
+    link_count: int
+    click_count: int
+    top_link: Optional[TopLinkSchema] = None
+
+class ClickBucket(Schema):
+    bucket: datetime
+    count: int
+
+class ClickSeries(Schema):
+    short_code: str
+    granularity: str
+    total: int
+    buckets: List[ClickBucket]
+
+
+def _click_series_response(short_code, granularity, rows):
+    return {
+        "short_code": short_code,
+        "granularity": granularity,
+        "total": sum(count for _, count in rows),
+        "buckets": [{"bucket": bucket, "count": count} for bucket, count in rows],
+    }
+
+
+def get_bulk_settings():
+    return {**BULK_DEFAULTS, **getattr(settings, 'SHORTENER_BULK', {})}
+
+
+def _check_bulk_size(payload):
+    max_urls = get_bulk_settings()['MAX_URLS']
+    if len(payload.original_urls) > max_urls:
+        raise HttpError(400, f"A bulk request accepts at most {max_urls} URLs")
+
+
+def _bulk_chunks(original_urls):
+    chunk_size = get_bulk_settings()['CHUNK_SIZE']
+    for start in range(0, len(original_urls), chunk_size):
+        yield start, original_urls[start:start + chunk_size]
+
+
+def _link_options(payload):
+    """取出建立連結時套用的選項，cache_max_age 不可超過 SHORTENER_REDIRECTS 的 MAX_MAX_AGE。"""
+    max_max_age = get_redirect_settings()['MAX_MAX_AGE']
+    if payload.cache_max_age is not None and payload.cache_max_age > max_max_age:
+        raise HttpError(400, f"cache_max_age must be at most {max_max_age} seconds")
+    return {
+        "expires_at": payload.expires_at,
+        "redirect_permanent": payload.redirect_permanent,
+        "cache_max_age": payload.cache_max_age,
+    }
+
+
+def _shorten_chunk(offset, original_urls, owner, **options):
+    """驗證並建立一個批次的網址，回傳每一筆的結果。"""
+    results = []
+    valid = []
+    for index, url in enumerate(original_urls, start=offset):
+        try:
+            url = str(ShortenRequest(original_url=url).original_url)
+        except ValidationError as e:
+            results.append({"index": index, "original_url": url, "short_code": None,
+                            "error": e.errors()[0]["msg"]})
+            continue
+        valid.append((index, url))
+
+    links = bulk_create_links([url for _, url in valid], owner=owner, **options) if valid else []
+    for (index, url), link in zip(valid, links):
+        results.append({"index": index, "original_url": url, "short_code": link.short_code,
+                        "error": None})
+    results.sort(key=lambda item: item["index"])
+    return results
+
+
+def _ndjson(results):
+    return "".join(json.dumps(item) + "\n" for item in results)
+
+
+def rate_limited_handler(request, exc: RateLimited):
+    # 由 ninja_shortener/api.py 註冊，將 RateLimited 轉換成 429 與 Retry-After
+    return too_many_requests(exc.retry_after, json.dumps({"detail": "Too many requests."}),
+                             content_type="application/json")
 
-@router.post("/shorten", response=LinkSchema, auth=JWTAuth())
+
+def _bulk_response(results):
+    created = sum(1 for item in results if item["error"] is None)
+    return {"created": created, "failed": len(results) - created, "results": results}
+
+@router.post("/shorten", response=LinkSchema, auth=CachedJWTAuth())
 def shorten_url(request, payload: ShortenRequest):
-    # The endpoint is now protected by JWTAuth.
+    # The endpoint is now protected by CachedJWTAuth.
     # The authenticated user is available via request.user
     owner = request.user
+    check_rate_limit("shorten", request)
 
-    link = Link.objects.create(
-        original_url=str(payload.original_url),
-        short_code=generate_short_code(),
-        owner=owner
-    )
+    link = create_link(str(payload.original_url), owner=owner, **_link_options(payload))
     return link
+
+
+@router.post("/shorten/bulk", response=BulkShortenResponse, auth=CachedJWTAuth())
+def bulk_shorten_urls(request, payload: BulkShortenRequest, stream: bool = False):
+    # 一次建立大量短網址，每個批次只需一次 bulk_create
+    # stream=true 時以 NDJSON 逐批回傳結果，不需等待全部完成
+    _check_bulk_size(payload)
+    options = _link_options(payload)
+    owner = request.user
+    check_rate_limit("shorten_bulk", request)
+
+    if stream:
+        def generate():
+            for offset, chunk in _bulk_chunks(payload.original_urls):
+                yield _ndjson(_shorten_chunk(offset, chunk, owner, **options))
+        return StreamingHttpResponse(generate(), content_type="application/x-ndjson")
+
+    results = []
+    for offset, chunk in _bulk_chunks(payload.original_urls):
+        results += _shorten_chunk(offset, chunk, owner, **options)
+    return _bulk_response(results)
+
+
+@router.get("/links/{short_code}/clicks", response=ClickSeries, auth=CachedJWTAuth())
+@read_from_replica
+def link_click_series(request, short_code: str, granularity: Literal["hour", "day"] = "hour",
+                      start: Optional[datetime] = None, end: Optional[datetime] = None):
+    # 從每小時 / 每天的時間桶表讀取點擊時間序列，只能查詢自己的連結
+    link = get_object_or_404(Link, short_code=short_code, owner=request.user)
+    rows = click_series(link.pk, granularity, start, end)
+    return _click_series_response(short_code, granularity, rows)
+
+
+@router.get("/stats", response=OwnerStatsSchema, auth=CachedJWTAuth())
+@read_from_replica
+def owner_stats(request):
+    # 目前使用者的總連結數、總點擊數與點擊最多的連結，來自增量維護的統計列
+    return get_owner_stats(request.user)
+
+
+@async_router.post("/shorten", response=LinkSchema, auth=AsyncCachedJWTAuth())
+async def shorten_url_async(request, payload: ShortenRequest):
+    # shorten_url 的非同步版本，等待資料庫時不佔用執行緒
+    owner = request.user
+    await acheck_rate_limit("shorten", request, owner)
+
+    link = await acreate_link(str(payload.original_url), owner=owner, **_link_options(payload))
+    return link
+
+
+@async_router.post("/shorten/bulk", response=BulkShortenResponse, auth=AsyncCachedJWTAuth())
+async def bulk_shorten_urls_async(request, payload: BulkShortenRequest, stream: bool = False):
+    # bulk_shorten_urls 的非同步版本，每個批次的寫入交由執行緒池處理
+    _check_bulk_size(payload)
+    options = _link_options(payload)
+    owner = request.user
+    await acheck_rate_limit("shorten_bulk", request, owner)
+    shorten_chunk = sync_to_async(_shorten_chunk)
+
+    if stream:
+        async def generate():
+            for offset, chunk in _bulk_chunks(payload.original_urls):
+                yield _ndjson(await shorten_chunk(offset, chunk, owner, **options))
+        return StreamingHttpResponse(generate(), content_type="application/x-ndjson")
+
+    results = []
+    for offset, chunk in _bulk_chunks(payload.original_urls):
+        results += await shorten_chunk(offset, chunk, owner, **options)
+    return _bulk_response(results)
+
+
+@async_router.get("/links/{short_code}/clicks", response=ClickSeries, auth=AsyncCachedJWTAuth())
+@read_from_replica
+async def link_click_series_async(request, short_code: str, granularity: Literal["hour", "day"] = "hour",
+                                  start: Optional[datetime] = None, end: Optional[datetime] = None):
+    # link_click_series 的非同步版本
+    link = await aget_object_or_404(Link, short_code=short_code, owner=request.user)
+    rows = await aclick_series(link.pk, granularity, start, end)
+    return _click_series_response(short_code, granularity, rows)
+
+
+@async_router.get("/stats", response=OwnerStatsSchema, auth=AsyncCachedJWTAuth())
+@read_from_replica
+async def owner_stats_async(request):
+    # owner_stats 的非同步版本
+    return await aget_owner_stats(request.user)
@@ -0,0 +1,108 @@
+import time
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from ninja_jwt.authentication import AsyncJWTAuth, JWTAuth
+from ninja_jwt.exceptions import AuthenticationFailed, InvalidToken
+from ninja_jwt.settings import api_settings
+
+from .usercache import get_user_cache_settings, invalidate_cached_user, user_cache_key  # noqa: F401
+
+# 快取中只存放驗證與 API 需要的欄位，不包含密碼雜湊等敏感資料
+CACHED_FIELDS = ('id', 'username', 'is_active')
+
+
+class CachedUserMixin:
+    """
+    快取「已驗證的 token → 使用者」對應，省去每個 API 請求查詢 User 的一次查詢。
+
+    token 的簽章、有效期限與 blacklist 檢查 (get_validated_token) 仍然每次執行，
+    只有載入 User 的部分改由快取提供。快取項目的存活時間不超過 token 的剩餘有效期，
+    User 儲存或刪除時會由 signal 讓快取失效 (見 shortener/signals.py)。
+
+    快取只存放 CACHED_FIELDS 的值；回傳的 User 其餘欄位為延遲載入 (deferred)，
+    第一次存取時才查詢資料庫。非同步的視圖中請只使用這些欄位。
+    """
+
+    def _user_id(self, validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+    def _cache_timeout(self, validated_token):
+        conf = get_user_cache_settings()
+        timeout = max(1, int(validated_token['exp'] - time.time()))
+        if conf['MAX_TTL'] is not None:
+            timeout = min(timeout, conf['MAX_TTL'])
+        return timeout
+
+    def _user_query(self, user_id):
+        return self.user_model.objects.filter(**{api_settings.USER_ID_FIELD: user_id}).values_list(*CACHED_FIELDS)
+
+    def _build_user(self, values):
+        """以快取的欄位建立 User，其餘欄位延遲載入。"""
+        if not isinstance(values, tuple):
+            # 沒有快取，或是舊版本快取的整個 User 物件
+            return None
+        return self.user_model.from_db(DEFAULT_DB_ALIAS, CACHED_FIELDS, values)
+
+    def _check_user(self, user):
+        if user is None:
+            raise AuthenticationFailed(_("User not found"))
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"))
+        return user
+
+    def get_user(self, validated_token):
+        conf = get_user_cache_settings()
+        if not conf['ENABLED']:
+            return super().get_user(validated_token)
+
+        user_id = self._user_id(validated_token)
+        cache = caches[conf['CACHE_ALIAS']]
+        key = user_cache_key(user_id)
+        user = self._build_user(cache.get(key))
+        if user is None:
+            values = self._user_query(user_id).first()
+            if values is not None:
+                cache.set(key, values, self._cache_timeout(validated_token))
+            user = self._build_user(values)
+        return self._check_user(user)
+
+    async def aget_user(self, validated_token):
+        """get_user 的非同步版本，快取命中時不需切換到執行緒池。"""
+        conf = get_user_cache_settings()
+        user_id = self._user_id(validated_token)
+        if not conf['ENABLED']:
+            user = await self.user_model.objects.filter(**{api_settings.USER_ID_FIELD: user_id}).afirst()
+            return self._check_user(user)
+
+        cache = caches[conf['CACHE_ALIAS']]
+        key = user_cache_key(user_id)
+        user = self._build_user(await cache.aget(key))
+        if user is None:
+            values = await self._user_query(user_id).afirst()
+            if values is not None:
+                await cache.aset(key, values, self._cache_timeout(validated_token))
+            user = self._build_user(values)
+        return self._check_user(user)
+
+
+class CachedJWTAuth(CachedUserMixin, JWTAuth):
+    """以快取載入使用者的 JWTAuth。"""
+
+
+class AsyncCachedJWTAuth(CachedUserMixin, AsyncJWTAuth):
+    """以快取載入使用者的 AsyncJWTAuth。"""
+
+    async def async_jwt_authenticate(self, request, token):
+        request.user = AnonymousUser()
+        # token 驗證可能查詢 blacklist，維持在執行緒池中執行
+        validated_token = await sync_to_async(self.get_validated_token)(token)
+        user = await self.aget_user(validated_token)
+        request.user = user
+        return user
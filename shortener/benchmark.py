@@ -0,0 +1,270 @@
+import json
+import logging
+import random
+import string
+import time
+import uuid
+from dataclasses import asdict, dataclass
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Max, Min
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from ninja_jwt.tokens import RefreshToken
+
+from .models import Link
+from .utils import DELETE_FIELDS, delete_links
+
+SCENARIOS = ('redirect', 'redirect_miss', 'shorten_form', 'shorten_api', 'dashboard')
+
+# 基準比較時允許的退步幅度 (比例)
+DEFAULT_THRESHOLD = 0.10
+
+# 壓測時建立的連結使用這個網域，結束後刪除
+BENCH_URL_PREFIX = 'https://bench.invalid/'
+
+
+def percentile(samples, pct):
+    """回傳已排序樣本的百分位數 (nearest-rank)。"""
+    if not samples:
+        return 0.0
+    index = max(0, min(len(samples) - 1, round(pct / 100 * len(samples)) - 1))
+    return samples[index]
+
+
+@dataclass
+class BenchmarkResult:
+    scenario: str
+    requests: int
+    errors: int
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    mean_ms: float
+    throughput: float
+    queries_per_request: float
+
+    @classmethod
+    def from_samples(cls, scenario, samples, elapsed, errors, queries):
+        samples = sorted(samples)
+        count = len(samples)
+        return cls(
+            scenario=scenario,
+            requests=count,
+            errors=errors,
+            p50_ms=percentile(samples, 50) * 1000,
+            p95_ms=percentile(samples, 95) * 1000,
+            p99_ms=percentile(samples, 99) * 1000,
+            mean_ms=sum(samples) / count * 1000 if count else 0.0,
+            throughput=count / elapsed if elapsed else 0.0,
+            queries_per_request=queries / count if count else 0.0,
+        )
+
+    def to_dict(self):
+        return asdict(self)
+
+
+def run_scenario(name, send, requests, warmup=0, expected_status=(200,)):
+    """
+    依序送出 requests 個請求，統計延遲、吞吐量與每個請求的查詢數。
+
+    Args:
+        name (str): 情境名稱。
+        send (callable): 接收請求序號並回傳 response 的函式。
+        requests (int): 計入統計的請求數。
+        warmup (int): 不計入統計的暖身請求數 (填滿快取、建立 Bloom filter 等)。
+        expected_status (tuple[int]): 視為成功的狀態碼。
+
+    Returns:
+        BenchmarkResult: 統計結果。
+    """
+    for i in range(warmup):
+        send(-1 - i)
+
+    samples, errors = [], 0
+    with CaptureQueriesContext(connection) as ctx:
+        started = time.perf_counter()
+        for i in range(requests):
+            request_started = time.perf_counter()
+            response = send(i)
+            samples.append(time.perf_counter() - request_started)
+            if response.status_code not in expected_status:
+                errors += 1
+        elapsed = time.perf_counter() - started
+    return BenchmarkResult.from_samples(name, samples, elapsed, errors, len(ctx.captured_queries))
+
+
+class BenchmarkSuite:
+    """
+    以行程內的 Django test Client 對現有資料庫執行可重現的壓測情境。
+
+    相同的 seed 會抽出相同的 short_code 與使用者；請求在行程內處理，
+    不包含網路與 WSGI 伺服器的開銷，適合比較程式碼變更前後的差異。
+    壓測期間停用速率限制，建立的連結在結束後刪除。
+
+    Args:
+        requests (int): 每個情境計入統計的請求數。
+        warmup (int): 每個情境的暖身請求數。
+        seed (int): 抽樣用的亂數種子。
+        sample_size (int): 重定向情境抽樣的 short_code 數。
+    """
+
+    def __init__(self, requests=1000, warmup=50, seed=0, sample_size=1000):
+        self.requests = requests
+        self.warmup = warmup
+        self.seed = seed
+        self.sample_size = sample_size
+        self.run_id = uuid.uuid4().hex[:8]
+
+    def _sample_codes(self):
+        rng = random.Random(self.seed)
+        bounds = Link.objects.aggregate(low=Min('pk'), high=Max('pk'))
+        if bounds['low'] is None:
+            return []
+        pks = {rng.randint(bounds['low'], bounds['high']) for _ in range(self.sample_size)}
+        codes = sorted(Link.objects.filter(pk__in=pks).values_list('short_code', flat=True))
+        rng.shuffle(codes)
+        return codes
+
+    def _dashboard_user(self):
+        # 從抽樣的連結中挑選有擁有者的一筆，避免對整個資料表做彙總
+        owner_id = (
+            Link.objects.filter(short_code__in=self._sample_codes(), owner__isnull=False)
+            .order_by('short_code')
+            .values_list('owner_id', flat=True)
+            .first()
+        )
+        return User.objects.filter(pk=owner_id, is_active=True).first()
+
+    def _url(self, i):
+        return f'{BENCH_URL_PREFIX}{self.run_id}/{i}'
+
+    def redirect(self):
+        codes = self._sample_codes()
+        if not codes:
+            return None
+        client = Client()
+        return lambda i: client.get(f'/{codes[i % len(codes)]}'), (302,)
+
+    def redirect_miss(self):
+        rng = random.Random(self.seed)
+        alphabet = string.ascii_letters + string.digits
+        codes = [''.join(rng.choices(alphabet, k=12)) for _ in range(self.sample_size)]
+        client = Client()
+        return lambda i: client.get(f'/{codes[i % len(codes)]}'), (404,)
+
+    def shorten_form(self):
+        client = Client()
+        return lambda i: client.post('/shorten/', {'original_url': self._url(f'form-{i}')}), (302,)
+
+    def shorten_api(self):
+        user = self._dashboard_user() or User.objects.filter(is_active=True).first()
+        if user is None:
+            return None
+        token = str(RefreshToken.for_user(user).access_token)
+        client = Client(HTTP_AUTHORIZATION=f'Bearer {token}')
+        return (
+            lambda i: client.post('/api/shorten', {'original_url': self._url(f'api-{i}')},
+                                  content_type='application/json'),
+            (200,),
+        )
+
+    def dashboard(self):
+        user = self._dashboard_user()
+        if user is None:
+            return None
+        client = Client()
+        client.force_login(user)
+        return lambda i: client.get('/dashboard/'), (200,)
+
+    def run(self, scenarios=SCENARIOS):
+        """
+        執行指定的情境，回傳 {情境: BenchmarkResult}；缺少所需資料的情境會被略過。
+        """
+        results = {}
+        overrides = override_settings(
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+            SHORTENER_RATE_LIMITS={'ENABLED': False},
+        )
+        # 不存在的代碼會讓 django.request 對每個請求記錄一次 404 警告
+        request_logger = logging.getLogger('django.request')
+        level = request_logger.level
+        request_logger.setLevel(logging.ERROR)
+        with overrides:
+            try:
+                for name in scenarios:
+                    prepared = getattr(self, name)()
+                    if prepared is None:
+                        continue
+                    send, expected_status = prepared
+                    results[name] = run_scenario(name, send, self.requests, self.warmup, expected_status)
+            finally:
+                request_logger.setLevel(level)
+                delete_links(Link.objects.filter(original_url__startswith=f'{BENCH_URL_PREFIX}{self.run_id}/')
+                             .values(*DELETE_FIELDS))
+        return results
+
+
+def save_results(path, results, seed=None):
+    """將結果存成 JSON，可作為之後比較用的基準。"""
+    data = {
+        'seed': seed,
+        'database': connection.vendor,
+        'link_count': Link.objects.count(),
+        'results': {name: result.to_dict() for name, result in results.items()},
+    }
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2)
+
+
+def load_results(path):
+    with open(path) as f:
+        data = json.load(f)
+    return {name: BenchmarkResult(**result) for name, result in data['results'].items()}
+
+
+# 指標: 數值越大越好時為 True
+COMPARED_METRICS = {
+    'p50_ms': False,
+    'p95_ms': False,
+    'p99_ms': False,
+    'throughput': True,
+    'queries_per_request': False,
+}
+
+
+def compare_results(current, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    與基準比較，回傳每個情境、每個指標的變化。
+
+    延遲與吞吐量超過 threshold 比例的退步視為 regression；
+    每個請求的查詢數只要增加就視為 regression。
+
+    Returns:
+        list[dict]: 每筆包含 scenario、metric、baseline、current、change、regression。
+    """
+    rows = []
+    for name, result in current.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            before, after = getattr(base, metric), getattr(result, metric)
+            change = (after - before) / before if before else 0.0
+            if metric == 'queries_per_request':
+                regression = after > before + 1e-9
+            elif higher_is_better:
+                regression = change < -threshold
+            else:
+                regression = change > threshold
+            rows.append({
+                'scenario': name,
+                'metric': metric,
+                'baseline': before,
+                'current': after,
+                'change': change,
+                'regression': regression,
+            })
+    return rows
@@ -0,0 +1,407 @@
+import hashlib
+import logging
+import math
+import os
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.db import connections, transaction
+from django.dispatch import receiver
+
+from .models import Link
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SETTINGS = {
+    # 需要設定 SHARED_CACHE_ALIAS，否則其他 worker 建立的連結在更新前會被誤判為不存在
+    'ENABLED': False,
+    'FALSE_POSITIVE_RATE': 0.01,
+    'MAX_BYTES': 16 * 1024 * 1024,
+    'MIN_CAPACITY': 100000,
+    'REFRESH_INTERVAL': 1.0,
+    # 增量更新往回重讀的秒數 (依 updated_at)，需大於建立連結的最長交易時間與各主機的時鐘誤差
+    'REFRESH_LAG': 60.0,
+    'BATCH_SIZE': 10000,
+    'SHARED_CACHE_ALIAS': None,
+    'SHARED_KEY': 'shortener:bloom:marker',
+}
+
+
+class BloomFilter:
+    """
+    固定大小的 Bloom filter。
+
+    以 blake2b 產生兩個 64 位元雜湊，再用 double hashing 推導出 k 個位置，
+    每次查詢只需計算一次雜湊。沒有偽陰性：回傳 False 代表一定不存在。
+
+    Args:
+        capacity (int): 預計存放的項目數。
+        error_rate (float): 達到 capacity 時的偽陽性率。
+        max_bytes (int): 位元陣列的記憶體上限；受限時實際偽陽性率會高於 error_rate。
+    """
+
+    def __init__(self, capacity, error_rate=0.01, max_bytes=16 * 1024 * 1024):
+        capacity = max(1, capacity)
+        bits = math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))
+        self.num_bits = max(8, min(bits, max_bytes * 8))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.capacity = capacity
+        self.count = 0
+        self._bits = bytearray((self.num_bits + 7) // 8)
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.num_bits for i in range(self.num_hashes))
+
+    def add(self, item):
+        """
+        加入 item，回傳是否有任何位元由 0 變 1。
+
+        重複加入不會增加 count，因此增量更新重讀的資料不會被重複計算；
+        新項目若恰好是偽陽性也不會計入，count 只是略低的估計值。
+        """
+        bits = self._bits
+        added = False
+        for pos in self._positions(item):
+            mask = 1 << (pos & 7)
+            if not bits[pos >> 3] & mask:
+                bits[pos >> 3] |= mask
+                added = True
+        if added:
+            self.count += 1
+        return added
+
+    def __contains__(self, item):
+        bits = self._bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+    @property
+    def size_bytes(self):
+        return len(self._bits)
+
+    def estimated_false_positive_rate(self):
+        """依目前的項目數估計偽陽性率。"""
+        return (1 - math.exp(-self.num_hashes * self.count / self.num_bits)) ** self.num_hashes
+
+
+class ShortCodeFilter:
+    """
+    每個 worker 行程內的 short_code 成員集合，讓不存在的短代碼不需查詢資料庫即可回傳 404。
+
+    worker 啟動時在背景執行緒從 Link 資料表建立 (prepare_short_code_filter)，建立完成前
+    所有代碼都交給快取與資料庫判斷，請求不會等待全表掃描。
+    本行程建立的連結會立即加入；其他 worker 建立連結並提交後會更新共用快取中的標記，
+    查詢結果為「不存在」時若標記已改變 (或距離上次更新超過 refresh_interval 秒) 就先更新再判斷。
+    Bloom filter 不能有偽陰性：沒有共用快取時無法得知其他 worker 的寫入，
+    每個「不存在」都先更新一次 (等同查詢資料庫)；標記被逐出快取時同樣視為已改變。
+
+    增量更新依 updated_at 而不是 pk 載入：pk 在 INSERT 時分配，pk 較小的連結可能較晚提交
+    (批次建立、import_links)。每次載入 updated_at 不早於已載入的最大值減去 refresh_lag 秒的連結，
+    refresh_lag 需大於建立連結的最長交易時間與各主機的時鐘誤差。
+    讀取資料庫時不持有鎖，讀取完成後才加入 filter；連結數超過容量時以兩倍容量完整重建後替換。
+    刪除的連結仍會留在 filter 中，只是之後改由資料庫判斷 (等同偽陽性)。
+    """
+
+    def __init__(self, error_rate=0.01, max_bytes=16 * 1024 * 1024, min_capacity=100000,
+                 refresh_interval=1.0, refresh_lag=60.0, batch_size=10000,
+                 shared_alias=None, shared_key='shortener:bloom:marker'):
+        self.error_rate = error_rate
+        self.max_bytes = max_bytes
+        self.min_capacity = min_capacity
+        self.refresh_interval = refresh_interval
+        self.refresh_lag = refresh_lag
+        self.batch_size = batch_size
+        self.shared_alias = shared_alias
+        self.shared_key = shared_key
+        self._bloom = None
+        self._watermark = None
+        self._seen_marker = None
+        self._refreshed_at = 0.0
+        self._added_during_build = None
+        # _lock 只保護對 filter 的寫入 (不含資料庫讀取)；_build_lock / _refresh_lock 讓建立與更新各只有一個執行緒執行
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self.negatives = 0
+        self.refreshes = 0
+
+    @property
+    def shared_cache(self):
+        if self.shared_alias is None:
+            return None
+        return caches[self.shared_alias]
+
+    @property
+    def ready(self):
+        return self._bloom is not None
+
+    def __contains__(self, short_code):
+        """只檢查目前的 filter，不會建立或更新；尚未建立時回傳 False。"""
+        bloom = self._bloom
+        return bloom is not None and short_code in bloom
+
+    def _rows(self, since):
+        """讀取 updated_at 不早於 since 的 (short_code, updated_at)，since 為 None 時讀取所有連結。"""
+        queryset = Link.objects.all() if since is None else Link.objects.filter(updated_at__gte=since)
+        return queryset.values_list('short_code', 'updated_at').iterator(chunk_size=self.batch_size)
+
+    def ensure_built(self):
+        """尚未建立時從資料表建立，多個執行緒同時呼叫時只會建立一次。"""
+        if self._bloom is None:
+            with self._build_lock:
+                if self._bloom is None:
+                    self.build()
+
+    def build(self):
+        """從 Link 資料表完整建立新的 filter，完成後才替換目前的 filter。"""
+        with self._lock:
+            self._added_during_build = []
+        marker = self._read_marker()
+        if marker is None:
+            marker = self.publish()
+        capacity = max(self.min_capacity, Link.objects.count() * 2)
+        bloom = BloomFilter(capacity, self.error_rate, self.max_bytes)
+        watermark = None
+        try:
+            for short_code, updated_at in self._rows(None):
+                bloom.add(short_code)
+                if watermark is None or updated_at > watermark:
+                    watermark = updated_at
+        finally:
+            with self._lock:
+                added, self._added_during_build = self._added_during_build, None
+        with self._lock:
+            # 掃描期間本行程建立的連結可能尚未提交而沒有被讀到
+            for short_code in added:
+                bloom.add(short_code)
+            self._bloom, self._watermark = bloom, watermark
+            self._seen_marker = marker
+            self._refreshed_at = time.monotonic()
+
+    def build_in_background(self):
+        """在背景執行緒建立 filter，不阻塞請求。"""
+        thread = threading.Thread(target=self._build_and_close, name='shortener-bloom-build', daemon=True)
+        thread.start()
+        return thread
+
+    def _build_and_close(self):
+        try:
+            self.ensure_built()
+        except Exception:
+            logger.exception('Failed to build the short code filter')
+        finally:
+            # 背景執行緒擁有自己的資料庫連線，建立後即關閉
+            connections.close_all()
+
+    def refresh(self):
+        """增量載入上次更新之後新增或修改的連結，超過容量時完整重建。"""
+        if self._bloom is None:
+            return
+        refreshes = self.refreshes
+        with self._refresh_lock:
+            if self.refreshes != refreshes:
+                # 等待期間其他執行緒已經更新過
+                return
+            self._refreshed_at = time.monotonic()
+            watermark = self._watermark
+            since = None if watermark is None else watermark - timedelta(seconds=self.refresh_lag)
+            rows = list(self._rows(since))
+            with self._lock:
+                bloom = self._bloom
+                for short_code, updated_at in rows:
+                    bloom.add(short_code)
+                    if self._watermark is None or updated_at > self._watermark:
+                        self._watermark = updated_at
+                self.refreshes += 1
+                needs_rebuild = bloom.count > bloom.capacity
+            if needs_rebuild:
+                with self._build_lock:
+                    self.build()
+
+    def add(self, short_codes):
+        """加入本行程剛建立的連結；filter 建立中時一併記錄，替換後加入新的 filter。"""
+        short_codes = list(short_codes)
+        with self._lock:
+            if self._added_during_build is not None:
+                self._added_during_build.extend(short_codes)
+            if self._bloom is not None:
+                for short_code in short_codes:
+                    self._bloom.add(short_code)
+
+    def _read_marker(self):
+        shared = self.shared_cache
+        return shared.get(self.shared_key) if shared is not None else None
+
+    def publish(self):
+        """
+        更新共用快取中的標記，讓其他 worker 下次遇到不存在的代碼時立即更新。
+
+        Returns:
+            str | None: 新的標記；沒有共用快取時回傳 None。
+        """
+        shared = self.shared_cache
+        if shared is None:
+            return None
+        marker = uuid.uuid4().hex
+        shared.set(self.shared_key, marker, None)
+        return marker
+
+    def _stale(self):
+        if self.shared_cache is None:
+            return True
+        if time.monotonic() - self._refreshed_at >= self.refresh_interval:
+            return True
+        marker = self._read_marker()
+        if marker is not None and marker == self._seen_marker:
+            return False
+        if marker is None:
+            # 標記被逐出 (或快取重新啟動)，無法得知期間的寫入：重新發布並更新
+            marker = self.publish()
+        # 記下已處理的標記，每個標記只觸發一次更新
+        self._seen_marker = marker
+        return True
+
+    def might_exist(self, short_code):
+        """
+        判斷 short_code 是否可能存在。
+
+        Returns:
+            bool: False 表示一定不存在，可直接回傳 404；True 時需繼續查詢 (包含 filter 尚未建立時)。
+        """
+        bloom = self._bloom
+        if bloom is None:
+            return True
+        if short_code in bloom:
+            return True
+        if self._stale():
+            self.refresh()
+            if short_code in self._bloom:
+                return True
+        self.negatives += 1
+        return False
+
+    def stats(self):
+        """回傳大小與偽陽性率等資訊，供監控使用。"""
+        bloom = self._bloom
+        return {
+            'ready': bloom is not None,
+            'items': bloom.count if bloom else 0,
+            'capacity': bloom.capacity if bloom else 0,
+            'size_bytes': bloom.size_bytes if bloom else 0,
+            'estimated_false_positive_rate': bloom.estimated_false_positive_rate() if bloom else 0.0,
+            'negatives': self.negatives,
+            'refreshes': self.refreshes,
+            'watermark': self._watermark,
+        }
+
+
+_short_code_filter = None
+
+
+def get_bloom_settings():
+    return {**DEFAULT_SETTINGS, **getattr(settings, 'SHORTENER_BLOOM_FILTER', {})}
+
+
+def get_short_code_filter():
+    """
+    取得依 ``SHORTENER_BLOOM_FILTER`` 設定建立的全域 ShortCodeFilter。
+
+    沒有 SHARED_CACHE_ALIAS 時每個「不存在」都需要查詢資料庫，filter 沒有效益，
+    視為停用 (system check 會提出 shortener.W002 警告)。
+
+    Returns:
+        ShortCodeFilter | None: 停用時回傳 None。
+    """
+    global _short_code_filter
+    conf = get_bloom_settings()
+    if not conf['ENABLED'] or conf['SHARED_CACHE_ALIAS'] is None:
+        return None
+    if _short_code_filter is None:
+        _short_code_filter = ShortCodeFilter(
+            error_rate=conf['FALSE_POSITIVE_RATE'],
+            max_bytes=conf['MAX_BYTES'],
+            min_capacity=conf['MIN_CAPACITY'],
+            refresh_interval=conf['REFRESH_INTERVAL'],
+            refresh_lag=conf['REFRESH_LAG'],
+            batch_size=conf['BATCH_SIZE'],
+            shared_alias=conf['SHARED_CACHE_ALIAS'],
+            shared_key=conf['SHARED_KEY'],
+        )
+    return _short_code_filter
+
+
+def reset_short_code_filter():
+    global _short_code_filter
+    _short_code_filter = None
+
+
+_prepared = False
+
+
+def prepare_short_code_filter():
+    """
+    於 worker 啟動時 (wsgi.py / asgi.py) 在背景建立 filter。
+
+    以 gunicorn --preload 等方式在 fork 前匯入時，fork 後尚未建立完成的 filter 會在子行程中重新建立
+    (背景執行緒不會被複製到子行程)。
+    """
+    global _prepared
+    short_code_filter = get_short_code_filter()
+    if short_code_filter is None or short_code_filter.ready:
+        return
+    if not _prepared and hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=_prepare_after_fork)
+    _prepared = True
+    short_code_filter.build_in_background()
+
+
+def _prepare_after_fork():
+    if _short_code_filter is not None and not _short_code_filter.ready:
+        # 父行程中的鎖可能正被建立中的執行緒持有，子行程改用新的 filter
+        reset_short_code_filter()
+        prepare_short_code_filter()
+
+
+def might_exist(short_code):
+    """short_code 可能存在時回傳 True；停用 filter 時一律回傳 True。"""
+    short_code_filter = get_short_code_filter()
+    return short_code_filter is None or short_code_filter.might_exist(short_code)
+
+
+async def amight_exist(short_code):
+    """might_exist 的非同步版本，需要查詢資料庫 (更新) 時才切換到執行緒池。"""
+    short_code_filter = get_short_code_filter()
+    if short_code_filter is None or not short_code_filter.ready:
+        return True
+    if short_code in short_code_filter:
+        return True
+    return await sync_to_async(short_code_filter.might_exist)(short_code)
+
+
+def add_short_codes(links):
+    """
+    將新建立的連結加入本行程的 filter，並在交易提交後通知其他 worker。
+
+    供 post_save 訊號與 bulk_create_links 使用 (bulk_create 不會送出訊號)。
+    """
+    short_code_filter = get_short_code_filter()
+    if short_code_filter is None:
+        return
+    links = list(links)
+    short_code_filter.add(link.short_code for link in links)
+    if links and short_code_filter.shared_cache is not None:
+        transaction.on_commit(short_code_filter.publish)
+
+
+@receiver(setting_changed)
+def _reset_on_setting_changed(setting, **kwargs):
+    if setting == 'SHORTENER_BLOOM_FILTER':
+        reset_short_code_filter()
@@ -0,0 +1,307 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.db import DEFAULT_DB_ALIAS, DatabaseError
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .bloom import amight_exist, might_exist
+from .instrumentation import record_cache_lookup
+from .linkindex import invalidate_link_index, lookup_link_index
+from .models import Link
+from .replicas import is_replica, replica_failed, use_replica
+
+DEFAULT_SETTINGS = {
+    'ENABLED': True,
+    'MAX_ENTRIES': 10000,
+    'TTL': 300,
+    'SHARED_CACHE_ALIAS': None,
+    'SHARED_TTL': 3600,
+    'KEY_PREFIX': 'shortener:link:',
+}
+
+
+class ResolvedLink(NamedTuple):
+    """short_code 解析後所需的最小資料，避免每次都載入完整的 Link。"""
+    pk: int
+    original_url: str
+    expires_at: Optional[datetime] = None
+    redirect_permanent: bool = False
+    cache_max_age: Optional[int] = None
+
+    def is_expired(self, now=None):
+        """快取中的項目同樣依到期時間判斷，不需要在到期時讓快取失效。"""
+        return self.expires_at is not None and self.expires_at <= (now or timezone.now())
+
+
+def _resolved_row(queryset, short_code):
+    return queryset.filter(short_code=short_code).values_list('pk', 'original_url', 'expires_at', 'redirect_permanent', 'cache_max_age')
+
+
+def load_resolved_link(short_code) -> Optional[ResolvedLink]:
+    """
+    直接從資料庫 (有設定副本時讀取副本) 解析 short_code，只取出需要的欄位。
+
+    副本查詢失敗時標記為不可用，與找不到時相同改由主庫確認。
+    """
+    with use_replica() as alias:
+        try:
+            row = _resolved_row(Link.objects, short_code).first()
+        except DatabaseError:
+            if not is_replica(alias):
+                raise
+            replica_failed(alias)
+            row = None
+    if row is None and alias != DEFAULT_DB_ALIAS:
+        # 副本可能還沒複寫到剛建立的連結，找不到時再確認主庫
+        row = _resolved_row(Link.objects.using(DEFAULT_DB_ALIAS), short_code).first()
+    return ResolvedLink(*row) if row else None
+
+
+async def aload_resolved_link(short_code) -> Optional[ResolvedLink]:
+    """load_resolved_link 的非同步版本，使用 Django 的 async ORM。"""
+    with use_replica() as alias:
+        try:
+            row = await _resolved_row(Link.objects, short_code).afirst()
+        except DatabaseError:
+            if not is_replica(alias):
+                raise
+            replica_failed(alias)
+            row = None
+    if row is None and alias != DEFAULT_DB_ALIAS:
+        row = await _resolved_row(Link.objects.using(DEFAULT_DB_ALIAS), short_code).afirst()
+    return ResolvedLink(*row) if row else None
+
+
+class LinkResolutionCache:
+    """
+    short_code → original_url 的兩層解析快取。
+
+    第一層為行程內 (in-process) 的 LRU，有筆數上限與 TTL；
+    第二層為可選的 Django cache (例如 Redis)，供多個 worker 共用。
+    兩層都沒有命中時才查詢資料庫，並回填兩層快取。
+
+    注意：行程內的 LRU 只會在本行程收到 save/delete 訊號時失效，
+    其他 worker 需依賴 TTL 過期，因此 TTL 不宜設定過長。
+    """
+
+    def __init__(self, max_entries=10000, ttl=300, shared_alias=None,
+                 shared_ttl=3600, key_prefix='shortener:link:'):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.shared_alias = shared_alias
+        self.shared_ttl = shared_ttl
+        self.key_prefix = key_prefix
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.local_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def shared_cache(self):
+        if self.shared_alias is None:
+            return None
+        return caches[self.shared_alias]
+
+    def _shared_key(self, short_code):
+        return f'{self.key_prefix}{short_code}'
+
+    def _get_local(self, short_code):
+        with self._lock:
+            entry = self._entries.get(short_code)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[short_code]
+                return None
+            self._entries.move_to_end(short_code)
+            return value
+
+    def _set_local(self, short_code, value):
+        with self._lock:
+            self._entries[short_code] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(short_code)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def resolve(self, short_code) -> Optional[ResolvedLink]:
+        """
+        解析 short_code。
+
+        Args:
+            short_code (str): 要解析的短代碼。
+
+        Returns:
+            ResolvedLink | None: 找不到對應的 Link 時回傳 None。
+        """
+        value = self._get_local(short_code)
+        if value is not None:
+            self.local_hits += 1
+            record_cache_lookup(True)
+            return value
+
+        shared = self.shared_cache
+        if shared is not None:
+            cached = shared.get(self._shared_key(short_code))
+            if cached is not None:
+                self.shared_hits += 1
+                record_cache_lookup(True)
+                value = ResolvedLink(*cached)
+                self._set_local(short_code, value)
+                return value
+
+        self.misses += 1
+        record_cache_lookup(False)
+        value = load_resolved_link(short_code)
+        if value is not None:
+            self._set_local(short_code, value)
+            if shared is not None:
+                shared.set(self._shared_key(short_code), tuple(value), self.shared_ttl)
+        return value
+
+    async def aresolve(self, short_code) -> Optional[ResolvedLink]:
+        """resolve 的非同步版本，共用層與資料庫查詢都不會佔用執行緒。"""
+        value = self._get_local(short_code)
+        if value is not None:
+            self.local_hits += 1
+            record_cache_lookup(True)
+            return value
+
+        shared = self.shared_cache
+        if shared is not None:
+            cached = await shared.aget(self._shared_key(short_code))
+            if cached is not None:
+                self.shared_hits += 1
+                record_cache_lookup(True)
+                value = ResolvedLink(*cached)
+                self._set_local(short_code, value)
+                return value
+
+        self.misses += 1
+        record_cache_lookup(False)
+        value = await aload_resolved_link(short_code)
+        if value is not None:
+            self._set_local(short_code, value)
+            if shared is not None:
+                await shared.aset(self._shared_key(short_code), tuple(value), self.shared_ttl)
+        return value
+
+    def invalidate(self, short_code):
+        """從兩層快取中移除指定的 short_code。"""
+        with self._lock:
+            self._entries.pop(short_code, None)
+        shared = self.shared_cache
+        if shared is not None:
+            shared.delete(self._shared_key(short_code))
+
+    def clear(self):
+        """清空行程內的快取並歸零計數器 (不影響共用快取)。"""
+        with self._lock:
+            self._entries.clear()
+        self.local_hits = self.shared_hits = self.misses = self.evictions = 0
+
+    @property
+    def hits(self):
+        return self.local_hits + self.shared_hits
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """回傳命中 / 未命中等計數，供監控使用。"""
+        return {
+            'hits': self.hits,
+            'local_hits': self.local_hits,
+            'shared_hits': self.shared_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self),
+            'max_entries': self.max_entries,
+        }
+
+
+_resolution_cache = None
+
+
+def get_resolution_settings():
+    return {**DEFAULT_SETTINGS, **getattr(settings, 'SHORTENER_RESOLUTION_CACHE', {})}
+
+
+def get_resolution_cache() -> Optional[LinkResolutionCache]:
+    """
+    取得依 ``SHORTENER_RESOLUTION_CACHE`` 設定建立的全域解析快取。
+
+    Returns:
+        LinkResolutionCache | None: 停用快取時回傳 None。
+    """
+    global _resolution_cache
+    conf = get_resolution_settings()
+    if not conf['ENABLED']:
+        return None
+    if _resolution_cache is None:
+        _resolution_cache = LinkResolutionCache(
+            max_entries=conf['MAX_ENTRIES'],
+            ttl=conf['TTL'],
+            shared_alias=conf['SHARED_CACHE_ALIAS'],
+            shared_ttl=conf['SHARED_TTL'],
+            key_prefix=conf['KEY_PREFIX'],
+        )
+    return _resolution_cache
+
+
+def reset_resolution_cache():
+    global _resolution_cache
+    _resolution_cache = None
+
+
+def resolve_short_code(short_code) -> Optional[ResolvedLink]:
+    """透過 mmap 索引與解析快取 (若啟用) 將 short_code 解析為 ResolvedLink。"""
+    # 索引命中時不需查詢 Bloom filter、快取與資料庫；未收錄的代碼繼續往下查詢
+    if (row := lookup_link_index(short_code)) is not None:
+        record_cache_lookup(True)
+        return ResolvedLink(*row)
+    # Bloom filter 判定一定不存在的代碼直接回傳，不查詢快取與資料庫
+    if not might_exist(short_code):
+        return None
+    resolution_cache = get_resolution_cache()
+    if resolution_cache is None:
+        return load_resolved_link(short_code)
+    return resolution_cache.resolve(short_code)
+
+
+async def aresolve_short_code(short_code) -> Optional[ResolvedLink]:
+    """resolve_short_code 的非同步版本。"""
+    # 索引查詢只讀取 mmap，不會阻塞事件迴圈
+    if (row := lookup_link_index(short_code)) is not None:
+        record_cache_lookup(True)
+        return ResolvedLink(*row)
+    if not await amight_exist(short_code):
+        return None
+    resolution_cache = get_resolution_cache()
+    if resolution_cache is None:
+        return await aload_resolved_link(short_code)
+    return await resolution_cache.aresolve(short_code)
+
+
+def invalidate_short_code(short_code):
+    """讓 short_code 在解析快取與本行程的索引中失效，於 Link 儲存或刪除時呼叫。"""
+    invalidate_link_index(short_code)
+    resolution_cache = get_resolution_cache()
+    if resolution_cache is not None:
+        resolution_cache.invalidate(short_code)
+
+
+@receiver(setting_changed)
+def _reset_on_setting_changed(setting, **kwargs):
+    if setting == 'SHORTENER_RESOLUTION_CACHE':
+        reset_resolution_cache()
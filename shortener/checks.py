@@ -0,0 +1,87 @@
+"""
+shortener 的 Django system checks (``python manage.py check``，migrate 與 runserver 也會執行)。
+"""
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+from .bloom import get_bloom_settings
+from .ratelimit import get_rate_limit_settings
+from .replicas import get_replica_settings
+
+# 狀態只存在單一行程內 (或完全不保存) 的快取後端
+PROCESS_LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches)
+def check_rate_limit_cache(app_configs, **kwargs):
+    """
+    速率限制的狀態存放在行程內的快取時，每個 worker 各自計算，實際的上限會變成 worker 數倍。
+
+    開發時 (DEBUG) 只有一個行程，不提出警告。
+    """
+    conf = get_rate_limit_settings()
+    if settings.DEBUG or not conf['ENABLED']:
+        return []
+    backend = settings.CACHES.get(conf['CACHE_ALIAS'], {}).get('BACKEND')
+    if backend not in PROCESS_LOCAL_CACHE_BACKENDS:
+        return []
+    return [Warning(
+        f"SHORTENER_RATE_LIMITS['CACHE_ALIAS'] ({conf['CACHE_ALIAS']!r}) uses {backend}, "
+        f"so each worker process keeps its own rate limits.",
+        hint="Point CACHE_ALIAS at a cache shared by all workers (e.g. Redis or Memcached), "
+             "or set SHORTENER_RATE_LIMITS['ENABLED'] = False.",
+        id='shortener.W001',
+    )]
+
+
+@register(Tags.caches)
+def check_bloom_filter_cache(app_configs, **kwargs):
+    """
+    Bloom filter 需要共用快取的標記才能得知其他 worker 建立的連結，否則會把有效的短代碼回報為 404。
+
+    未設定 SHARED_CACHE_ALIAS 時 filter 不會啟用；正式環境的行程內快取同樣無法跨 worker 共用。
+    """
+    conf = get_bloom_settings()
+    if not conf['ENABLED']:
+        return []
+    alias = conf['SHARED_CACHE_ALIAS']
+    if alias is None:
+        return [Warning(
+            "SHORTENER_BLOOM_FILTER is enabled without SHARED_CACHE_ALIAS, so the filter stays disabled.",
+            hint="Set SHARED_CACHE_ALIAS to a cache shared by all workers, or set ENABLED = False.",
+            id='shortener.W002',
+        )]
+    backend = settings.CACHES.get(alias, {}).get('BACKEND')
+    if settings.DEBUG or backend not in PROCESS_LOCAL_CACHE_BACKENDS:
+        return []
+    return [Warning(
+        f"SHORTENER_BLOOM_FILTER['SHARED_CACHE_ALIAS'] ({alias!r}) uses {backend}, so other workers "
+        f"never see the marker and may answer 404 for links created elsewhere.",
+        hint="Point SHARED_CACHE_ALIAS at a cache shared by all workers (e.g. Redis or Memcached).",
+        id='shortener.W002',
+    )]
+
+
+@register(Tags.caches)
+def check_replica_pinning_cache(app_configs, **kwargs):
+    """
+    API 用戶端寫入後的讀取只靠共用快取中的使用者標記固定走主庫，行程內的快取只對同一個 worker 有效。
+
+    沒有設定副本或開發時 (DEBUG) 不提出警告。
+    """
+    conf = get_replica_settings()
+    if settings.DEBUG or not conf['REPLICAS']:
+        return []
+    alias = conf['CACHE_ALIAS']
+    backend = settings.CACHES.get(alias, {}).get('BACKEND') if alias else None
+    if alias and backend not in PROCESS_LOCAL_CACHE_BACKENDS:
+        return []
+    return [Warning(
+        "SHORTENER_READ_REPLICAS['CACHE_ALIAS'] is not a cache shared by all workers, so API clients "
+        "authenticated with JWT may read from a replica right after their own writes.",
+        hint="Point CACHE_ALIAS at a cache shared by all workers (e.g. Redis or Memcached).",
+        id='shortener.W003',
+    )]
@@ -0,0 +1,322 @@
+import atexit
+import logging
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import connections, transaction
+from django.db.models import Case, DateTimeField, F, IntegerField, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import ClickEvent, Link
+from .stats import record_click_added, record_clicks_added
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SETTINGS = {
+    # 'immediate'：每次點擊立即以 F() 更新；'buffered'：先在記憶體累計再批次寫入
+    'MODE': 'immediate',
+    'BATCH_SIZE': 500,
+    'FLUSH_INTERVAL': 5.0,
+    'BACKGROUND_FLUSH': True,
+    # 是否另外寫入原始點擊事件 (ClickEvent)，供 rollup_clicks 彙總成時間序列；
+    # 兩種模式的事件都先在 ClickBuffer 累積，再以 bulk_create 批次寫入
+    'RECORD_EVENTS': False,
+}
+
+
+def get_click_settings():
+    return {**DEFAULT_SETTINGS, **getattr(settings, 'SHORTENER_CLICK_TRACKING', {})}
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def flush_click_counts(counts, batch_size=500):
+    """
+    以批次的 F() 表達式將累計的點擊數寫回資料庫。
+
+    每個批次只產生一個 UPDATE，click_count 以 ``F('click_count') + n`` 累加，
+    last_clicked_at 只會往較新的時間更新，因此多個 worker 同時寫入也不會遺失點擊。
+
+    Args:
+        counts (dict): link pk → (點擊次數, 最後點擊時間)。
+        batch_size (int): 每個 UPDATE 最多涵蓋的 Link 數量。
+
+    Returns:
+        int: 實際更新的 Link 筆數。
+    """
+    updated = 0
+    items = sorted(counts.items())
+    with transaction.atomic():
+        for chunk in _chunks(items, batch_size):
+            click_whens = []
+            time_whens = []
+            for pk, (count, clicked_at) in chunk:
+                clicked_at = Value(clicked_at, output_field=DateTimeField())
+                click_whens.append(When(pk=pk, then=Value(count)))
+                time_whens.append(When(
+                    pk=pk,
+                    then=Greatest(Coalesce(F('last_clicked_at'), clicked_at), clicked_at),
+                ))
+            updated += Link.objects.filter(pk__in=[pk for pk, _ in chunk]).update(
+                click_count=F('click_count') + Case(
+                    *click_whens, default=Value(0), output_field=IntegerField()
+                ),
+                last_clicked_at=Case(
+                    *time_whens, default=F('last_clicked_at'), output_field=DateTimeField()
+                ),
+            )
+            record_clicks_added({pk: count for pk, (count, _) in chunk})
+    return updated
+
+
+def write_click_events(events, batch_size=500):
+    """
+    以 bulk_create 批次寫入原始點擊事件。
+
+    Args:
+        events (list[tuple[int, datetime]]): (link pk, 點擊時間)。
+        batch_size (int): 每個 INSERT 的筆數。
+    """
+    ClickEvent.objects.bulk_create(
+        [ClickEvent(link_id=pk, clicked_at=clicked_at) for pk, clicked_at in events],
+        batch_size=batch_size,
+    )
+
+
+class ClickBuffer:
+    """
+    每個 worker 行程內的點擊計數緩衝區 (write-behind)。
+
+    重定向時只在記憶體中累加，待累計點擊數達到 ``batch_size``
+    或距離上次寫入超過 ``flush_interval`` 秒時，才批次寫回資料庫。
+    即時模式只以 record_event 累積原始點擊事件，同樣在達到門檻時以 bulk_create 批次寫入。
+    有背景執行緒時達到門檻只喚醒該執行緒寫入，請求不會等待寫入；沒有背景執行緒時才由請求直接寫入。
+    """
+
+    def __init__(self, batch_size=500, flush_interval=5.0, background=False, record_events=False):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.record_events = record_events
+        self._pending = {}
+        self._events = []
+        self._pending_clicks = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._stopped = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+        if background and flush_interval > 0:
+            self._thread = threading.Thread(
+                target=self._run, name='shortener-click-flush', daemon=True
+            )
+            self._thread.start()
+
+    @property
+    def pending_clicks(self):
+        return self._pending_clicks
+
+    def _due(self):
+        return (
+            max(self._pending_clicks, len(self._events)) >= self.batch_size
+            or time.monotonic() - self._last_flush >= self.flush_interval
+        )
+
+    def _add(self, pk, clicked_at):
+        """累加一次點擊，回傳是否已達到寫入門檻。"""
+        clicked_at = clicked_at or timezone.now()
+        with self._lock:
+            count, last = self._pending.get(pk, (0, clicked_at))
+            self._pending[pk] = (count + 1, max(last, clicked_at))
+            self._pending_clicks += 1
+            if self.record_events:
+                self._events.append((pk, clicked_at))
+            return self._due()
+
+    def _add_event(self, pk, clicked_at):
+        with self._lock:
+            self._events.append((pk, clicked_at))
+            return self._due()
+
+    def _wake_thread(self):
+        """有背景執行緒時喚醒它寫入並回傳 True；沒有時回傳 False，由呼叫端直接寫入。"""
+        if self._thread is None:
+            return False
+        self._wake.set()
+        return True
+
+    def record(self, pk, clicked_at=None):
+        """記錄一次點擊，必要時觸發寫入。"""
+        if self._add(pk, clicked_at) and not self._wake_thread():
+            self.flush()
+
+    async def arecord(self, pk, clicked_at=None):
+        """record 的非同步版本，沒有背景執行緒時寫入交由執行緒池處理。"""
+        if self._add(pk, clicked_at) and not self._wake_thread():
+            await sync_to_async(self.flush)()
+
+    def record_event(self, pk, clicked_at):
+        """只累積一筆原始點擊事件 (點擊數已由即時模式寫入)，必要時觸發寫入。"""
+        if self._add_event(pk, clicked_at) and not self._wake_thread():
+            self.flush()
+
+    async def arecord_event(self, pk, clicked_at):
+        """record_event 的非同步版本。"""
+        if self._add_event(pk, clicked_at) and not self._wake_thread():
+            await sync_to_async(self.flush)()
+
+    def _take_pending(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            events, self._events = self._events, []
+            self._pending_clicks = 0
+            self._last_flush = time.monotonic()
+        return pending, events
+
+    def _restore_pending(self, pending, events):
+        with self._lock:
+            for pk, (count, clicked_at) in pending.items():
+                current_count, current_last = self._pending.get(pk, (0, clicked_at))
+                self._pending[pk] = (current_count + count, max(current_last, clicked_at))
+                self._pending_clicks += count
+            self._events[:0] = events
+
+    def flush(self):
+        """
+        將緩衝區內的點擊寫回資料庫。
+
+        寫入失敗時會把點擊放回緩衝區，待下一次寫入時重試。
+
+        Returns:
+            int: 本次寫入的點擊總數。
+        """
+        with self._flush_lock:
+            pending, events = self._take_pending()
+            if not pending and not events:
+                return 0
+            try:
+                with transaction.atomic():
+                    if pending:
+                        flush_click_counts(pending, self.batch_size)
+                    if events:
+                        write_click_events(events, self.batch_size)
+            except Exception:
+                logger.exception('Failed to flush %d buffered links and %d click events', len(pending), len(events))
+                self._restore_pending(pending, events)
+                return 0
+            return sum(count for count, _ in pending.values())
+
+    def _run(self):
+        # 每 flush_interval 秒或被 record 喚醒 (累計達到 batch_size) 時檢查是否需要寫入
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            if self._stopped.is_set():
+                return
+            if self._due():
+                self.flush()
+                # 背景執行緒擁有自己的資料庫連線，寫入後即關閉以免佔用
+                connections.close_all()
+
+    def close(self):
+        """停止背景執行緒並寫入剩餘的點擊，於 worker 結束時呼叫。"""
+        self._stopped.set()
+        self._wake.set()
+        return self.flush()
+
+
+_click_buffer = None
+_click_buffer_lock = threading.Lock()
+
+
+def get_click_buffer():
+    """取得依 ``SHORTENER_CLICK_TRACKING`` 設定建立的全域點擊緩衝區。"""
+    global _click_buffer
+    if _click_buffer is None:
+        with _click_buffer_lock:
+            if _click_buffer is None:
+                conf = get_click_settings()
+                _click_buffer = ClickBuffer(
+                    batch_size=conf['BATCH_SIZE'],
+                    flush_interval=conf['FLUSH_INTERVAL'],
+                    background=conf['BACKGROUND_FLUSH'],
+                    record_events=conf['RECORD_EVENTS'],
+                )
+    return _click_buffer
+
+
+def reset_click_buffer():
+    """捨棄目前的緩衝區 (不寫入)，主要供測試與設定變更時使用。"""
+    global _click_buffer
+    if _click_buffer is not None:
+        _click_buffer._stopped.set()
+    _click_buffer = None
+
+
+def _record_immediate_click(pk, clicked_at):
+    """
+    即時模式的一次點擊：以 F() 更新連結，再以一個 UPDATE 更新擁有者統計。
+
+    兩個 UPDATE 在同一個交易中 (已在交易中時直接加入，不另建 savepoint)，
+    reconcile_owner_stats 鎖定統計列時不會讀到只套用了一半的點擊。
+    """
+    with transaction.atomic(savepoint=False):
+        Link.objects.filter(pk=pk).update(
+            click_count=F('click_count') + 1,
+            last_clicked_at=clicked_at,
+        )
+        record_click_added(pk)
+
+
+def record_click(pk):
+    """
+    依設定的模式記錄一次點擊。
+
+    即時模式每次點擊以 F() 更新連結，再以一個 UPDATE 更新擁有者統計；
+    緩衝模式在寫回時一併更新。兩種模式的原始點擊事件都交給 ClickBuffer 批次寫入。
+
+    Args:
+        pk (int): 被點擊的 Link 主鍵。
+    """
+    conf = get_click_settings()
+    if conf['MODE'] == 'buffered':
+        get_click_buffer().record(pk)
+        return
+    clicked_at = timezone.now()
+    _record_immediate_click(pk, clicked_at)
+    if conf['RECORD_EVENTS']:
+        get_click_buffer().record_event(pk, clicked_at)
+
+
+async def arecord_click(pk):
+    """record_click 的非同步版本。"""
+    conf = get_click_settings()
+    if conf['MODE'] == 'buffered':
+        await get_click_buffer().arecord(pk)
+        return
+    clicked_at = timezone.now()
+    # transaction.atomic 不支援非同步，兩個 UPDATE 一起在 ORM 的執行緒中執行
+    await sync_to_async(_record_immediate_click)(pk, clicked_at)
+    if conf['RECORD_EVENTS']:
+        await get_click_buffer().arecord_event(pk, clicked_at)
+
+
+@atexit.register
+def flush_on_shutdown():
+    """worker 結束時寫入尚未寫回的點擊，避免遺失。"""
+    if _click_buffer is not None:
+        _click_buffer.close()
+
+
+@receiver(setting_changed)
+def _reset_on_setting_changed(setting, **kwargs):
+    if setting == 'SHORTENER_CLICK_TRACKING':
+        reset_click_buffer()
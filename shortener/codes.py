@@ -0,0 +1,184 @@
+import math
+import string
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.db.models import F
+from django.dispatch import receiver
+
+from .models import ShortCodeSequence
+
+DEFAULT_SETTINGS = {
+    'LENGTH': 7,
+    'ALPHABET': string.ascii_letters + string.digits,
+    # 打亂序號與代碼的對應，讓連續建立的短網址看起來不連續 (非加密用途)
+    'OBFUSCATE': True,
+    'OBFUSCATION_KEY': 0x9E3779B97F4A7C15,
+    # 每個 worker 一次向資料庫預留的序號數量
+    'BLOCK_SIZE': 1000,
+    'SEQUENCE_NAME': 'link',
+}
+
+
+def get_code_settings():
+    return {**DEFAULT_SETTINGS, **getattr(settings, 'SHORTENER_SHORT_CODES', {})}
+
+
+def reserve_block(name, size):
+    """
+    向資料庫預留一段連續的序號。
+
+    以 ``F()`` 原子地推進序號列，多個 worker 同時預留也不會拿到重疊的區段。
+
+    Args:
+        name (str): 序號名稱。
+        size (int): 要預留的序號數量。
+
+    Returns:
+        tuple[int, int]: 預留區段的 [start, end)。
+    """
+    with transaction.atomic():
+        updated = ShortCodeSequence.objects.filter(name=name).update(
+            next_value=F('next_value') + size
+        )
+        if not updated:
+            ShortCodeSequence.objects.get_or_create(name=name)
+            ShortCodeSequence.objects.filter(name=name).update(
+                next_value=F('next_value') + size
+            )
+        end = ShortCodeSequence.objects.values_list('next_value', flat=True).get(name=name)
+    return end - size, end
+
+
+class ShortCodeAllocator:
+    """
+    不需查詢資料庫即可產生唯一短代碼的分配器。
+
+    每個 worker 向 ``ShortCodeSequence`` 預留一段序號 (例如 1000 個)，
+    之後只在記憶體中遞增並以指定字母表編碼成固定長度的代碼；
+    序號不會重複，因此代碼也不會重複，不需要任何 ``exists()`` 檢查。
+    """
+
+    def __init__(self, length=7, alphabet=DEFAULT_SETTINGS['ALPHABET'], obfuscate=True,
+                 obfuscation_key=DEFAULT_SETTINGS['OBFUSCATION_KEY'], block_size=1000,
+                 sequence_name='link'):
+        if len(set(alphabet)) != len(alphabet) or len(alphabet) < 2:
+            raise ValueError('alphabet must contain at least two unique characters')
+        self.length = length
+        self.alphabet = alphabet
+        self.obfuscate = obfuscate
+        self.obfuscation_key = obfuscation_key
+        self.block_size = block_size
+        self.sequence_name = sequence_name
+        self._next = 0
+        self._end = 0
+        self._lock = threading.Lock()
+
+    def _permutation(self, space):
+        # space 範圍內的仿射置換 n → (n * multiplier + offset) mod space，
+        # multiplier 與 space 互質，因此是一對一對應，不會產生碰撞
+        multiplier = (self.obfuscation_key % space) | 1
+        while math.gcd(multiplier, space) != 1:
+            multiplier += 2
+        offset = (self.obfuscation_key >> 17) % space
+        return multiplier, offset
+
+    def encode(self, number, length=None):
+        """
+        將序號編碼為固定長度的短代碼。
+
+        Args:
+            number (int): 非負的序號。
+            length (int): 代碼長度，預設使用分配器設定的長度。
+
+        Returns:
+            str: 短代碼。
+        """
+        length = length or self.length
+        base = len(self.alphabet)
+        space = base ** length
+        if not 0 <= number < space:
+            raise ValueError(f'sequence {number} does not fit in {length} characters')
+        if self.obfuscate:
+            multiplier, offset = self._permutation(space)
+            number = (number * multiplier + offset) % space
+        chars = []
+        for _ in range(length):
+            number, digit = divmod(number, base)
+            chars.append(self.alphabet[digit])
+        return ''.join(reversed(chars))
+
+    def _take(self, count):
+        """從目前的區段取出 count 個序號，區段不足時回傳 None。"""
+        with self._lock:
+            if self._end - self._next < count:
+                return None
+            start = self._next
+            self._next += count
+            return range(start, start + count)
+
+    def _refill(self, count):
+        start, end = reserve_block(self.sequence_name, max(self.block_size, count))
+        with self._lock:
+            # 舊區段剩餘的序號直接捨棄，只會讓代碼不連續，不影響唯一性
+            self._next, self._end = start, end
+
+    def _numbers(self, count):
+        numbers = self._take(count)
+        while numbers is None:
+            self._refill(count)
+            numbers = self._take(count)
+        return numbers
+
+    def allocate(self, length=None):
+        """分配一個新的短代碼。"""
+        return self.encode(self._numbers(1)[0], length)
+
+    def allocate_many(self, count, length=None):
+        """一次分配多個短代碼，最多只需預留一次區段。"""
+        return [self.encode(number, length) for number in self._numbers(count)]
+
+    async def aallocate(self, length=None):
+        """allocate 的非同步版本，只有在需要預留新區段時才會存取資料庫。"""
+        numbers = self._take(1)
+        while numbers is None:
+            await sync_to_async(self._refill)(1)
+            numbers = self._take(1)
+        return self.encode(numbers[0], length)
+
+
+_allocator = None
+_allocator_lock = threading.Lock()
+
+
+def get_code_allocator():
+    """取得依 ``SHORTENER_SHORT_CODES`` 設定建立的全域分配器。"""
+    global _allocator
+    if _allocator is None:
+        with _allocator_lock:
+            if _allocator is None:
+                conf = get_code_settings()
+                _allocator = ShortCodeAllocator(
+                    length=conf['LENGTH'],
+                    alphabet=conf['ALPHABET'],
+                    obfuscate=conf['OBFUSCATE'],
+                    obfuscation_key=conf['OBFUSCATION_KEY'],
+                    block_size=conf['BLOCK_SIZE'],
+                    sequence_name=conf['SEQUENCE_NAME'],
+                )
+    return _allocator
+
+
+def reset_code_allocator():
+    """捨棄目前預留的區段，主要供測試與設定變更時使用。"""
+    global _allocator
+    _allocator = None
+
+
+@receiver(setting_changed)
+def _reset_on_setting_changed(setting, **kwargs):
+    if setting == 'SHORTENER_SHORT_CODES':
+        reset_code_allocator()
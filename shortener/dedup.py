@@ -0,0 +1,102 @@
+import hashlib
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from django.conf import settings
+from django.db import connection as default_connection
+
+DEFAULT_SETTINGS = {
+    'ENABLED': False,
+    # 正規化規則：符合規則的網址視為同一個網址。預設只套用不改變目的地的規則
+    # (scheme 與主機名稱不分大小寫、預設埠號)；其餘規則會讓重複的請求拿到
+    # 另一個網址 (例如不同的 utm_* 或 fragment) 的短網址，需自行啟用
+    'LOWERCASE_HOST': True,
+    'DROP_DEFAULT_PORT': True,
+    'DROP_FRAGMENT': False,
+    'SORT_QUERY': False,
+    'STRIP_TRAILING_SLASH': False,
+    'DROP_QUERY_PARAMS': [],
+}
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def get_dedup_settings():
+    return {**DEFAULT_SETTINGS, **getattr(settings, 'SHORTENER_DEDUP', {})}
+
+
+def dedup_enabled():
+    return get_dedup_settings()['ENABLED']
+
+
+def _port(parts):
+    """回傳網址的埠號；沒有埠號或埠號不合法 (例如 :99999、:x) 時回傳 None，保留原本的 netloc。"""
+    try:
+        return parts.port
+    except ValueError:
+        return None
+
+
+def normalize_url(url, rules=None):
+    """
+    依 ``SHORTENER_DEDUP`` 的規則正規化網址。
+
+    Args:
+        url (str): 原始網址。
+        rules (dict): 正規化規則，預設使用設定值。
+
+    Returns:
+        str: 正規化後的網址；無法解析的網址 (例如不完整的 IPv6 位址) 只去除前後空白。
+    """
+    rules = rules or get_dedup_settings()
+    try:
+        parts = urlsplit(url.strip())
+    except ValueError:
+        return url.strip()
+    scheme = parts.scheme.lower()
+    netloc = parts.netloc
+    if rules['LOWERCASE_HOST']:
+        netloc = netloc.lower()
+    port = _port(parts)
+    if rules['DROP_DEFAULT_PORT'] and port is not None and port == DEFAULT_PORTS.get(scheme):
+        netloc = netloc.rsplit(':', 1)[0]
+
+    path = parts.path or '/'
+    if rules['STRIP_TRAILING_SLASH'] and len(path) > 1:
+        path = path.rstrip('/') or '/'
+
+    query = parts.query
+    if rules['DROP_QUERY_PARAMS'] or rules['SORT_QUERY']:
+        dropped = set(rules['DROP_QUERY_PARAMS'])
+        params = [(k, v) for k, v in parse_qsl(query, keep_blank_values=True) if k not in dropped]
+        if rules['SORT_QUERY']:
+            params.sort()
+        query = urlencode(params)
+
+    fragment = '' if rules['DROP_FRAGMENT'] else parts.fragment
+    return urlunsplit((scheme, netloc, path, query, fragment))
+
+
+def hash_url(url, rules=None):
+    """回傳正規化網址的 SHA-256 十六進位雜湊值，存放於 ``Link.url_hash``。"""
+    return hashlib.sha256(normalize_url(url, rules).encode('utf-8')).hexdigest()
+
+
+def lock_url_hashes(owner, url_hashes, connection=default_connection):
+    """
+    以交易層級的 advisory lock 鎖住 (owner, url_hash)，需在交易中呼叫。
+
+    (owner, url_hash) 沒有唯一約束 (分割表上無法建立不含分割鍵的唯一約束)，
+    同時建立相同網址的請求由此鎖排隊，取得鎖之後再確認是否已存在。依排序後的順序上鎖以避免死結。
+    非 PostgreSQL 時不做任何事 (SQLite 只用於開發與測試)。
+    """
+    if connection.vendor != 'postgresql':
+        return
+    owner_id = owner.pk if owner is not None else 0
+    keys = sorted({f'{owner_id}:{url_hash}' for url_hash in url_hashes if url_hash})
+    if not keys:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT pg_advisory_xact_lock(hashtextextended(k, 0)) FROM unnest(%s::text[]) AS k',
+            [keys],
+        )
@@ -0,0 +1,47 @@
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Link
+from .utils import delete_links
+
+# 封存時寫出的欄位
+ARCHIVE_FIELDS = ('id', 'short_code', 'original_url', 'owner_id', 'click_count',
+                  'created_at', 'last_clicked_at', 'expires_at')
+
+
+def purge_expired_links(batch_size=500, now=None, archive=None):
+    """
+    刪除一批已到期的連結 (可選擇先封存)。
+
+    依 expires_at 的部分索引 (partial index) 讀取最早到期的一小批，
+    每批一個短交易，避免長時間持有鎖或一次產生大量 WAL。
+    正在被其他交易更新 (例如寫入點擊數) 的資料列會被略過 (SKIP LOCKED)，留待下一批處理。
+    擁有者統計與刪除紀錄由 delete_links (LinkQuerySet.delete) 整批寫入；解析快取與點擊時間桶透過 ORM 的刪除 (post_delete 訊號與 CASCADE) 一併清除。
+
+    Args:
+        batch_size (int): 本批次最多刪除的連結數。
+        now (datetime): 判斷到期的時間，預設為目前時間。
+        archive (file): 若提供，刪除前將每筆連結以 NDJSON 寫入此檔案。
+            封存在交易提交前寫出，交易失敗時下一批可能重複封存同一筆 (at-least-once)。
+
+    Returns:
+        int: 本批次刪除的連結數，0 表示已沒有到期的連結。
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        rows = list(
+            Link.objects.select_for_update(skip_locked=True)
+            .filter(expires_at__lte=now)
+            .order_by('expires_at')
+            .values(*ARCHIVE_FIELDS)[:batch_size]
+        )
+        if not rows:
+            return 0
+        if archive is not None:
+            archive.write(''.join(json.dumps(row, cls=DjangoJSONEncoder) + '\n' for row in rows))
+            archive.flush()
+        delete_links(rows)
+    return len(rows)
@@ -0,0 +1,110 @@
+import csv
+import io
+import json
+
+from .models import Link
+from .replicas import aiterate_with_fallback, iterate_with_fallback
+
+EXPORT_FIELDS = ('short_code', 'original_url', 'click_count', 'created_at', 'last_clicked_at', 'expires_at')
+
+# 伺服器端游標每次抓取的筆數，也是每次輸出的行數
+EXPORT_CHUNK_SIZE = 2000
+
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def export_queryset(owner, using=None):
+    """
+    匯出用的 QuerySet：只取出匯出欄位 (values)，不建立 Link 實例。
+
+    依 (owner, created_at, id) 索引的順序讀取，資料庫不需要排序即可立刻回傳第一筆。
+    """
+    return (
+        Link.objects.using(using).filter(owner=owner)
+        .order_by('-created_at', '-id')
+        .values(*EXPORT_FIELDS)
+    )
+
+
+def _format_value(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+class RowFormatter:
+    """將一批資料列格式化成 CSV 或 NDJSON 文字。"""
+
+    def __init__(self, fmt):
+        self.fmt = fmt
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer)
+
+    def header(self):
+        if self.fmt != 'csv':
+            return ''
+        self._writer.writerow(EXPORT_FIELDS)
+        return self._drain()
+
+    def rows(self, rows):
+        if self.fmt == 'csv':
+            self._writer.writerows([_format_value(row[f]) for f in EXPORT_FIELDS] for row in rows)
+            return self._drain()
+        return ''.join(
+            json.dumps({k: _format_value(v) for k, v in row.items()}) + '\n'
+            for row in rows
+        )
+
+    def _drain(self):
+        value = self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return value
+
+
+def stream_links(owner, fmt, chunk_size=EXPORT_CHUNK_SIZE, using=None):
+    """
+    以伺服器端游標逐批輸出使用者的所有連結。
+
+    記憶體用量只與 chunk_size 有關，與連結總數無關；
+    CSV 標題列在查詢資料庫之前就先輸出，讓客戶端立即收到第一個位元組。
+
+    Args:
+        owner (User): 要匯出的使用者。
+        fmt (str): 'csv' 或 'ndjson'。
+        chunk_size (int): 每批的筆數。
+        using (str | None): 資料庫別名。串流在視圖返回後才開始讀取，
+            因此讀取副本時需在視圖中先決定別名；副本在讀到第一筆之前失敗時改讀主庫。
+
+    Yields:
+        str: 格式化後的文字區塊。
+    """
+    formatter = RowFormatter(fmt)
+    if header := formatter.header():
+        yield header
+    batch = []
+    rows = iterate_with_fallback(lambda alias: export_queryset(owner, alias).iterator(chunk_size=chunk_size), using)
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= chunk_size:
+            yield formatter.rows(batch)
+            batch = []
+    if batch:
+        yield formatter.rows(batch)
+
+
+async def astream_links(owner, fmt, chunk_size=EXPORT_CHUNK_SIZE, using=None):
+    """stream_links 的非同步版本，供 ASGI 部署使用，避免同步迭代器被整個讀入記憶體。"""
+    formatter = RowFormatter(fmt)
+    if header := formatter.header():
+        yield header
+    batch = []
+    rows = aiterate_with_fallback(lambda alias: export_queryset(owner, alias).aiterator(chunk_size=chunk_size), using)
+    async for row in rows:
+        batch.append(row)
+        if len(batch) >= chunk_size:
+            yield formatter.rows(batch)
+            batch = []
+    if batch:
+        yield formatter.rows(batch)
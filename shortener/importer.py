@@ -0,0 +1,379 @@
+"""
+從舊系統大量匯入連結 (import_links 指令)。
+
+輸入以串流方式讀取 CSV 或 NDJSON，每批次：
+1. 驗證欄位，並以一次查詢解析該批所有擁有者的使用者名稱。
+2. PostgreSQL 以 COPY 寫入暫存表，再以一個 INSERT ... ON CONFLICT 合併進 Link；
+   其他資料庫改用 bulk_create / bulk_update。
+3. 提交後將進度寫入檢查點檔案，中斷後重新執行會從上次完成的批次之後繼續。
+   合併以 short_code 判斷衝突，重複處理同一批不會產生重複的連結。
+
+匯入的連結保留舊系統的短代碼，不填入 url_hash：舊資料中同一擁有者的相同網址可能有多個代碼，
+不應被去重的唯一約束擋下。
+"""
+import csv
+import io
+import json
+import os
+from datetime import timezone as dt_timezone
+from typing import NamedTuple, Optional
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.validators import URLValidator
+from django.db import connection as default_connection
+from django.db import transaction
+from django.db.models import Case, DateTimeField, Value, When
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .bloom import add_short_codes
+from .cache import invalidate_short_code
+from .metrics import record_links_created
+from .models import Link
+from .stats import reconcile_owner_stats, record_links_added
+
+FORMATS = ('csv', 'ndjson')
+ON_CONFLICT = ('skip', 'update')
+
+# 舊系統的欄位名稱 → Link 的欄位
+FIELD_ALIASES = {
+    'code': 'short_code',
+    'url': 'original_url',
+    'username': 'owner',
+    'clicks': 'click_count',
+}
+
+STAGING_TABLE = 'shortener_link_import'
+
+SHORT_CODE_MAX_LENGTH = Link._meta.get_field('short_code').max_length
+
+
+class ImportRow(NamedTuple):
+    row: int
+    short_code: str
+    original_url: str
+    owner_id: Optional[int]
+    click_count: int
+    created_at: Optional[object]
+
+
+class RowError(NamedTuple):
+    row: int
+    reason: str
+    record: dict
+
+
+class ImportStats(NamedTuple):
+    read: int = 0
+    written: int = 0
+    rejected: int = 0
+
+
+def detect_format(path):
+    return 'ndjson' if path.endswith(('.ndjson', '.jsonl', '.json')) else 'csv'
+
+
+def read_records(stream, fmt):
+    """
+    逐筆讀取輸入，欄位名稱依 FIELD_ALIASES 轉換。
+
+    Yields:
+        tuple[int, dict]: (資料列編號，從 1 開始, 欄位)。
+    """
+    if fmt == 'csv':
+        records = csv.DictReader(stream)
+    else:
+        records = (json.loads(line) for line in stream if line.strip())
+    for number, record in enumerate(records, start=1):
+        yield number, {FIELD_ALIASES.get(key, key): value for key, value in record.items()}
+
+
+def batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class OwnerResolver:
+    """以批次查詢將使用者名稱轉換成 id，查過的結果 (包含不存在的) 會被快取。"""
+
+    def __init__(self):
+        self._ids = {}
+
+    def resolve(self, usernames):
+        missing = {name for name in usernames if name and name not in self._ids}
+        if missing:
+            found = dict(
+                get_user_model().objects.filter(username__in=missing).values_list('username', 'pk')
+            )
+            for name in missing:
+                self._ids[name] = found.get(name)
+        return self._ids
+
+
+_validate_url = URLValidator()
+
+
+def _parse_row(number, record, owner_ids, now):
+    short_code = str(record.get('short_code') or '').strip()
+    if not short_code or '/' in short_code or len(short_code) > SHORT_CODE_MAX_LENGTH:
+        raise ValueError('invalid short_code')
+
+    original_url = str(record.get('original_url') or '').strip()
+    try:
+        _validate_url(original_url)
+    except ValidationError:
+        raise ValueError('invalid original_url')
+
+    owner_id = None
+    if owner := record.get('owner'):
+        owner_id = owner_ids.get(owner)
+        if owner_id is None:
+            raise ValueError(f'unknown owner {owner!r}')
+
+    try:
+        click_count = int(record.get('click_count') or 0)
+    except (TypeError, ValueError):
+        raise ValueError('invalid click_count')
+    if click_count < 0:
+        raise ValueError('invalid click_count')
+
+    created_at = now
+    if value := record.get('created_at'):
+        created_at = parse_datetime(str(value))
+        if created_at is None:
+            raise ValueError('invalid created_at')
+        if timezone.is_naive(created_at):
+            created_at = timezone.make_aware(created_at, dt_timezone.utc)
+
+    return ImportRow(number, short_code, original_url, owner_id, click_count, created_at)
+
+
+def validate_batch(records, resolver):
+    """
+    驗證一批資料列。
+
+    Args:
+        records (list[tuple[int, dict]]): read_records 產生的資料列。
+        resolver (OwnerResolver): 使用者名稱解析器。
+
+    Returns:
+        tuple[list[ImportRow], list[RowError]]: 有效的資料列與錯誤。
+    """
+    owner_ids = resolver.resolve({record.get('owner') for _, record in records})
+    now = timezone.now()
+    rows, errors = [], []
+    for number, record in records:
+        try:
+            rows.append(_parse_row(number, record, owner_ids, now))
+        except ValueError as e:
+            errors.append(RowError(number, str(e), record))
+    return rows, errors
+
+
+def _latest_per_code(rows):
+    """同一批內重複的 short_code 只保留最後一筆。"""
+    return list({row.short_code: row for row in rows}.values())
+
+
+def _copy(cursor, sql, data):
+    # psycopg2 使用 copy_expert，psycopg 3 使用 copy()
+    if hasattr(cursor, 'copy_expert'):
+        cursor.copy_expert(sql, data)
+    else:
+        with cursor.copy(sql) as copy:
+            copy.write(data.getvalue())
+
+
+def copy_merge(rows, on_conflict, connection=default_connection):
+    """
+    PostgreSQL：以 COPY 寫入暫存表，再以一個 INSERT ... ON CONFLICT 合併。
+
+    Returns:
+        list[tuple[int, str]]: 寫入 (新增或更新) 的 (id, short_code)。
+    """
+    table = Link._meta.db_table
+    data = io.StringIO()
+    writer = csv.writer(data)
+    for row in rows:
+        writer.writerow([row.row, row.short_code, row.original_url, row.owner_id,
+                         row.click_count, row.created_at.isoformat()])
+    data.seek(0)
+
+    if on_conflict == 'update':
+        conflict = ('DO UPDATE SET original_url = EXCLUDED.original_url, '
+                    'owner_id = EXCLUDED.owner_id, click_count = EXCLUDED.click_count, updated_at = now()')
+    else:
+        conflict = 'DO NOTHING'
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} ('
+            f'source_row bigint, short_code varchar({SHORT_CODE_MAX_LENGTH}), original_url text, '
+            f'owner_id bigint, click_count integer, created_at timestamptz) ON COMMIT DELETE ROWS'
+        )
+        _copy(cursor, f'COPY {STAGING_TABLE} (source_row, short_code, original_url, owner_id, click_count, created_at) '
+                      f'FROM STDIN WITH (FORMAT csv)', data)
+        cursor.execute(
+            f'INSERT INTO {table} (short_code, original_url, owner_id, click_count, created_at) '
+            f'SELECT DISTINCT ON (short_code) short_code, original_url, owner_id, click_count, created_at '
+            f'FROM {STAGING_TABLE} ORDER BY short_code, source_row DESC '
+            f'ON CONFLICT (short_code) {conflict} RETURNING id, short_code'
+        )
+        return cursor.fetchall()
+
+
+def bulk_merge(rows, on_conflict):
+    """
+    其他資料庫：以 bulk_create 新增、bulk_update 更新。
+
+    auto_now_add 的 created_at 在 bulk_create 時會被覆寫，新增後再以一個 UPDATE 寫回原本的時間。
+
+    Returns:
+        list[tuple[int, str]]: 寫入 (新增或更新) 的 (id, short_code)。
+    """
+    rows = _latest_per_code(rows)
+    existing = dict(
+        Link.objects.filter(short_code__in=[row.short_code for row in rows]).values_list('short_code', 'pk')
+    )
+    new_rows = [row for row in rows if row.short_code not in existing]
+    links = Link.objects.bulk_create([
+        Link(short_code=row.short_code, original_url=row.original_url, owner_id=row.owner_id,
+             click_count=row.click_count)
+        for row in new_rows
+    ])
+    if new_rows:
+        Link.objects.filter(short_code__in=[row.short_code for row in new_rows]).update(created_at=Case(
+            *[When(short_code=row.short_code, then=Value(row.created_at)) for row in new_rows],
+            output_field=DateTimeField(),
+        ))
+    written = [(link.pk, link.short_code) for link in links]
+
+    if on_conflict == 'update':
+        # bulk_update 不會套用 auto_now，需自行更新 updated_at
+        now = timezone.now()
+        updated = [
+            Link(pk=existing[row.short_code], short_code=row.short_code, original_url=row.original_url,
+                 owner_id=row.owner_id, click_count=row.click_count, updated_at=now)
+            for row in rows if row.short_code in existing
+        ]
+        Link.objects.bulk_update(updated, ['original_url', 'owner', 'click_count', 'updated_at'])
+        written += [(link.pk, link.short_code) for link in updated]
+    return written
+
+
+class Checkpoint:
+    """
+    記錄已完成的資料列編號與統計，以暫存檔加 os.replace 原子地寫入。
+
+    Args:
+        path (str | None): 檢查點檔案，None 表示不記錄。
+        stats_class (type): 統計的 NamedTuple，預設為 ImportStats。
+    """
+
+    def __init__(self, path, stats_class=ImportStats):
+        self.path = path
+        self.stats_class = stats_class
+
+    def load(self):
+        if self.path is None or not os.path.exists(self.path):
+            return self.stats_class()
+        with open(self.path, encoding='utf-8') as f:
+            return self.stats_class(**json.load(f))
+
+    def save(self, stats):
+        if self.path is None:
+            return
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(stats._asdict(), f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        if self.path is not None and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class LinkImporter:
+    """
+    將 CSV / NDJSON 串流分批匯入 Link。
+
+    Args:
+        batch_size (int): 每個交易處理的資料列數。
+        on_conflict (str): short_code 已存在時 'skip' (保留既有) 或 'update' (以匯入的資料覆寫)。
+        checkpoint (Checkpoint | None): 進度檢查點，None 表示不可續傳。
+        on_progress (callable | None): 每批完成後以 ImportStats 呼叫。
+        on_error (callable | None): 每筆無效的資料列以 RowError 呼叫。
+    """
+
+    def __init__(self, batch_size=5000, on_conflict='skip', checkpoint=None, on_progress=None, on_error=None,
+                 connection=default_connection):
+        self.batch_size = batch_size
+        self.on_conflict = on_conflict
+        self.checkpoint = checkpoint or Checkpoint(None)
+        self.on_progress = on_progress
+        self.on_error = on_error
+        self.connection = connection
+        self.resolver = OwnerResolver()
+
+    def merge(self, rows):
+        if self.connection.vendor == 'postgresql':
+            return copy_merge(rows, self.on_conflict, self.connection)
+        return bulk_merge(rows, self.on_conflict)
+
+    def run(self, stream, fmt):
+        """
+        Returns:
+            ImportStats: 累計 (含先前中斷的執行) 的統計。
+        """
+        stats = self.checkpoint.load()
+        records = ((number, record) for number, record in read_records(stream, fmt) if number > stats.read)
+        for batch in batched(records, self.batch_size):
+            rows, errors = validate_batch(batch, self.resolver)
+            written = []
+            if rows:
+                with transaction.atomic(using=self.connection.alias):
+                    previous_owners = self._previous_owners(rows)
+                    written = self.merge(rows)
+                    self._after_write(written, rows, previous_owners)
+            for error in errors:
+                if self.on_error is not None:
+                    self.on_error(error)
+            stats = ImportStats(batch[-1][0], stats.written + len(written), stats.rejected + len(errors))
+            self.checkpoint.save(stats)
+            if self.on_progress is not None:
+                self.on_progress(stats)
+        self.checkpoint.clear()
+        return stats
+
+    def _previous_owners(self, rows):
+        """覆寫模式下，取得被覆寫的連結原本的擁有者，其統計需要重新計算。"""
+        if self.on_conflict != 'update':
+            return set()
+        return set(
+            Link.objects.filter(short_code__in=[row.short_code for row in rows], owner__isnull=False)
+            .values_list('owner_id', flat=True)
+        )
+
+    def _after_write(self, written, rows, previous_owners):
+        # 與 bulk_create_links 相同：bulk 寫入不會送出 post_save，需自行通知 Bloom filter 與擁有者統計
+        add_short_codes(Link(pk=pk, short_code=short_code) for pk, short_code in written)
+        if self.on_conflict == 'update':
+            # 覆寫可能改變點擊數與擁有者，直接以實際資料重新計算受影響的擁有者
+            owners = previous_owners | {row.owner_id for row in rows if row.owner_id is not None}
+            if owners:
+                reconcile_owner_stats(sorted(owners))
+            for _, short_code in written:
+                invalidate_short_code(short_code)
+        else:
+            by_code = {row.short_code: row for row in rows}
+            record_links_added(
+                Link(pk=pk, owner_id=by_code[short_code].owner_id, click_count=by_code[short_code].click_count)
+                for pk, short_code in written
+            )
+            record_links_created(len(written))
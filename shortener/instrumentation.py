@@ -0,0 +1,152 @@
+import contextvars
+import json
+import logging
+import random
+import time
+from dataclasses import dataclass
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+DEFAULT_SETTINGS = {
+    # 0 表示停用 (middleware 不會被載入)，1.0 表示每個請求都記錄
+    'SAMPLE_RATE': 0.0,
+    'HEADER': True,
+    'LOG': True,
+    'LOGGER': 'shortener.timing',
+}
+
+
+def get_timing_settings():
+    return {**DEFAULT_SETTINGS, **getattr(settings, 'SHORTENER_SERVER_TIMING', {})}
+
+
+@dataclass
+class RequestMetrics:
+    """單一請求的統計資料，透過 contextvar 在同一個請求中 (含 sync_to_async 執行緒) 共用。"""
+    started: float
+    queries: int = 0
+    db_time: float = 0.0
+    cache_hits: int = 0
+    cache_misses: int = 0
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+
+_current_metrics = contextvars.ContextVar('shortener_request_metrics', default=None)
+
+
+def record_cache_lookup(hit):
+    """記錄一次解析快取查詢；目前的請求沒有被抽樣時不做任何事。"""
+    metrics = _current_metrics.get()
+    if metrics is not None:
+        if hit:
+            metrics.cache_hits += 1
+        else:
+            metrics.cache_misses += 1
+
+
+def _time_query(execute, sql, params, many, context):
+    metrics = _current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_time += time.perf_counter() - started
+        metrics.queries += 1
+
+
+def _install_query_timers():
+    """在目前執行緒的所有資料庫連線上安裝計時 wrapper (只安裝一次)。"""
+    for alias in connections:
+        connection = connections[alias]
+        if _time_query not in connection.execute_wrappers:
+            connection.execute_wrappers.append(_time_query)
+
+
+def server_timing_header(metrics, total):
+    """組成 Server-Timing 標頭，時間單位為毫秒。"""
+    return ', '.join([
+        f'total;dur={total * 1000:.2f}',
+        f'db;dur={metrics.db_time * 1000:.2f};desc="queries={metrics.queries}"',
+        f'cache;desc="hits={metrics.cache_hits} misses={metrics.cache_misses}"',
+    ])
+
+
+class ServerTimingMiddleware:
+    """
+    記錄每個請求的查詢數、資料庫時間、解析快取命中數與總時間。
+
+    結果以 ``Server-Timing`` 標頭回傳，並以 JSON 格式寫入 ``shortener.timing`` logger。
+    只有依 ``SAMPLE_RATE`` 抽樣到的請求會被記錄；SAMPLE_RATE 為 0 時
+    middleware 在啟動時即被移除 (MiddlewareNotUsed)，不會有任何額外開銷。
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        conf = get_timing_settings()
+        if not conf['SAMPLE_RATE']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = conf['SAMPLE_RATE']
+        self.header = conf['HEADER']
+        self.logger = logging.getLogger(conf['LOGGER']) if conf['LOG'] else None
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def _sampled(self):
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not self._sampled():
+            return self.get_response(request)
+        _install_query_timers()
+        metrics = RequestMetrics(started=time.perf_counter())
+        token = _current_metrics.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_metrics.reset(token)
+        return self._finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        if not self._sampled():
+            return await self.get_response(request)
+        # 非同步視圖的查詢在 sync_to_async 的執行緒中執行，連線也屬於該執行緒
+        await sync_to_async(_install_query_timers)()
+        metrics = RequestMetrics(started=time.perf_counter())
+        token = _current_metrics.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_metrics.reset(token)
+        return self._finish(request, response, metrics)
+
+    def _finish(self, request, response, metrics):
+        total = metrics.elapsed()
+        if self.header:
+            response['Server-Timing'] = server_timing_header(metrics, total)
+        if self.logger is not None:
+            match = request.resolver_match
+            self.logger.info(json.dumps({
+                'method': request.method,
+                'path': request.path,
+                'view': match.view_name if match else None,
+                'status': response.status_code,
+                'total_ms': round(total * 1000, 2),
+                'db_ms': round(metrics.db_time * 1000, 2),
+                'queries': metrics.queries,
+                'cache_hits': metrics.cache_hits,
+                'cache_misses': metrics.cache_misses,
+            }))
+        return response
@@ -0,0 +1,339 @@
+"""
+以 mmap 共用的唯讀短代碼索引 (build_link_index 指令建立)。
+
+每個 worker 各自在 Python dict 中快取數百萬個連結，每台主機需要數 GB 的記憶體。
+索引檔將 short_code → 網址位置依位元組排序存放在單一檔案中，worker 以 mmap 開啟，
+各行程共用作業系統的 page cache，行程內只保留 256 筆的 fanout 表。
+
+檔案格式 (little-endian)：
+- 標頭：magic、版本、世代 (generation)、筆數、網址區的位置與建立時間。
+- fanout 表：256 個累計筆數，fanout[b] 為第一個位元組 <= b 的項目數 (與 git pack index 相同)，
+  查詢時先依第一個位元組縮小範圍再二分搜尋。
+- 固定長度的項目：補齊到 16 位元組的 short_code、pk、網址的位置與長度、cache_max_age 與旗標。
+- 網址區：所有網址的 UTF-8 內容。
+
+重新建立時先寫入暫存檔，再以 os.replace 取代索引檔；worker 每 CHECK_INTERVAL 秒檢查一次
+檔案是否換成新的世代，已開啟的舊 mmap 在沒有查詢使用後才會關閉。
+
+索引是建立當下的快照：有到期時間的連結不收錄 (到期後必須回傳 410)，
+之後建立的連結查不到時會繼續查詢資料庫。其他 worker 修改或刪除的連結要到下次建立後才會反映，
+本行程內失效的短代碼則會略過索引，直到換成在失效之後建立的世代。
+"""
+import logging
+import mmap
+import os
+import shutil
+import struct
+import threading
+import time
+from typing import NamedTuple
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from .export import EXPORT_CHUNK_SIZE
+from .models import Link
+from .redirectmap import code_order
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SETTINGS = {
+    'ENABLED': False,
+    'PATH': None,
+    'CHECK_INTERVAL': 5.0,
+}
+
+MAGIC = b'SLIX'
+VERSION = 1
+KEY_SIZE = 16
+# magic, 版本, 世代, 筆數, 網址區的位置, 建立時間 (Unix 時間)
+HEADER = struct.Struct('<4sIQQQd')
+FANOUT = struct.Struct('<256Q')
+# short_code, pk, 網址位置 (相對於網址區), 網址長度, cache_max_age (-1 表示未設定), 旗標
+RECORD = struct.Struct('<16sQQIiB3x')
+RECORDS_OFFSET = HEADER.size + FANOUT.size
+FLAG_PERMANENT = 1
+
+INDEX_FIELDS = ('pk', 'short_code', 'original_url', 'redirect_permanent', 'cache_max_age')
+
+
+class IndexInfo(NamedTuple):
+    generation: int
+    entries: int
+    size_bytes: int
+
+
+class LinkIndex:
+    """
+    以 mmap 開啟的單一世代索引檔。
+
+    Args:
+        path (str): 索引檔路徑。
+
+    Raises:
+        ValueError: 檔案不是索引檔或版本不符。
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mm) < RECORDS_OFFSET:
+            self._mm.close()
+            raise ValueError(f'{path} is too small to be a link index')
+        magic, version, self.generation, self.count, self._heap_offset, self.built_at = HEADER.unpack_from(self._mm)
+        if magic != MAGIC or version != VERSION:
+            self._mm.close()
+            raise ValueError(f'{path} is not a version {VERSION} link index')
+        self._fanout = FANOUT.unpack_from(self._mm, HEADER.size)
+        if hasattr(mmap, 'MADV_RANDOM'):
+            # 查詢是隨機存取，不需要預讀
+            self._mm.madvise(mmap.MADV_RANDOM)
+
+    def lookup(self, short_code):
+        """
+        在索引中查詢 short_code。
+
+        Returns:
+            tuple | None: 可直接建立 ResolvedLink 的 (pk, original_url, expires_at, redirect_permanent,
+            cache_max_age)，不在索引中時回傳 None。
+        """
+        key = short_code.encode()
+        if not key or len(key) > KEY_SIZE:
+            return None
+        first = key[0]
+        lo = self._fanout[first - 1] if first else 0
+        hi = self._fanout[first]
+        key = key.ljust(KEY_SIZE, b'\0')
+        mm = self._mm
+        while lo < hi:
+            mid = (lo + hi) // 2
+            offset = RECORDS_OFFSET + mid * RECORD.size
+            current = mm[offset:offset + KEY_SIZE]
+            if current < key:
+                lo = mid + 1
+            elif current > key:
+                hi = mid
+            else:
+                _, pk, url_offset, url_length, max_age, flags = RECORD.unpack_from(mm, offset)
+                start = self._heap_offset + url_offset
+                original_url = mm[start:start + url_length].decode()
+                return pk, original_url, None, bool(flags & FLAG_PERMANENT), None if max_age < 0 else max_age
+        return None
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def size_bytes(self):
+        return len(self._mm)
+
+
+def read_generation(path):
+    """讀取既有索引檔的世代，檔案不存在或無法辨識時回傳 0。"""
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(HEADER.size)
+    except FileNotFoundError:
+        return 0
+    if len(header) < HEADER.size:
+        return 0
+    magic, version, generation, *_ = HEADER.unpack(header)
+    return generation if magic == MAGIC else 0
+
+
+def build_link_index(path, batch_size=EXPORT_CHUNK_SIZE):
+    """
+    從 Link 資料表建立新世代的索引檔並原子地取代 path。
+
+    項目與網址分別串流寫入暫存檔，記憶體用量與連結數無關。
+
+    Args:
+        path (str): 索引檔路徑。
+        batch_size (int): 伺服器端游標每次讀取的筆數。
+
+    Returns:
+        IndexInfo: 新的世代、收錄的連結數與檔案大小。
+    """
+    generation = read_generation(path) + 1
+    built_at = time.time()
+    tmp_path, heap_path = f'{path}.tmp', f'{path}.heap.tmp'
+    counts = [0] * 256
+    entries = heap_size = 0
+    previous = b''
+    rows = (
+        Link.objects.filter(expires_at__isnull=True)
+        .order_by(code_order())
+        .values_list(*INDEX_FIELDS)
+        .iterator(chunk_size=batch_size)
+    )
+    try:
+        with open(tmp_path, 'wb') as f, open(heap_path, 'w+b') as heap:
+            f.write(b'\0' * RECORDS_OFFSET)
+            for pk, short_code, original_url, redirect_permanent, cache_max_age in rows:
+                key = short_code.encode()
+                if not key or len(key) > KEY_SIZE:
+                    continue
+                if key <= previous:
+                    raise ValueError('short codes are not returned in byte order')
+                previous = key
+                url = original_url.encode()
+                f.write(RECORD.pack(key, pk, heap_size, len(url),
+                                    -1 if cache_max_age is None else cache_max_age,
+                                    FLAG_PERMANENT if redirect_permanent else 0))
+                heap.write(url)
+                heap_size += len(url)
+                counts[key[0]] += 1
+                entries += 1
+
+            heap_offset = f.tell()
+            heap.seek(0)
+            shutil.copyfileobj(heap, f)
+            size = f.tell()
+
+            fanout, total = [], 0
+            for count in counts:
+                total += count
+                fanout.append(total)
+            f.seek(0)
+            f.write(HEADER.pack(MAGIC, VERSION, generation, entries, heap_offset, built_at))
+            f.write(FANOUT.pack(*fanout))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    finally:
+        if os.path.exists(heap_path):
+            os.remove(heap_path)
+    return IndexInfo(generation, entries, size)
+
+
+class LinkIndexReader:
+    """
+    每個 worker 行程內的索引讀取端，負責在索引檔換成新世代時重新開啟。
+
+    每次查詢最多每 check_interval 秒 stat 一次索引檔；檔案 (inode) 改變時開啟新的 mmap，
+    正在使用舊世代查詢的執行緒仍持有舊的 LinkIndex，不會讀到已關閉的 mmap。
+    索引檔不存在或無法開啟時不使用索引，所有查詢都交給資料庫。
+    """
+
+    def __init__(self, path, check_interval=5.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._index = None
+        self._file_key = None
+        self._checked_at = None
+        self._stale = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+
+    def _reload_if_changed(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            self._index, self._file_key = None, None
+            return
+        file_key = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if file_key == self._file_key:
+            return
+        try:
+            index = LinkIndex(self.path)
+        except (OSError, ValueError):
+            logger.warning('Cannot open link index %s', self.path, exc_info=True)
+            return
+        with self._lock:
+            # 在新世代建立之後才失效的短代碼仍需略過索引
+            self._stale = {code: at for code, at in self._stale.items() if at >= index.built_at}
+            self._index, self._file_key = index, file_key
+        self.reloads += 1
+
+    def current(self):
+        """回傳目前的 LinkIndex，必要時檢查是否有新的世代。"""
+        now = time.monotonic()
+        if self._checked_at is None or now - self._checked_at >= self.check_interval:
+            self._checked_at = now
+            self._reload_if_changed()
+        return self._index
+
+    def lookup(self, short_code):
+        """查詢 short_code，不在索引中或已在本行程失效時回傳 None (需繼續查詢資料庫)。"""
+        index = self.current()
+        if index is None:
+            return None
+        row = None if short_code in self._stale else index.lookup(short_code)
+        if row is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return row
+
+    def invalidate(self, short_code):
+        """本行程修改或刪除連結後略過索引中的舊資料。"""
+        with self._lock:
+            self._stale[short_code] = time.time()
+
+    def stats(self):
+        """回傳目前的世代與命中次數，供監控使用。"""
+        index = self._index
+        return {
+            'generation': index.generation if index else 0,
+            'entries': len(index) if index else 0,
+            'size_bytes': index.size_bytes if index else 0,
+            'hits': self.hits,
+            'misses': self.misses,
+            'reloads': self.reloads,
+            'stale': len(self._stale),
+        }
+
+
+_link_index_reader = None
+
+
+def get_link_index_settings():
+    return {**DEFAULT_SETTINGS, **getattr(settings, 'SHORTENER_LINK_INDEX', {})}
+
+
+def get_link_index_reader():
+    """
+    取得依 ``SHORTENER_LINK_INDEX`` 設定建立的全域 LinkIndexReader。
+
+    Returns:
+        LinkIndexReader | None: 停用或未設定 PATH 時回傳 None。
+    """
+    global _link_index_reader
+    conf = get_link_index_settings()
+    if not conf['ENABLED'] or not conf['PATH']:
+        return None
+    if _link_index_reader is None:
+        _link_index_reader = LinkIndexReader(str(conf['PATH']), check_interval=conf['CHECK_INTERVAL'])
+    return _link_index_reader
+
+
+def reset_link_index():
+    global _link_index_reader
+    _link_index_reader = None
+
+
+def lookup_link_index(short_code):
+    """若啟用索引，回傳 short_code 在索引中的資料列，否則回傳 None。"""
+    reader = get_link_index_reader()
+    if reader is None:
+        return None
+    return reader.lookup(short_code)
+
+
+def invalidate_link_index(short_code):
+    reader = get_link_index_reader()
+    if reader is not None:
+        reader.invalidate(short_code)
+
+
+@receiver(setting_changed)
+def _reset_on_setting_changed(setting, **kwargs):
+    if setting == 'SHORTENER_LINK_INDEX':
+        reset_link_index()
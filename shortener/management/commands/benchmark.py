@@ -0,0 +1,72 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from shortener.benchmark import (
+    DEFAULT_THRESHOLD,
+    SCENARIOS,
+    BenchmarkSuite,
+    compare_results,
+    load_results,
+    save_results,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "對重定向、建立短網址 (表單與 API) 與儀表板執行可重現的壓測，"
+        "回報 p50/p95/p99 延遲、吞吐量與每個請求的查詢數，並可與基準比較。"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenario', action='append', choices=SCENARIOS, dest='scenarios',
+                            help='只執行指定的情境，可重複指定 (預設全部)')
+        parser.add_argument('--requests', type=int, default=1000,
+                            help='每個情境的請求數 (預設 1000)')
+        parser.add_argument('--warmup', type=int, default=50,
+                            help='每個情境不計入統計的暖身請求數 (預設 50)')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='抽樣用的亂數種子 (預設 0)')
+        parser.add_argument('--save-baseline', metavar='PATH',
+                            help='將結果存成 JSON 基準檔')
+        parser.add_argument('--compare', metavar='PATH',
+                            help='與指定的基準檔比較')
+        parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                            help='延遲與吞吐量允許的退步比例 (預設 0.10)')
+        parser.add_argument('--fail-on-regression', action='store_true',
+                            help='與基準比較有退步時以非零狀態結束')
+
+    def handle(self, *args, scenarios, requests, warmup, seed, save_baseline, compare,
+               threshold, fail_on_regression, **options):
+        if settings.DEBUG:
+            self.stderr.write('DEBUG is on; results include debug overhead (e.g. the technical 404 page).')
+        suite = BenchmarkSuite(requests=requests, warmup=warmup, seed=seed)
+        results = suite.run(scenarios or SCENARIOS)
+        if not results:
+            raise CommandError('No scenario could run; generate data with generate_synthetic_links first.')
+
+        self.stdout.write(
+            f"{'scenario':<14}{'requests':>9}{'errors':>8}{'p50 ms':>9}{'p95 ms':>9}"
+            f"{'p99 ms':>9}{'req/s':>9}{'queries':>9}"
+        )
+        for result in results.values():
+            self.stdout.write(
+                f'{result.scenario:<14}{result.requests:>9}{result.errors:>8}'
+                f'{result.p50_ms:>9.2f}{result.p95_ms:>9.2f}{result.p99_ms:>9.2f}'
+                f'{result.throughput:>9.0f}{result.queries_per_request:>9.2f}'
+            )
+
+        if save_baseline:
+            save_results(save_baseline, results, seed=seed)
+            self.stdout.write(f'Saved baseline to {save_baseline}.')
+
+        if compare:
+            rows = compare_results(results, load_results(compare), threshold)
+            regressions = [row for row in rows if row['regression']]
+            for row in rows:
+                marker = '  REGRESSION' if row['regression'] else ''
+                self.stdout.write(
+                    f"{row['scenario']:<14}{row['metric']:<20}{row['baseline']:>10.2f}"
+                    f" -> {row['current']:>10.2f} ({row['change']:+.1%}){marker}"
+                )
+            if regressions and fail_on_regression:
+                raise CommandError(f'{len(regressions)} metric(s) regressed against {compare}.')
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from shortener.export import EXPORT_CHUNK_SIZE
+from shortener.linkindex import build_link_index, get_link_index_settings
+
+
+class Command(BaseCommand):
+    help = "從 Link 資料表建立新世代的 mmap 短代碼索引並原子地取代索引檔，各 worker 會在 CHECK_INTERVAL 內自動切換。"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default=None,
+                            help='索引檔路徑 (預設為 SHORTENER_LINK_INDEX 的 PATH)')
+        parser.add_argument('--batch-size', type=int, default=EXPORT_CHUNK_SIZE,
+                            help=f'每次從資料庫讀取的筆數 (預設 {EXPORT_CHUNK_SIZE})')
+        parser.add_argument('--loop', type=float, default=None, metavar='SECONDS',
+                            help='持續執行，每次建立完成後等待指定秒數再重新建立')
+
+    def handle(self, *args, path, batch_size, loop, **options):
+        path = path or get_link_index_settings()['PATH']
+        if not path:
+            raise CommandError('No index path given and SHORTENER_LINK_INDEX has no PATH.')
+        while True:
+            info = build_link_index(str(path), batch_size=batch_size)
+            self.stdout.write(
+                f'Built link index generation {info.generation}: {info.entries} links, {info.size_bytes} bytes.'
+            )
+            if loop is None:
+                return
+            time.sleep(loop)
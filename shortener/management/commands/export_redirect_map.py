@@ -0,0 +1,38 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from shortener.models import DeletedLink
+from shortener.redirectmap import export_redirect_map
+
+
+class Command(BaseCommand):
+    help = "將連結匯出成依短代碼排序的 TSV 與 nginx map 檔，讓前端代理直接回應重定向；預設只重新匯出上次之後變更的連結。"
+
+    def add_arguments(self, parser):
+        parser.add_argument('tsv', help='TSV 輸出路徑，也是增量匯出的基礎 (旁邊會寫入 <tsv>.state)')
+        parser.add_argument('--nginx', default=None, metavar='PATH',
+                            help='同時輸出 nginx 的 map 檔 (定義 $shortener_redirect 與 $shortener_redirect_permanent)')
+        parser.add_argument('--full', action='store_true',
+                            help='忽略上次的匯出，重新讀取所有連結')
+        parser.add_argument('--overlap', type=int, default=60, metavar='SECONDS',
+                            help='增量匯出時往前多查詢的秒數，涵蓋匯出時尚未提交的寫入 (預設 60)')
+        parser.add_argument('--keep-deleted', action='store_true',
+                            help='不刪除這次匯出已涵蓋的刪除紀錄 (多個匯出目標共用刪除紀錄時使用)')
+        parser.add_argument('--prune-deleted', type=float, default=None, metavar='DAYS',
+                            help='搭配 --keep-deleted：匯出後刪除超過指定天數的刪除紀錄；請大於所有匯出目標的匯出間隔')
+
+    def handle(self, *args, tsv, nginx, full, overlap, keep_deleted, prune_deleted, **options):
+        result = export_redirect_map(tsv, nginx, full=full, overlap=overlap, prune_deleted=not keep_deleted)
+        if result.changed is None:
+            self.stdout.write(f'Exported {result.entries} redirects (full export).')
+        else:
+            self.stdout.write(f'Exported {result.entries} redirects ({result.changed} changed).')
+        if result.pruned:
+            self.stdout.write(f'Pruned {result.pruned} deletion records.')
+
+        if prune_deleted is not None:
+            cutoff = timezone.now() - datetime.timedelta(days=prune_deleted)
+            pruned, _ = DeletedLink.objects.filter(deleted_at__lt=cutoff).delete()
+            self.stdout.write(f'Pruned {pruned} deletion records.')
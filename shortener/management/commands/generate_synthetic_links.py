@@ -0,0 +1,86 @@
+import datetime
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Case, DateTimeField, Value, When
+from django.utils import timezone
+
+from django.core.management.base import BaseCommand
+
+from shortener.codes import get_code_allocator
+from shortener.dedup import dedup_enabled, hash_url
+from shortener.models import Link
+
+
+class Command(BaseCommand):
+    help = "以 bulk insert 快速產生大量測試用的使用者與連結，供壓測使用。"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--links', type=int, default=1_000_000,
+                            help='要產生的連結數 (預設 1000000)')
+        parser.add_argument('--users', type=int, default=1000,
+                            help='要產生的使用者數 (預設 1000)')
+        parser.add_argument('--anonymous-ratio', type=float, default=0.1,
+                            help='沒有擁有者的連結比例 (預設 0.1)')
+        parser.add_argument('--days', type=int, default=365,
+                            help='created_at 分布在最近幾天內 (預設 365)')
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='每次 bulk_create 的筆數 (預設 5000)')
+        parser.add_argument('--password', default='bench-password',
+                            help='產生的使用者的密碼 (預設 bench-password)')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='亂數種子，相同的種子產生相同的分布')
+
+    def handle(self, *args, links, users, anonymous_ratio, days, batch_size, password, seed, **options):
+        rng = random.Random(seed)
+        owner_ids = self._create_users(users, password)
+        self.stdout.write(f'{len(owner_ids)} users ready.')
+
+        allocator = get_code_allocator()
+        with_hash = dedup_enabled()
+        now = timezone.now()
+        span = days * 86400
+        created = 0
+        while created < links:
+            size = min(batch_size, links - created)
+            batch = []
+            created_at = {}
+            for code in allocator.allocate_many(size):
+                # 以短代碼組成網址，重複執行也不會與既有的連結重複
+                url = f'https://synthetic.example.com/{code}'
+                owner_id = None
+                if owner_ids and rng.random() >= anonymous_ratio:
+                    owner_id = rng.choice(owner_ids)
+                batch.append(Link(
+                    original_url=url,
+                    short_code=code,
+                    owner_id=owner_id,
+                    url_hash=hash_url(url) if with_hash else None,
+                    click_count=int(rng.paretovariate(1.5)) - 1,
+                ))
+                created_at[code] = now - datetime.timedelta(seconds=rng.randrange(span or 1))
+            with transaction.atomic():
+                Link.objects.bulk_create(batch)
+                # auto_now_add 的 created_at 在 bulk_create 時會被覆寫，新增後再以一個 UPDATE 寫回分散的時間
+                Link.objects.filter(short_code__in=list(created_at)).update(created_at=Case(
+                    *[When(short_code=code, then=Value(value)) for code, value in created_at.items()],
+                    output_field=DateTimeField(),
+                ))
+            created += size
+            self.stdout.write(f'{created}/{links} links', ending='\r')
+            self.stdout.flush()
+        self.stdout.write(f'Created {created} links.')
+
+    def _create_users(self, count, password):
+        """建立 bench-user-N 使用者 (已存在則沿用)，回傳其 id。"""
+        # 密碼雜湊很慢，所有使用者共用同一個雜湊值
+        hashed = make_password(password)
+        usernames = [f'bench-user-{n}' for n in range(count)]
+        User.objects.bulk_create(
+            [User(username=username, password=hashed) for username in usernames],
+            ignore_conflicts=True,
+            batch_size=1000,
+        )
+        return sorted(User.objects.filter(username__in=usernames).values_list('pk', flat=True))
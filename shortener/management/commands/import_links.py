@@ -0,0 +1,81 @@
+import json
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from shortener.importer import FORMATS, ON_CONFLICT, Checkpoint, LinkImporter, detect_format
+
+# 沒有指定 --errors 時，最多在 stderr 列出的無效資料列數
+MAX_REPORTED_ERRORS = 20
+
+
+class Command(BaseCommand):
+    help = "從 CSV 或 NDJSON 串流大量匯入連結 (short_code / code, original_url / url, owner, click_count / clicks, created_at)。"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='輸入檔案，- 表示從 stdin 讀取')
+        parser.add_argument('--format', choices=FORMATS, default=None,
+                            help='輸入格式，預設依副檔名判斷 (.ndjson / .jsonl 為 NDJSON，其餘為 CSV)')
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='每個交易處理的資料列數 (預設 5000)')
+        parser.add_argument('--on-conflict', choices=ON_CONFLICT, default='skip',
+                            help='short_code 已存在時保留既有的連結 (skip，預設) 或以匯入的資料覆寫 (update)')
+        parser.add_argument('--checkpoint', default=None, metavar='PATH',
+                            help='進度檢查點檔案，預設為 <path>.checkpoint；中斷後重新執行會從檢查點繼續')
+        parser.add_argument('--restart', action='store_true',
+                            help='忽略既有的檢查點，從頭開始匯入')
+        parser.add_argument('--errors', default=None, metavar='PATH',
+                            help='將無效的資料列與原因以 NDJSON 寫入此檔案')
+
+    def handle(self, *args, path, format, batch_size, on_conflict, checkpoint, restart, errors, **options):
+        fmt = format or detect_format(path)
+        if path == '-':
+            checkpoint_path = checkpoint
+        else:
+            checkpoint_path = checkpoint or f'{path}.checkpoint'
+        checkpoint = Checkpoint(checkpoint_path)
+        if restart:
+            checkpoint.clear()
+        if (resumed := checkpoint.load()).read:
+            self.stdout.write(f'Resuming after row {resumed.read}.')
+
+        self._started = time.monotonic()
+        self._start_row = resumed.read
+        self._reported = 0
+        self._errors_file = open(errors, 'a', encoding='utf-8') if errors else None
+        importer = LinkImporter(batch_size=batch_size, on_conflict=on_conflict, checkpoint=checkpoint,
+                                on_progress=self._progress, on_error=self._error)
+        try:
+            if path == '-':
+                stats = importer.run(sys.stdin, fmt)
+            else:
+                try:
+                    stream = open(path, encoding='utf-8', newline='')
+                except OSError as e:
+                    raise CommandError(f'Cannot open {path}: {e}')
+                with stream:
+                    stats = importer.run(stream, fmt)
+        finally:
+            if self._errors_file is not None:
+                self._errors_file.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {stats.read} rows: {stats.written} written, {stats.rejected} rejected.'
+        ))
+
+    def _progress(self, stats):
+        elapsed = time.monotonic() - self._started
+        self.stdout.write(
+            f'{stats.read} rows read, {stats.written} written, {stats.rejected} rejected '
+            f'({(stats.read - self._start_row) / elapsed if elapsed else 0:.0f} rows/s)',
+            ending='\r',
+        )
+        self.stdout.flush()
+
+    def _error(self, error):
+        if self._errors_file is not None:
+            self._errors_file.write(json.dumps(error._asdict()) + '\n')
+        elif self._reported < MAX_REPORTED_ERRORS:
+            self._reported += 1
+            self.stderr.write(f'Row {error.row}: {error.reason}')
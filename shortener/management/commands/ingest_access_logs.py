@@ -0,0 +1,101 @@
+import gzip
+import itertools
+import re
+import sys
+from datetime import timezone as dt_timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from shortener.accesslog import (
+    REDIRECT_STATUSES,
+    IngestConflict,
+    IngestStats,
+    ingest_access_log,
+    load_progress,
+    log_fingerprint,
+    reset_progress,
+)
+
+
+class Command(BaseCommand):
+    help = "從 CDN / 反向代理的存取日誌 (Common 或 Combined Log Format) 將邊緣節點回應的重定向累加回點擊數。"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='日誌檔案 (.gz 會自動解壓縮)，- 表示從 stdin 讀取')
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='每個交易處理的行數 (預設 5000)')
+        parser.add_argument('--status', type=int, action='append', dest='statuses', default=None,
+                            help='視為一次點擊的狀態碼，可重複指定 (預設 301、302、307、308)')
+        parser.add_argument('--hit-pattern', default=None, metavar='REGEX',
+                            help='只計入符合此正規表示式的行，例如快取命中的標記；'
+                                 '未命中的請求已由 Django 記錄過點擊，不應重複計入')
+        parser.add_argument('--since', default=None, metavar='DATETIME',
+                            help='只計入此時間 (ISO 8601，含) 之後的行；無法以 --hit-pattern 區分時，'
+                                 '以 --since / --until 指定 Django 沒有回應重定向的期間')
+        parser.add_argument('--until', default=None, metavar='DATETIME',
+                            help='只計入此時間 (ISO 8601，不含) 之前的行')
+        parser.add_argument('--restart', action='store_true',
+                            help='刪除此檔案已記錄的進度並從頭匯入 (已累加的點擊會再累加一次)')
+
+    def handle(self, *args, path, batch_size, statuses, hit_pattern, since, until, restart, **options):
+        statuses = frozenset(statuses) if statuses else REDIRECT_STATUSES
+        if not hit_pattern and since is None and until is None:
+            # 轉送到 Django 的重定向已經記錄過點擊，全部計入會重複累加
+            raise CommandError(
+                'Pass --hit-pattern to count only responses served by the edge, or --since/--until for a '
+                'period in which Django did not serve redirects; otherwise tracked clicks are counted twice.'
+            )
+        try:
+            hit_pattern = re.compile(hit_pattern) if hit_pattern else None
+        except re.error as e:
+            raise CommandError(f'Invalid --hit-pattern: {e}')
+        since = self._parse_time('--since', since)
+        until = self._parse_time('--until', until)
+
+        if path == '-':
+            stats = self._ingest(sys.stdin, 'stdin', batch_size, statuses, hit_pattern, since, until, restart)
+        else:
+            opener = gzip.open if path.endswith('.gz') else open
+            try:
+                stream = opener(path, 'rt', encoding='utf-8', errors='replace')
+            except OSError as e:
+                raise CommandError(f'Cannot open {path}: {e}')
+            with stream:
+                stats = self._ingest(stream, path, batch_size, statuses, hit_pattern, since, until, restart)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Read {stats.read} lines: {stats.clicks} clicks added, '
+            f'{stats.unknown} unknown short codes, {stats.skipped} skipped.'
+        ))
+
+    def _ingest(self, stream, name, batch_size, statuses, hit_pattern, since, until, restart):
+        first_line = next(stream, '')
+        if not first_line:
+            return IngestStats()
+        source = log_fingerprint(first_line)
+        if restart:
+            reset_progress(source)
+        if (resumed := load_progress(source)).read:
+            self.stdout.write(f'Resuming after line {resumed.read}.')
+        try:
+            return ingest_access_log(itertools.chain([first_line], stream), batch_size, statuses, hit_pattern,
+                                     source=source, name=name, on_progress=self._progress, since=since, until=until)
+        except IngestConflict as e:
+            raise CommandError(str(e))
+
+    def _parse_time(self, option, value):
+        """解析 ISO 8601 的時間，沒有時區時視為 UTC。"""
+        if value is None:
+            return None
+        parsed = parse_datetime(value)
+        if parsed is None:
+            raise CommandError(f'Invalid {option}: {value}')
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed, dt_timezone.utc)
+        return parsed
+
+    def _progress(self, stats):
+        self.stdout.write(f'{stats.read} lines read, {stats.clicks} clicks added', ending='\r')
+        self.stdout.flush()
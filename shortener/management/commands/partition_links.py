@@ -0,0 +1,75 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from shortener.partitioning import (
+    NEW_TABLE,
+    OLD_TABLE,
+    TABLE,
+    copy_batch,
+    create_partitioned_table,
+    drop_old_table,
+    get_partitioning_settings,
+    get_progress,
+    install_sync_trigger,
+    is_partitioned,
+    swap_tables,
+)
+
+
+class Command(BaseCommand):
+    help = "將 Link 表線上遷移為以 short_code 雜湊分割的表 (僅支援 PostgreSQL)，中斷後重新執行會從上次的進度繼續。"
+
+    def add_arguments(self, parser):
+        conf = get_partitioning_settings()
+        parser.add_argument('--partitions', type=int, default=conf['PARTITIONS'],
+                            help=f'分割區數量，只在建立分割表時使用 (預設 {conf["PARTITIONS"]})')
+        parser.add_argument('--batch-size', type=int, default=conf['BATCH_SIZE'],
+                            help=f'每個交易複製的 id 範圍 (預設 {conf["BATCH_SIZE"]})')
+        parser.add_argument('--sleep', type=float, default=0.0, metavar='SECONDS',
+                            help='每批之間暫停的秒數，降低對線上流量的影響')
+        parser.add_argument('--no-swap', action='store_true',
+                            help='只複製資料，不交換表名 (之後再執行一次即可交換)')
+        parser.add_argument('--drop-old', action='store_true',
+                            help=f'交換後刪除保留的原表 {OLD_TABLE}')
+
+    def handle(self, *args, partitions, batch_size, sleep, no_swap, drop_old, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Hash partitioning requires PostgreSQL.')
+        if not get_partitioning_settings()['ENABLED']:
+            raise CommandError("Set SHORTENER_LINK_PARTITIONING['ENABLED'] = True first.")
+
+        with connection.cursor() as cursor:
+            already_partitioned = is_partitioned(cursor)
+            progress = get_progress(cursor)
+        if not already_partitioned:
+            if progress is None:
+                with transaction.atomic(), connection.cursor() as cursor:
+                    create_partitioned_table(cursor, partitions)
+                    install_sync_trigger(cursor)
+                self.stdout.write(f'Created {NEW_TABLE} with {partitions} partitions and installed the sync trigger.')
+            self._copy(batch_size, sleep)
+            if no_swap:
+                self.stdout.write('Copy finished; run the command again to swap the tables.')
+                return
+            with transaction.atomic(), connection.cursor() as cursor:
+                swap_tables(cursor)
+            self.stdout.write(self.style.SUCCESS(f'{TABLE} is now partitioned; the old table is kept as {OLD_TABLE}.'))
+        else:
+            self.stdout.write(f'{TABLE} is already partitioned.')
+
+        if drop_old:
+            with connection.cursor() as cursor:
+                drop_old_table(cursor)
+            self.stdout.write(f'Dropped {OLD_TABLE}.')
+
+    def _copy(self, batch_size, sleep):
+        while True:
+            with transaction.atomic(), connection.cursor() as cursor:
+                copied, upper = copy_batch(cursor, batch_size)
+            self.stdout.write(f'Copied rows up to id {copied} of {upper}.')
+            if copied >= upper:
+                return
+            if sleep:
+                time.sleep(sleep)
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from shortener.expiry import purge_expired_links
+
+
+class Command(BaseCommand):
+    help = "以小批次刪除已到期的連結，可選擇先封存成 NDJSON 檔案。"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='每個交易刪除的連結數 (預設 500)')
+        parser.add_argument('--sleep', type=float, default=0.1, metavar='SECONDS',
+                            help='每批之間暫停的秒數，分散寫入量以免影響重定向延遲 (預設 0.1)')
+        parser.add_argument('--archive', metavar='PATH', default=None,
+                            help='刪除前將連結以 NDJSON 附加寫入此檔案')
+        parser.add_argument('--loop', type=float, default=None, metavar='SECONDS',
+                            help='持續執行，每次清除完所有到期連結後等待指定秒數')
+
+    def handle(self, *args, batch_size, sleep, archive, loop, **options):
+        while True:
+            total = self._purge(batch_size, sleep, archive)
+            self.stdout.write(f'Purged {total} expired links.')
+            if loop is None:
+                return
+            time.sleep(loop)
+
+    def _purge(self, batch_size, sleep, archive_path):
+        total = 0
+        archive = open(archive_path, 'a', encoding='utf-8') if archive_path else None
+        try:
+            while purged := purge_expired_links(batch_size, archive=archive):
+                total += purged
+                if sleep:
+                    time.sleep(sleep)
+        finally:
+            if archive is not None:
+                archive.close()
+        return total
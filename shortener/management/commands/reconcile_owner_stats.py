@@ -0,0 +1,42 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from shortener.stats import reconcile_owner_stats
+
+
+class Command(BaseCommand):
+    help = "依實際的連結資料重新計算每個擁有者的彙總統計，修正增量維護產生的偏移。"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='每個交易處理的擁有者數 (預設 1000)')
+        parser.add_argument('--user', action='append', dest='usernames', default=None, metavar='USERNAME',
+                            help='只處理指定的使用者，可重複指定')
+        parser.add_argument('--loop', type=float, default=None, metavar='SECONDS',
+                            help='持續執行，每次處理完所有擁有者後等待指定秒數 (即時點擊模式下用來更新點擊數)')
+
+    def handle(self, *args, batch_size, usernames, loop, **options):
+        users = get_user_model().objects.order_by('pk')
+        if usernames:
+            users = users.filter(username__in=usernames)
+        while True:
+            checked, fixed = self._reconcile(users, batch_size)
+            self.stdout.write(f'Checked {checked} owners, fixed {fixed}.')
+            if loop is None:
+                return
+            time.sleep(loop)
+
+    def _reconcile(self, users, batch_size):
+        checked = fixed = 0
+        last_pk = None
+        while True:
+            batch = users if last_pk is None else users.filter(pk__gt=last_pk)
+            owner_ids = list(batch.values_list('pk', flat=True)[:batch_size])
+            if not owner_ids:
+                break
+            fixed += reconcile_owner_stats(owner_ids)
+            checked += len(owner_ids)
+            last_pk = owner_ids[-1]
+        return checked, fixed
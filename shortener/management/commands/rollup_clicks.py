@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from shortener.analytics import rollup_click_events
+
+
+class Command(BaseCommand):
+    help = "將原始點擊事件彙總進每小時與每天的時間桶，並刪除已彙總的事件。"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000,
+                            help='每個交易處理的事件數 (預設 10000)')
+        parser.add_argument('--loop', type=float, default=None, metavar='SECONDS',
+                            help='持續執行，每次處理完所有事件後等待指定秒數')
+
+    def handle(self, *args, batch_size, loop, **options):
+        while True:
+            total = 0
+            while processed := rollup_click_events(batch_size):
+                total += processed
+            self.stdout.write(f'Rolled up {total} click events.')
+            if loop is None:
+                return
+            time.sleep(loop)
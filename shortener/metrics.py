@@ -0,0 +1,170 @@
+"""
+Prometheus 格式的監控指標。
+
+多個 worker 行程時，啟動前設定環境變數 ``PROMETHEUS_MULTIPROC_DIR``
+(每次部署清空的目錄)，prometheus_client 會將各行程的數值寫入該目錄，
+``/metrics`` 再從所有行程的檔案彙總。使用 gunicorn 時，請在設定檔的
+``child_exit`` hook 呼叫 ``prometheus_client.multiprocess.mark_process_dead(worker.pid)``，
+讓已結束 worker 的 gauge 不再被計入。
+
+gauge 在 ``/metrics`` 被讀取時更新；其他 worker 無法在該請求中更新自己的 gauge，
+因此請求結束時也會更新，但每個行程最多每 GAUGE_INTERVAL 秒一次。
+"""
+import os
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import Http404, HttpResponse
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+from .bloom import get_short_code_filter
+from .cache import get_resolution_cache
+from .clicks import get_click_buffer, get_click_settings
+
+DEFAULT_SETTINGS = {
+    'ENABLED': True,
+    # 允許讀取 /metrics 的 IP，None 表示不限制 (由反向代理控管)
+    'ALLOWED_IPS': None,
+    # 請求結束時更新本行程 gauge 的最小間隔 (秒)
+    'GAUGE_INTERVAL': 5.0,
+}
+
+ROUTES = ('redirect', 'shorten', 'api', 'dashboard', 'other')
+
+# 重定向的延遲通常在數毫秒內，桶的範圍從 1ms 開始
+REQUEST_LATENCY = Histogram(
+    'shortener_request_duration_seconds',
+    '每個請求的處理時間 (秒)，依路由分類。',
+    ['route'],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+LINKS_CREATED = Counter('shortener_links_created', '建立的短網址數。')
+CLICKS = Counter('shortener_clicks', '成功重定向 (點擊) 的次數。')
+NOT_FOUND = Counter('shortener_not_found', '找不到短代碼而回傳 404 的次數。')
+PENDING_CLICKS = Gauge('shortener_pending_clicks', '緩衝中尚未寫回資料庫的點擊數。',
+                       multiprocess_mode='livesum')
+CACHE_ENTRIES = Gauge('shortener_resolution_cache_entries', '行程內解析快取的項目數。',
+                      multiprocess_mode='livesum')
+BLOOM_ITEMS = Gauge('shortener_bloom_filter_items', 'Bloom filter 中的短代碼數 (各 worker 的最大值)。',
+                    multiprocess_mode='livemax')
+
+
+def get_metrics_settings():
+    return {**DEFAULT_SETTINGS, **getattr(settings, 'SHORTENER_METRICS', {})}
+
+
+def route_for(request):
+    """將請求對應到固定的幾個路由名稱，避免 label 數量無限增加。"""
+    match = request.resolver_match
+    if match is None:
+        return 'other'
+    if match.namespace.startswith('shortener_api'):
+        return 'api'
+    if match.url_name == 'redirect':
+        return 'redirect'
+    if match.url_name == 'shorten_url':
+        return 'shorten'
+    if match.url_name and match.url_name.startswith(('dashboard', 'export_links')):
+        return 'dashboard'
+    return 'other'
+
+
+def record_links_created(count=1):
+    LINKS_CREATED.inc(count)
+
+
+def refresh_gauges():
+    """以本行程目前的狀態更新 gauge。"""
+    global _next_gauge_refresh
+    _next_gauge_refresh = time.monotonic() + get_metrics_settings()['GAUGE_INTERVAL']
+    if get_click_settings()['MODE'] == 'buffered':
+        PENDING_CLICKS.set(get_click_buffer().pending_clicks)
+    resolution_cache = get_resolution_cache()
+    CACHE_ENTRIES.set(len(resolution_cache) if resolution_cache is not None else 0)
+    short_code_filter = get_short_code_filter()
+    BLOOM_ITEMS.set(short_code_filter.stats()['items'] if short_code_filter is not None else 0)
+
+
+_next_gauge_refresh = 0.0
+
+
+def maybe_refresh_gauges():
+    """距離上次更新超過 GAUGE_INTERVAL 時才更新 gauge，請求路徑上通常只比較一次時間。"""
+    if time.monotonic() >= _next_gauge_refresh:
+        refresh_gauges()
+
+
+def reset_gauge_refresh():
+    global _next_gauge_refresh
+    _next_gauge_refresh = 0.0
+
+
+def observe(request, response, elapsed):
+    route = route_for(request)
+    REQUEST_LATENCY.labels(route).observe(elapsed)
+    if route == 'redirect':
+        if response.status_code == 404:
+            NOT_FOUND.inc()
+        elif response.status_code in (301, 302):
+            CLICKS.inc()
+    maybe_refresh_gauges()
+
+
+class PrometheusMetricsMiddleware:
+    """記錄每個請求的延遲與點擊、404 次數，並定期更新本行程的 gauge。"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not get_metrics_settings()['ENABLED']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        started = time.perf_counter()
+        response = self.get_response(request)
+        observe(request, response, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        observe(request, response, time.perf_counter() - started)
+        return response
+
+
+def get_registry():
+    """多行程模式下彙總所有 worker 的數值，否則使用預設的 registry。"""
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def metrics_view(request):
+    """以 Prometheus 文字格式輸出所有指標。"""
+    conf = get_metrics_settings()
+    if not conf['ENABLED']:
+        raise Http404
+    if conf['ALLOWED_IPS'] is not None and request.META.get('REMOTE_ADDR') not in conf['ALLOWED_IPS']:
+        raise Http404
+    refresh_gauges()
+    return HttpResponse(generate_latest(get_registry()), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.2 on 2026-10-17 19:45
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shortener', '0002_short_code_sequence'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='link',
+            name='url_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='link',
+            constraint=models.UniqueConstraint(condition=models.Q(('owner__isnull', False), ('url_hash__isnull', False)), fields=('owner', 'url_hash'), name='shortener_link_owner_url_hash_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='link',
+            constraint=models.UniqueConstraint(condition=models.Q(('owner__isnull', True), ('url_hash__isnull', False)), fields=('url_hash',), name='shortener_link_anon_url_hash_uniq'),
+        ),
+    ]
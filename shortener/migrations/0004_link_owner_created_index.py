@@ -0,0 +1,19 @@
+# Generated by Django 5.2.2 on 2026-10-17 19:46
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shortener', '0003_link_url_hash'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='link',
+            index=models.Index(fields=['owner', 'created_at', 'id'], name='shortener_link_owner_created'),
+        ),
+    ]
@@ -0,0 +1,93 @@
+from django.conf import settings
+from django.db import migrations
+
+# 此 migration 不匯入 shortener.partitioning：該模組依賴目前的 Link 模型與之後的修改，
+# migration 必須固定在撰寫時的 schema，因此所需的 SQL 直接寫在這裡
+PARTITION_KEY = 'short_code'
+
+
+def _index_statement(name, definition, contype, constraint_definition, target):
+    """
+    將原表的索引、主鍵或唯一約束改寫到分割表；不含分割鍵的唯一性改為一般索引。
+
+    去重用的 (owner, url_hash) 唯一索引在此改為一般索引，0012 再將 migration state 改為相同的一般索引。
+    """
+    if contype == 'p':
+        return f'ALTER TABLE {target} ADD CONSTRAINT {name} PRIMARY KEY (id, {PARTITION_KEY})'
+    if contype is not None:
+        columns = constraint_definition.split('(', 1)[1].rsplit(')', 1)[0]
+        if PARTITION_KEY in columns:
+            return f'ALTER TABLE {target} ADD CONSTRAINT {name} UNIQUE ({columns})'
+        return f'CREATE INDEX {name} ON {target} ({columns})'
+    using = definition.split(' USING ', 1)[1]
+    unique = definition.startswith('CREATE UNIQUE ') and PARTITION_KEY in using.split(' WHERE ', 1)[0]
+    return f'CREATE {"UNIQUE " if unique else ""}INDEX {name} ON {target} USING {using}'
+
+
+def partition_link_table(apps, schema_editor):
+    # 只在啟用 SHORTENER_LINK_PARTITIONING 且 Link 表仍是空的 (新安裝) 時直接分割；
+    # 已有資料的表請改用 `python manage.py partition_links` 線上分批遷移
+    conf = {'ENABLED': False, 'PARTITIONS': 16, **getattr(settings, 'SHORTENER_LINK_PARTITIONING', {})}
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql' or not conf['ENABLED']:
+        return
+    table = apps.get_model('shortener', 'Link')._meta.db_table
+    new_table = f'{table}_partitioned'
+    sequence = f'{table}_pid_seq'
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s))', [table],
+        )
+        if cursor.fetchone()[0]:
+            return
+        cursor.execute(f'SELECT EXISTS (SELECT 1 FROM {table})')
+        if cursor.fetchone()[0]:
+            return
+
+        cursor.execute(
+            'SELECT i.indexname, i.indexdef, c.contype, pg_get_constraintdef(c.oid) '
+            'FROM pg_indexes i LEFT JOIN pg_constraint c '
+            '  ON c.conname = i.indexname AND c.conrelid = to_regclass(%s) '
+            'WHERE i.schemaname = current_schema() AND i.tablename = %s ORDER BY i.indexname',
+            [table, table],
+        )
+        indexes = cursor.fetchall()
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = to_regclass(%s) AND contype = 'f' ORDER BY conname",
+            [table],
+        )
+        foreign_keys = cursor.fetchall()
+
+        cursor.execute(
+            f'CREATE TABLE {new_table} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+            f'PARTITION BY HASH ({PARTITION_KEY})'
+        )
+        cursor.execute(f'CREATE SEQUENCE IF NOT EXISTS {sequence}')
+        cursor.execute(f"ALTER TABLE {new_table} ALTER COLUMN id SET DEFAULT nextval('{sequence}')")
+        cursor.execute(f'ALTER SEQUENCE {sequence} OWNED BY {new_table}.id')
+        for remainder in range(conf['PARTITIONS']):
+            cursor.execute(
+                f'CREATE TABLE {table}_p{remainder} PARTITION OF {new_table} '
+                f'FOR VALUES WITH (MODULUS {conf["PARTITIONS"]}, REMAINDER {remainder})'
+            )
+
+        # 原表是空的，不需要線上遷移的同步與交換：刪除原表後沿用原本的索引與約束名稱
+        cursor.execute(f'DROP TABLE {table}')
+        cursor.execute(f'ALTER TABLE {new_table} RENAME TO {table}')
+        for name, definition, contype, constraint_definition in indexes:
+            cursor.execute(_index_statement(name, definition, contype, constraint_definition, table))
+        for name, definition in foreign_keys:
+            cursor.execute(f'ALTER TABLE {table} ADD CONSTRAINT {name} {definition}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shortener', '0005_click_events_and_rollups'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_link_table, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.2 on 2026-10-17 20:23
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('shortener', '0007_link_expires_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OwnerStats',
+            fields=[
+                ('owner', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='link_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('link_count', models.IntegerField(default=0)),
+                ('click_count', models.BigIntegerField(default=0)),
+                ('top_link_clicks', models.IntegerField(default=0)),
+                ('top_link', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='shortener.link')),
+            ],
+        ),
+    ]
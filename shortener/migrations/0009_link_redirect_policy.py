@@ -0,0 +1,23 @@
+# Generated by Django 5.2.2 on 2026-10-17 20:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shortener', '0008_owner_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='link',
+            name='cache_max_age',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='link',
+            name='redirect_permanent',
+            field=models.BooleanField(db_default=False, default=False),
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 5.2.2 on 2026-10-17 21:38
+
+from django.conf import settings
+from django.db import migrations, models
+
+# 去重改由 advisory lock 保證 (dedup.lock_url_hashes)，(owner, url_hash) 的部分唯一約束改為一般索引。
+# 未分割的表上是唯一索引，0006 / partition_links 分割過的表上已經是同名的一般索引，
+# 兩者都以 DROP INDEX IF EXISTS 移除後建立新的索引，state 與實際的 schema 一致
+OLD_CONSTRAINTS = [
+    models.UniqueConstraint(condition=models.Q(('owner__isnull', False), ('url_hash__isnull', False)),
+                            fields=('owner', 'url_hash'), name='shortener_link_owner_url_hash_uniq'),
+    models.UniqueConstraint(condition=models.Q(('owner__isnull', True), ('url_hash__isnull', False)),
+                            fields=('url_hash',), name='shortener_link_anon_url_hash_uniq'),
+]
+
+INDEXES = [
+    models.Index(condition=models.Q(('owner__isnull', False), ('url_hash__isnull', False)),
+                 fields=['owner', 'url_hash'], name='shortener_link_owner_url_hash'),
+    models.Index(condition=models.Q(('owner__isnull', True), ('url_hash__isnull', False)),
+                 fields=['url_hash'], name='shortener_link_anon_url_hash'),
+]
+
+
+def replace_unique_indexes(apps, schema_editor):
+    # 不支援部分索引的資料庫 (MySQL) 從未建立過這些約束，也不會建立新的索引
+    if not schema_editor.connection.features.supports_partial_indexes:
+        return
+    Link = apps.get_model('shortener', 'Link')
+    for constraint in OLD_CONSTRAINTS:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {schema_editor.quote_name(constraint.name)}')
+    for index in INDEXES:
+        schema_editor.add_index(Link, index)
+
+
+def restore_unique_indexes(apps, schema_editor):
+    # 分割過的表無法建立不含分割鍵的唯一索引，還原會失敗，需先還原分割
+    if not schema_editor.connection.features.supports_partial_indexes:
+        return
+    Link = apps.get_model('shortener', 'Link')
+    for index in INDEXES:
+        schema_editor.remove_index(Link, index)
+    for constraint in OLD_CONSTRAINTS:
+        schema_editor.add_constraint(Link, constraint)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shortener', '0011_access_log_progress'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(replace_unique_indexes, restore_unique_indexes),
+            ],
+            state_operations=[
+                migrations.RemoveConstraint(
+                    model_name='link',
+                    name=OLD_CONSTRAINTS[0].name,
+                ),
+                migrations.RemoveConstraint(
+                    model_name='link',
+                    name=OLD_CONSTRAINTS[1].name,
+                ),
+                migrations.AddIndex(
+                    model_name='link',
+                    index=INDEXES[0],
+                ),
+                migrations.AddIndex(
+                    model_name='link',
+                    index=INDEXES[1],
+                ),
+            ],
+        ),
+    ]
@@ -1,15 +1,182 @@
-from django.db import models
+from django.db import models, router, transaction
+from django.db.models.functions import Now
 from django.contrib.auth.models import User
 
+# 刪除連結時扣除擁有者統計與記錄刪除紀錄需要的欄位
+DELETE_FIELDS = ('id', 'short_code', 'owner_id', 'click_count')
+
+
+class LinkQuerySet(models.QuerySet):
+    def delete(self):
+        """
+        刪除連結，並在同一個交易中扣除擁有者統計與記錄刪除紀錄 (DeletedLink)。
+
+        Link.delete()、管理後台與 delete_links 都經過這裡，整批只多一個 SELECT、一個 UPDATE 與一個 INSERT；
+        隨使用者 CASCADE 刪除的連結不經過這裡，由 signals.record_deleted_user_links 記錄。
+        """
+        return self.delete_rows(list(self.values(*DELETE_FIELDS)))
+
+    def delete_rows(self, links):
+        """
+        刪除已讀取 DELETE_FIELDS 的連結，不需再讀取一次 (delete_links 與 purge_expired_links)。
+
+        只刪除傳入的連結，統計與刪除紀錄不會漏掉讀取後才符合條件的連結。
+        """
+        # stats 與 redirectmap 都依賴此模組的模型
+        from .redirectmap import record_deleted_links
+        from .stats import record_links_removed
+
+        with transaction.atomic(using=self.db):
+            rows = type(self)(self.model, using=self._db).filter(pk__in=[link['id'] for link in links])
+            deleted = super(LinkQuerySet, rows).delete()
+            record_links_removed(links)
+            record_deleted_links([link['short_code'] for link in links])
+        return deleted
+
+
 class Link(models.Model):
     original_url = models.URLField()
     short_code = models.CharField(max_length=15, unique=True, db_index=True)
     owner = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # 最後修改時間，export_redirect_map 以此只重新匯出變更過的連結；
+    # db_default 讓 import_links 等直接以 SQL 寫入的路徑也有值 (點擊數的 UPDATE 不會更新此欄位)
+    updated_at = models.DateTimeField(auto_now=True, db_default=Now())
     click_count = models.IntegerField(default=0)
     last_clicked_at = models.DateTimeField(null=True, blank=True)
+    # 正規化網址的雜湊值，僅在啟用 SHORTENER_DEDUP 時填入
+    url_hash = models.CharField(max_length=64, null=True, blank=True, editable=False)
+    # 到期時間，None 表示永久有效；到期後重定向回傳 410，並由 purge_expired_links 分批刪除
+    expires_at = models.DateTimeField(null=True, blank=True)
+    # 重定向策略：301 (永久) 或 302，以及 Cache-Control 的 max-age (秒)，None 表示使用 SHORTENER_REDIRECTS 的預設值
+    # db_default 讓 import_links 等直接以 SQL 寫入的路徑不需指定此欄位
+    redirect_permanent = models.BooleanField(default=False, db_default=False)
+    cache_max_age = models.PositiveIntegerField(null=True, blank=True)
+
+    objects = LinkQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # 儀表板的游標分頁：WHERE owner = ? ORDER BY created_at DESC, id DESC
+            models.Index(fields=['owner', 'created_at', 'id'], name='shortener_link_owner_created'),
+            # 只索引有到期時間的連結，清除到期連結時依到期順序分批讀取
+            models.Index(fields=['expires_at'], name='shortener_link_expires_at',
+                         condition=models.Q(expires_at__isnull=False)),
+            # 增量匯出重定向對照表時讀取上次匯出後變更的連結
+            models.Index(fields=['updated_at'], name='shortener_link_updated_at'),
+            # 去重時以 (owner, url_hash) 查詢既有的相同網址；分割表無法建立不含分割鍵的唯一約束，
+            # 因此不以唯一約束保證，改由 dedup.lock_url_hashes 讓同時建立相同網址的請求排隊
+            models.Index(fields=['owner', 'url_hash'], name='shortener_link_owner_url_hash',
+                         condition=models.Q(url_hash__isnull=False, owner__isnull=False)),
+            models.Index(fields=['url_hash'], name='shortener_link_anon_url_hash',
+                         condition=models.Q(url_hash__isnull=False, owner__isnull=True)),
+        ]
 
     def __str__(self):
         if self.owner:
             return f'{self.short_code} for {self.owner.username}'
         return f'{self.short_code} (anonymous)'
+
+    def delete(self, using=None, keep_parents=False):
+        """經過 LinkQuerySet.delete 刪除，與批次刪除同樣維護擁有者統計與刪除紀錄。"""
+        if self.pk is None:
+            raise ValueError(f"{self._meta.object_name} object can't be deleted because its id attribute is set to None.")
+        using = using or router.db_for_write(Link, instance=self)
+        deleted = Link.objects.using(using).filter(pk=self.pk).delete()
+        self.pk = None
+        return deleted
+
+
+class DeletedLink(models.Model):
+    """
+    被刪除的連結 (tombstone)，啟用 SHORTENER_REDIRECT_MAP 的 TRACK_DELETIONS 時由 LinkQuerySet.delete 批次寫入。
+
+    增量匯出重定向對照表時據此移除已刪除的短代碼，匯出後由 export_redirect_map 刪除已涵蓋的紀錄。
+    """
+    short_code = models.CharField(max_length=15)
+    deleted_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f'{self.short_code} deleted at {self.deleted_at:%Y-%m-%d %H:%M}'
+
+
+class AccessLogProgress(models.Model):
+    """
+    ingest_access_logs 對每個日誌檔案的進度，與點擊數在同一個交易中更新。
+
+    以日誌第一行的雜湊識別檔案 (輪替後壓縮或改名仍是同一個檔案)；完成後保留，
+    重新執行同一個檔案時只處理之後新增的行，不會重複累加點擊。
+    """
+    source = models.CharField(max_length=64, unique=True)
+    name = models.CharField(max_length=255, blank=True)
+    read = models.BigIntegerField(default=0)
+    clicks = models.BigIntegerField(default=0)
+    unknown = models.BigIntegerField(default=0)
+    skipped = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.name or self.source}: {self.read} lines'
+
+
+class ShortCodeSequence(models.Model):
+    """短代碼分配器使用的序號，各 worker 以區段為單位向此處預留。"""
+    name = models.CharField(max_length=32, primary_key=True)
+    next_value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.name}: {self.next_value}'
+
+
+class ClickEvent(models.Model):
+    """
+    原始點擊事件，只追加寫入 (append-only)，由 rollup_clicks 彙總進時間桶後刪除。
+
+    為了讓批次寫入盡量便宜，除了主鍵之外不建立任何索引，也不建立外鍵約束。
+    """
+    link = models.ForeignKey(Link, on_delete=models.DO_NOTHING, db_constraint=False,
+                             db_index=False, related_name='+')
+    clicked_at = models.DateTimeField()
+
+
+class ClickRollup(models.Model):
+    link = models.ForeignKey(Link, on_delete=models.CASCADE, db_constraint=False,
+                             db_index=False, related_name='+')
+    bucket = models.DateTimeField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+        constraints = [
+            # 兼作 (link, bucket) 範圍查詢的索引
+            models.UniqueConstraint(fields=['link', 'bucket'], name='%(app_label)s_%(class)s_link_bucket_uniq'),
+        ]
+
+    def __str__(self):
+        return f'{self.link_id} @ {self.bucket:%Y-%m-%d %H:%M}: {self.count}'
+
+
+class HourlyClickRollup(ClickRollup):
+    """每個連結每小時的點擊數。"""
+
+
+class DailyClickRollup(ClickRollup):
+    """每個連結每天 (UTC) 的點擊數。"""
+
+
+class OwnerStats(models.Model):
+    """
+    每個擁有者的彙總數字，於建立連結與寫回點擊時增量維護 (見 shortener/stats.py)。
+
+    儀表板與 /stats API 以一次主鍵查詢取得，不需對擁有者的所有連結做 Count / Sum。
+    """
+    owner = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='link_stats')
+    link_count = models.IntegerField(default=0)
+    click_count = models.BigIntegerField(default=0)
+    # 點擊最多的連結；不建立外鍵約束，連結被刪除時由 LinkQuerySet.delete 整批清除
+    top_link = models.ForeignKey(Link, on_delete=models.DO_NOTHING, null=True, blank=True,
+                                 db_constraint=False, related_name='+')
+    top_link_clicks = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.owner_id}: {self.link_count} links, {self.click_count} clicks'
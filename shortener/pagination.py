@@ -0,0 +1,111 @@
+import base64
+import binascii
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import List, Optional
+
+from django.conf import settings
+from django.db.models import Q
+
+DEFAULT_SETTINGS = {
+    'PAGE_SIZE': 50,
+    'MAX_PAGE_SIZE': 200,
+}
+
+
+def get_pagination_settings():
+    return {**DEFAULT_SETTINGS, **getattr(settings, 'SHORTENER_DASHBOARD', {})}
+
+
+def encode_cursor(created_at, pk):
+    """將 (created_at, id) 編碼成可放在網址中的游標字串。"""
+    raw = f'{created_at.isoformat()}|{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    解碼 encode_cursor 產生的游標。
+
+    Raises:
+        ValueError: 游標格式不正確。
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, pk = raw.rsplit('|', 1)
+        return datetime.fromisoformat(created_at), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise ValueError(f'Invalid cursor: {cursor!r}') from e
+
+
+def clamp_page_size(value):
+    """將使用者傳入的每頁筆數限制在 1 到 MAX_PAGE_SIZE 之間。"""
+    conf = get_pagination_settings()
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return conf['PAGE_SIZE']
+    return max(1, min(size, conf['MAX_PAGE_SIZE']))
+
+
+@dataclass
+class KeysetPage:
+    items: List = field(default_factory=list)
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.prev_cursor is not None
+
+
+def paginate_newest_first(queryset, after=None, before=None, page_size=None):
+    """
+    以 (created_at, id) 做游標 (keyset) 分頁，由新到舊排序。
+
+    與 OFFSET 分頁不同，每一頁都只需沿著 (owner, created_at, id) 索引
+    讀取 page_size + 1 筆，不論翻到多深的頁數成本都相同。
+
+    Args:
+        queryset (QuerySet): 已篩選好的 QuerySet。
+        after (str): 取得此游標之後 (較舊) 的一頁。
+        before (str): 取得此游標之前 (較新) 的一頁。
+        page_size (int): 每頁筆數。
+
+    Returns:
+        KeysetPage: 本頁的資料與前後頁游標。
+
+    Raises:
+        ValueError: 游標格式不正確。
+    """
+    page_size = page_size or get_pagination_settings()['PAGE_SIZE']
+
+    if before:
+        created_at, pk = decode_cursor(before)
+        rows = list(
+            queryset.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, pk__gt=pk))
+            .order_by('created_at', 'pk')[:page_size + 1]
+        )
+        has_more = len(rows) > page_size
+        items = rows[:page_size][::-1]
+        has_newer, has_older = has_more, True
+    else:
+        if after:
+            created_at, pk = decode_cursor(after)
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk)
+            )
+        rows = list(queryset.order_by('-created_at', '-pk')[:page_size + 1])
+        items = rows[:page_size]
+        has_newer, has_older = bool(after), len(rows) > page_size
+
+    page = KeysetPage(items=items)
+    if items and has_older:
+        page.next_cursor = encode_cursor(items[-1].created_at, items[-1].pk)
+    if items and has_newer:
+        page.prev_cursor = encode_cursor(items[0].created_at, items[0].pk)
+    return page
@@ -0,0 +1,268 @@
+"""
+以 short_code 做 Postgres 宣告式雜湊分割 (hash partitioning) 的 Link 表。
+
+分割後的表維持原本的名稱與欄位，ORM 不需要任何修改；差異在於：
+- 主鍵改為 (id, short_code)，唯一約束必須包含分割鍵，short_code 的唯一性仍由資料庫保證。
+- 不含 short_code 的唯一約束無法跨分割區保證，改為一般索引。去重本來就不依賴唯一約束，
+  而是以 advisory lock 排除同時建立相同網址 (見 dedup.lock_url_hashes)，分割前後行為相同。
+- id 改由獨立的 sequence 產生。
+
+線上遷移 (partition_links 指令) 的步驟：
+1. 建立分割表 ``<table>_partitioned`` 與分割區，複製原表的索引與外鍵。
+2. 在原表安裝 trigger，之後的 INSERT / UPDATE / DELETE 同步寫入分割表。
+3. 以 id 範圍分批複製既有資料，每批一個交易，進度記錄在狀態表中，可中斷後繼續；
+   複製時以 FOR SHARE 鎖住讀到的資料列，同時進行的刪除或修改會等這批複製完成，
+   再由 trigger 套用到分割表，已刪除的連結不會在交換後重新出現。
+4. 短暫鎖住原表，交換表名與索引名稱；原表保留為 ``<table>_unpartitioned``。
+"""
+import re
+from typing import NamedTuple, Optional
+
+from django.conf import settings
+
+from .models import Link
+
+DEFAULT_SETTINGS = {
+    # 新安裝時由 migration 直接分割；partition_links 指令要求先啟用
+    'ENABLED': False,
+    'PARTITIONS': 16,
+    'BATCH_SIZE': 10000,
+}
+
+TABLE = Link._meta.db_table
+PARTITION_KEY = 'short_code'
+NEW_TABLE = f'{TABLE}_partitioned'
+OLD_TABLE = f'{TABLE}_unpartitioned'
+SEQUENCE = f'{TABLE}_pid_seq'
+STATE_TABLE = f'{TABLE}_partition_state'
+SYNC_FUNCTION = f'{TABLE}_partition_sync'
+TMP_SUFFIX = '_p'
+OLD_SUFFIX = '_old'
+
+# Postgres 識別字的長度上限
+MAX_NAME_LENGTH = 63
+
+_INDEX_DEF = re.compile(r'^CREATE (UNIQUE )?INDEX (\S+) ON (?:ONLY )?(\S+) (USING .*)$')
+
+
+def get_partitioning_settings():
+    return {**DEFAULT_SETTINGS, **getattr(settings, 'SHORTENER_LINK_PARTITIONING', {})}
+
+
+class IndexInfo(NamedTuple):
+    name: str
+    definition: str
+    # pg_constraint.contype：'p' 主鍵、'u' 唯一約束，一般索引為 None
+    constraint_type: Optional[str] = None
+    constraint_definition: Optional[str] = None
+
+
+def suffixed(name, suffix):
+    """加上後綴，超過 Postgres 識別字長度時截斷原名稱。"""
+    return name[:MAX_NAME_LENGTH - len(suffix)] + suffix
+
+
+def partition_name(index):
+    return f'{TABLE}_p{index}'
+
+
+def rewrite_index(index, target, name):
+    """
+    將原表的索引定義改寫為分割表上的索引。
+
+    不包含分割鍵的唯一索引無法建立在分割表上，改為一般索引。
+
+    Args:
+        index (IndexInfo): 原表的索引。
+        target (str): 分割表名稱。
+        name (str): 新索引的名稱。
+
+    Returns:
+        str: CREATE INDEX 語句。
+    """
+    match = _INDEX_DEF.match(index.definition)
+    if match is None:
+        raise ValueError(f'Unsupported index definition: {index.definition}')
+    unique, _, _, using = match.groups()
+    columns = using.split(' WHERE ', 1)[0]
+    if unique and PARTITION_KEY not in columns:
+        unique = None
+    return f'CREATE {unique or ""}INDEX {name} ON {target} {using}'
+
+
+def constraint_statement(index, target, name):
+    """將原表的主鍵或唯一約束改寫為分割表上的約束 (或一般索引)。"""
+    if index.constraint_type == 'p':
+        return f'ALTER TABLE {target} ADD CONSTRAINT {name} PRIMARY KEY (id, {PARTITION_KEY})'
+    columns = index.constraint_definition.split('(', 1)[1].rsplit(')', 1)[0]
+    if PARTITION_KEY in columns:
+        return f'ALTER TABLE {target} ADD CONSTRAINT {name} UNIQUE ({columns})'
+    return f'CREATE INDEX {name} ON {target} ({columns})'
+
+
+def table_exists(cursor, table):
+    cursor.execute('SELECT to_regclass(%s) IS NOT NULL', [table])
+    return cursor.fetchone()[0]
+
+
+def is_partitioned(cursor, table=TABLE):
+    cursor.execute(
+        'SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s))',
+        [table],
+    )
+    return cursor.fetchone()[0]
+
+
+def get_columns(cursor, table):
+    cursor.execute(
+        'SELECT column_name FROM information_schema.columns '
+        'WHERE table_schema = current_schema() AND table_name = %s ORDER BY ordinal_position',
+        [table],
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+
+def get_indexes(cursor, table):
+    cursor.execute(
+        'SELECT i.indexname, i.indexdef, c.contype, pg_get_constraintdef(c.oid) '
+        'FROM pg_indexes i LEFT JOIN pg_constraint c '
+        '  ON c.conname = i.indexname AND c.conrelid = to_regclass(%s) '
+        'WHERE i.schemaname = current_schema() AND i.tablename = %s ORDER BY i.indexname',
+        [table, table],
+    )
+    return [IndexInfo(*row) for row in cursor.fetchall()]
+
+
+def get_foreign_keys(cursor, table):
+    cursor.execute(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = to_regclass(%s) AND contype = 'f' ORDER BY conname",
+        [table],
+    )
+    return cursor.fetchall()
+
+
+def create_partitioned_table(cursor, partitions):
+    """建立分割表與分割區，並複製原表的索引、約束與外鍵 (名稱加上暫時的後綴)。"""
+    cursor.execute(
+        f'CREATE TABLE {NEW_TABLE} (LIKE {TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+        f'PARTITION BY HASH ({PARTITION_KEY})'
+    )
+    cursor.execute(f'CREATE SEQUENCE IF NOT EXISTS {SEQUENCE}')
+    cursor.execute(f"ALTER TABLE {NEW_TABLE} ALTER COLUMN id SET DEFAULT nextval('{SEQUENCE}')")
+    cursor.execute(f'ALTER SEQUENCE {SEQUENCE} OWNED BY {NEW_TABLE}.id')
+    for remainder in range(partitions):
+        cursor.execute(
+            f'CREATE TABLE {partition_name(remainder)} PARTITION OF {NEW_TABLE} '
+            f'FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})'
+        )
+    for index in get_indexes(cursor, TABLE):
+        name = suffixed(index.name, TMP_SUFFIX)
+        if index.constraint_type is not None:
+            cursor.execute(constraint_statement(index, NEW_TABLE, name))
+        else:
+            cursor.execute(rewrite_index(index, NEW_TABLE, name))
+    for name, definition in get_foreign_keys(cursor, TABLE):
+        cursor.execute(f'ALTER TABLE {NEW_TABLE} ADD CONSTRAINT {name} {definition}')
+
+
+def install_sync_trigger(cursor):
+    """
+    在原表安裝同步 trigger，並記錄需要分批複製的 id 上限。
+
+    CREATE TRIGGER 會等待進行中的寫入交易結束，之後才讀取 MAX(id)，
+    因此 id 大於上限的資料列一定會經由 trigger 寫入分割表。
+    """
+    columns = get_columns(cursor, TABLE)
+    column_list = ', '.join(columns)
+    values = ', '.join(f'NEW.{column}' for column in columns)
+    updates = ', '.join(f'{column} = EXCLUDED.{column}' for column in columns if column != PARTITION_KEY)
+    cursor.execute(f"""
+        CREATE OR REPLACE FUNCTION {SYNC_FUNCTION}() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'DELETE' OR (TG_OP = 'UPDATE' AND OLD.{PARTITION_KEY} <> NEW.{PARTITION_KEY}) THEN
+                DELETE FROM {NEW_TABLE} WHERE {PARTITION_KEY} = OLD.{PARTITION_KEY};
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO {NEW_TABLE} ({column_list}) VALUES ({values})
+                ON CONFLICT ({PARTITION_KEY}) DO UPDATE SET {updates};
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    cursor.execute(
+        f'CREATE TRIGGER {SYNC_FUNCTION} AFTER INSERT OR UPDATE OR DELETE ON {TABLE} '
+        f'FOR EACH ROW EXECUTE FUNCTION {SYNC_FUNCTION}()'
+    )
+    cursor.execute(f'CREATE TABLE {STATE_TABLE} (upper_id bigint NOT NULL, copied_id bigint NOT NULL)')
+    cursor.execute(f'INSERT INTO {STATE_TABLE} SELECT COALESCE(MAX(id), 0), 0 FROM {TABLE}')
+
+
+def get_progress(cursor):
+    """
+    Returns:
+        tuple[int, int] | None: (已複製到的 id, 需要複製的 id 上限)；尚未開始時回傳 None。
+    """
+    if not table_exists(cursor, STATE_TABLE):
+        return None
+    cursor.execute(f'SELECT copied_id, upper_id FROM {STATE_TABLE}')
+    return cursor.fetchone()
+
+
+def copy_batch(cursor, batch_size):
+    """
+    複製下一段 id 範圍的資料；已由 trigger 寫入的資料列 (較新的版本) 會被略過。
+
+    讀取時不加鎖的話，交易開始後才提交的 DELETE 會先經由 trigger 刪除分割表中 (尚不存在) 的資料列，
+    之後這批複製再依舊的快照把它寫回去。FOR SHARE 讓同時進行的 DELETE / UPDATE 等待這批提交，
+    已在等待的資料列則依提交後的版本重新判斷，刪除的資料列不會被複製。
+
+    Returns:
+        tuple[int, int]: 複製後的 (已複製到的 id, 上限)。
+    """
+    copied, upper = get_progress(cursor)
+    end = min(copied + batch_size, upper)
+    column_list = ', '.join(get_columns(cursor, TABLE))
+    cursor.execute(
+        f'INSERT INTO {NEW_TABLE} ({column_list}) SELECT {column_list} FROM {TABLE} '
+        f'WHERE id > %s AND id <= %s FOR SHARE ON CONFLICT DO NOTHING',
+        [copied, end],
+    )
+    cursor.execute(f'UPDATE {STATE_TABLE} SET copied_id = %s', [end])
+    return end, upper
+
+
+def _rename_indexes(cursor, table, indexes, rename):
+    for index in indexes:
+        new_name = rename(index.name)
+        if index.constraint_type is not None:
+            cursor.execute(f'ALTER TABLE {table} RENAME CONSTRAINT {index.name} TO {new_name}')
+        else:
+            cursor.execute(f'ALTER INDEX {index.name} RENAME TO {new_name}')
+
+
+def swap_tables(cursor):
+    """
+    以分割表取代原表，需在交易中執行。
+
+    鎖住原表期間只做重新命名與設定 sequence，不會複製資料，鎖定時間很短。
+    """
+    cursor.execute(f'LOCK TABLE {TABLE} IN ACCESS EXCLUSIVE MODE')
+    cursor.execute(f"SELECT setval('{SEQUENCE}', GREATEST((SELECT MAX(id) FROM {TABLE}), 1))")
+    cursor.execute(f'DROP TRIGGER IF EXISTS {SYNC_FUNCTION} ON {TABLE}')
+    cursor.execute(f'DROP FUNCTION IF EXISTS {SYNC_FUNCTION}()')
+    cursor.execute(f'DROP TABLE IF EXISTS {STATE_TABLE}')
+
+    old_indexes = get_indexes(cursor, TABLE)
+    new_names = {suffixed(index.name, TMP_SUFFIX): index.name for index in old_indexes}
+    _rename_indexes(cursor, TABLE, old_indexes, lambda name: suffixed(name, OLD_SUFFIX))
+    cursor.execute(f'ALTER TABLE {TABLE} RENAME TO {OLD_TABLE}')
+    cursor.execute(f'ALTER TABLE {NEW_TABLE} RENAME TO {TABLE}')
+    new_indexes = [index for index in get_indexes(cursor, TABLE) if index.name in new_names]
+    _rename_indexes(cursor, TABLE, new_indexes, new_names.get)
+
+
+def drop_old_table(cursor):
+    cursor.execute(f'DROP TABLE IF EXISTS {OLD_TABLE}')
+
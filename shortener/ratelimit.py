@@ -0,0 +1,183 @@
+import functools
+import math
+import time
+from typing import NamedTuple
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+DEFAULT_SETTINGS = {
+    'ENABLED': True,
+    'CACHE_ALIAS': 'default',
+    'KEY_PREFIX': 'shortener:rl',
+    # 取得用戶端 IP 的 META 欄位；位於反向代理之後時可改為 'HTTP_X_REAL_IP' 等
+    'IP_META_KEY': 'REMOTE_ADDR',
+    # 每個範圍的補充速率 (每秒幾個 token) 與桶的容量 (可連續送出的請求數)
+    'RATES': {
+        'shorten': {'RATE': 1.0, 'BURST': 30},
+        'shorten_bulk': {'RATE': 0.1, 'BURST': 5},
+    },
+}
+
+
+def get_rate_limit_settings():
+    return {**DEFAULT_SETTINGS, **getattr(settings, 'SHORTENER_RATE_LIMITS', {})}
+
+
+class RateLimitResult(NamedTuple):
+    allowed: bool
+    retry_after: float = 0.0
+
+
+class RateLimited(Exception):
+    """超過速率限制，由 API 的例外處理器轉換成 429 回應。"""
+
+    def __init__(self, retry_after):
+        super().__init__(f'Rate limit exceeded, retry after {retry_after:.1f}s')
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    以 GCRA (generic cell rate algorithm) 實作的 token bucket，狀態存放在 Django cache。
+
+    每個 key 只需儲存一個數字：下一個 token 的理論到達時間 (TAT)。
+    每次檢查只需一次 get 與一次 set，狀態存放在共用快取時即可跨 worker 共用限制。
+    get 與 set 之間並非原子操作，同一個 key 的並行請求最多可能多放行幾個，
+    對防止濫用已經足夠。
+
+    Args:
+        rate (float): 每秒補充的 token 數。
+        burst (int): 桶的容量，也就是閒置後可連續送出的請求數。
+        cache_alias (str): 存放狀態的 CACHES 別名。
+        key_prefix (str): cache key 的前綴。
+    """
+
+    def __init__(self, rate, burst, cache_alias='default', key_prefix='shortener:rl'):
+        self.interval = 1.0 / rate
+        self.burst = burst
+        self.cache_alias = cache_alias
+        self.key_prefix = key_prefix
+
+    def _key(self, key):
+        return f'{self.key_prefix}:{key}'
+
+    def _decide(self, tat, now):
+        """回傳 (結果, 新的 TAT)；被拒絕時新的 TAT 為 None。"""
+        new_tat = max(tat or now, now) + self.interval
+        allow_at = new_tat - self.burst * self.interval
+        if allow_at > now:
+            return RateLimitResult(False, allow_at - now), None
+        return RateLimitResult(True), new_tat
+
+    def _timeout(self, new_tat, now):
+        return max(1, math.ceil(new_tat - now))
+
+    def hit(self, key):
+        """消耗 key 的一個 token，回傳是否放行與需等待的秒數。"""
+        cache = caches[self.cache_alias]
+        now = time.time()
+        result, new_tat = self._decide(cache.get(self._key(key)), now)
+        if new_tat is not None:
+            cache.set(self._key(key), new_tat, self._timeout(new_tat, now))
+        return result
+
+    async def ahit(self, key):
+        """hit 的非同步版本。"""
+        cache = caches[self.cache_alias]
+        now = time.time()
+        result, new_tat = self._decide(await cache.aget(self._key(key)), now)
+        if new_tat is not None:
+            await cache.aset(self._key(key), new_tat, self._timeout(new_tat, now))
+        return result
+
+
+def get_bucket(scope):
+    """依設定建立 scope 的 TokenBucket，停用或未設定該 scope 時回傳 None。"""
+    conf = get_rate_limit_settings()
+    rate = conf['RATES'].get(scope)
+    if not conf['ENABLED'] or rate is None:
+        return None
+    return TokenBucket(rate['RATE'], rate['BURST'], conf['CACHE_ALIAS'], f"{conf['KEY_PREFIX']}:{scope}")
+
+
+def client_key(request, user=None):
+    """
+    以已登入的使用者 (含 API token 驗證後的使用者) 為限制對象，匿名請求則以 IP 區分。
+
+    Args:
+        request (HttpRequest): 目前的請求。
+        user (User): 已取得的使用者；未提供時使用 request.user。
+    """
+    user = user if user is not None else getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return f'user:{user.pk}'
+    conf = get_rate_limit_settings()
+    return f"ip:{request.META.get(conf['IP_META_KEY'], '')}"
+
+
+def check_rate_limit(scope, request, user=None):
+    """
+    消耗一個 token，超過限制時拋出 RateLimited。
+
+    Raises:
+        RateLimited: 超過速率限制。
+    """
+    bucket = get_bucket(scope)
+    if bucket is None:
+        return
+    result = bucket.hit(client_key(request, user))
+    if not result.allowed:
+        raise RateLimited(result.retry_after)
+
+
+async def acheck_rate_limit(scope, request, user=None):
+    """check_rate_limit 的非同步版本。"""
+    bucket = get_bucket(scope)
+    if bucket is None:
+        return
+    if user is None and hasattr(request, 'auser'):
+        user = await request.auser()
+    result = await bucket.ahit(client_key(request, user))
+    if not result.allowed:
+        raise RateLimited(result.retry_after)
+
+
+def too_many_requests(retry_after, content='Too many requests.', content_type='text/plain; charset=utf-8'):
+    """建立帶有 Retry-After 標頭的 429 回應。"""
+    response = HttpResponse(content, status=429, content_type=content_type)
+    response['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+def rate_limit(scope):
+    """
+    為 Django 視圖 (同步或非同步) 加上速率限制的 decorator，超過限制時回傳 429。
+
+    Args:
+        scope (str): SHORTENER_RATE_LIMITS['RATES'] 中的範圍名稱。
+    """
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @functools.wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                if request.method == 'POST':
+                    try:
+                        await acheck_rate_limit(scope, request)
+                    except RateLimited as e:
+                        return too_many_requests(e.retry_after)
+                return await view_func(request, *args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method == 'POST':
+                try:
+                    check_rate_limit(scope, request)
+                except RateLimited as e:
+                    return too_many_requests(e.retry_after)
+            return view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,247 @@
+"""
+將 Link 表匯出成前端代理可直接使用的重定向對照表 (export_redirect_map 指令)。
+
+輸出兩種格式：
+- 依 short_code 排序的 TSV (short_code, original_url, 狀態碼)，同時作為下次增量匯出的基礎。
+- nginx 的 map 檔，以 include 載入後由 nginx 直接回應重定向，對照表中沒有的代碼才轉給 Django。
+
+增量匯出只查詢上次匯出後變更 (updated_at) 或刪除 (DeletedLink) 的連結，
+再與上次的 TSV 依排序合併，不需重新讀取整個 Link 表。刪除紀錄由所有刪除連結的路徑寫入
+(LinkQuerySet.delete 與使用者的 CASCADE)，匯出後刪除已被這次匯出涵蓋的紀錄；
+關閉 SHORTENER_REDIRECT_MAP 的 TRACK_DELETIONS 時不寫入刪除紀錄，每次都完整匯出。
+輸出先寫入同目錄的暫存檔，完成後以 os.replace 原子地取代，讀取端不會看到寫到一半的檔案。
+
+有到期時間的連結不匯出 (到期後必須回傳 410)，網址含有無法安全寫入 nginx 設定的字元時也不匯出，
+兩者都留給 Django 處理。
+"""
+import json
+import os
+import re
+from contextlib import ExitStack
+from datetime import timedelta
+from typing import NamedTuple, Optional
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F
+from django.db.models.functions import Collate
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .export import EXPORT_CHUNK_SIZE
+from .models import DeletedLink, Link
+
+DEFAULT_SETTINGS = {
+    'TRACK_DELETIONS': True,
+}
+
+MAP_FIELDS = ('short_code', 'original_url', 'redirect_permanent', 'expires_at')
+
+# nginx 設定中有特殊意義 ($ 變數、引號、分號、大括號) 或會破壞 TSV 的字元
+UNSAFE_CHARACTERS = re.compile(r'[\s"\'\\$;{}#]|[\x00-\x1f\x7f]')
+
+
+class MapEntry(NamedTuple):
+    short_code: str
+    original_url: str
+    status: int
+
+
+class ExportResult(NamedTuple):
+    entries: int
+    changed: Optional[int]  # None 表示完整匯出
+    pruned: int = 0  # 刪除的刪除紀錄數
+
+
+def get_redirect_map_settings():
+    return {**DEFAULT_SETTINGS, **getattr(settings, 'SHORTENER_REDIRECT_MAP', {})}
+
+
+def deletion_tracking_enabled():
+    return get_redirect_map_settings()['TRACK_DELETIONS']
+
+
+def record_deleted_links(short_codes):
+    """
+    以一個 INSERT 記錄被刪除的短代碼，需在刪除的同一個交易中呼叫；未啟用 TRACK_DELETIONS 時不寫入。
+
+    Args:
+        short_codes (list[str]): 被刪除的短代碼。
+    """
+    if short_codes and deletion_tracking_enabled():
+        DeletedLink.objects.bulk_create([DeletedLink(short_code=short_code) for short_code in short_codes])
+
+
+def map_entry(short_code, original_url, redirect_permanent, expires_at):
+    """將一個連結轉換成對照表的項目，不應由前端代理回應的連結回傳 None。"""
+    if expires_at is not None:
+        return None
+    if not short_code or UNSAFE_CHARACTERS.search(short_code) or UNSAFE_CHARACTERS.search(original_url):
+        return None
+    return MapEntry(short_code, original_url, 301 if redirect_permanent else 302)
+
+
+def code_order():
+    # 合併時以 Python 的字串比較排序，PostgreSQL 需以 "C" collation 排序才會一致
+    if connection.vendor == 'postgresql':
+        return Collate(F('short_code'), 'C')
+    return F('short_code')
+
+
+def iter_all_entries(chunk_size=EXPORT_CHUNK_SIZE):
+    """以伺服器端游標依 short_code 排序讀取所有可匯出的連結。"""
+    rows = (
+        Link.objects.filter(expires_at__isnull=True)
+        .order_by(code_order())
+        .values_list(*MAP_FIELDS)
+        .iterator(chunk_size=chunk_size)
+    )
+    for row in rows:
+        if entry := map_entry(*row):
+            yield entry
+
+
+def fetch_changes(since):
+    """
+    取得 since 之後變更或刪除的連結。
+
+    Returns:
+        list[tuple[str, MapEntry | None]]: 依 short_code 排序的 (短代碼, 新的項目)，None 表示移除。
+    """
+    changes = {code: None for code in DeletedLink.objects.filter(deleted_at__gt=since)
+               .values_list('short_code', flat=True)}
+    # 目前仍存在的連結以其現況為準 (被刪除後又以相同代碼匯入的情況)
+    for row in Link.objects.filter(updated_at__gt=since).values_list(*MAP_FIELDS).iterator():
+        changes[row[0]] = map_entry(*row)
+    return sorted(changes.items())
+
+
+def read_tsv(path):
+    with open(path, encoding='utf-8', newline='') as f:
+        for line in f:
+            short_code, original_url, status = line.rstrip('\n').split('\t')
+            yield MapEntry(short_code, original_url, int(status))
+
+
+def merge_changes(previous, changes):
+    """依 short_code 合併上次匯出的項目 (已排序) 與變更，產生新的排序項目。"""
+    changes = iter(changes)
+    change = next(changes, None)
+    for entry in previous:
+        while change is not None and change[0] < entry.short_code:
+            if change[1] is not None:
+                yield change[1]
+            change = next(changes, None)
+        if change is not None and change[0] == entry.short_code:
+            if change[1] is not None:
+                yield change[1]
+            change = next(changes, None)
+        else:
+            yield entry
+    while change is not None:
+        if change[1] is not None:
+            yield change[1]
+        change = next(changes, None)
+
+
+class AtomicFile:
+    """寫入同目錄的暫存檔，成功結束時 fsync 後以 os.replace 取代目標檔案，失敗時刪除暫存檔。"""
+
+    def __init__(self, path):
+        self.path = path
+        self.tmp_path = f'{path}.tmp'
+
+    def __enter__(self):
+        self.file = open(self.tmp_path, 'w', encoding='utf-8', newline='')
+        return self.file
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+        self.file.close()
+        if exc_type is None:
+            os.replace(self.tmp_path, self.path)
+        else:
+            os.remove(self.tmp_path)
+
+
+class NginxMapWriter:
+    """
+    寫出 nginx 的 map 檔，定義 $shortener_redirect (目標網址) 與 $shortener_redirect_permanent。
+
+    永久重定向需要第二個 map，只有這些短代碼會暫存在記憶體中。
+    """
+
+    def __init__(self, f):
+        self.f = f
+        self.permanent = []
+        f.write('# Generated by export_redirect_map. Do not edit.\n')
+        f.write('map $uri $shortener_redirect {\n    default "";\n')
+
+    def write(self, entry):
+        self.f.write(f'    /{entry.short_code} "{entry.original_url}";\n')
+        if entry.status == 301:
+            self.permanent.append(entry.short_code)
+
+    def close(self):
+        self.f.write('}\n\nmap $uri $shortener_redirect_permanent {\n    default 0;\n')
+        for short_code in self.permanent:
+            self.f.write(f'    /{short_code} 1;\n')
+        self.f.write('}\n')
+
+
+def _load_state(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return parse_datetime(json.load(f)['exported_at'])
+
+
+def export_redirect_map(tsv_path, nginx_path=None, full=False, overlap=60, prune_deleted=True):
+    """
+    匯出重定向對照表。
+
+    成功匯出後，下次增量匯出只會查詢 ``匯出開始時間 - overlap`` 之後的刪除紀錄，
+    更早的紀錄已被這次匯出涵蓋，預設一併刪除。
+
+    Args:
+        tsv_path (str): TSV 輸出路徑，旁邊的 ``<tsv_path>.state`` 記錄上次匯出的時間。
+        nginx_path (str | None): nginx map 檔的輸出路徑。
+        full (bool): 忽略上次的匯出，重新讀取整個 Link 表。
+        overlap (int): 增量匯出時往前多查詢的秒數，涵蓋匯出期間仍未提交的寫入；
+            重複套用同一筆變更不影響結果。
+        prune_deleted (bool): 匯出後刪除已被涵蓋的刪除紀錄；多個匯出目標共用刪除紀錄時請設為 False。
+
+    Returns:
+        ExportResult: 匯出的項目數、變更數 (完整匯出時為 None) 與刪除的刪除紀錄數。
+    """
+    state_path = f'{tsv_path}.state'
+    started = timezone.now()
+    tracked = deletion_tracking_enabled()
+    since = None if full or not tracked or not os.path.exists(tsv_path) else _load_state(state_path)
+    if since is None:
+        entries, changed = iter_all_entries(), None
+    else:
+        changes = fetch_changes(since - timedelta(seconds=overlap))
+        entries, changed = merge_changes(read_tsv(tsv_path), changes), len(changes)
+
+    count = 0
+    with ExitStack() as stack:
+        tsv = stack.enter_context(AtomicFile(tsv_path))
+        nginx = NginxMapWriter(stack.enter_context(AtomicFile(nginx_path))) if nginx_path else None
+        for entry in entries:
+            tsv.write(f'{entry.short_code}\t{entry.original_url}\t{entry.status}\n')
+            if nginx is not None:
+                nginx.write(entry)
+            count += 1
+        if nginx is not None:
+            nginx.close()
+
+    with AtomicFile(state_path) as f:
+        json.dump({'exported_at': started.isoformat()}, f)
+
+    pruned = 0
+    if tracked and prune_deleted:
+        pruned, _ = DeletedLink.objects.filter(deleted_at__lte=started - timedelta(seconds=overlap)).delete()
+    return ExportResult(count, changed, pruned)
@@ -0,0 +1,61 @@
+from django.conf import settings
+from django.http import HttpResponsePermanentRedirect, HttpResponseRedirect
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+
+DEFAULT_SETTINGS = {
+    # 連結沒有設定 cache_max_age 時使用的 max-age (秒)，None 表示不送出 Cache-Control
+    'DEFAULT_MAX_AGE': None,
+    # API 可設定的 cache_max_age 上限 (秒)
+    'MAX_MAX_AGE': 365 * 24 * 3600,
+}
+
+
+def get_redirect_settings():
+    return {**DEFAULT_SETTINGS, **getattr(settings, 'SHORTENER_REDIRECTS', {})}
+
+
+def cache_max_age(resolved, now=None):
+    """
+    計算重定向回應的 max-age。
+
+    有到期時間的連結，快取期間不會超過到期時間，到期後 CDN 與瀏覽器才會回來取得 410；
+    301 本身會被瀏覽器無限期快取，因此有到期時間的永久重定向同樣以剩餘時間為上限。
+
+    Args:
+        resolved (ResolvedLink): 解析後的連結。
+        now (datetime): 目前時間，預設為 timezone.now()。
+
+    Returns:
+        int | None: max-age 秒數，None 表示不送出 Cache-Control。
+    """
+    max_age = resolved.cache_max_age
+    if max_age is None:
+        max_age = get_redirect_settings()['DEFAULT_MAX_AGE']
+    if resolved.expires_at is not None and (max_age is not None or resolved.redirect_permanent):
+        remaining = int((resolved.expires_at - (now or timezone.now())).total_seconds())
+        max_age = max(0, remaining if max_age is None else min(max_age, remaining))
+    return max_age
+
+
+def redirect_response(resolved):
+    """
+    依連結的重定向策略建立回應。
+
+    max-age 大於 0 時加上 ``Cache-Control: public, max-age=N``，讓 CDN 與瀏覽器在期間內自行重定向；
+    0 表示 ``no-store``，每次點擊都必須回到應用程式。
+
+    Args:
+        resolved (ResolvedLink): 解析後的連結。
+
+    Returns:
+        HttpResponseRedirect | HttpResponsePermanentRedirect: 302 或 301 的重定向。
+    """
+    response_class = HttpResponsePermanentRedirect if resolved.redirect_permanent else HttpResponseRedirect
+    response = response_class(resolved.original_url)
+    max_age = cache_max_age(resolved)
+    if max_age:
+        patch_cache_control(response, public=True, max_age=max_age)
+    elif max_age == 0:
+        patch_cache_control(response, no_store=True)
+    return response
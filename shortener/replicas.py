@@ -0,0 +1,362 @@
+"""
+讀寫分離：唯讀的路徑 (重定向解析、儀表板、匯出、點擊分析) 讀取副本，其餘讀寫都走主庫。
+
+使用方式：
+- ``DATABASE_ROUTERS`` 加入 ``ReadReplicaRouter``，``SHORTENER_READ_REPLICAS['REPLICAS']``
+  列出副本的資料庫別名。沒有設定副本時所有查詢都走主庫。
+- 唯讀的程式碼以 ``use_replica()`` 或 ``@read_from_replica`` 包起來；
+  一個區塊內只選一次副本，同一個請求的查詢會讀到一致的資料。
+- ``ReplicaPinningMiddleware`` 在寫入請求 (POST 等) 成功後設定 cookie，
+  之後 STICKY_SECONDS 秒內同一個用戶端的讀取都走主庫 (read-your-writes)。
+  以 JWT 呼叫 API 的用戶端不保存 cookie，改在共用快取記錄 token 中的使用者 id。
+- 連線或查詢失敗的副本會被標記為不可用 RETRY_INTERVAL 秒，期間改讀其他副本或主庫；
+  ``@read_from_replica`` 的視圖、重定向解析與匯出的串流在副本查詢失敗時改在主庫重新讀取。
+  事件迴圈中無法事先確認連線，非同步路徑只能依查詢失敗判斷。
+"""
+import asyncio
+import base64
+import contextvars
+import functools
+import json
+import logging
+import random
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SETTINGS = {
+    # 副本的資料庫別名 (DATABASES 的 key)
+    'REPLICAS': [],
+    # 寫入後的讀取固定走主庫的秒數，應大於副本的複寫延遲
+    'STICKY_SECONDS': 10,
+    'COOKIE_NAME': 'shortener_use_primary',
+    # 以 JWT 呼叫 API 的用戶端不保存 cookie：寫入後在此快取記錄使用者 id，之後該使用者的讀取同樣走主庫；
+    # 需是所有 worker 共用的快取，None 表示只以 cookie 固定
+    'CACHE_ALIAS': 'default',
+    'KEY_PREFIX': 'shortener:use-primary',
+    # 連線失敗的副本在這段時間內不再嘗試
+    'RETRY_INTERVAL': 30,
+}
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+# 目前區塊讀取用的資料庫別名；None 表示未指定 (走主庫)
+_read_alias = contextvars.ContextVar('shortener_read_alias', default=None)
+
+# 副本別名 → 恢復嘗試的時間 (time.monotonic())
+_down_until = {}
+
+
+def get_replica_settings():
+    return {**DEFAULT_SETTINGS, **getattr(settings, 'SHORTENER_READ_REPLICAS', {})}
+
+
+def replica_aliases():
+    return list(get_replica_settings()['REPLICAS'])
+
+
+def _in_event_loop():
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def mark_replica_down(alias):
+    """將副本標記為不可用，RETRY_INTERVAL 秒內不會被選到。"""
+    _down_until[alias] = time.monotonic() + get_replica_settings()['RETRY_INTERVAL']
+
+
+def reset_replica_health():
+    _down_until.clear()
+
+
+def is_replica(alias):
+    return alias is not None and alias != DEFAULT_DB_ALIAS
+
+
+def replica_failed(alias):
+    """副本的查詢失敗：記錄後標記為不可用，由呼叫端改在主庫重新讀取。"""
+    logger.warning('Read replica %r failed, retrying on the primary', alias, exc_info=True)
+    mark_replica_down(alias)
+
+
+def replica_available(alias):
+    """
+    檢查副本是否可用。
+
+    同步環境中會確認連線可以建立 (已連線時不需額外成本)，失敗則標記為不可用；
+    在事件迴圈中不能建立連線，只依據先前的檢查結果判斷，查詢失敗時由呼叫端以
+    replica_failed 標記。
+    """
+    if _down_until.get(alias, 0) > time.monotonic():
+        return False
+    if _in_event_loop():
+        return True
+    try:
+        connections[alias].ensure_connection()
+    except DatabaseError:
+        logger.warning('Read replica %r is unavailable, falling back', alias, exc_info=True)
+        mark_replica_down(alias)
+        return False
+    _down_until.pop(alias, None)
+    return True
+
+
+def choose_replica():
+    """
+    隨機選出一個可用的副本。
+
+    Returns:
+        str | None: 副本別名；沒有設定或全部不可用時回傳 None。
+    """
+    candidates = replica_aliases()
+    random.shuffle(candidates)
+    for alias in candidates:
+        if replica_available(alias):
+            return alias
+    return None
+
+
+def read_alias():
+    """目前區塊的讀取會使用的資料庫別名。"""
+    return _read_alias.get() or DEFAULT_DB_ALIAS
+
+
+@contextmanager
+def use_replica():
+    """
+    區塊內的讀取改走副本；已固定走主庫 (use_primary) 時維持主庫。
+
+    Yields:
+        str: 實際使用的資料庫別名。
+    """
+    if _read_alias.get() == DEFAULT_DB_ALIAS:
+        yield DEFAULT_DB_ALIAS
+        return
+    alias = choose_replica() or DEFAULT_DB_ALIAS
+    token = _read_alias.set(alias)
+    try:
+        yield alias
+    finally:
+        _read_alias.reset(token)
+
+
+@contextmanager
+def use_primary():
+    """區塊內的讀取都走主庫，優先於 use_replica。"""
+    token = _read_alias.set(DEFAULT_DB_ALIAS)
+    try:
+        yield DEFAULT_DB_ALIAS
+    finally:
+        _read_alias.reset(token)
+
+
+def read_from_replica(view_func):
+    """
+    讓視圖 (同步或非同步) 內的讀取走副本的 decorator。
+
+    副本的查詢失敗 (DatabaseError) 時標記為不可用，並在主庫重新執行一次視圖；
+    被包裝的視圖只能讀取，重新執行才不會有副作用。
+    """
+    if iscoroutinefunction(view_func):
+        @functools.wraps(view_func)
+        async def async_wrapper(*args, **kwargs):
+            with use_replica() as alias:
+                try:
+                    return await view_func(*args, **kwargs)
+                except DatabaseError:
+                    if not is_replica(alias):
+                        raise
+                    replica_failed(alias)
+            with use_primary():
+                return await view_func(*args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(view_func)
+    def wrapper(*args, **kwargs):
+        with use_replica() as alias:
+            try:
+                return view_func(*args, **kwargs)
+            except DatabaseError:
+                if not is_replica(alias):
+                    raise
+                replica_failed(alias)
+        with use_primary():
+            return view_func(*args, **kwargs)
+    return wrapper
+
+
+_EMPTY = object()
+
+
+def iterate_with_fallback(make_iterable, alias):
+    """
+    以 alias 逐筆讀取 make_iterable(alias)；讀到第一筆之前副本失敗時，標記為不可用並改讀主庫。
+
+    已輸出資料後的錯誤無法重試 (串流回應已經送出部分內容)，直接拋出。
+
+    Args:
+        make_iterable (callable): 以資料庫別名建立可迭代物件，例如伺服器端游標。
+        alias (str | None): 讀取使用的資料庫別名。
+    """
+    try:
+        iterator = iter(make_iterable(alias))
+        first = next(iterator, _EMPTY)
+    except DatabaseError:
+        if not is_replica(alias):
+            raise
+        replica_failed(alias)
+        iterator = iter(make_iterable(DEFAULT_DB_ALIAS))
+        first = next(iterator, _EMPTY)
+    if first is _EMPTY:
+        return
+    yield first
+    yield from iterator
+
+
+async def aiterate_with_fallback(make_iterable, alias):
+    """iterate_with_fallback 的非同步版本，make_iterable 回傳非同步迭代器。"""
+    try:
+        iterator = aiter(make_iterable(alias))
+        first = await anext(iterator, _EMPTY)
+    except DatabaseError:
+        if not is_replica(alias):
+            raise
+        replica_failed(alias)
+        iterator = aiter(make_iterable(DEFAULT_DB_ALIAS))
+        first = await anext(iterator, _EMPTY)
+    if first is _EMPTY:
+        return
+    yield first
+    async for item in iterator:
+        yield item
+
+
+class ReadReplicaRouter:
+    """依 use_replica / use_primary 設定的別名分配讀取，寫入一律走主庫。"""
+
+    def db_for_read(self, model, **hints):
+        alias = _read_alias.get()
+        if alias is None or alias == DEFAULT_DB_ALIAS:
+            return None
+        # 交易中的讀取必須看到同一個交易的寫入
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # 副本與主庫是同一份資料
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # 副本的 schema 由複寫同步，不直接執行 migration
+        if db in replica_aliases():
+            return False
+        return None
+
+
+def bearer_user_id(request):
+    """
+    取出 Authorization 標頭中 JWT 的使用者 id，沒有或無法解析時回傳 None。
+
+    只解碼 payload 而不驗證簽章：結果只用來決定讀主庫或副本，偽造的 id 最多讓讀取改走主庫；
+    寫入後記錄的 id 來自通過驗證的請求 (回應成功)。
+    """
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() != 'bearer' or token.count('.') != 2:
+        return None
+    payload = token.split('.')[1]
+    try:
+        claims = json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))
+    except ValueError:
+        return None
+    if not isinstance(claims, dict):
+        return None
+    return claims.get(getattr(settings, 'NINJA_JWT', {}).get('USER_ID_CLAIM', 'user_id'))
+
+
+class ReplicaPinningMiddleware:
+    """
+    讀取自己剛寫入的資料 (read-your-writes)。
+
+    寫入請求期間與之後 STICKY_SECONDS 秒內，同一個用戶端的讀取都固定走主庫，
+    不會因為複寫延遲而看不到剛建立的連結。瀏覽器以 cookie 記錄；
+    帶 JWT 的 API 請求以共用快取中該使用者 id 的標記記錄，沒有 Authorization 標頭的讀取不查詢快取。
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        conf = get_replica_settings()
+        if not conf['REPLICAS']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.cookie_name = conf['COOKIE_NAME']
+        self.sticky_seconds = conf['STICKY_SECONDS']
+        self.cache = caches[conf['CACHE_ALIAS']] if conf['CACHE_ALIAS'] else None
+        self.key_prefix = conf['KEY_PREFIX']
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def _user_key(self, request):
+        """帶 JWT 的請求回傳使用者標記的快取 key，其餘回傳 None。"""
+        if self.cache is None:
+            return None
+        user_id = bearer_user_id(request)
+        return f'{self.key_prefix}:{user_id}' if user_id is not None else None
+
+    def _pinned_without_cache(self, request):
+        return request.method not in SAFE_METHODS or self.cookie_name in request.COOKIES
+
+    def _pinned(self, request):
+        if self._pinned_without_cache(request):
+            return True
+        key = self._user_key(request)
+        return key is not None and self.cache.get(key) is not None
+
+    async def _apinned(self, request):
+        if self._pinned_without_cache(request):
+            return True
+        key = self._user_key(request)
+        return key is not None and await self.cache.aget(key) is not None
+
+    def _succeeded_write(self, request, response):
+        if request.method in SAFE_METHODS or response.status_code >= 400:
+            return False
+        response.set_cookie(self.cookie_name, '1', max_age=self.sticky_seconds,
+                            httponly=True, samesite='Lax')
+        return True
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not self._pinned(request):
+            return self.get_response(request)
+        with use_primary():
+            response = self.get_response(request)
+        if self._succeeded_write(request, response) and (key := self._user_key(request)):
+            self.cache.set(key, 1, self.sticky_seconds)
+        return response
+
+    async def __acall__(self, request):
+        if not await self._apinned(request):
+            return await self.get_response(request)
+        with use_primary():
+            response = await self.get_response(request)
+        if self._succeeded_write(request, response) and (key := self._user_key(request)):
+            await self.cache.aset(key, 1, self.sticky_seconds)
+        return response
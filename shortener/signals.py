@@ -0,0 +1,53 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .bloom import add_short_codes
+from .cache import invalidate_short_code
+from .metrics import record_links_created
+from .models import Link
+from .redirectmap import deletion_tracking_enabled, record_deleted_links
+from .stats import record_links_added
+from .usercache import invalidate_cached_user
+
+
+@receiver(post_save, sender=Link)
+@receiver(post_delete, sender=Link)
+def invalidate_link_cache(sender, instance, **kwargs):
+    """Link 被儲存或刪除時，讓其 short_code 的解析快取失效。"""
+    invalidate_short_code(instance.short_code)
+
+
+@receiver(post_save, sender=Link)
+def add_to_short_code_filter(sender, instance, created, **kwargs):
+    """新建立的 Link 加入本行程的 Bloom filter，讓重定向不會誤判為不存在。"""
+    if created:
+        add_short_codes([instance])
+
+
+@receiver(post_save, sender=Link)
+def count_created_link(sender, instance, created, **kwargs):
+    """新建立的 Link 計入 Prometheus 的 shortener_links_created_total。"""
+    if created:
+        record_links_created()
+
+
+@receiver(post_save, sender=Link)
+def count_owner_link(sender, instance, created, **kwargs):
+    """新建立的 Link 計入擁有者的彙總統計。"""
+    if created:
+        record_links_added([instance])
+
+
+@receiver(pre_delete, sender=get_user_model())
+def record_deleted_user_links(sender, instance, **kwargs):
+    """使用者的連結會隨 CASCADE 刪除，先以一個 INSERT 記錄這些短代碼，讓增量匯出的重定向對照表移除它們。"""
+    if deletion_tracking_enabled():
+        record_deleted_links(list(Link.objects.filter(owner_id=instance.pk).values_list('short_code', flat=True)))
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def invalidate_user_cache(sender, instance, **kwargs):
+    """User 被儲存或刪除時 (例如停用帳號)，讓 JWT 驗證的使用者快取失效。"""
+    invalidate_cached_user(instance.pk)
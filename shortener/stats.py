@@ -0,0 +1,223 @@
+"""
+每個擁有者的彙總數字 (連結數、總點擊數、點擊最多的連結)。
+
+數字在寫入時增量維護，儀表板與 /stats API 只需一次主鍵查詢：
+- 建立連結：post_save 訊號 (單筆)、bulk_create_links 與 import_links (批次)。
+- 寫回點擊：flush_click_counts (緩衝模式)，每批點擊只多一個 UPDATE；
+  即時模式每次點擊多一個 UPDATE (record_click_added)，以子查詢取得擁有者，不需先讀取連結。
+- 刪除連結：LinkQuerySet.delete (Link.delete()、QuerySet.delete() 與 delete_links)，每批只多一個 UPDATE。
+
+直接改寫 click_count、變更擁有者等寫入會讓數字偏移，尚無統計列的擁有者 (升級前建立的連結) 的即時點擊也不會計入。
+這些都由 reconcile_owner_stats 指令依實際資料重新計算 (可用 --loop 定期執行)。
+點擊最多的連結只會往點擊數更多的連結更新，被刪除時清除，由之後的點擊或重新計算補上。
+"""
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.db.models import BigIntegerField, Case, Count, F, Q, Subquery, Sum, Value, When, Window
+from django.db.models.functions import Coalesce, RowNumber
+
+from .models import Link, OwnerStats
+
+
+def _link_delta(deltas, owner_id, links, clicks, pk, click_count):
+    current_links, current_clicks, top = deltas.get(owner_id, (0, 0, None))
+    if top is None or click_count > top[1]:
+        top = (pk, click_count)
+    deltas[owner_id] = (current_links + links, current_clicks + clicks, top)
+
+
+def _update_owner_stats(deltas):
+    link_whens, click_whens, top_whens, top_clicks_whens = [], [], [], []
+    for owner_id, (links, clicks, (pk, click_count)) in deltas.items():
+        link_whens.append(When(owner_id=owner_id, then=Value(links)))
+        click_whens.append(When(owner_id=owner_id, then=Value(clicks)))
+        beats = Q(owner_id=owner_id, top_link_clicks__lt=click_count)
+        top_whens.append(When(beats, then=Value(pk)))
+        top_clicks_whens.append(When(beats, then=Value(click_count)))
+    return OwnerStats.objects.filter(owner_id__in=deltas).update(
+        link_count=F('link_count') + Case(*link_whens, default=Value(0)),
+        click_count=F('click_count') + Case(*click_whens, default=Value(0)),
+        top_link=Case(*top_whens, default=F('top_link'), output_field=BigIntegerField()),
+        top_link_clicks=Case(*top_clicks_whens, default=F('top_link_clicks')),
+    )
+
+
+def apply_owner_deltas(deltas):
+    """
+    以一個 UPDATE 將增量套用到多個擁有者的統計。
+
+    尚無統計列的擁有者 (第一次建立連結) 才會多一次查詢與 INSERT，之後再套用其增量。
+
+    Args:
+        deltas (dict): owner_id → (連結數增量, 點擊數增量, 候選的 (link pk, 點擊數))。
+            候選連結的點擊數多於目前的最多點擊數時，取代為點擊最多的連結。
+    """
+    if not deltas:
+        return
+    if _update_owner_stats(deltas) == len(deltas):
+        return
+    existing = set(OwnerStats.objects.filter(owner_id__in=deltas).values_list('owner_id', flat=True))
+    missing = {owner_id: delta for owner_id, delta in deltas.items() if owner_id not in existing}
+    OwnerStats.objects.bulk_create([OwnerStats(owner_id=owner_id) for owner_id in missing], ignore_conflicts=True)
+    _update_owner_stats(missing)
+
+
+def record_links_added(links):
+    """
+    將新建立的連結計入擁有者的統計。
+
+    Args:
+        links (iterable[Link]): 已寫入資料庫 (有 pk) 的 Link，匿名連結會被略過。
+    """
+    deltas = {}
+    for link in links:
+        if link.owner_id is not None:
+            _link_delta(deltas, link.owner_id, 1, link.click_count, link.pk, link.click_count)
+    apply_owner_deltas(deltas)
+
+
+def record_clicks_added(counts):
+    """
+    將寫回的點擊數計入擁有者的統計，需在更新 Link 的同一個交易中呼叫。
+
+    Args:
+        counts (dict): link pk → 新增的點擊數。
+    """
+    deltas = {}
+    rows = Link.objects.filter(pk__in=list(counts), owner__isnull=False).values_list('pk', 'owner_id', 'click_count')
+    for pk, owner_id, click_count in rows:
+        _link_delta(deltas, owner_id, 0, counts[pk], pk, click_count)
+    apply_owner_deltas(deltas)
+
+
+def _click_added_update(pk):
+    link = Link.objects.filter(pk=pk)
+    click_count = Subquery(link.values('click_count')[:1])
+    beats = Q(top_link_clicks__lt=click_count)
+    queryset = OwnerStats.objects.filter(owner_id=Subquery(link.values('owner_id')[:1]))
+    return queryset, {
+        'click_count': F('click_count') + 1,
+        'top_link': Case(When(beats, then=Value(pk)), default=F('top_link'), output_field=BigIntegerField()),
+        'top_link_clicks': Case(When(beats, then=click_count), default=F('top_link_clicks')),
+    }
+
+
+def record_click_added(pk):
+    """
+    將即時模式的一次點擊計入擁有者的統計，需在更新 Link 的 click_count 之後、同一個交易中呼叫。
+
+    擁有者與連結目前的點擊數都以子查詢取得，整個更新只有一個 UPDATE；匿名連結不會更新任何資料列。
+
+    Args:
+        pk (int): 被點擊的 Link 主鍵。
+    """
+    queryset, values = _click_added_update(pk)
+    queryset.update(**values)
+
+
+def record_links_removed(links):
+    """
+    將一批被刪除的連結從擁有者的統計扣除，所有擁有者只需一個 UPDATE，需在刪除的同一個交易中呼叫。
+
+    被刪除的連結若是點擊最多的連結，清除後由之後的點擊或重新計算選出。
+
+    Args:
+        links (iterable[dict]): 被刪除的連結，需包含 id、owner_id 與 click_count。
+    """
+    deltas, removed = {}, []
+    for link in links:
+        if link['owner_id'] is None:
+            continue
+        count, clicks = deltas.get(link['owner_id'], (0, 0))
+        deltas[link['owner_id']] = (count + 1, clicks + link['click_count'])
+        removed.append(link['id'])
+    if not deltas:
+        return
+    link_whens = [When(owner_id=owner_id, then=Value(count)) for owner_id, (count, _) in deltas.items()]
+    click_whens = [When(owner_id=owner_id, then=Value(clicks)) for owner_id, (_, clicks) in deltas.items()]
+    is_top = Q(top_link__in=removed)
+    OwnerStats.objects.filter(owner_id__in=deltas).update(
+        link_count=F('link_count') - Case(*link_whens, default=Value(0)),
+        click_count=F('click_count') - Case(*click_whens, default=Value(0)),
+        top_link=Case(When(is_top, then=None), default=F('top_link'), output_field=BigIntegerField()),
+        top_link_clicks=Case(When(is_top, then=Value(0)), default=F('top_link_clicks')),
+    )
+
+
+def get_owner_stats(owner):
+    """
+    取得擁有者的統計 (含點擊最多的連結)；尚未建立任何連結時回傳未儲存的空白統計。
+
+    Args:
+        owner (User): 擁有者。
+
+    Returns:
+        OwnerStats: 擁有者的統計。
+    """
+    stats = OwnerStats.objects.select_related('top_link').filter(owner_id=owner.pk).first()
+    return stats or OwnerStats(owner_id=owner.pk)
+
+
+aget_owner_stats = sync_to_async(get_owner_stats)
+
+
+def compute_owner_stats(owner_ids):
+    """
+    依實際的 Link 資料計算一批擁有者的統計。
+
+    Returns:
+        dict: owner_id → (連結數, 點擊數, 點擊最多的 link pk, 其點擊數)。
+    """
+    totals = (
+        Link.objects.filter(owner_id__in=owner_ids)
+        .values('owner_id')
+        .annotate(links=Count('id'), clicks=Coalesce(Sum('click_count'), 0))
+        .order_by()
+    )
+    tops = {
+        owner_id: (pk, click_count)
+        for owner_id, pk, click_count in (
+            Link.objects.filter(owner_id__in=owner_ids, click_count__gt=0)
+            .annotate(rank=Window(RowNumber(), partition_by=F('owner_id'),
+                                  order_by=[F('click_count').desc(), F('id').desc()]))
+            .filter(rank=1)
+            .values_list('owner_id', 'pk', 'click_count')
+        )
+    }
+    expected = {owner_id: (0, 0, None, 0) for owner_id in owner_ids}
+    for row in totals:
+        expected[row['owner_id']] = (row['links'], row['clicks'], *tops.get(row['owner_id'], (None, 0)))
+    return expected
+
+
+def reconcile_owner_stats(owner_ids):
+    """
+    以實際的 Link 資料修正一批擁有者的統計。
+
+    先鎖定統計列再讀取連結：同時寫回點擊的交易會在鎖上等待，
+    其增量在本交易提交後才套用，因此不會被重複計算或覆寫掉。
+
+    Args:
+        owner_ids (list[int]): 擁有者 id。
+
+    Returns:
+        int: 被修正 (或新建立) 的統計列數。
+    """
+    fields = ('link_count', 'click_count', 'top_link_id', 'top_link_clicks')
+    with transaction.atomic():
+        current = {stats.owner_id: stats
+                   for stats in OwnerStats.objects.select_for_update().filter(owner_id__in=owner_ids)}
+        to_create, to_update = [], []
+        for owner_id, values in compute_owner_stats(owner_ids).items():
+            stats = current.get(owner_id)
+            if stats is None:
+                if values[0]:
+                    to_create.append(OwnerStats(owner_id=owner_id, **dict(zip(fields, values))))
+                continue
+            if tuple(getattr(stats, field) for field in fields) != values:
+                for field, value in zip(fields, values):
+                    setattr(stats, field, value)
+                to_update.append(stats)
+        OwnerStats.objects.bulk_create(to_create, ignore_conflicts=True)
+        OwnerStats.objects.bulk_update(to_update, fields)
+    return len(to_create) + len(to_update)
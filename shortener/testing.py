@@ -0,0 +1,30 @@
+from contextlib import contextmanager
+
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+
+
+@contextmanager
+def assert_max_queries(limit, using='default'):
+    """
+    斷言區塊內執行的 SQL 查詢數不超過 limit (查詢預算)。
+
+    與 ``assertNumQueries`` 不同，只限制上限，減少查詢的優化不會讓測試失敗。
+    超過預算時會在錯誤訊息中列出所有查詢，方便找出多出來的查詢。
+
+    Args:
+        limit (int): 允許的最大查詢數。
+        using (str): 資料庫別名。
+
+    Yields:
+        CaptureQueriesContext: 可在區塊結束後檢查 captured_queries。
+
+    Raises:
+        AssertionError: 查詢數超過 limit。
+    """
+    with CaptureQueriesContext(connections[using]) as ctx:
+        yield ctx
+    executed = len(ctx.captured_queries)
+    if executed > limit:
+        queries = '\n'.join(f'{i}. {query["sql"]}' for i, query in enumerate(ctx.captured_queries, 1))
+        raise AssertionError(f'{executed} queries executed, budget is {limit}:\n{queries}')
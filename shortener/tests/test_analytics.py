@@ -0,0 +1,175 @@
+import datetime
+import io
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from ninja import NinjaAPI
+from ninja.testing import TestClient
+from ninja_jwt.tokens import RefreshToken
+
+from ninja_shortener.api import api
+from shortener.analytics import click_series, rollup_click_events, truncate
+from shortener.clicks import get_click_buffer
+from shortener.models import ClickEvent, DailyClickRollup, HourlyClickRollup, Link
+
+UTC = datetime.timezone.utc
+
+
+@pytest.fixture(autouse=True)
+def reset_ninja_registry():
+    """清除 Ninja 的內部註冊表以防止 ConfigError。"""
+    yield
+    if hasattr(NinjaAPI, "_registry"):
+        NinjaAPI._registry = []
+
+
+@pytest.fixture
+def user():
+    return User.objects.create_user(username="analyst", password="password123")
+
+
+@pytest.fixture
+def link(user):
+    return Link.objects.create(original_url="https://example.com", short_code="stats1", owner=user)
+
+
+def add_events(link, *timestamps):
+    ClickEvent.objects.bulk_create([ClickEvent(link=link, clicked_at=ts) for ts in timestamps])
+
+
+def test_truncate_to_bucket():
+    """測試時間會被截斷到每小時 / 每天的時間桶起點。"""
+    value = datetime.datetime(2025, 6, 7, 13, 45, 12, tzinfo=UTC)
+    assert truncate(value, "hour") == datetime.datetime(2025, 6, 7, 13, tzinfo=UTC)
+    assert truncate(value, "day") == datetime.datetime(2025, 6, 7, tzinfo=UTC)
+
+
+@pytest.mark.django_db
+@override_settings(SHORTENER_CLICK_TRACKING={
+    "MODE": "immediate", "BATCH_SIZE": 3, "FLUSH_INTERVAL": 60,
+    "BACKGROUND_FLUSH": False, "RECORD_EVENTS": True,
+})
+def test_immediate_mode_batches_click_events(link):
+    """
+    測試即時模式的點擊數立即寫入，原始點擊事件則批次寫入。
+
+    驗證：
+    - 未達 BATCH_SIZE 前只更新 click_count，沒有事件
+    - 達到 BATCH_SIZE 時以一個 INSERT 寫入累積的事件
+    """
+    client = Client()
+    for _ in range(2):
+        client.get("/stats1")
+    link.refresh_from_db()
+    assert link.click_count == 2
+    assert not ClickEvent.objects.exists()
+
+    with CaptureQueriesContext(connection) as ctx:
+        client.get("/stats1")
+    assert sum("shortener_clickevent" in query["sql"] for query in ctx.captured_queries) == 1
+    assert list(ClickEvent.objects.values_list("link_id", flat=True)) == [link.pk] * 3
+
+
+@pytest.mark.django_db
+@override_settings(SHORTENER_CLICK_TRACKING={
+    "MODE": "buffered", "BATCH_SIZE": 100, "FLUSH_INTERVAL": 60,
+    "BACKGROUND_FLUSH": False, "RECORD_EVENTS": True,
+})
+def test_buffered_events_are_written_in_batches(link):
+    """
+    測試 buffered 模式下點擊事件與計數一起批次寫入。
+
+    驗證：
+    - 寫入前沒有任何事件
+    - flush 後事件數等於點擊數
+    """
+    client = Client()
+    for _ in range(3):
+        client.get("/stats1")
+    assert not ClickEvent.objects.exists()
+
+    get_click_buffer().flush()
+    assert ClickEvent.objects.filter(link=link).count() == 3
+
+
+@pytest.mark.django_db
+def test_rollup_compacts_events_into_buckets(link):
+    """
+    測試 rollup 將事件彙總到每小時與每天的時間桶並刪除事件。
+
+    驗證：
+    - 每小時與每天的計數正確
+    - 再次彙總時累加到既有的時間桶
+    - 已刪除連結的事件被捨棄
+    """
+    add_events(
+        link,
+        datetime.datetime(2025, 6, 7, 10, 5, tzinfo=UTC),
+        datetime.datetime(2025, 6, 7, 10, 55, tzinfo=UTC),
+        datetime.datetime(2025, 6, 7, 11, 0, tzinfo=UTC),
+    )
+    ClickEvent.objects.create(link_id=999999, clicked_at=datetime.datetime(2025, 6, 7, tzinfo=UTC))
+
+    assert rollup_click_events(batch_size=2) == 2
+    call_command("rollup_clicks", batch_size=2, stdout=io.StringIO())
+    assert not ClickEvent.objects.exists()
+
+    hourly = dict(HourlyClickRollup.objects.values_list("bucket", "count"))
+    assert hourly == {
+        datetime.datetime(2025, 6, 7, 10, tzinfo=UTC): 2,
+        datetime.datetime(2025, 6, 7, 11, tzinfo=UTC): 1,
+    }
+    assert DailyClickRollup.objects.get().count == 3
+
+    add_events(link, datetime.datetime(2025, 6, 7, 10, 30, tzinfo=UTC))
+    rollup_click_events()
+    assert HourlyClickRollup.objects.get(bucket=datetime.datetime(2025, 6, 7, 10, tzinfo=UTC)).count == 3
+    assert DailyClickRollup.objects.get().count == 4
+    assert not HourlyClickRollup.objects.filter(link_id=999999).exists()
+
+
+@pytest.mark.django_db
+def test_click_series_reads_rollups_only(link):
+    """測試時間序列只讀取時間桶表，尚未彙總的原始事件不會出現。"""
+    start = datetime.datetime(2025, 6, 1, tzinfo=UTC)
+    end = datetime.datetime(2025, 6, 8, tzinfo=UTC)
+    HourlyClickRollup.objects.create(link=link, bucket=datetime.datetime(2025, 6, 7, 10, tzinfo=UTC), count=5)
+    add_events(link, datetime.datetime(2025, 6, 7, 12, tzinfo=UTC))
+
+    assert click_series(link.pk, "hour", start, end) == [
+        (datetime.datetime(2025, 6, 7, 10, tzinfo=UTC), 5),
+    ]
+
+
+@pytest.mark.django_db
+def test_click_series_api(user, link):
+    """
+    測試點擊時間序列 API。
+
+    驗證：
+    - 擁有者可以取得每天的時間序列與總數
+    - 其他用戶查詢會回傳 404
+    - 不支援的粒度回傳 422
+    """
+    DailyClickRollup.objects.create(link=link, bucket=datetime.datetime(2025, 6, 6, tzinfo=UTC), count=2)
+    DailyClickRollup.objects.create(link=link, bucket=datetime.datetime(2025, 6, 7, tzinfo=UTC), count=3)
+    token = str(RefreshToken.for_user(user).access_token)
+    client = TestClient(api, headers={"Authorization": f"Bearer {token}"})
+
+    response = client.get("/links/stats1/clicks?granularity=day&start=2025-06-01T00:00:00Z&end=2025-06-30T00:00:00Z")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total"] == 5
+    assert [bucket["count"] for bucket in data["buckets"]] == [2, 3]
+
+    response = client.get("/links/stats1/clicks?granularity=minute")
+    assert response.status_code == 422
+
+    other = User.objects.create_user(username="intruder", password="password123")
+    other_token = str(RefreshToken.for_user(other).access_token)
+    response = client.get("/links/stats1/clicks", headers={"Authorization": f"Bearer {other_token}"})
+    assert response.status_code == 404
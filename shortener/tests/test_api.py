@@ -1,5 +1,9 @@
+import json
+
 import pytest
 from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
 from ninja import NinjaAPI
 from ninja.testing import TestClient
 from ninja_jwt.tokens import RefreshToken
@@ -96,3 +100,78 @@ def test_create_link_with_invalid_url():
     # Django Ninja 對於 Schema 驗證失敗通常返回 422
     assert response.status_code == 422
     assert not Link.objects.filter(original_url="not-a-valid-url").exists()
+
+
+@pytest.fixture
+def auth_client():
+    """提供帶有 JWT token 的 API 測試客戶端。"""
+    user = User.objects.create_user(username="bulkuser", password="password123")
+    token = str(RefreshToken.for_user(user).access_token)
+    return user, TestClient(api, headers={"Authorization": f"Bearer {token}"})
+
+
+@pytest.mark.django_db
+@override_settings(SHORTENER_BULK={"CHUNK_SIZE": 2})
+def test_bulk_shorten_creates_links_in_chunks(auth_client):
+    """
+    測試批次建立短網址會分批 bulk_create 並回傳每一筆的結果。
+
+    驗證：
+    - 有效的網址全部建立且擁有者正確
+    - 無效的網址只讓該筆失敗並附上錯誤訊息
+    - 結果依照輸入順序回傳
+    """
+    user, client = auth_client
+    urls = ["https://a.example.com/", "not-a-valid-url", "https://b.example.com/", "https://c.example.com/"]
+
+    with CaptureQueriesContext(connection) as ctx:
+        response = client.post("/shorten/bulk", json={"original_urls": urls})
+    assert response.status_code == 200
+
+    data = response.json()
+    assert data["created"] == 3
+    assert data["failed"] == 1
+    assert [item["index"] for item in data["results"]] == [0, 1, 2, 3]
+    assert data["results"][1]["error"]
+    assert data["results"][1]["short_code"] is None
+
+    assert Link.objects.filter(owner=user).count() == 3
+    codes = {item["short_code"] for item in data["results"] if item["short_code"]}
+    assert set(Link.objects.values_list("short_code", flat=True)) == codes
+    inserts = [q for q in ctx.captured_queries if q["sql"].startswith("INSERT") and "shortener_link" in q["sql"]]
+    assert len(inserts) == 2
+
+
+@pytest.mark.django_db
+def test_bulk_shorten_streams_ndjson(auth_client):
+    """測試 stream=true 時以 NDJSON 逐筆回傳結果。"""
+    _, client = auth_client
+    urls = ["https://a.example.com/", "https://b.example.com/"]
+    response = client.post("/shorten/bulk?stream=true", json={"original_urls": urls})
+    assert response.status_code == 200
+
+    assert response.streaming
+    body = response.content.decode()
+    items = [json.loads(line) for line in body.splitlines()]
+    assert [item["original_url"] for item in items] == urls
+    assert all(item["short_code"] for item in items)
+    assert Link.objects.count() == 2
+
+
+@pytest.mark.django_db
+@override_settings(SHORTENER_BULK={"MAX_URLS": 2})
+def test_bulk_shorten_rejects_oversized_request(auth_client):
+    """測試超過 MAX_URLS 的請求會被拒絕且不建立任何記錄。"""
+    _, client = auth_client
+    urls = [f"https://{n}.example.com/" for n in range(3)]
+    response = client.post("/shorten/bulk", json={"original_urls": urls})
+    assert response.status_code == 400
+    assert not Link.objects.exists()
+
+
+@pytest.mark.django_db
+def test_bulk_shorten_requires_authentication():
+    """測試未認證用戶無法使用批次建立 API。"""
+    client = TestClient(api)
+    response = client.post("/shorten/bulk", json={"original_urls": ["https://example.com"]})
+    assert response.status_code == 401
@@ -0,0 +1,108 @@
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.test import AsyncClient
+from django.test.utils import override_settings
+from ninja import NinjaAPI
+from ninja.testing import TestAsyncClient
+from ninja_jwt.tokens import RefreshToken
+
+from ninja_shortener.api import async_api
+from shortener.models import Link
+
+ASYNC_URLCONF = "ninja_shortener.urls_async"
+
+
+@pytest.fixture(autouse=True)
+def reset_ninja_registry():
+    """清除 Ninja 的內部註冊表以防止 ConfigError。"""
+    yield
+    if hasattr(NinjaAPI, "_registry"):
+        NinjaAPI._registry = []
+
+
+@pytest.mark.django_db
+@override_settings(ROOT_URLCONF=ASYNC_URLCONF)
+def test_async_redirect_view():
+    """
+    測試非同步重定向視圖。
+
+    驗證：
+    - 有效的短網址回傳 302 並導向原始網址
+    - 點擊次數正確增加
+    """
+    link = Link.objects.create(original_url="https://example.com/async", short_code="async1")
+
+    response = async_to_sync(AsyncClient().get)("/async1")
+    assert response.status_code == 302
+    assert response.url == link.original_url
+
+    link.refresh_from_db()
+    assert link.click_count == 1
+    assert link.last_clicked_at is not None
+
+
+@pytest.mark.django_db
+@override_settings(ROOT_URLCONF=ASYNC_URLCONF)
+def test_async_redirect_view_invalid():
+    """測試非同步重定向視圖對無效短網址回傳 404。"""
+    response = async_to_sync(AsyncClient().get)("/missing1")
+    assert response.status_code == 404
+
+
+@pytest.mark.django_db
+@override_settings(ROOT_URLCONF=ASYNC_URLCONF)
+def test_async_shorten_url_view():
+    """
+    測試非同步建立短網址的表單視圖。
+
+    驗證：
+    - 成功建立後重定向到首頁
+    - 短網址被存入 session
+    """
+    client = AsyncClient()
+    original_url = "https://djangoproject.com/async"
+    response = async_to_sync(client.post)("/shorten/", {"original_url": original_url})
+
+    assert response.status_code == 302
+    assert response.url == "/"
+    link = Link.objects.get(original_url=original_url)
+    assert link.owner is None
+    assert client.session["latest_short_url"].endswith(f"/{link.short_code}")
+
+
+@pytest.mark.django_db
+def test_async_api_shorten():
+    """
+    測試非同步 API 端點可建立短網址。
+
+    驗證：
+    - 已認證用戶回傳 200
+    - Link 記錄的擁有者正確設置
+    """
+    user = User.objects.create_user(username="asyncuser", password="password123")
+    token = str(RefreshToken.for_user(user).access_token)
+    client = TestAsyncClient(async_api, headers={"Authorization": f"Bearer {token}"})
+
+    original_url = "https://docs.djangoproject.com/en/5.2/topics/async/"
+
+    async def post():
+        return await client.post("/shorten", json={"original_url": original_url})
+
+    response = async_to_sync(post)()
+    assert response.status_code == 200
+    assert response.json()["owner"] == user.id
+    assert Link.objects.get(original_url=original_url).owner == user
+
+
+@pytest.mark.django_db
+def test_async_api_shorten_unauthenticated():
+    """測試非同步 API 端點對未認證請求回傳 401。"""
+    client = TestAsyncClient(async_api)
+
+    async def post():
+        return await client.post("/shorten", json={"original_url": "https://example.com"})
+
+    response = async_to_sync(post)()
+    assert response.status_code == 401
+    assert not Link.objects.exists()
@@ -0,0 +1,147 @@
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
+from ninja_jwt.authentication import JWTAuth
+from ninja_jwt.exceptions import AuthenticationFailed, InvalidToken
+from ninja_jwt.settings import api_settings
+from ninja_jwt.tokens import RefreshToken, SlidingToken
+
+from shortener.auth import AsyncCachedJWTAuth, CachedJWTAuth
+from shortener.usercache import user_cache_key
+
+
+@pytest.fixture
+def user():
+    return User.objects.create_user(username="jwtuser", password="password123")
+
+
+def access_token(user):
+    return str(RefreshToken.for_user(user).access_token)
+
+
+def authenticate(auth, token):
+    return auth.authenticate(RequestFactory().post("/api/shorten"), token)
+
+
+def user_queries(ctx):
+    return [q for q in ctx.captured_queries if "auth_user" in q["sql"]]
+
+
+@pytest.mark.django_db
+def test_cached_auth_saves_user_query(user):
+    """
+    測試快取後每個請求少一次 User 查詢。
+
+    驗證：
+    - 原本的 JWTAuth 每次都查詢 User
+    - CachedJWTAuth 只有第一次查詢，之後沒有任何查詢
+    """
+    token = access_token(user)
+
+    with CaptureQueriesContext(connection) as ctx:
+        for _ in range(3):
+            assert authenticate(JWTAuth(), token) == user
+    assert len(user_queries(ctx)) == 3
+
+    auth = CachedJWTAuth()
+    with CaptureQueriesContext(connection) as ctx:
+        assert authenticate(auth, token) == user
+    assert len(user_queries(ctx)) == 1
+    with CaptureQueriesContext(connection) as ctx:
+        for _ in range(3):
+            assert authenticate(auth, token) == user
+    assert len(ctx.captured_queries) == 0
+
+
+@pytest.mark.django_db
+def test_cache_stores_only_public_fields(user):
+    """
+    測試快取只存放 id、username 與 is_active，不包含密碼雜湊。
+
+    驗證：
+    - 快取的值只有這三個欄位
+    - 回傳的 User 其餘欄位在存取時才從資料庫載入
+    """
+    token = access_token(user)
+    authenticate(CachedJWTAuth(), token)
+    assert caches["default"].get(user_cache_key(user.pk)) == (user.pk, "jwtuser", True)
+
+    cached = authenticate(CachedJWTAuth(), token)
+    assert cached.get_deferred_fields() >= {"password", "email"}
+    with CaptureQueriesContext(connection) as ctx:
+        assert cached.check_password("password123")
+    assert len(user_queries(ctx)) == 1
+
+
+@pytest.mark.django_db
+def test_deactivating_user_invalidates_cache(user):
+    """測試停用帳號後，快取中的使用者立即失效。"""
+    token = access_token(user)
+    auth = CachedJWTAuth()
+    authenticate(auth, token)
+
+    user.is_active = False
+    user.save()
+    with pytest.raises(AuthenticationFailed):
+        authenticate(auth, token)
+
+
+@pytest.mark.django_db
+def test_deleted_user_is_rejected(user):
+    """測試刪除帳號後，token 無法再通過驗證。"""
+    token = access_token(user)
+    auth = CachedJWTAuth()
+    authenticate(auth, token)
+
+    user.delete()
+    with pytest.raises(AuthenticationFailed):
+        authenticate(auth, token)
+
+
+@pytest.mark.django_db
+def test_blacklisted_token_is_rejected_with_cached_user(user, monkeypatch):
+    """
+    測試使用者已在快取中時，被加入 blacklist 的 token 仍然會被拒絕。
+
+    驗證：
+    - 使用可加入 blacklist 的 SlidingToken 驗證成功
+    - 加入 blacklist 後同一個 token 被拒絕
+    """
+    monkeypatch.setattr(api_settings, "AUTH_TOKEN_CLASSES", [SlidingToken])
+    sliding = SlidingToken.for_user(user)
+    auth = CachedJWTAuth()
+    assert authenticate(auth, str(sliding)) == user
+
+    sliding.blacklist()
+    with pytest.raises(InvalidToken):
+        authenticate(auth, str(sliding))
+
+
+@pytest.mark.django_db
+@override_settings(SHORTENER_JWT_USER_CACHE={"ENABLED": False})
+def test_cache_can_be_disabled(user):
+    """測試停用快取後每次都查詢 User。"""
+    token = access_token(user)
+    with CaptureQueriesContext(connection) as ctx:
+        authenticate(CachedJWTAuth(), token)
+        authenticate(CachedJWTAuth(), token)
+    assert len(user_queries(ctx)) == 2
+
+
+@pytest.mark.django_db
+def test_async_cached_auth(user):
+    """測試非同步版本在快取命中時沒有任何查詢。"""
+    token = access_token(user)
+    auth = AsyncCachedJWTAuth()
+
+    async def run():
+        return await auth.authenticate(RequestFactory().post("/api/shorten"), token)
+
+    assert async_to_sync(run)() == user
+    with CaptureQueriesContext(connection) as ctx:
+        assert async_to_sync(run)() == user
+    assert len(ctx.captured_queries) == 0
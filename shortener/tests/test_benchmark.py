@@ -0,0 +1,81 @@
+import datetime
+import io
+import json
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from shortener.benchmark import BenchmarkResult, compare_results
+from shortener.models import Link
+
+
+def result(**overrides):
+    values = dict(scenario="redirect", requests=100, errors=0, p50_ms=1.0, p95_ms=2.0,
+                  p99_ms=3.0, mean_ms=1.2, throughput=800.0, queries_per_request=1.0)
+    values.update(overrides)
+    return BenchmarkResult(**values)
+
+
+@pytest.mark.django_db
+def test_generate_synthetic_links():
+    """
+    測試產生測試資料的指令以 bulk insert 建立使用者與連結。
+
+    驗證：
+    - 建立指定數量的使用者與連結，短代碼不重複
+    - created_at 分布在 --days 的範圍內，不會被 auto_now_add 覆寫為同一時間
+    - 重複執行時沿用既有的使用者
+    """
+    call_command("generate_synthetic_links", links=120, users=4, batch_size=50, days=30, stdout=io.StringIO())
+    assert User.objects.filter(username__startswith="bench-user-").count() == 4
+    assert Link.objects.count() == 120
+    assert Link.objects.values("short_code").distinct().count() == 120
+    assert Link.objects.filter(owner__isnull=False).exists()
+    spread = Link.objects.aggregate(oldest=Min("created_at"), newest=Max("created_at"))
+    assert spread["newest"] - spread["oldest"] > datetime.timedelta(days=20)
+    assert spread["oldest"] >= timezone.now() - datetime.timedelta(days=30, minutes=1)
+    assert Link.objects.values("created_at").distinct().count() > 100
+
+    call_command("generate_synthetic_links", links=10, users=4, stdout=io.StringIO())
+    assert User.objects.filter(username__startswith="bench-user-").count() == 4
+    assert Link.objects.count() == 130
+
+
+@pytest.mark.django_db
+def test_benchmark_command_saves_and_compares_baseline(tmp_path):
+    """
+    測試壓測指令執行所有情境、儲存基準檔並與基準比較。
+
+    驗證：
+    - 所有情境都執行且沒有錯誤
+    - 壓測建立的連結在結束後被刪除
+    - 基準中的查詢數較少時回報退步，--fail-on-regression 時以錯誤結束
+    """
+    call_command("generate_synthetic_links", links=30, users=2, stdout=io.StringIO())
+    baseline = tmp_path / "baseline.json"
+
+    out = io.StringIO()
+    call_command("benchmark", requests=5, warmup=1, save_baseline=str(baseline), stdout=out, stderr=io.StringIO())
+    data = json.loads(baseline.read_text())
+    assert set(data["results"]) == {"redirect", "redirect_miss", "shorten_form", "shorten_api", "dashboard"}
+    assert all(item["errors"] == 0 for item in data["results"].values())
+    assert Link.objects.count() == 30
+
+    data["results"]["redirect"]["queries_per_request"] = 0
+    baseline.write_text(json.dumps(data))
+    with pytest.raises(CommandError):
+        call_command("benchmark", scenarios=["redirect"], requests=5, warmup=1, compare=str(baseline),
+                     fail_on_regression=True, stdout=io.StringIO(), stderr=io.StringIO())
+
+
+def test_compare_results_thresholds():
+    """測試延遲超過門檻或查詢數增加時視為退步，門檻內的變化則不算。"""
+    baseline = {"redirect": result()}
+    rows = compare_results({"redirect": result(p95_ms=2.1, throughput=760.0)}, baseline, threshold=0.1)
+    assert not [row for row in rows if row["regression"]]
+
+    rows = compare_results({"redirect": result(p99_ms=4.0, queries_per_request=1.5)}, baseline, threshold=0.1)
+    assert {row["metric"] for row in rows if row["regression"]} == {"p99_ms", "queries_per_request"}
@@ -0,0 +1,221 @@
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.cache import caches
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from shortener.bloom import BloomFilter, ShortCodeFilter, get_short_code_filter, prepare_short_code_filter
+from shortener.cache import aresolve_short_code
+from shortener.checks import check_bloom_filter_cache
+from shortener.models import Link
+from shortener.utils import bulk_create_links
+
+SHARED_BLOOM = {"ENABLED": True, "SHARED_CACHE_ALIAS": "default"}
+
+
+def test_bloom_filter_has_no_false_negatives():
+    """
+    測試 Bloom filter 沒有偽陰性，且偽陽性率接近設定值。
+
+    驗證：
+    - 所有加入的項目都回傳 True
+    - 未加入項目的偽陽性率不超過設定值的兩倍
+    - 重複加入不會增加計數
+    """
+    bloom = BloomFilter(capacity=5000, error_rate=0.01)
+    items = [f"code{n}" for n in range(5000)]
+    for item in items:
+        bloom.add(item)
+    assert all(item in bloom for item in items)
+    count = bloom.count
+    assert not bloom.add("code1")
+    assert bloom.count == count
+
+    false_positives = sum(f"other{n}" in bloom for n in range(20000))
+    assert false_positives / 20000 < 0.02
+
+
+def test_bloom_filter_respects_memory_budget():
+    """測試位元陣列不會超過記憶體上限。"""
+    bloom = BloomFilter(capacity=1_000_000, error_rate=0.001, max_bytes=1024)
+    assert bloom.size_bytes == 1024
+
+
+@pytest.mark.django_db
+@override_settings(SHORTENER_BLOOM_FILTER=SHARED_BLOOM)
+def test_definite_miss_skips_database():
+    """
+    測試一定不存在的代碼不查詢資料庫，直接回傳 404。
+
+    驗證：
+    - filter 建立後，不存在的代碼沒有任何查詢
+    - 存在的代碼仍可正常重定向
+    """
+    Link.objects.create(original_url="https://example.com", short_code="exists1")
+    client = Client()
+    get_short_code_filter().ensure_built()
+
+    with CaptureQueriesContext(connection) as ctx:
+        response = client.get("/nothere")
+    assert response.status_code == 404
+    assert not [q for q in ctx.captured_queries if "shortener_link" in q["sql"]]
+    assert get_short_code_filter().negatives == 1
+
+    assert client.get("/exists1").status_code == 302
+
+
+@pytest.mark.django_db
+@override_settings(SHORTENER_BLOOM_FILTER=SHARED_BLOOM)
+def test_new_links_are_added_immediately():
+    """測試本行程建立 (含批次建立) 的連結立即加入 filter。"""
+    short_code_filter = get_short_code_filter()
+    short_code_filter.ensure_built()
+
+    Link.objects.create(original_url="https://example.com", short_code="fresh1")
+    links = bulk_create_links(["https://a.example.com", "https://b.example.com"])
+    assert "fresh1" in short_code_filter
+    assert all(link.short_code in short_code_filter for link in links)
+
+
+@pytest.mark.django_db
+def test_links_from_other_workers_are_never_reported_missing(monkeypatch):
+    """
+    測試其他 worker 建立的連結 (本行程沒有收到訊號) 不會被誤判為不存在。
+
+    驗證：
+    - 沒有共用快取時，每個「不存在」都先增量更新，立即找到其他 worker 的連結
+    - 共用標記被逐出快取時同樣先更新
+    """
+    now = [1000.0]
+    monkeypatch.setattr("shortener.bloom.time.monotonic", lambda: now[0])
+    short_code_filter = ShortCodeFilter(refresh_interval=5)
+    short_code_filter.ensure_built()
+
+    # 以 bulk_create 模擬其他 worker 寫入，不會觸發本行程的 filter 更新
+    Link.objects.bulk_create([Link(original_url="https://other.example.com", short_code="other1")])
+    assert short_code_filter.might_exist("other1")
+    assert short_code_filter.refreshes == 1
+
+    caches["default"].clear()
+    shared = ShortCodeFilter(refresh_interval=3600, shared_alias="default")
+    shared.ensure_built()
+    Link.objects.bulk_create([Link(original_url="https://evicted.example.com", short_code="evicted1")])
+    caches["default"].clear()
+    assert shared.might_exist("evicted1")
+    assert not shared.might_exist("missing1")
+    assert shared.refreshes == 1
+
+
+@pytest.mark.django_db
+def test_late_commits_with_lower_pk_are_loaded(monkeypatch):
+    """測試 pk 較小但較晚提交的連結 (批次建立、匯入) 依 updated_at 載入，不會被誤判為不存在。"""
+    now = [1000.0]
+    monkeypatch.setattr("shortener.bloom.time.monotonic", lambda: now[0])
+    Link.objects.bulk_create([Link(pk=5000, original_url="https://high.example.com", short_code="high1")])
+    short_code_filter = ShortCodeFilter(refresh_interval=5)
+    short_code_filter.ensure_built()
+
+    Link.objects.bulk_create([Link(pk=10, original_url="https://late.example.com", short_code="late1")])
+    now[0] += 5
+    assert short_code_filter.might_exist("late1")
+
+
+@pytest.mark.django_db
+def test_filter_is_not_built_in_the_request_path():
+    """
+    測試 filter 不在請求中建立。
+
+    驗證：
+    - 尚未建立時所有代碼都交給資料庫判斷，不查詢整個資料表
+    - 建立期間本行程建立的連結在替換後仍在 filter 中
+    - 更新時讀取資料庫不持有 filter 的鎖
+    """
+    short_code_filter = ShortCodeFilter(refresh_interval=0)
+    with CaptureQueriesContext(connection) as ctx:
+        assert short_code_filter.might_exist("anything")
+    assert not ctx.captured_queries
+    assert not short_code_filter.ready
+
+    rows = short_code_filter._rows
+
+    def rows_adding_during_build(since):
+        assert not short_code_filter._lock.locked()
+        if since is None:
+            short_code_filter.add(["during1"])
+        return rows(since)
+
+    short_code_filter._rows = rows_adding_during_build
+    short_code_filter.ensure_built()
+    assert "during1" in short_code_filter
+    assert not short_code_filter.might_exist("missing1")
+    assert short_code_filter.refreshes == 1
+
+
+@pytest.mark.django_db
+@override_settings(SHORTENER_BLOOM_FILTER=SHARED_BLOOM)
+def test_prepare_builds_in_background(monkeypatch):
+    """測試 worker 啟動時在背景建立 filter。"""
+    started = []
+    monkeypatch.setattr(ShortCodeFilter, "build_in_background", lambda self: started.append(self))
+    prepare_short_code_filter()
+    assert started == [get_short_code_filter()]
+
+
+@pytest.mark.django_db
+def test_shared_marker_triggers_refresh():
+    """測試設定共用快取時，其他 worker 提交新連結後更新的標記會立即觸發更新。"""
+    caches["default"].clear()
+    short_code_filter = ShortCodeFilter(refresh_interval=3600, shared_alias="default")
+    short_code_filter.ensure_built()
+
+    Link.objects.bulk_create([Link(original_url="https://other.example.com", short_code="other2")])
+    ShortCodeFilter(shared_alias="default").publish()
+    assert short_code_filter.might_exist("other2")
+
+
+@pytest.mark.django_db
+def test_filter_rebuilds_when_over_capacity():
+    """測試連結數超過容量時以更大的容量重建。"""
+    short_code_filter = ShortCodeFilter(min_capacity=2, refresh_interval=0)
+    short_code_filter.ensure_built()
+    Link.objects.bulk_create([
+        Link(original_url=f"https://{n}.example.com", short_code=f"grow{n}") for n in range(5)
+    ])
+    assert short_code_filter.might_exist("grow4")
+    assert short_code_filter.stats()["capacity"] >= 10
+
+
+@pytest.mark.django_db
+@override_settings(SHORTENER_BLOOM_FILTER=SHARED_BLOOM)
+def test_async_definite_miss():
+    """測試非同步解析對一定不存在的代碼回傳 None。"""
+    Link.objects.create(original_url="https://example.com", short_code="async1")
+    get_short_code_filter().ensure_built()
+
+    async def resolve(code):
+        return await aresolve_short_code(code)
+
+    assert async_to_sync(resolve)("nothere") is None
+    assert async_to_sync(resolve)("async1").original_url == "https://example.com"
+
+
+@pytest.mark.django_db
+def test_filter_is_disabled_by_default():
+    """
+    測試預設停用，且沒有共用快取時拒絕啟用。
+
+    驗證：
+    - 預設與未設定 SHARED_CACHE_ALIAS 時不建立 filter，仍可正常重定向
+    - system check 對未設定共用快取或使用行程內快取提出警告
+    """
+    assert get_short_code_filter() is None
+    assert check_bloom_filter_cache(None) == []
+    Link.objects.create(original_url="https://example.com", short_code="plain1")
+    assert Client().get("/plain1").status_code == 302
+
+    with override_settings(SHORTENER_BLOOM_FILTER={"ENABLED": True}):
+        assert get_short_code_filter() is None
+        assert [warning.id for warning in check_bloom_filter_cache(None)] == ["shortener.W002"]
+    with override_settings(SHORTENER_BLOOM_FILTER=SHARED_BLOOM, DEBUG=False):
+        assert [warning.id for warning in check_bloom_filter_cache(None)] == ["shortener.W002"]
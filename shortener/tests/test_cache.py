@@ -0,0 +1,157 @@
+import pytest
+from django.core.cache import caches
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from shortener.cache import LinkResolutionCache, get_resolution_cache
+from shortener.models import Link
+
+
+@pytest.fixture
+def link():
+    """建立測試用的 Link。"""
+    return Link.objects.create(original_url="https://example.com", short_code="cached1")
+
+
+@pytest.mark.django_db
+def test_resolve_hits_local_cache_after_first_lookup(link):
+    """
+    測試第一次解析會查詢資料庫，之後直接命中行程內快取。
+
+    驗證：
+    - 第一次解析計入 miss 並產生一次查詢
+    - 第二次解析計入 hit 且沒有任何查詢
+    """
+    resolution_cache = LinkResolutionCache()
+
+    with CaptureQueriesContext(connection) as ctx:
+        resolved = resolution_cache.resolve("cached1")
+    assert resolved.pk == link.pk
+    assert resolved.original_url == link.original_url
+    assert len(ctx.captured_queries) == 1
+
+    with CaptureQueriesContext(connection) as ctx:
+        assert resolution_cache.resolve("cached1") == resolved
+    assert len(ctx.captured_queries) == 0
+
+    stats = resolution_cache.stats()
+    assert stats["misses"] == 1
+    assert stats["local_hits"] == 1
+    assert stats["size"] == 1
+
+
+@pytest.mark.django_db
+def test_resolve_unknown_code_returns_none():
+    """測試不存在的 short_code 回傳 None 並計入 miss。"""
+    resolution_cache = LinkResolutionCache()
+    assert resolution_cache.resolve("missing") is None
+    assert resolution_cache.misses == 1
+    assert len(resolution_cache) == 0
+
+
+@pytest.mark.django_db
+def test_lru_evicts_least_recently_used():
+    """
+    測試超過筆數上限時會淘汰最久未使用的項目。
+
+    驗證：
+    - 最近使用過的項目保留下來
+    - 被淘汰的次數有被記錄
+    """
+    for code in ("a1", "b2", "c3"):
+        Link.objects.create(original_url=f"https://{code}.example.com", short_code=code)
+    resolution_cache = LinkResolutionCache(max_entries=2)
+
+    resolution_cache.resolve("a1")
+    resolution_cache.resolve("b2")
+    resolution_cache.resolve("a1")  # a1 成為最近使用
+    resolution_cache.resolve("c3")  # 淘汰 b2
+
+    assert len(resolution_cache) == 2
+    assert resolution_cache.evictions == 1
+    resolution_cache.resolve("a1")
+    assert resolution_cache.local_hits == 2
+
+
+@pytest.mark.django_db
+def test_expired_entries_are_reloaded(link, monkeypatch):
+    """測試超過 TTL 的項目會重新從資料庫載入。"""
+    resolution_cache = LinkResolutionCache(ttl=10)
+    now = [1000.0]
+    monkeypatch.setattr("shortener.cache.time.monotonic", lambda: now[0])
+
+    resolution_cache.resolve("cached1")
+    now[0] += 11
+    resolution_cache.resolve("cached1")
+    assert resolution_cache.misses == 2
+    assert resolution_cache.local_hits == 0
+
+
+@pytest.mark.django_db
+def test_shared_cache_tier_is_used_between_workers(link):
+    """
+    測試共用的 Django cache 層可讓其他 worker 免查詢資料庫。
+
+    驗證：
+    - 第二個快取實例 (模擬另一個 worker) 從共用層命中
+    """
+    caches["default"].clear()
+    first = LinkResolutionCache(shared_alias="default")
+    second = LinkResolutionCache(shared_alias="default")
+
+    first.resolve("cached1")
+    with CaptureQueriesContext(connection) as ctx:
+        resolved = second.resolve("cached1")
+    assert resolved.original_url == link.original_url
+    assert len(ctx.captured_queries) == 0
+    assert second.shared_hits == 1
+
+
+@pytest.mark.django_db
+@override_settings(SHORTENER_RESOLUTION_CACHE={"SHARED_CACHE_ALIAS": "default"})
+def test_save_and_delete_invalidate_cache(link):
+    """
+    測試 Link 儲存與刪除時會讓兩層快取失效。
+
+    驗證：
+    - 修改 original_url 後解析到新的網址
+    - 刪除後解析結果為 None
+    """
+    caches["default"].clear()
+    resolution_cache = get_resolution_cache()
+    resolution_cache.resolve("cached1")
+
+    link.original_url = "https://changed.example.com"
+    link.save()
+    assert resolution_cache.resolve("cached1").original_url == "https://changed.example.com"
+
+    link.delete()
+    assert resolution_cache.resolve("cached1") is None
+
+
+@pytest.mark.django_db
+def test_redirect_view_uses_resolution_cache(link):
+    """測試重定向視圖在快取命中後不再查詢連結，只剩記錄點擊的寫入。"""
+    client = Client()
+    client.get("/cached1")
+
+    with CaptureQueriesContext(connection) as ctx:
+        response = client.get("/cached1")
+    assert response.status_code == 302
+    assert response.url == link.original_url
+    assert not [q for q in ctx.captured_queries if q["sql"].startswith("SELECT")]
+    assert get_resolution_cache().local_hits == 1
+
+    link.refresh_from_db()
+    assert link.click_count == 2
+
+
+@pytest.mark.django_db
+@override_settings(SHORTENER_RESOLUTION_CACHE={"ENABLED": False})
+def test_redirect_view_without_cache(link):
+    """測試停用快取時仍可正常重定向。"""
+    assert get_resolution_cache() is None
+    response = Client().get("/cached1")
+    assert response.status_code == 302
+    assert response.url == link.original_url
@@ -0,0 +1,162 @@
+import datetime
+import threading
+
+import pytest
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+
+from shortener.clicks import ClickBuffer, flush_click_counts, get_click_buffer
+from shortener.models import Link
+
+BUFFERED = {"MODE": "buffered", "BATCH_SIZE": 3, "FLUSH_INTERVAL": 60, "BACKGROUND_FLUSH": False}
+
+
+@pytest.fixture
+def links():
+    """建立兩個測試用的 Link。"""
+    return [
+        Link.objects.create(original_url="https://a.example.com", short_code="clk_a"),
+        Link.objects.create(original_url="https://b.example.com", short_code="clk_b"),
+    ]
+
+
+@pytest.mark.django_db
+def test_flush_click_counts_uses_single_update(links):
+    """
+    測試批次寫入只使用一個 UPDATE 並正確累加各連結的點擊數。
+
+    驗證：
+    - 多個連結的點擊在同一個 UPDATE 中寫入
+    - last_clicked_at 被設定為最後點擊時間
+    """
+    clicked_at = timezone.now()
+    with CaptureQueriesContext(connection) as ctx:
+        updated = flush_click_counts({
+            links[0].pk: (3, clicked_at),
+            links[1].pk: (1, clicked_at),
+        })
+    assert updated == 2
+    assert len([q for q in ctx.captured_queries if q["sql"].startswith("UPDATE")]) == 1
+
+    links[0].refresh_from_db()
+    links[1].refresh_from_db()
+    assert links[0].click_count == 3
+    assert links[1].click_count == 1
+    assert links[0].last_clicked_at == clicked_at
+
+
+@pytest.mark.django_db
+def test_flush_does_not_move_last_clicked_at_backwards(links):
+    """測試較舊的點擊時間不會覆蓋較新的 last_clicked_at。"""
+    newer = timezone.now()
+    older = newer - datetime.timedelta(hours=1)
+    Link.objects.filter(pk=links[0].pk).update(click_count=5, last_clicked_at=newer)
+
+    flush_click_counts({links[0].pk: (2, older)})
+    links[0].refresh_from_db()
+    assert links[0].click_count == 7
+    assert links[0].last_clicked_at == newer
+
+
+@pytest.mark.django_db
+@override_settings(SHORTENER_CLICK_TRACKING=BUFFERED)
+def test_buffered_redirect_does_not_write(links):
+    """
+    測試 buffered 模式下重定向不會寫入資料庫，直到達到批次大小。
+
+    驗證：
+    - 快取命中後的重定向沒有任何查詢
+    - 達到 BATCH_SIZE 時一次寫回所有點擊
+    """
+    client = Client()
+    client.get("/clk_a")
+    with CaptureQueriesContext(connection) as ctx:
+        response = client.get("/clk_a")
+    assert response.status_code == 302
+    assert len(ctx.captured_queries) == 0
+
+    links[0].refresh_from_db()
+    assert links[0].click_count == 0
+    assert get_click_buffer().pending_clicks == 2
+
+    client.get("/clk_a")
+    links[0].refresh_from_db()
+    assert links[0].click_count == 3
+    assert links[0].last_clicked_at is not None
+    assert get_click_buffer().pending_clicks == 0
+
+
+@pytest.mark.django_db
+def test_buffer_flushes_after_interval(links, monkeypatch):
+    """測試距離上次寫入超過 FLUSH_INTERVAL 時會觸發寫入。"""
+    now = [1000.0]
+    monkeypatch.setattr("shortener.clicks.time.monotonic", lambda: now[0])
+    buffer = ClickBuffer(batch_size=100, flush_interval=5)
+
+    buffer.record(links[0].pk)
+    links[0].refresh_from_db()
+    assert links[0].click_count == 0
+
+    now[0] += 6
+    buffer.record(links[1].pk)
+    links[0].refresh_from_db()
+    links[1].refresh_from_db()
+    assert links[0].click_count == 1
+    assert links[1].click_count == 1
+
+
+def test_full_buffer_wakes_background_thread(monkeypatch):
+    """測試有背景執行緒時達到 batch_size 只喚醒該執行緒寫入，請求的執行緒不會寫入。"""
+    flushed = threading.Event()
+    flush_threads = []
+
+    def fake_flush(self):
+        flush_threads.append(threading.current_thread().name)
+        self._take_pending()
+        flushed.set()
+        return 0
+
+    monkeypatch.setattr(ClickBuffer, "flush", fake_flush)
+    monkeypatch.setattr("shortener.clicks.connections.close_all", lambda: None)
+    buffer = ClickBuffer(batch_size=2, flush_interval=60, background=True)
+    buffer.record(1)
+    buffer.record(2)
+
+    assert flushed.wait(5)
+    assert flush_threads == ["shortener-click-flush"]
+    buffer.close()
+    buffer._thread.join(5)
+    assert not buffer._thread.is_alive()
+
+
+@pytest.mark.django_db
+def test_close_flushes_pending_clicks(links):
+    """測試 worker 結束時 close() 會寫回剩餘的點擊。"""
+    buffer = ClickBuffer(batch_size=100, flush_interval=60)
+    for _ in range(4):
+        buffer.record(links[1].pk)
+
+    assert buffer.close() == 4
+    links[1].refresh_from_db()
+    assert links[1].click_count == 4
+
+
+@pytest.mark.django_db
+def test_failed_flush_keeps_clicks(links, monkeypatch):
+    """測試寫入失敗時點擊會保留在緩衝區中等待重試。"""
+    buffer = ClickBuffer(batch_size=100, flush_interval=60)
+    buffer.record(links[0].pk)
+
+    def broken_flush(*args, **kwargs):
+        raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr("shortener.clicks.flush_click_counts", broken_flush)
+    assert buffer.flush() == 0
+    assert buffer.pending_clicks == 1
+
+    monkeypatch.undo()
+    assert buffer.flush() == 1
+    links[0].refresh_from_db()
+    assert links[0].click_count == 1
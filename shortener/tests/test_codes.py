@@ -0,0 +1,93 @@
+import pytest
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from shortener.codes import ShortCodeAllocator, reserve_block
+from shortener.models import Link
+from shortener.utils import create_link
+
+
+def test_encode_is_collision_free_and_fixed_length():
+    """
+    測試序號編碼為一對一對應且長度固定。
+
+    驗證：
+    - 整個代碼空間內沒有任何碰撞
+    - 所有代碼長度相同且只使用指定的字母表
+    """
+    allocator = ShortCodeAllocator(length=3, alphabet="abcdef")
+    codes = {allocator.encode(n) for n in range(6 ** 3)}
+    assert len(codes) == 6 ** 3
+    assert all(len(code) == 3 and set(code) <= set("abcdef") for code in codes)
+
+
+def test_encode_without_obfuscation_is_sequential():
+    """測試關閉打亂時，代碼即為序號的 base-N 表示。"""
+    allocator = ShortCodeAllocator(length=4, alphabet="0123456789", obfuscate=False)
+    assert allocator.encode(0) == "0000"
+    assert allocator.encode(42) == "0042"
+
+    obfuscated = ShortCodeAllocator(length=4, alphabet="0123456789")
+    assert [obfuscated.encode(n) for n in range(3)] != ["0000", "0001", "0002"]
+
+
+def test_encode_rejects_numbers_outside_code_space():
+    """測試序號超出代碼空間時拋出 ValueError。"""
+    allocator = ShortCodeAllocator(length=2, alphabet="ab")
+    with pytest.raises(ValueError):
+        allocator.encode(4)
+
+
+@pytest.mark.django_db
+def test_reserved_blocks_do_not_overlap():
+    """測試多個 worker 預留的區段不會重疊。"""
+    first = reserve_block("test", 100)
+    second = reserve_block("test", 100)
+    assert first == (0, 100)
+    assert second == (100, 200)
+
+
+@pytest.mark.django_db
+def test_allocator_reserves_blocks_lazily():
+    """
+    測試分配器只有在區段用完時才存取資料庫。
+
+    驗證：
+    - 同一區段內的分配沒有任何查詢
+    - 兩個分配器 (模擬兩個 worker) 產生的代碼不重複
+    """
+    worker_a = ShortCodeAllocator(block_size=10)
+    worker_b = ShortCodeAllocator(block_size=10)
+    codes = [worker_a.allocate(), worker_b.allocate()]
+
+    with CaptureQueriesContext(connection) as ctx:
+        codes += [worker_a.allocate() for _ in range(9)]
+    assert len(ctx.captured_queries) == 0
+
+    codes += worker_a.allocate_many(15) + worker_b.allocate_many(5)
+    assert len(set(codes)) == len(codes)
+
+
+@pytest.mark.django_db
+def test_create_link_needs_no_lookup_query():
+    """測試建立 Link 時不會為了檢查代碼重複而執行 SELECT。"""
+    user = User.objects.create_user(username="codeuser", password="password123")
+    create_link("https://example.com/warmup", owner=user)
+
+    with CaptureQueriesContext(connection) as ctx:
+        link = create_link("https://example.com/next", owner=user)
+    assert link.pk is not None
+    assert not [q for q in ctx.captured_queries if q["sql"].startswith("SELECT")]
+
+
+@pytest.mark.django_db
+def test_create_link_skips_legacy_colliding_codes(monkeypatch):
+    """測試與舊有代碼碰撞時會改用下一個代碼。"""
+    allocator = ShortCodeAllocator(block_size=10)
+    monkeypatch.setattr("shortener.utils.get_code_allocator", lambda: allocator)
+    legacy_code = allocator.encode(0)
+    Link.objects.create(original_url="https://legacy.example.com", short_code=legacy_code)
+
+    link = create_link("https://example.com/new")
+    assert link.short_code == allocator.encode(1)
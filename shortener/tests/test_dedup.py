@@ -0,0 +1,166 @@
+import pytest
+from django.contrib.auth.models import User
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from ninja import NinjaAPI
+from ninja.testing import TestClient
+from ninja_jwt.tokens import RefreshToken
+
+from ninja_shortener.api import api
+from shortener import utils
+from shortener.dedup import DEFAULT_SETTINGS, hash_url, normalize_url
+from shortener.models import Link
+from shortener.utils import bulk_create_links, create_link
+
+DEDUP = {"ENABLED": True, "DROP_QUERY_PARAMS": ["utm_source"]}
+
+
+@pytest.fixture(autouse=True)
+def reset_ninja_registry():
+    """清除 Ninja 的內部註冊表以防止 ConfigError。"""
+    yield
+    if hasattr(NinjaAPI, "_registry"):
+        NinjaAPI._registry = []
+
+
+@pytest.fixture
+def user():
+    return User.objects.create_user(username="dedupuser", password="password123")
+
+
+def test_normalize_url_rules():
+    """
+    測試網址正規化規則。
+
+    驗證：
+    - 預設只將 scheme 與主機名稱轉小寫、移除預設埠號，保留查詢參數與 fragment 原樣
+    - 另外啟用的規則排序查詢參數、移除 fragment 與指定的追蹤參數
+    """
+    assert normalize_url("HTTPS://Example.COM:443/a?b=2&a=1&utm_source=x#top", DEFAULT_SETTINGS) == \
+        "https://example.com/a?b=2&a=1&utm_source=x#top"
+    assert hash_url("https://example.com/a?b=2", DEFAULT_SETTINGS) != \
+        hash_url("https://example.com/a?b=2#top", DEFAULT_SETTINGS)
+
+    rules = {**DEFAULT_SETTINGS, "SORT_QUERY": True, "DROP_FRAGMENT": True, "DROP_QUERY_PARAMS": ["utm_source"]}
+    assert normalize_url("HTTPS://Example.COM:443/a?b=2&a=1&utm_source=x#top", rules) == \
+        "https://example.com/a?a=1&b=2"
+    assert hash_url("https://example.com/a?a=1&b=2", rules) == \
+        hash_url("https://EXAMPLE.com/a?b=2&a=1", rules)
+
+    strip = {**rules, "STRIP_TRAILING_SLASH": True}
+    assert normalize_url("https://example.com/a/", strip) == "https://example.com/a"
+
+
+@pytest.mark.django_db
+@override_settings(SHORTENER_DEDUP=DEDUP)
+def test_create_link_returns_existing_duplicate(user):
+    """
+    測試啟用去重時，同一擁有者的相同網址回傳既有的 Link。
+
+    驗證：
+    - 正規化後相同的網址只建立一筆
+    - 不同擁有者與匿名用戶各自建立
+    """
+    first = create_link("https://example.com/page?utm_source=mail", owner=user)
+    again = create_link("https://EXAMPLE.com/page", owner=user)
+    assert again.pk == first.pk
+
+    other = User.objects.create_user(username="other", password="password123")
+    assert create_link("https://example.com/page", owner=other).pk != first.pk
+
+    anonymous = create_link("https://example.com/page")
+    assert create_link("https://example.com/page").pk == anonymous.pk
+    assert Link.objects.count() == 3
+
+
+@pytest.mark.django_db
+@override_settings(SHORTENER_DEDUP={"ENABLED": True})
+def test_default_rules_keep_distinct_destinations(user):
+    """測試預設規則下，追蹤參數或 fragment 不同的網址各自建立，回傳的連結一定導向要求的網址。"""
+    first = create_link("https://example.com/page?utm_source=mail", owner=user)
+    for url in ["https://example.com/page", "https://example.com/page?utm_source=ads", "https://example.com/page#top"]:
+        assert create_link(url, owner=user).original_url == url
+    assert create_link("https://EXAMPLE.com:443/page?utm_source=mail", owner=user).pk == first.pk
+
+
+@pytest.mark.django_db
+def test_dedup_disabled_creates_new_rows(user):
+    """測試未啟用去重時每次都建立新的 Link 且不寫入 url_hash。"""
+    first = create_link("https://example.com/page", owner=user)
+    second = create_link("https://example.com/page", owner=user)
+    assert first.pk != second.pk
+    assert first.url_hash is None
+
+
+@pytest.mark.django_db
+@override_settings(SHORTENER_DEDUP=DEDUP)
+def test_concurrent_duplicate_returns_winner(user, monkeypatch):
+    """
+    測試同時送出的重複請求是安全的。
+
+    模擬另一個請求在第一次查詢之後搶先建立了相同網址：
+    取得 advisory lock 後再次確認，應回傳搶先建立的那一筆。
+    """
+    winner = create_link("https://example.com/race", owner=user)
+    real_find = utils.find_duplicate
+    calls = []
+
+    def racing_find(owner, url_hash):
+        calls.append(url_hash)
+        return None if len(calls) == 1 else real_find(owner, url_hash)
+
+    monkeypatch.setattr(utils, "find_duplicate", racing_find)
+    assert create_link("https://example.com/race", owner=user).pk == winner.pk
+    assert Link.objects.filter(owner=user).count() == 1
+
+
+@pytest.mark.django_db
+@override_settings(SHORTENER_DEDUP=DEDUP)
+def test_bulk_create_links_deduplicates(user):
+    """測試批次建立時會沿用既有的網址並合併同一批次內的重複網址。"""
+    existing = create_link("https://example.com/old", owner=user)
+    links = bulk_create_links(
+        ["https://example.com/new", "https://example.com/old", "https://EXAMPLE.com/new"],
+        owner=user,
+    )
+    assert links[1].pk == existing.pk
+    assert links[0].pk == links[2].pk
+    assert Link.objects.filter(owner=user).count() == 2
+
+
+@pytest.mark.django_db
+@override_settings(SHORTENER_DEDUP=DEDUP)
+def test_api_and_form_return_existing_link(user):
+    """測試 API 與表單視圖在重複提交時回傳相同的短網址。"""
+    token = str(RefreshToken.for_user(user).access_token)
+    client = TestClient(api, headers={"Authorization": f"Bearer {token}"})
+    first = client.post("/shorten", json={"original_url": "https://example.com/api"}).json()
+    second = client.post("/shorten", json={"original_url": "https://EXAMPLE.com/api"}).json()
+    assert first["short_code"] == second["short_code"]
+
+    form_client = Client()
+    form_client.post(reverse("shorten_url"), {"original_url": "https://example.com/form"})
+    first_url = form_client.session["latest_short_url"]
+    form_client.get(reverse("home"))
+    form_client.post(reverse("shorten_url"), {"original_url": "https://example.com/form"})
+    assert form_client.session["latest_short_url"] == first_url
+    assert Link.objects.filter(owner=None).count() == 1
+
+
+@pytest.mark.django_db
+@override_settings(SHORTENER_DEDUP=DEDUP)
+def test_malformed_port_does_not_fail(user):
+    """
+    測試埠號不合法的網址不會讓正規化拋出例外。
+
+    驗證：
+    - 超出範圍或非數字的埠號保留原樣，只套用其他規則
+    - 表單送出這類網址時不會回傳 500
+    """
+    assert normalize_url("HTTP://A.example.com:99999/x", DEFAULT_SETTINGS) == "http://a.example.com:99999/x"
+    assert normalize_url("http://a.example.com:x/", DEFAULT_SETTINGS) == "http://a.example.com:x/"
+    assert normalize_url("http://[::1/", DEFAULT_SETTINGS) == "http://[::1/"
+
+    response = Client().post(reverse("shorten_url"), {"original_url": "http://example.com:99999/"})
+    assert response.status_code < 500
@@ -0,0 +1,138 @@
+import datetime
+import io
+import json
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+from django.utils import timezone
+from ninja import NinjaAPI
+from ninja.testing import TestClient
+from ninja_jwt.tokens import RefreshToken
+
+from ninja_shortener.api import api
+from shortener.cache import get_resolution_cache
+from shortener.expiry import purge_expired_links
+from shortener.models import DeletedLink, HourlyClickRollup, Link, OwnerStats
+from shortener.testing import assert_max_queries
+from shortener.utils import create_link
+
+
+@pytest.fixture(autouse=True)
+def reset_ninja_registry():
+    """清除 Ninja 的內部註冊表以防止 ConfigError。"""
+    yield
+    if hasattr(NinjaAPI, "_registry"):
+        NinjaAPI._registry = []
+
+
+def hours(n):
+    return timezone.now() + datetime.timedelta(hours=n)
+
+
+@pytest.mark.django_db
+def test_expired_link_returns_gone(monkeypatch):
+    """
+    測試到期的連結回傳 410，且不記錄點擊。
+
+    驗證：
+    - 未到期的連結正常重定向
+    - 快取中的項目到期後同樣回傳 410
+    """
+    link = Link.objects.create(original_url="https://example.com", short_code="expire1", expires_at=hours(1))
+    client = Client()
+    assert client.get("/expire1").status_code == 302
+    assert "expire1" in get_resolution_cache()._entries
+
+    later = hours(2)
+    monkeypatch.setattr(timezone, "now", lambda: later)
+    assert client.get("/expire1").status_code == 410
+    link.refresh_from_db()
+    assert link.click_count == 1
+
+
+@pytest.mark.django_db
+@override_settings(ROOT_URLCONF="ninja_shortener.urls_async")
+def test_expired_link_returns_gone_async():
+    """測試非同步的重定向視圖同樣回傳 410。"""
+    Link.objects.create(original_url="https://example.com", short_code="expire2", expires_at=hours(-1))
+    response = async_to_sync(AsyncClient().get)("/expire2")
+    assert response.status_code == 410
+
+
+@pytest.mark.django_db
+@override_settings(SHORTENER_DEDUP={"ENABLED": True})
+def test_api_creates_expiring_links_without_dedup():
+    """
+    測試 API 建立有到期時間的連結。
+
+    驗證：
+    - 回應包含 expires_at
+    - 有到期時間的連結不與既有的相同網址去重
+    - 沒有時區的到期時間被拒絕
+    """
+    user = User.objects.create_user(username="campaign", password="password123")
+    token = str(RefreshToken.for_user(user).access_token)
+    client = TestClient(api, headers={"Authorization": f"Bearer {token}"})
+    permanent = create_link("https://example.com/sale", owner=user)
+
+    expires_at = hours(24).isoformat()
+    response = client.post("/shorten", json={"original_url": "https://example.com/sale", "expires_at": expires_at})
+    assert response.status_code == 200
+    assert response.json()["expires_at"] is not None
+    assert response.json()["short_code"] != permanent.short_code
+
+    response = client.post("/shorten", json={"original_url": "https://example.com", "expires_at": "2030-01-01T00:00:00"})
+    assert response.status_code == 422
+
+
+@pytest.mark.django_db
+def test_purge_expired_links_command(tmp_path):
+    """
+    測試清除到期連結的指令。
+
+    驗證：
+    - 只刪除已到期的連結，分批處理
+    - 刪除前封存成 NDJSON，點擊時間桶一併刪除
+    """
+    for n in range(5):
+        Link.objects.create(original_url=f"https://{n}.example.com", short_code=f"old{n}", expires_at=hours(-n - 1))
+    Link.objects.create(original_url="https://future.example.com", short_code="future", expires_at=hours(1))
+    Link.objects.create(original_url="https://forever.example.com", short_code="forever")
+    HourlyClickRollup.objects.create(link=Link.objects.get(short_code="old0"), bucket=hours(-2), count=3)
+
+    archive = tmp_path / "expired.ndjson"
+    out = io.StringIO()
+    call_command("purge_expired_links", batch_size=2, sleep=0, archive=str(archive), stdout=out)
+
+    assert "Purged 5 expired links." in out.getvalue()
+    assert set(Link.objects.values_list("short_code", flat=True)) == {"future", "forever"}
+    assert not HourlyClickRollup.objects.exists()
+    rows = [json.loads(line) for line in archive.read_text().splitlines()]
+    assert sorted(row["short_code"] for row in rows) == [f"old{n}" for n in range(5)]
+    assert rows[0]["expires_at"] is not None
+
+
+@pytest.mark.django_db
+def test_purge_expired_links_batches_owner_stats():
+    """測試每批清除的查詢數與連結數無關：擁有者統計以一個 UPDATE 扣除，刪除紀錄以一個 INSERT 寫入。"""
+    users = [User.objects.create_user(username=f"purge{n}", password="password123") for n in range(3)]
+    Link.objects.bulk_create([
+        Link(original_url=f"https://{n}.example.com", short_code=f"exp{n}", owner=users[n % 3],
+             click_count=1, expires_at=hours(-1))
+        for n in range(100)
+    ])
+    Link.objects.create(original_url="https://keep.example.com", short_code="keep", owner=users[0])
+    call_command("reconcile_owner_stats", stdout=io.StringIO())
+
+    with assert_max_queries(11) as ctx:
+        assert purge_expired_links(batch_size=100) == 100
+    assert sum("shortener_ownerstats" in query["sql"] for query in ctx.captured_queries) == 1
+    assert sum("shortener_deletedlink" in query["sql"] for query in ctx.captured_queries) == 1
+    assert DeletedLink.objects.count() == 100
+    assert OwnerStats.objects.get(owner=users[0]).link_count == 1
+    assert OwnerStats.objects.get(owner=users[0]).click_count == 0
+    assert OwnerStats.objects.get(owner=users[1]).link_count == 0
@@ -0,0 +1,107 @@
+import csv
+import io
+import json
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import AsyncClient, Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from shortener.export import EXPORT_FIELDS, stream_links
+from shortener.models import Link
+
+
+@pytest.fixture
+def exporter():
+    """建立一位擁有 5 個連結的用戶，以及另一位用戶的連結。"""
+    user = User.objects.create_user(username="exporter", password="password123")
+    for n in range(5):
+        Link.objects.create(original_url=f"https://{n}.example.com/?q=a,b", short_code=f"exp{n}", owner=user)
+    other = User.objects.create_user(username="other", password="password123")
+    Link.objects.create(original_url="https://other.example.com", short_code="other1", owner=other)
+    return user
+
+
+@pytest.mark.django_db
+def test_stream_links_yields_header_before_querying(exporter):
+    """
+    測試 CSV 標題列在查詢資料庫之前就先輸出，之後依 chunk_size 分批輸出。
+
+    驗證：
+    - 取得第一個區塊時沒有任何查詢
+    - 所有連結只用一個查詢讀取
+    """
+    chunks = stream_links(exporter, "csv", chunk_size=2)
+    with CaptureQueriesContext(connection) as ctx:
+        assert next(chunks) == ",".join(EXPORT_FIELDS) + "\r\n"
+    assert len(ctx.captured_queries) == 0
+
+    with CaptureQueriesContext(connection) as ctx:
+        body = list(chunks)
+    assert len(body) == 3  # 2 + 2 + 1
+    assert len(ctx.captured_queries) == 1
+
+
+@pytest.mark.django_db
+def test_export_csv_view(exporter):
+    """
+    測試 CSV 匯出視圖以串流回傳使用者自己的連結。
+
+    驗證：
+    - 回傳串流回應與下載檔名
+    - 只包含自己的連結，且含逗號的網址被正確跳脫
+    """
+    client = Client()
+    client.login(username="exporter", password="password123")
+    response = client.get(reverse("export_links_csv"))
+
+    assert response.status_code == 200
+    assert response.streaming
+    assert response["Content-Disposition"] == 'attachment; filename="links.csv"'
+    rows = list(csv.DictReader(io.StringIO(b"".join(response.streaming_content).decode())))
+    assert [row["short_code"] for row in rows] == ["exp4", "exp3", "exp2", "exp1", "exp0"]
+    assert rows[0]["original_url"] == "https://4.example.com/?q=a,b"
+    assert rows[0]["click_count"] == "0"
+
+
+@pytest.mark.django_db
+def test_export_ndjson_view(exporter):
+    """測試 NDJSON 匯出視圖每行輸出一個 JSON 物件。"""
+    client = Client()
+    client.login(username="exporter", password="password123")
+    response = client.get(reverse("export_links_ndjson"))
+
+    assert response["Content-Type"] == "application/x-ndjson"
+    lines = b"".join(response.streaming_content).decode().splitlines()
+    items = [json.loads(line) for line in lines]
+    assert len(items) == 5
+    assert set(items[0]) == set(EXPORT_FIELDS)
+    assert items[0]["last_clicked_at"] is None
+
+
+@pytest.mark.django_db
+def test_export_requires_login():
+    """測試未登入的用戶會被導向登入頁面。"""
+    response = Client().get(reverse("export_links_csv"))
+    assert response.status_code == 302
+    assert "login" in response.url
+
+
+@pytest.mark.django_db
+@override_settings(ROOT_URLCONF="ninja_shortener.urls_async")
+def test_async_export_view(exporter):
+    """測試非同步匯出視圖以非同步迭代器串流輸出。"""
+    client = AsyncClient()
+
+    async def export():
+        await client.aforce_login(exporter)
+        response = await client.get("/dashboard/export.ndjson")
+        return response, b"".join([chunk async for chunk in response.streaming_content])
+
+    response, content = async_to_sync(export)()
+    assert response.status_code == 200
+    assert response.is_async
+    assert len(content.decode().splitlines()) == 5
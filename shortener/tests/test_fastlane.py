@@ -0,0 +1,110 @@
+import io
+from wsgiref.util import setup_testing_defaults
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.signals import request_finished, request_started
+from django.db import close_old_connections
+from django.test import AsyncRequestFactory
+from django.test.utils import override_settings
+
+from ninja_shortener.fastlane import (
+    FastLaneASGI, FastLaneASGIHandler, FastLaneWSGI, FastLaneWSGIHandler, reserved_paths,
+)
+from shortener.models import Link
+
+
+@pytest.fixture(autouse=True)
+def keep_test_connection():
+    """與 Django 的測試 Client 相同，請求結束時不關閉測試交易所在的資料庫連線。"""
+    request_started.disconnect(close_old_connections)
+    request_finished.disconnect(close_old_connections)
+    yield
+    request_started.connect(close_old_connections)
+    request_finished.connect(close_old_connections)
+
+
+def wsgi_get(application, path):
+    environ = {"PATH_INFO": path, "HTTP_HOST": "testserver", "wsgi.input": io.BytesIO()}
+    setup_testing_defaults(environ)
+    captured = {}
+
+    def start_response(status, headers):
+        captured["status"] = int(status.split()[0])
+        captured["headers"] = dict(headers)
+
+    body = application(environ, start_response)
+    b"".join(body)
+    body.close()
+    return captured["status"], captured["headers"]
+
+
+def test_reserved_paths():
+    """測試排在重定向路由之前的單層固定路徑不會進入快速通道。"""
+    assert reserved_paths("ninja_shortener.urls") == {"", "metrics"}
+    dispatcher = FastLaneWSGI(None, None, reserved_paths("ninja_shortener.urls"))
+    assert dispatcher.is_fast_path("/abc123")
+    assert not dispatcher.is_fast_path("/metrics")
+    assert not dispatcher.is_fast_path("/")
+    assert not dispatcher.is_fast_path("/dashboard/")
+    assert not dispatcher.is_fast_path("/api/shorten")
+
+
+@pytest.mark.django_db
+def test_wsgi_fast_lane_skips_full_middleware():
+    """
+    測試 WSGI 快速通道。
+
+    驗證：
+    - 短代碼以精簡的 middleware 重定向並記錄點擊 (沒有 clickjacking 等標頭)
+    - 其他路由仍經過完整的 MIDDLEWARE
+    - 不存在的短代碼同樣回傳 404
+    """
+    link = Link.objects.create(original_url="https://example.com/fast", short_code="fast1")
+    application = FastLaneWSGI(WSGIHandler(), FastLaneWSGIHandler(), reserved_paths())
+
+    status, headers = wsgi_get(application, "/fast1")
+    assert status == 302
+    assert headers["Location"] == "https://example.com/fast"
+    assert "X-Frame-Options" not in headers
+    link.refresh_from_db()
+    assert link.click_count == 1
+
+    status, headers = wsgi_get(application, "/metrics")
+    assert headers["X-Frame-Options"] == "DENY"
+
+    status, headers = wsgi_get(application, "/missing1")
+    assert status == 404
+
+
+def test_asgi_dispatcher_routes_by_path():
+    """測試 ASGI dispatcher 依去除 root_path 後的路徑選擇應用程式，非 HTTP 連線交給完整的應用程式。"""
+    calls = []
+
+    def app(name):
+        async def application(scope, receive, send):
+            calls.append(name)
+        return application
+
+    dispatcher = FastLaneASGI(app("full"), app("fast"), frozenset({"metrics"}))
+    for scope in ({"type": "http", "path": "/abc123"},
+                  {"type": "http", "path": "/prefix/abc123", "root_path": "/prefix"},
+                  {"type": "http", "path": "/metrics"},
+                  {"type": "websocket", "path": "/abc123"}):
+        async_to_sync(dispatcher)(scope, None, None)
+    assert calls == ["fast", "fast", "full", "full"]
+
+
+@pytest.mark.django_db
+@override_settings(ROOT_URLCONF="ninja_shortener.urls_async")
+def test_asgi_fast_lane_handler_redirects():
+    """測試 ASGI 快速通道的 handler 以非同步視圖回應重定向，且不經過完整的 MIDDLEWARE。"""
+    link = Link.objects.create(original_url="https://example.com/afast", short_code="afast1")
+    handler = FastLaneASGIHandler()
+    response = async_to_sync(handler.get_response_async)(AsyncRequestFactory().get("/afast1"))
+    assert response.status_code == 302
+    assert response["Location"] == "https://example.com/afast"
+    assert not response.has_header("X-Frame-Options")
+    link.refresh_from_db()
+    assert link.click_count == 1
@@ -0,0 +1,94 @@
+import datetime
+import io
+import json
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.management import call_command
+
+from shortener.models import Link
+
+
+@pytest.fixture
+def owner():
+    return User.objects.create_user(username="legacy", password="password123")
+
+
+def write(tmp_path, name, content):
+    path = tmp_path / name
+    path.write_text(content)
+    return path
+
+
+@pytest.mark.django_db
+def test_import_csv_with_legacy_columns(tmp_path, owner):
+    """
+    測試以舊系統的欄位名稱匯入 CSV。
+
+    驗證：
+    - 使用者名稱解析為擁有者，點擊數與建立時間被保留
+    - 無效的資料列 (網址、未知的使用者、過長的代碼) 寫入錯誤檔，其餘照常匯入
+    """
+    path = write(tmp_path, "links.csv", (
+        "code,url,username,clicks,created_at\n"
+        "abc123,https://example.com/a,legacy,42,2020-01-02T03:04:05Z\n"
+        "abc124,https://example.com/b,,0,\n"
+        "bad1,not-a-url,,0,\n"
+        "bad2,https://example.com/c,ghost,0,\n"
+        "waytoolongshortcode,https://example.com/d,,0,\n"
+    ))
+    errors = tmp_path / "errors.ndjson"
+    out = io.StringIO()
+    call_command("import_links", str(path), batch_size=2, errors=str(errors), stdout=out)
+
+    assert "5 rows: 2 written, 3 rejected" in out.getvalue()
+    link = Link.objects.get(short_code="abc123")
+    assert link.owner == owner
+    assert link.click_count == 42
+    assert link.created_at == datetime.datetime(2020, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc)
+    assert Link.objects.get(short_code="abc124").owner is None
+    reasons = [json.loads(line)["reason"] for line in errors.read_text().splitlines()]
+    assert reasons == ["invalid original_url", "unknown owner 'ghost'", "invalid short_code"]
+    assert not (tmp_path / "links.csv.checkpoint").exists()
+
+
+@pytest.mark.django_db
+def test_import_conflict_handling(tmp_path, owner):
+    """
+    測試 short_code 已存在時的處理。
+
+    驗證：
+    - skip 保留既有的連結，update 以匯入的資料覆寫
+    - 同一批內重複的代碼以最後一筆為準
+    """
+    Link.objects.create(original_url="https://old.example.com", short_code="dup1", click_count=1)
+    path = write(tmp_path, "links.ndjson", "\n".join(json.dumps(row) for row in [
+        {"short_code": "dup1", "original_url": "https://new.example.com", "click_count": 5},
+        {"short_code": "dup2", "original_url": "https://first.example.com"},
+        {"short_code": "dup2", "original_url": "https://second.example.com", "owner": "legacy"},
+    ]))
+    call_command("import_links", str(path), stdout=io.StringIO())
+    assert Link.objects.get(short_code="dup1").original_url == "https://old.example.com"
+    assert Link.objects.get(short_code="dup2").original_url == "https://second.example.com"
+
+    call_command("import_links", str(path), on_conflict="update", stdout=io.StringIO())
+    link = Link.objects.get(short_code="dup1")
+    assert (link.original_url, link.click_count) == ("https://new.example.com", 5)
+    assert Link.objects.count() == 2
+
+
+@pytest.mark.django_db
+def test_import_resumes_from_checkpoint(tmp_path):
+    """測試中斷後重新執行時，從檢查點記錄的資料列之後繼續匯入。"""
+    path = write(tmp_path, "links.csv", "short_code,original_url\n" + "".join(
+        f"resume{n},https://{n}.example.com\n" for n in range(5)
+    ))
+    checkpoint = tmp_path / "links.csv.checkpoint"
+    checkpoint.write_text(json.dumps({"read": 3, "written": 3, "rejected": 0}))
+
+    out = io.StringIO()
+    call_command("import_links", str(path), batch_size=1, stdout=out)
+    assert "Resuming after row 3." in out.getvalue()
+    assert "5 rows: 5 written, 0 rejected" in out.getvalue()
+    assert set(Link.objects.values_list("short_code", flat=True)) == {"resume3", "resume4"}
+    assert not checkpoint.exists()
@@ -0,0 +1,141 @@
+import json
+import logging
+import re
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from ninja import NinjaAPI
+from ninja.testing import TestClient
+from ninja_jwt.tokens import RefreshToken
+
+from ninja_shortener.api import api
+from shortener.models import Link
+from shortener.bloom import get_short_code_filter
+from shortener.testing import assert_max_queries
+
+TIMING_ON = {"SAMPLE_RATE": 1.0}
+
+
+@pytest.fixture(autouse=True)
+def reset_ninja_registry():
+    """清除 Ninja 的內部註冊表以防止 ConfigError。"""
+    yield
+    if hasattr(NinjaAPI, "_registry"):
+        NinjaAPI._registry = []
+
+
+@pytest.fixture
+def link():
+    return Link.objects.create(original_url="https://example.com", short_code="timed1")
+
+
+def header_metrics(response):
+    header = response["Server-Timing"]
+    return {
+        "queries": int(re.search(r"queries=(\d+)", header).group(1)),
+        "hits": int(re.search(r"hits=(\d+)", header).group(1)),
+        "misses": int(re.search(r"misses=(\d+)", header).group(1)),
+    }
+
+
+@pytest.mark.django_db
+@override_settings(SHORTENER_SERVER_TIMING=TIMING_ON)
+def test_server_timing_header_and_log(link, caplog):
+    """
+    測試抽樣的請求回傳 Server-Timing 標頭並寫入 JSON 格式的記錄。
+
+    驗證：
+    - 第一次重定向為快取 miss，第二次為 hit
+    - 標頭中的查詢數與記錄一致
+    """
+    client = Client()
+    first = client.get("/timed1")
+    assert "total;dur=" in first["Server-Timing"]
+    assert header_metrics(first)["misses"] == 1
+
+    with caplog.at_level(logging.INFO, logger="shortener.timing"):
+        second = client.get("/timed1")
+    metrics = header_metrics(second)
+    assert metrics["hits"] == 1 and metrics["misses"] == 0
+
+    record = json.loads(caplog.records[-1].getMessage())
+    assert record["view"] == "redirect"
+    assert record["status"] == 302
+    assert record["queries"] == metrics["queries"]
+
+
+@pytest.mark.django_db
+def test_server_timing_disabled_by_default(link):
+    """測試預設 SAMPLE_RATE 為 0 時不載入 middleware，也沒有標頭。"""
+    response = Client().get("/timed1")
+    assert "Server-Timing" not in response
+
+
+@pytest.mark.django_db
+@override_settings(SHORTENER_SERVER_TIMING={"SAMPLE_RATE": 1.0, "LOG": False},
+                   ROOT_URLCONF="ninja_shortener.urls_async")
+def test_server_timing_counts_async_view_queries(link):
+    """測試非同步視圖在 sync_to_async 執行緒中的查詢也會被計入。"""
+    response = async_to_sync(AsyncClient().get)("/timed1")
+    assert response.status_code == 302
+    assert header_metrics(response)["queries"] >= 1
+
+
+@pytest.mark.django_db
+def test_assert_max_queries_reports_queries():
+    """測試超過查詢預算時拋出 AssertionError 並列出查詢。"""
+    with pytest.raises(AssertionError, match="budget is 0"):
+        with assert_max_queries(0):
+            Link.objects.count()
+
+
+@pytest.mark.django_db
+@override_settings(SHORTENER_BLOOM_FILTER={"ENABLED": True, "SHARED_CACHE_ALIAS": "default"})
+def test_redirect_view_query_budget(link):
+    """
+    測試重定向的查詢預算。
+
+    驗證：
+    - Bloom filter 建立後，不存在的代碼沒有查詢
+    - 快取未命中時一次解析加上記錄點擊的寫入
+    - 快取命中後只剩記錄點擊的寫入 (連結與擁有者統計各一個 UPDATE，點擊事件批次寫入)
+    """
+    client = Client()
+    get_short_code_filter().ensure_built()
+    with assert_max_queries(0):
+        assert client.get("/missing1").status_code == 404
+    with assert_max_queries(3):
+        client.get("/timed1")
+    with assert_max_queries(2):
+        response = client.get("/timed1")
+    assert response.status_code == 302
+
+
+@pytest.mark.django_db
+def test_dashboard_view_query_budget():
+    """測試儀表板的查詢預算不隨連結數增加 (session、使用者、擁有者統計、一頁連結)。"""
+    user = User.objects.create_user(username="budget", password="password123")
+    for n in range(30):
+        Link.objects.create(original_url=f"https://{n}.example.com", short_code=f"budget{n}", owner=user)
+    client = Client()
+    client.force_login(user)
+    with assert_max_queries(4):
+        response = client.get(reverse("dashboard"))
+    assert response.status_code == 200
+
+
+@pytest.mark.django_db
+def test_api_shorten_query_budget():
+    """測試 API 建立短網址的查詢預算 (使用者快取命中後，savepoint 內的 INSERT 與擁有者統計的 UPDATE)。"""
+    user = User.objects.create_user(username="apibudget", password="password123")
+    token = str(RefreshToken.for_user(user).access_token)
+    client = TestClient(api, headers={"Authorization": f"Bearer {token}"})
+    client.post("/shorten", json={"original_url": "https://warmup.example.com"})
+
+    with assert_max_queries(4):
+        response = client.post("/shorten", json={"original_url": "https://budget.example.com"})
+    assert response.status_code == 200
@@ -0,0 +1,107 @@
+import datetime
+import io
+
+import pytest
+from django.core.management import call_command
+from django.test import Client
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from shortener.linkindex import LinkIndex, LinkIndexReader, build_link_index
+from shortener.models import Link
+
+
+@pytest.mark.django_db
+def test_build_and_lookup_link_index(tmp_path):
+    """
+    測試建立索引檔與二分搜尋查詢。
+
+    驗證：
+    - 收錄的連結可查回 pk、網址與重定向策略
+    - 有到期時間的連結不收錄，不存在的代碼與過長的代碼回傳 None
+    - 非 ASCII 的代碼依位元組排序仍可查到
+    """
+    plain = Link.objects.create(original_url="https://example.com/a", short_code="idxa")
+    Link.objects.create(original_url="https://example.com/b", short_code="idxb", redirect_permanent=True,
+                        cache_max_age=600)
+    Link.objects.create(original_url="https://example.com/é", short_code="idxé")
+    Link.objects.create(original_url="https://example.com/Z", short_code="Z9")
+    Link.objects.create(original_url="https://example.com/e", short_code="idxexp",
+                        expires_at=timezone.now() + datetime.timedelta(days=1))
+    path = str(tmp_path / "links.idx")
+
+    info = build_link_index(path)
+    assert (info.generation, info.entries) == (1, 4)
+
+    index = LinkIndex(path)
+    assert index.lookup("idxa") == (plain.pk, "https://example.com/a", None, False, None)
+    assert index.lookup("idxb")[1:] == ("https://example.com/b", None, True, 600)
+    assert index.lookup("idxé")[1] == "https://example.com/é"
+    assert index.lookup("Z9")[1] == "https://example.com/Z"
+    assert index.lookup("idxexp") is None
+    assert index.lookup("idx") is None
+    assert index.lookup("idxaa") is None
+    assert index.lookup("x" * 20) is None
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+@pytest.mark.django_db
+def test_link_index_reader_swaps_generations(tmp_path):
+    """
+    測試讀取端切換到新世代的索引。
+
+    驗證：
+    - 索引檔不存在或損毀時不使用索引
+    - 重新建立後讀取到新的世代與新連結
+    - 本行程失效的代碼略過索引，直到換成之後建立的世代
+    """
+    path = str(tmp_path / "links.idx")
+    reader = LinkIndexReader(path, check_interval=0)
+    assert reader.lookup("swap1") is None
+
+    (tmp_path / "links.idx").write_bytes(b"garbage")
+    assert reader.lookup("swap1") is None
+
+    Link.objects.create(original_url="https://example.com/1", short_code="swap1")
+    build_link_index(path)
+    assert reader.lookup("swap1")[1] == "https://example.com/1"
+
+    Link.objects.create(original_url="https://example.com/2", short_code="swap2")
+    assert reader.lookup("swap2") is None
+    build_link_index(path)
+    assert reader.lookup("swap2")[1] == "https://example.com/2"
+    assert reader.stats()["generation"] == 2
+
+    reader.invalidate("swap1")
+    assert reader.lookup("swap1") is None
+    build_link_index(path)
+    assert reader.lookup("swap1")[1] == "https://example.com/1"
+
+
+@pytest.mark.django_db
+def test_redirect_consults_link_index(tmp_path):
+    """
+    測試啟用索引時重定向優先使用索引。
+
+    驗證：
+    - 索引中的連結直接以索引的網址重定向，並記錄點擊
+    - 建立索引後才新增的連結仍由資料庫解析
+    - build_link_index 指令輸出世代與連結數
+    """
+    link = Link.objects.create(original_url="https://example.com/indexed", short_code="viaidx")
+    path = tmp_path / "links.idx"
+    out = io.StringIO()
+    call_command("build_link_index", path=str(path), stdout=out)
+    assert "Built link index generation 1: 1 links" in out.getvalue()
+    # 不經過訊號直接修改資料表，確認回應來自索引而不是資料庫
+    Link.objects.filter(pk=link.pk).update(original_url="https://example.com/changed")
+    Link.objects.create(original_url="https://example.com/new", short_code="notinidx")
+
+    with override_settings(SHORTENER_LINK_INDEX={"ENABLED": True, "PATH": path}):
+        client = Client()
+        response = client.get("/viaidx")
+        assert response["Location"] == "https://example.com/indexed"
+        assert client.get("/notinidx")["Location"] == "https://example.com/new"
+        assert client.get("/missing1").status_code == 404
+
+    assert Link.objects.get(pk=link.pk).click_count == 1
@@ -0,0 +1,123 @@
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+from prometheus_client import REGISTRY
+
+from shortener import metrics
+from shortener.models import Link
+from shortener.utils import bulk_create_links
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+@pytest.mark.django_db
+def test_metrics_endpoint_prometheus_format():
+    """測試 /metrics 以 Prometheus 文字格式輸出所有指標。"""
+    response = Client().get("/metrics")
+    assert response.status_code == 200
+    assert response["Content-Type"].startswith("text/plain")
+    body = response.content.decode()
+    for name in ("shortener_request_duration_seconds", "shortener_links_created_total",
+                 "shortener_clicks_total", "shortener_not_found_total",
+                 "shortener_pending_clicks", "shortener_resolution_cache_entries"):
+        assert f"# TYPE {name.removesuffix('_total')}" in body
+
+
+@pytest.mark.django_db
+def test_redirect_counts_clicks_not_found_and_latency():
+    """
+    測試重定向的點擊、404 與延遲指標。
+
+    驗證：
+    - 成功重定向增加 clicks，不存在的代碼增加 not_found
+    - 延遲依路由記錄在 histogram 中
+    """
+    Link.objects.create(original_url="https://example.com", short_code="metric1")
+    clicks = sample("shortener_clicks_total")
+    not_found = sample("shortener_not_found_total")
+    observed = sample("shortener_request_duration_seconds_count", route="redirect")
+
+    client = Client()
+    assert client.get("/metric1").status_code == 302
+    assert client.get("/nothere").status_code == 404
+
+    assert sample("shortener_clicks_total") == clicks + 1
+    assert sample("shortener_not_found_total") == not_found + 1
+    assert sample("shortener_request_duration_seconds_count", route="redirect") == observed + 2
+
+
+@pytest.mark.django_db
+@override_settings(ROOT_URLCONF="ninja_shortener.urls_async")
+def test_async_views_are_measured():
+    """測試 ASGI 路徑的非同步視圖同樣記錄延遲與點擊。"""
+    Link.objects.create(original_url="https://example.com", short_code="metric2")
+    clicks = sample("shortener_clicks_total")
+    observed = sample("shortener_request_duration_seconds_count", route="redirect")
+
+    response = async_to_sync(AsyncClient().get)("/metric2")
+    assert response.status_code == 302
+    assert sample("shortener_clicks_total") == clicks + 1
+    assert sample("shortener_request_duration_seconds_count", route="redirect") == observed + 1
+
+
+@pytest.mark.django_db
+def test_links_created_counter():
+    """測試單筆建立 (post_save) 與批次建立 (bulk_create) 都會計入建立的連結數。"""
+    user = User.objects.create_user(username="metrics", password="password123")
+    created = sample("shortener_links_created_total")
+    Link.objects.create(original_url="https://example.com", short_code="metric3")
+    bulk_create_links(["https://a.example.com", "https://b.example.com"], owner=user)
+    assert sample("shortener_links_created_total") == created + 3
+
+
+@pytest.mark.django_db
+@override_settings(SHORTENER_CLICK_TRACKING={"MODE": "buffered", "BATCH_SIZE": 100, "FLUSH_INTERVAL": 60,
+                                            "BACKGROUND_FLUSH": False})
+def test_pending_clicks_gauge():
+    """測試緩衝模式下 gauge 反映尚未寫回的點擊數。"""
+    Link.objects.create(original_url="https://example.com", short_code="metric4")
+    client = Client()
+    client.get("/metric4")
+    client.get("/metric4")
+    client.get("/metrics")
+    assert sample("shortener_pending_clicks") == 2
+
+
+@pytest.mark.django_db
+def test_gauges_refresh_on_scrape_and_at_most_once_per_interval(monkeypatch):
+    """
+    測試 gauge 不在每個請求都更新。
+
+    驗證：
+    - GAUGE_INTERVAL 內的多個請求只更新一次，超過間隔後再更新
+    - 讀取 /metrics 時一定更新
+    """
+    now = [1000.0]
+    monkeypatch.setattr("shortener.metrics.time.monotonic", lambda: now[0])
+    refreshes = []
+    refresh_gauges = metrics.refresh_gauges
+    monkeypatch.setattr(metrics, "refresh_gauges", lambda: refreshes.append(now[0]) or refresh_gauges())
+    Link.objects.create(original_url="https://example.com", short_code="metric5")
+
+    client = Client()
+    for _ in range(5):
+        client.get("/metric5")
+    assert len(refreshes) == 1
+    now[0] += metrics.get_metrics_settings()["GAUGE_INTERVAL"]
+    client.get("/metric5")
+    assert len(refreshes) == 2
+
+    client.get("/metrics")
+    assert len(refreshes) == 3
+
+
+@pytest.mark.django_db
+@override_settings(SHORTENER_METRICS={"ALLOWED_IPS": ["10.0.0.1"]})
+def test_metrics_endpoint_allowed_ips():
+    """測試設定 ALLOWED_IPS 時，其他來源回傳 404。"""
+    assert Client().get("/metrics").status_code == 404
+    assert Client(REMOTE_ADDR="10.0.0.1").get("/metrics").status_code == 200
@@ -0,0 +1,178 @@
+import io
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import Client
+from django.test.utils import override_settings
+from ninja import NinjaAPI
+from ninja.testing import TestClient
+from ninja_jwt.tokens import RefreshToken
+
+from ninja_shortener.api import api
+from shortener.clicks import arecord_click, get_click_buffer, record_click
+from shortener.importer import LinkImporter
+from shortener.models import Link, OwnerStats
+from shortener.utils import DELETE_FIELDS, bulk_create_links, create_link, delete_links
+
+
+@pytest.fixture(autouse=True)
+def reset_ninja_registry():
+    """清除 Ninja 的內部註冊表以防止 ConfigError。"""
+    yield
+    if hasattr(NinjaAPI, "_registry"):
+        NinjaAPI._registry = []
+
+
+def stats_of(user):
+    stats = OwnerStats.objects.get(owner=user)
+    return stats.link_count, stats.click_count, stats.top_link_id, stats.top_link_clicks
+
+
+@pytest.mark.django_db
+@override_settings(SHORTENER_CLICK_TRACKING={"MODE": "buffered", "BACKGROUND_FLUSH": False})
+def test_stats_follow_creates_clicks_and_deletes():
+    """
+    測試擁有者統計隨寫入增量維護。
+
+    驗證：
+    - 單筆與批次建立都計入連結數，匿名連結不計入
+    - 寫回點擊時累加點擊數並更新點擊最多的連結
+    - 刪除連結時扣除，點擊最多的連結被刪除時清除
+    """
+    user = User.objects.create_user(username="stats", password="password123")
+    first = create_link("https://example.com/1", owner=user)
+    second, third = bulk_create_links(["https://example.com/2", "https://example.com/3"], owner=user)
+    create_link("https://example.com/anonymous")
+    assert stats_of(user) == (3, 0, None, 0)
+
+    client = Client()
+    for code in [first.short_code, second.short_code, second.short_code]:
+        client.get(f"/{code}")
+    get_click_buffer().flush()
+    assert stats_of(user) == (3, 3, second.pk, 2)
+
+    delete_links(Link.objects.filter(pk=second.pk).values(*DELETE_FIELDS))
+    assert stats_of(user) == (2, 1, None, 0)
+    client.get(f"/{third.short_code}")
+    get_click_buffer().flush()
+    assert stats_of(user) == (2, 2, third.pk, 1)
+
+
+@pytest.mark.django_db
+def test_stats_follow_immediate_clicks():
+    """
+    測試預設的即時點擊模式也更新擁有者統計。
+
+    驗證：
+    - 每次重定向累加點擊數，並更新點擊最多的連結
+    - 非同步的記錄路徑相同，匿名連結不影響任何統計
+    """
+    user = User.objects.create_user(username="immediate", password="password123")
+    first = create_link("https://example.com/first", owner=user)
+    second = create_link("https://example.com/second", owner=user)
+    anonymous = create_link("https://example.com/anonymous")
+
+    client = Client()
+    for _ in range(5):
+        client.get(f"/{first.short_code}")
+    client.get(f"/{anonymous.short_code}")
+    first.refresh_from_db()
+    assert first.click_count == 5
+    assert stats_of(user) == (2, 5, first.pk, 5)
+
+    for _ in range(6):
+        async_to_sync(arecord_click)(second.pk)
+    assert stats_of(user) == (2, 11, second.pk, 6)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_immediate_click_updates_link_and_stats_together(monkeypatch):
+    """測試即時模式的連結與擁有者統計在同一個交易中更新，統計更新失敗時連結的點擊數也不會增加。"""
+    user = User.objects.create_user(username="atomicclick", password="password123")
+    link = create_link("https://example.com/atomic", owner=user)
+
+    def broken_update(pk):
+        raise RuntimeError("stats update failed")
+
+    monkeypatch.setattr("shortener.clicks.record_click_added", broken_update)
+    for record in (record_click, async_to_sync(arecord_click)):
+        with pytest.raises(RuntimeError):
+            record(link.pk)
+    link.refresh_from_db()
+    assert link.click_count == 0
+    assert stats_of(user) == (1, 0, None, 0)
+
+
+@pytest.mark.django_db
+def test_stats_api():
+    """
+    測試 /stats API 回傳統計。
+
+    驗證：
+    - 回傳總連結數、總點擊數與點擊最多的連結
+    - 沒有任何連結的使用者回傳空白統計
+    """
+    user = User.objects.create_user(username="statsapi", password="password123")
+    link = create_link("https://example.com/top", owner=user)
+    create_link("https://example.com/other", owner=user)
+    Client().get(f"/{link.short_code}")
+
+    client = TestClient(api)
+    token = str(RefreshToken.for_user(user).access_token)
+    response = client.get("/stats", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+    assert response.json() == {
+        "link_count": 2,
+        "click_count": 1,
+        "top_link": {"short_code": link.short_code, "original_url": "https://example.com/top", "click_count": 1},
+    }
+
+    other = User.objects.create_user(username="nolinks", password="password123")
+    token = str(RefreshToken.for_user(other).access_token)
+    response = client.get("/stats", headers={"Authorization": f"Bearer {token}"})
+    assert response.json() == {"link_count": 0, "click_count": 0, "top_link": None}
+
+
+@pytest.mark.django_db
+def test_dashboard_headline_uses_stats():
+    """測試儀表板顯示統計列的數字。"""
+    user = User.objects.create_user(username="headline", password="password123")
+    link = create_link("https://example.com/headline", owner=user)
+    Link.objects.filter(pk=link.pk).update(click_count=7)
+    OwnerStats.objects.filter(owner=user).update(click_count=7, top_link=link, top_link_clicks=7)
+
+    client = Client()
+    client.force_login(user)
+    response = client.get("/dashboard/")
+    assert response.context["stats"].click_count == 7
+    assert response.context["stats"].top_link.short_code == link.short_code
+
+
+@pytest.mark.django_db
+def test_reconcile_and_import_fix_drift():
+    """
+    測試修正統計偏移。
+
+    驗證：
+    - reconcile_owner_stats 指令依實際資料修正偏移，並為缺少統計列的擁有者建立
+    - 匯入的連結 (含點擊數) 計入統計，覆寫模式重新計算受影響的擁有者
+    """
+    user = User.objects.create_user(username="drift", password="password123")
+    legacy = User.objects.create_user(username="legacy", password="password123")
+    link = create_link("https://example.com/drift", owner=user)
+    Link.objects.filter(pk=link.pk).update(click_count=5)
+    Link.objects.bulk_create([Link(original_url="https://example.com/raw", short_code="rawstat", owner=legacy)])
+
+    out = io.StringIO()
+    call_command("reconcile_owner_stats", batch_size=1, stdout=out)
+    assert "Checked 2 owners, fixed 2." in out.getvalue()
+    assert stats_of(user) == (1, 5, link.pk, 5)
+    assert stats_of(legacy) == (1, 0, None, 0)
+
+    LinkImporter().run(io.StringIO("code,url,username,clicks\nimp1,https://example.com/i,legacy,4\n"), "csv")
+    assert stats_of(legacy) == (2, 4, Link.objects.get(short_code="imp1").pk, 4)
+    LinkImporter(on_conflict="update").run(io.StringIO("code,url,username,clicks\nimp1,https://example.com/i,drift,9\n"), "csv")
+    assert stats_of(legacy) == (1, 0, None, 0)
+    assert stats_of(user)[:2] == (2, 14)
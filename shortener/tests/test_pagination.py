@@ -0,0 +1,122 @@
+import datetime
+
+import pytest
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from shortener.models import Link
+from shortener.pagination import clamp_page_size, decode_cursor, encode_cursor, paginate_newest_first
+
+
+@pytest.fixture
+def user_links():
+    """建立一位擁有 7 個連結的用戶，其中兩個連結的建立時間相同。"""
+    user = User.objects.create_user(username="pager", password="password123")
+    base = timezone.now()
+    for n in range(7):
+        Link.objects.create(original_url=f"https://{n}.example.com", short_code=f"page{n}", owner=user)
+    # 讓 page2 與 page3 的 created_at 相同，驗證以 id 決定順序
+    created = {f"page{n}": base - datetime.timedelta(minutes=10 - n) for n in range(7)}
+    created["page3"] = created["page2"]
+    for code, created_at in created.items():
+        Link.objects.filter(short_code=code).update(created_at=created_at)
+    return user
+
+
+def codes(page):
+    return [link.short_code for link in page.items]
+
+
+def test_cursor_round_trip():
+    """測試游標可正確編碼與解碼，無效游標拋出 ValueError。"""
+    created_at = timezone.now()
+    assert decode_cursor(encode_cursor(created_at, 42)) == (created_at, 42)
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+
+@override_settings(SHORTENER_DASHBOARD={"PAGE_SIZE": 10, "MAX_PAGE_SIZE": 20})
+def test_clamp_page_size():
+    """測試每頁筆數會被限制在允許範圍內。"""
+    assert clamp_page_size(None) == 10
+    assert clamp_page_size("abc") == 10
+    assert clamp_page_size("0") == 1
+    assert clamp_page_size("500") == 20
+
+
+@pytest.mark.django_db
+def test_keyset_pagination_walks_forward_and_back(user_links):
+    """
+    測試游標分頁可以往後翻頁再翻回來。
+
+    驗證：
+    - 由新到舊排序，created_at 相同時以 id 排序且不遺漏
+    - 第一頁沒有上一頁，最後一頁沒有下一頁
+    """
+    queryset = Link.objects.filter(owner=user_links)
+
+    first = paginate_newest_first(queryset, page_size=3)
+    assert codes(first) == ["page6", "page5", "page4"]
+    assert not first.has_previous and first.has_next
+
+    second = paginate_newest_first(queryset, after=first.next_cursor, page_size=3)
+    assert codes(second) == ["page3", "page2", "page1"]
+    assert second.has_previous and second.has_next
+
+    last = paginate_newest_first(queryset, after=second.next_cursor, page_size=3)
+    assert codes(last) == ["page0"]
+    assert last.has_previous and not last.has_next
+
+    back = paginate_newest_first(queryset, before=last.prev_cursor, page_size=3)
+    assert codes(back) == codes(second)
+    back = paginate_newest_first(queryset, before=back.prev_cursor, page_size=3)
+    assert codes(back) == codes(first)
+    assert not back.has_previous
+
+
+@pytest.mark.django_db
+def test_dashboard_page_query_cost_is_constant(user_links):
+    """
+    測試儀表板每一頁的查詢數固定，且只載入該頁的連結。
+
+    驗證：
+    - 深頁與第一頁的查詢數相同
+    - 回傳的連結數等於 page_size
+    """
+    client = Client()
+    client.login(username="pager", password="password123")
+    first = client.get(reverse("dashboard"), {"page_size": 2})
+    assert len(first.context["links"]) == 2
+
+    page = first.context["page"]
+    with CaptureQueriesContext(connection) as first_ctx:
+        client.get(reverse("dashboard"), {"page_size": 2})
+    for _ in range(2):
+        response = client.get(reverse("dashboard"), {"page_size": 2, "after": page.next_cursor})
+        page = response.context["page"]
+    with CaptureQueriesContext(connection) as deep_ctx:
+        client.get(reverse("dashboard"), {"page_size": 2, "after": page.next_cursor})
+    assert len(deep_ctx.captured_queries) == len(first_ctx.captured_queries)
+
+
+@pytest.mark.django_db
+def test_dashboard_renders_pagination_controls(user_links):
+    """測試儀表板顯示上一頁與下一頁的連結，無效游標回到第一頁。"""
+    client = Client()
+    client.login(username="pager", password="password123")
+
+    response = client.get(reverse("dashboard"), {"page_size": 3})
+    content = response.content.decode()
+    assert "下一頁" in content
+    assert "上一頁" not in content
+
+    response = client.get(reverse("dashboard"), {"page_size": 3, "after": response.context["page"].next_cursor})
+    assert "上一頁" in response.content.decode()
+
+    response = client.get(reverse("dashboard"), {"after": "garbage"})
+    assert response.status_code == 200
+    assert response.context["links"][0].short_code == "page6"
@@ -0,0 +1,169 @@
+import ast
+import importlib
+import inspect
+import io
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import Client
+from django.test.utils import override_settings
+
+from shortener import partitioning
+from shortener.models import Link
+from shortener.partitioning import (
+    OLD_TABLE,
+    IndexInfo,
+    constraint_statement,
+    copy_batch,
+    is_partitioned,
+    rewrite_index,
+    suffixed,
+    table_exists,
+)
+from shortener.utils import bulk_create_links, create_link
+
+requires_postgres = pytest.mark.skipif(connection.vendor != "postgresql", reason="需要 PostgreSQL 的宣告式分割")
+
+PARTITIONED_DEDUP = {
+    "SHORTENER_DEDUP": {"ENABLED": True},
+    "SHORTENER_LINK_PARTITIONING": {"ENABLED": True, "PARTITIONS": 4},
+}
+
+
+def test_rewrite_index_for_partitioned_table():
+    """
+    測試原表的索引改寫到分割表。
+
+    驗證：
+    - 包含分割鍵的唯一索引維持唯一
+    - 不含分割鍵的唯一索引 (去重用) 改為一般索引，並保留 WHERE 條件
+    """
+    anon = IndexInfo(
+        "shortener_link_anon_url_hash_uniq",
+        "CREATE UNIQUE INDEX shortener_link_anon_url_hash_uniq ON public.shortener_link USING btree (url_hash) "
+        "WHERE ((url_hash IS NOT NULL) AND (owner_id IS NULL))",
+    )
+    assert rewrite_index(anon, "new_table", "idx_p") == (
+        "CREATE INDEX idx_p ON new_table USING btree (url_hash) "
+        "WHERE ((url_hash IS NOT NULL) AND (owner_id IS NULL))"
+    )
+    like = IndexInfo(
+        "shortener_link_short_code_like",
+        "CREATE UNIQUE INDEX shortener_link_short_code_like ON public.shortener_link "
+        "USING btree (short_code varchar_pattern_ops)",
+    )
+    assert rewrite_index(like, "new_table", "idx_p").startswith("CREATE UNIQUE INDEX idx_p ON new_table")
+
+
+def test_constraint_statement_includes_partition_key():
+    """測試主鍵加入分割鍵，唯一約束只在包含分割鍵時保留。"""
+    pkey = IndexInfo("shortener_link_pkey", "", "p", "PRIMARY KEY (id)")
+    assert constraint_statement(pkey, "t", "pk_p").endswith("PRIMARY KEY (id, short_code)")
+    short_code = IndexInfo("shortener_link_short_code_key", "", "u", "UNIQUE (short_code)")
+    assert constraint_statement(short_code, "t", "uq_p") == "ALTER TABLE t ADD CONSTRAINT uq_p UNIQUE (short_code)"
+    other = IndexInfo("shortener_link_owner_uniq", "", "u", "UNIQUE (owner_id, url_hash)")
+    assert constraint_statement(other, "t", "uq_p") == "CREATE INDEX uq_p ON t (owner_id, url_hash)"
+    assert len(suffixed("x" * 70, "_old")) == 63
+
+
+class RecordingCursor:
+    def __init__(self):
+        self.statements = []
+
+    def execute(self, sql, params=None):
+        self.statements.append(sql)
+
+
+def test_copy_batch_locks_copied_rows(monkeypatch):
+    """測試分批複製以 FOR SHARE 讀取，同時進行的刪除會等待複製提交後再由 trigger 套用。"""
+    monkeypatch.setattr(partitioning, "get_progress", lambda cursor: (0, 10))
+    monkeypatch.setattr(partitioning, "get_columns", lambda cursor, table: ["id", "short_code"])
+    cursor = RecordingCursor()
+    assert copy_batch(cursor, 4) == (4, 10)
+    assert "WHERE id > %s AND id <= %s FOR SHARE ON CONFLICT DO NOTHING" in cursor.statements[0]
+
+
+def test_partition_migration_is_self_contained():
+    """
+    測試 0006 migration 不匯入 shortener 的模組 (目前的 Link 模型)，並與線上遷移以相同方式改寫索引。
+    """
+    migration = importlib.import_module("shortener.migrations.0006_partition_link_table")
+    tree = ast.parse(inspect.getsource(migration))
+    imported = [node.module for node in ast.walk(tree) if isinstance(node, ast.ImportFrom)]
+    imported += [alias.name for node in ast.walk(tree) if isinstance(node, ast.Import) for alias in node.names]
+    assert not [name for name in imported if name.startswith("shortener")]
+
+    anon = ("shortener_link_anon", "CREATE UNIQUE INDEX shortener_link_anon ON public.shortener_link "
+            "USING btree (url_hash) WHERE (owner_id IS NULL)", None, None)
+    like = ("shortener_link_like", "CREATE UNIQUE INDEX shortener_link_like ON public.shortener_link "
+            "USING btree (short_code varchar_pattern_ops)", None, None)
+    for name, definition, contype, constraint_definition in [
+        anon, like,
+        ("shortener_link_pkey", "", "p", "PRIMARY KEY (id)"),
+        ("shortener_link_short_code_key", "", "u", "UNIQUE (short_code)"),
+        ("shortener_link_owner_uniq", "", "u", "UNIQUE (owner_id, url_hash)"),
+    ]:
+        index = IndexInfo(name, definition, contype, constraint_definition)
+        expected = (constraint_statement(index, "t", name) if contype
+                    else rewrite_index(index, "t", name))
+        assert migration._index_statement(name, definition, contype, constraint_definition, "t") == expected
+
+
+@pytest.mark.django_db
+@override_settings(**PARTITIONED_DEDUP)
+def test_dedup_with_partitioning_enabled():
+    """測試啟用分割後，單筆與批次建立的去重仍回傳既有的連結。"""
+    user = User.objects.create_user(username="partitioned", password="password123")
+    first = create_link("https://example.com/a", owner=user)
+    assert create_link("https://example.com/a", owner=user).pk == first.pk
+
+    links = bulk_create_links(["https://example.com/a", "https://example.com/b", "https://example.com/b"], owner=user)
+    assert links[0].pk == first.pk
+    assert links[1].pk == links[2].pk
+    assert Link.objects.filter(owner=user).count() == 2
+
+
+@pytest.mark.django_db
+def test_url_hash_indexes_match_migration_state():
+    """測試 (owner, url_hash) 在資料庫中與 migration state 一致：只有一般索引，沒有唯一約束。"""
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, Link._meta.db_table)
+    assert not constraints["shortener_link_owner_url_hash"]["unique"]
+    assert not constraints["shortener_link_anon_url_hash"]["unique"]
+    assert not any(name.endswith("_url_hash_uniq") for name in constraints)
+    assert not any(constraint.name.endswith("_url_hash_uniq") for constraint in Link._meta.constraints)
+
+
+@requires_postgres
+@pytest.mark.django_db
+@override_settings(**PARTITIONED_DEDUP)
+def test_partition_links_command_migrates_online():
+    """
+    測試 partition_links 指令將既有的 Link 表分批遷移為分割表。
+
+    驗證：
+    - 既有資料與遷移期間 (trigger 同步) 的寫入都被複製
+    - 交換後 ORM 的建立、重定向與短代碼唯一約束都正常
+    """
+    user = User.objects.create_user(username="partition", password="password123")
+    for n in range(7):
+        Link.objects.create(original_url=f"https://{n}.example.com", short_code=f"part{n}", owner=user)
+
+    call_command("partition_links", batch_size=2, no_swap=True, stdout=io.StringIO())
+    Link.objects.create(original_url="https://late.example.com", short_code="partlate", owner=user)
+    Link.objects.filter(short_code="part0").update(click_count=5)
+    call_command("partition_links", drop_old=True, stdout=io.StringIO())
+
+    with connection.cursor() as cursor:
+        assert is_partitioned(cursor)
+        assert not table_exists(cursor, OLD_TABLE)
+    assert Link.objects.count() == 8
+    assert Link.objects.get(short_code="part0").click_count == 5
+
+    link = create_link("https://new.example.com", owner=user)
+    assert Link.objects.get(pk=link.pk).short_code == link.short_code
+    assert Client().get("/part3").status_code == 302
+    with pytest.raises(IntegrityError), transaction.atomic():
+        Link.objects.create(original_url="https://dup.example.com", short_code="part3")
@@ -0,0 +1,167 @@
+import time
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+from ninja import NinjaAPI
+from ninja.testing import TestClient
+from ninja_jwt.tokens import RefreshToken
+
+from ninja_shortener.api import api
+from shortener.checks import check_rate_limit_cache
+from shortener.models import Link
+from shortener.ratelimit import TokenBucket
+
+LIMITS = {"RATES": {"shorten": {"RATE": 1.0, "BURST": 3}, "shorten_bulk": {"RATE": 1.0, "BURST": 1}}}
+
+
+@pytest.fixture(autouse=True)
+def reset_ninja_registry():
+    """清除 Ninja 的內部註冊表以防止 ConfigError。"""
+    yield
+    if hasattr(NinjaAPI, "_registry"):
+        NinjaAPI._registry = []
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("shortener.ratelimit.time.time", lambda: now[0])
+    return now
+
+
+def test_token_bucket_allows_burst_then_refills(clock):
+    """
+    測試 token bucket 允許連續送出 burst 個請求，之後依速率補充。
+
+    驗證：
+    - 超過容量時拒絕並回傳需等待的秒數
+    - 經過一個補充間隔後再放行一個請求
+    - 不同的 key 互不影響
+    """
+    bucket = TokenBucket(rate=2.0, burst=3, key_prefix="test-bucket")
+    assert all(bucket.hit("a").allowed for _ in range(3))
+
+    denied = bucket.hit("a")
+    assert not denied.allowed
+    assert denied.retry_after == pytest.approx(0.5)
+    assert bucket.hit("b").allowed
+
+    clock[0] += 0.5
+    assert bucket.hit("a").allowed
+    assert not bucket.hit("a").allowed
+
+
+def test_token_bucket_async(clock):
+    """測試非同步版本與同步版本共用同一個狀態。"""
+    bucket = TokenBucket(rate=1.0, burst=1, key_prefix="test-bucket")
+
+    async def ahit():
+        return await bucket.ahit("a")
+
+    assert async_to_sync(ahit)().allowed
+    assert not bucket.hit("a").allowed
+
+
+def test_token_bucket_costs_less_than_a_millisecond():
+    """測試限制器本身每次檢查的成本低於 1 毫秒 (本機快取)。"""
+    bucket = TokenBucket(rate=1000.0, burst=1000, key_prefix="test-bucket")
+    started = time.perf_counter()
+    for n in range(2000):
+        bucket.hit(f"client-{n % 50}")
+    assert (time.perf_counter() - started) / 2000 < 0.001
+
+
+@pytest.mark.django_db
+@override_settings(SHORTENER_RATE_LIMITS=LIMITS)
+def test_form_view_returns_429_per_ip():
+    """
+    測試匿名表單提交依 IP 限制，超過時回傳 429 與 Retry-After。
+
+    驗證：
+    - 前 3 次成功建立
+    - 第 4 次回傳 429 且沒有建立連結
+    - 其他 IP 不受影響
+    """
+    client = Client(REMOTE_ADDR="10.0.0.1")
+    for n in range(3):
+        response = client.post("/shorten/", {"original_url": f"https://{n}.example.com"})
+        assert response.status_code == 302
+
+    response = client.post("/shorten/", {"original_url": "https://blocked.example.com"})
+    assert response.status_code == 429
+    assert int(response["Retry-After"]) >= 1
+    assert not Link.objects.filter(original_url="https://blocked.example.com").exists()
+
+    response = Client(REMOTE_ADDR="10.0.0.2").post("/shorten/", {"original_url": "https://other.example.com"})
+    assert response.status_code == 302
+
+
+@pytest.mark.django_db
+@override_settings(SHORTENER_RATE_LIMITS=LIMITS)
+def test_api_returns_429_per_user():
+    """
+    測試 API 依使用者限制，超過時回傳 JSON 格式的 429 與 Retry-After。
+
+    驗證：
+    - 單筆與批次端點分開計算
+    """
+    user = User.objects.create_user(username="limited", password="password123")
+    token = str(RefreshToken.for_user(user).access_token)
+    client = TestClient(api, headers={"Authorization": f"Bearer {token}"})
+
+    for n in range(3):
+        assert client.post("/shorten", json={"original_url": f"https://{n}.example.com"}).status_code == 200
+    response = client.post("/shorten", json={"original_url": "https://blocked.example.com"})
+    assert response.status_code == 429
+    assert response.json() == {"detail": "Too many requests."}
+    assert response["Retry-After"] == "1"
+
+    assert client.post("/shorten/bulk", json={"original_urls": ["https://a.example.com"]}).status_code == 200
+    assert client.post("/shorten/bulk", json={"original_urls": ["https://b.example.com"]}).status_code == 429
+
+
+@pytest.mark.django_db
+@override_settings(SHORTENER_RATE_LIMITS={**LIMITS, "ENABLED": False})
+def test_rate_limit_can_be_disabled():
+    """測試停用速率限制後不會回傳 429。"""
+    client = Client()
+    for n in range(5):
+        response = client.post("/shorten/", {"original_url": f"https://{n}.example.com"})
+        assert response.status_code == 302
+
+
+@pytest.mark.django_db
+@override_settings(SHORTENER_RATE_LIMITS=LIMITS, ROOT_URLCONF="ninja_shortener.urls_async")
+def test_async_form_view_rate_limited():
+    """測試非同步表單視圖同樣受到速率限制。"""
+    client = AsyncClient()
+
+    async def submit(n):
+        return await client.post("/shorten/", {"original_url": f"https://{n}.example.com"})
+
+    statuses = [async_to_sync(submit)(n).status_code for n in range(4)]
+    assert statuses == [302, 302, 302, 429]
+
+
+def test_check_warns_about_process_local_cache():
+    """
+    測試速率限制使用行程內的快取時，system check 提出警告。
+
+    驗證：
+    - 正式環境 (DEBUG 關閉) 使用 LocMemCache 時回報 shortener.W001
+    - 指向共用快取、停用速率限制或 DEBUG 時不警告
+    """
+    locmem = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+    shared = {**locmem, "shared": {"BACKEND": "django.core.cache.backends.redis.RedisCache",
+                                   "LOCATION": "redis://127.0.0.1:6379"}}
+    with override_settings(DEBUG=False, CACHES=locmem):
+        assert [warning.id for warning in check_rate_limit_cache(None)] == ["shortener.W001"]
+        with override_settings(SHORTENER_RATE_LIMITS={"ENABLED": False}):
+            assert check_rate_limit_cache(None) == []
+    with override_settings(DEBUG=False, CACHES=shared, SHORTENER_RATE_LIMITS={"CACHE_ALIAS": "shared"}):
+        assert check_rate_limit_cache(None) == []
+    with override_settings(DEBUG=True, CACHES=locmem):
+        assert check_rate_limit_cache(None) == []
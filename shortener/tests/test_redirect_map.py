@@ -0,0 +1,142 @@
+import datetime
+import io
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from shortener import redirectmap
+from shortener.models import DeletedLink, Link, OwnerStats
+from shortener.redirectmap import MapEntry, merge_changes
+from shortener.utils import DELETE_FIELDS, delete_links
+
+
+def test_merge_changes_keeps_order():
+    """測試合併變更時新增、修改與移除都維持 short_code 的排序。"""
+    previous = [MapEntry("b", "https://b", 302), MapEntry("d", "https://d", 302), MapEntry("f", "https://f", 302)]
+    changes = [("a", MapEntry("a", "https://a", 302)), ("d", None), ("e", MapEntry("e", "https://e", 301)),
+               ("f", MapEntry("f", "https://f2", 302)), ("g", None)]
+    assert [entry.short_code for entry in merge_changes(previous, changes)] == ["a", "b", "e", "f"]
+    assert list(merge_changes(previous, changes))[-1].original_url == "https://f2"
+
+
+@pytest.mark.django_db
+def test_export_redirect_map_full_then_incremental(tmp_path, monkeypatch):
+    """
+    測試 export_redirect_map 指令。
+
+    驗證：
+    - 完整匯出依 short_code 排序，略過有到期時間與含有不安全字元的連結
+    - nginx map 檔包含目標網址，永久重定向另外列在第二個 map
+    - 增量匯出不讀取整個 Link 表，只套用變更、刪除與新增的連結
+    """
+    Link.objects.create(original_url="https://example.com/b", short_code="mapb")
+    Link.objects.create(original_url="https://example.com/a", short_code="mapa", redirect_permanent=True)
+    Link.objects.create(original_url="https://example.com/$var", short_code="mapunsafe")
+    Link.objects.create(original_url="https://example.com/e", short_code="mapexpiring",
+                        expires_at=timezone.now() + datetime.timedelta(days=1))
+    tsv = tmp_path / "redirects.tsv"
+    nginx = tmp_path / "redirects.map"
+
+    out = io.StringIO()
+    call_command("export_redirect_map", str(tsv), nginx=str(nginx), stdout=out)
+    assert "Exported 2 redirects (full export)." in out.getvalue()
+    assert tsv.read_text() == "mapa\thttps://example.com/a\t301\nmapb\thttps://example.com/b\t302\n"
+    nginx_map = nginx.read_text()
+    assert '    /mapb "https://example.com/b";\n' in nginx_map
+    assert "map $uri $shortener_redirect_permanent {\n    default 0;\n    /mapa 1;\n}" in nginx_map
+    assert not list(tmp_path.glob("*.tmp"))
+
+    def full_scan():
+        raise AssertionError("incremental export should not read every link")
+    monkeypatch.setattr(redirectmap, "iter_all_entries", full_scan)
+
+    changed = Link.objects.get(short_code="mapb")
+    changed.original_url = "https://example.com/b2"
+    changed.save()
+    delete_links(Link.objects.filter(short_code="mapa").values(*DELETE_FIELDS))
+    Link.objects.create(original_url="https://example.com/c", short_code="mapc")
+
+    call_command("export_redirect_map", str(tsv), nginx=str(nginx), stdout=io.StringIO())
+    assert tsv.read_text() == "mapb\thttps://example.com/b2\t302\nmapc\thttps://example.com/c\t302\n"
+    assert "/mapa" not in nginx.read_text()
+
+
+@pytest.mark.django_db
+def test_export_redirect_map_prunes_deletion_records(tmp_path):
+    """
+    測試刪除紀錄的清除。
+
+    驗證：
+    - 一批刪除只以一個 INSERT 寫入刪除紀錄，刪除使用者時其連結同樣被記錄
+    - 匯出後刪除已被涵蓋 (早於匯出開始時間 - overlap) 的紀錄，保留之後的紀錄
+    - --keep-deleted 保留所有紀錄，搭配 --prune-deleted 只刪除超過指定天數的紀錄
+    """
+    user = User.objects.create_user(username="mapowner", password="password123")
+    Link.objects.bulk_create([Link(original_url=f"https://example.com/{n}", short_code=f"gone{n}") for n in range(3)])
+    Link.objects.create(original_url="https://example.com/owned", short_code="owned", owner=user)
+    delete_links(Link.objects.filter(short_code__startswith="gone").values(*DELETE_FIELDS))
+    user.delete()
+    assert sorted(DeletedLink.objects.values_list("short_code", flat=True)) == ["gone0", "gone1", "gone2", "owned"]
+    DeletedLink.objects.update(deleted_at=timezone.now() - datetime.timedelta(days=10))
+    DeletedLink.objects.create(short_code="recent")
+
+    out = io.StringIO()
+    call_command("export_redirect_map", str(tmp_path / "a.tsv"), keep_deleted=True, stdout=out)
+    assert "Pruned" not in out.getvalue()
+    assert DeletedLink.objects.count() == 5
+
+    call_command("export_redirect_map", str(tmp_path / "a.tsv"), keep_deleted=True, prune_deleted=7, stdout=out)
+    assert "Pruned 4 deletion records." in out.getvalue()
+    DeletedLink.objects.create(short_code="old")
+    DeletedLink.objects.filter(short_code="old").update(deleted_at=timezone.now() - datetime.timedelta(hours=1))
+
+    out = io.StringIO()
+    call_command("export_redirect_map", str(tmp_path / "b.tsv"), stdout=out)
+    assert "Pruned 1 deletion records." in out.getvalue()
+    assert list(DeletedLink.objects.values_list("short_code", flat=True)) == ["recent"]
+
+
+@pytest.mark.django_db
+def test_every_delete_path_records_deletions():
+    """
+    測試不經過 delete_links 的刪除同樣寫入刪除紀錄並扣除擁有者統計。
+
+    驗證：
+    - Link.delete() 與 QuerySet.delete() (管理後台的刪除) 都記錄短代碼
+    - 點擊最多的連結被刪除時從擁有者統計清除
+    """
+    user = User.objects.create_user(username="plaindelete", password="password123")
+    top = Link.objects.create(original_url="https://example.com/top", short_code="plaintop", owner=user)
+    Link.objects.create(original_url="https://example.com/other", short_code="plainother", owner=user)
+    Link.objects.bulk_create([Link(original_url=f"https://example.com/{n}", short_code=f"plain{n}") for n in range(2)])
+    OwnerStats.objects.filter(owner=user).update(click_count=5, top_link=top, top_link_clicks=5)
+    Link.objects.filter(pk=top.pk).update(click_count=5)
+
+    top.delete()
+    assert top.pk is None
+    stats = OwnerStats.objects.get(owner=user)
+    assert (stats.link_count, stats.click_count, stats.top_link_id) == (1, 0, None)
+
+    assert Link.objects.filter(short_code__in=["plain0", "plain1", "plainother"]).delete()[0] == 3
+    assert sorted(DeletedLink.objects.values_list("short_code", flat=True)) == [
+        "plain0", "plain1", "plainother", "plaintop",
+    ]
+    assert OwnerStats.objects.get(owner=user).link_count == 0
+
+
+@pytest.mark.django_db
+@override_settings(SHORTENER_REDIRECT_MAP={"TRACK_DELETIONS": False})
+def test_deletions_untracked_when_disabled(tmp_path):
+    """測試關閉 TRACK_DELETIONS 時不寫入刪除紀錄，且每次都完整匯出。"""
+    tsv = tmp_path / "redirects.tsv"
+    Link.objects.create(original_url="https://example.com/a", short_code="untracked")
+    call_command("export_redirect_map", str(tsv), stdout=io.StringIO())
+    delete_links(Link.objects.values(*DELETE_FIELDS))
+    assert not DeletedLink.objects.exists()
+
+    out = io.StringIO()
+    call_command("export_redirect_map", str(tsv), stdout=out)
+    assert "Exported 0 redirects (full export)." in out.getvalue()
@@ -0,0 +1,237 @@
+import datetime
+import gzip
+import io
+import re
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+from django.utils import timezone
+from ninja import NinjaAPI
+from ninja.testing import TestClient
+from ninja_jwt.tokens import RefreshToken
+
+from ninja_shortener.api import api
+from shortener import accesslog
+from shortener.accesslog import log_fingerprint, parse_line
+from shortener.models import AccessLogProgress, ClickEvent, Link, OwnerStats
+from shortener.utils import create_link
+
+
+@pytest.fixture(autouse=True)
+def reset_ninja_registry():
+    """清除 Ninja 的內部註冊表以防止 ConfigError。"""
+    yield
+    if hasattr(NinjaAPI, "_registry"):
+        NinjaAPI._registry = []
+
+
+def log_line(code, status=302, time="17/Oct/2026:10:00:00 +0000", extra=' "-" "Mozilla/5.0"'):
+    return f'203.0.113.9 - - [{time}] "GET /{code} HTTP/1.1" {status} 0{extra}\n'
+
+
+@pytest.mark.django_db
+def test_redirect_policy_headers():
+    """
+    測試每個連結的重定向策略。
+
+    驗證：
+    - 預設為沒有 Cache-Control 的 302
+    - redirect_permanent 回傳 301，cache_max_age 加上 public, max-age
+    - cache_max_age 為 0 時回傳 no-store
+    - 有到期時間的連結，快取期間不超過到期時間
+    """
+    Link.objects.create(original_url="https://example.com/a", short_code="plain")
+    Link.objects.create(original_url="https://example.com/b", short_code="cached", redirect_permanent=True,
+                        cache_max_age=3600)
+    Link.objects.create(original_url="https://example.com/c", short_code="nostore", cache_max_age=0)
+    Link.objects.create(original_url="https://example.com/d", short_code="soon", cache_max_age=3600,
+                        expires_at=timezone.now() + datetime.timedelta(seconds=60))
+    client = Client()
+
+    response = client.get("/plain")
+    assert response.status_code == 302
+    assert not response.has_header("Cache-Control")
+
+    response = client.get("/cached")
+    assert response.status_code == 301
+    assert response["Location"] == "https://example.com/b"
+    assert response["Cache-Control"] == "public, max-age=3600"
+
+    assert client.get("/nostore")["Cache-Control"] == "no-store"
+    max_age = int(client.get("/soon")["Cache-Control"].rsplit("=", 1)[1])
+    assert 0 < max_age <= 60
+
+
+@pytest.mark.django_db
+@override_settings(ROOT_URLCONF="ninja_shortener.urls_async", SHORTENER_REDIRECTS={"DEFAULT_MAX_AGE": 300})
+def test_redirect_default_max_age_async():
+    """測試非同步的重定向視圖同樣套用 SHORTENER_REDIRECTS 的預設 max-age。"""
+    Link.objects.create(original_url="https://example.com", short_code="asyncmax")
+    response = async_to_sync(AsyncClient().get)("/asyncmax")
+    assert response.status_code == 302
+    assert response["Cache-Control"] == "public, max-age=300"
+
+
+@pytest.mark.django_db
+@override_settings(SHORTENER_DEDUP={"ENABLED": True}, SHORTENER_REDIRECTS={"MAX_MAX_AGE": 86400})
+def test_api_sets_redirect_policy():
+    """
+    測試 API 設定重定向策略。
+
+    驗證：
+    - 回應包含 redirect_permanent 與 cache_max_age
+    - 自訂策略的連結不與既有的相同網址去重
+    - 超過 MAX_MAX_AGE 的 cache_max_age 被拒絕
+    """
+    user = User.objects.create_user(username="policy", password="password123")
+    token = str(RefreshToken.for_user(user).access_token)
+    client = TestClient(api, headers={"Authorization": f"Bearer {token}"})
+    existing = create_link("https://example.com/policy", owner=user)
+
+    response = client.post("/shorten", json={"original_url": "https://example.com/policy",
+                                             "redirect_permanent": True, "cache_max_age": 600})
+    assert response.status_code == 200
+    assert response.json()["redirect_permanent"] is True
+    assert response.json()["cache_max_age"] == 600
+    assert response.json()["short_code"] != existing.short_code
+
+    response = client.post("/shorten/bulk", json={"original_urls": ["https://example.com/x"], "cache_max_age": 60})
+    assert Link.objects.get(short_code=response.json()["results"][0]["short_code"]).cache_max_age == 60
+
+    response = client.post("/shorten", json={"original_url": "https://example.com", "cache_max_age": 86401})
+    assert response.status_code == 400
+
+
+def test_parse_access_log_lines():
+    """
+    測試存取日誌的解析。
+
+    驗證：
+    - 同時支援 Common 與 Combined Log Format，查詢字串會被忽略
+    - 非 GET、非重定向、不像短代碼的路徑以及不符合 hit_pattern 的行被略過
+    """
+    entry = parse_line(log_line("abc123?utm_source=x"))
+    assert entry.short_code == "abc123"
+    assert entry.clicked_at == datetime.datetime(2026, 10, 17, 10, tzinfo=datetime.timezone.utc)
+    assert parse_line(log_line("abc123", extra="")).short_code == "abc123"
+
+    assert parse_line(log_line("abc123", status=404)) is None
+    assert parse_line(log_line("api/shorten")) is None
+    assert parse_line(log_line("abc123").replace("GET", "HEAD")) is None
+    assert parse_line("not a log line") is None
+    assert parse_line(log_line("abc123", extra=' "-" "ua" MISS'), hit_pattern=re.compile(r" HIT$")) is None
+
+
+@pytest.mark.django_db
+@override_settings(SHORTENER_CLICK_TRACKING={"RECORD_EVENTS": True})
+def test_ingest_access_logs_command(tmp_path):
+    """
+    測試 ingest_access_logs 指令。
+
+    驗證：
+    - 重定向依短代碼累加回 click_count 與擁有者統計，last_clicked_at 取最新的日誌時間
+    - 同時寫入原始點擊事件
+    - 找不到的短代碼與其他請求分別計數，--since / --until 以外的行略過
+    - 完成後保留進度，再次執行同一個檔案 (包含壓縮後) 不會重複累加
+    """
+    user = User.objects.create_user(username="edge", password="password123")
+    link = create_link("https://example.com/edge", owner=user)
+    other = Link.objects.create(original_url="https://example.com/other", short_code="edge2", click_count=1)
+    log = tmp_path / "access.log"
+    log.write_text(
+        log_line(link.short_code)
+        + log_line(link.short_code, status=301, time="17/Oct/2026:11:30:00 +0000")
+        + log_line("edge2")
+        + log_line("missing")
+        + log_line(link.short_code, status=200)
+        + log_line(link.short_code, time="17/Oct/2026:12:00:00 +0000")
+        + "garbage\n"
+    )
+
+    out = io.StringIO()
+    call_command("ingest_access_logs", str(log), batch_size=2, since="2026-10-17T09:00:00Z",
+                 until="2026-10-17T12:00:00", stdout=out)
+    assert "Read 7 lines: 3 clicks added, 1 unknown short codes, 3 skipped." in out.getvalue()
+
+    link.refresh_from_db()
+    assert link.click_count == 2
+    assert link.last_clicked_at == datetime.datetime(2026, 10, 17, 11, 30, tzinfo=datetime.timezone.utc)
+    assert Link.objects.get(pk=other.pk).click_count == 2
+    assert OwnerStats.objects.get(owner=user).click_count == 2
+    assert ClickEvent.objects.count() == 3
+
+    gzipped = tmp_path / "access.log.1.gz"
+    gzipped.write_bytes(gzip.compress(log.read_bytes()))
+    for path in (log, gzipped):
+        out = io.StringIO()
+        call_command("ingest_access_logs", str(path), since="2026-10-17T09:00:00Z", stdout=out)
+        assert "Resuming after line 7." in out.getvalue()
+    link.refresh_from_db()
+    assert link.click_count == 2
+    assert AccessLogProgress.objects.get().read == 7
+
+
+@pytest.mark.django_db
+def test_ingest_access_logs_resumes_from_committed_progress(tmp_path, monkeypatch):
+    """
+    測試中斷後重新執行時，已提交的行不會被重複累加。
+
+    驗證：
+    - 進度與點擊在同一個交易中提交，批次失敗時兩者都不會寫入
+    - 重新執行從最後提交的行之後繼續，新增到檔案尾端的行會被處理
+    """
+    Link.objects.create(original_url="https://example.com/resume", short_code="resume")
+    log = tmp_path / "access.log"
+    log.write_text(log_line("resume") * 5)
+
+    ingest_batch = accesslog.ingest_batch
+    calls = []
+
+    def crash_on_second_batch(entries, **kwargs):
+        calls.append(len(entries))
+        result = ingest_batch(entries, **kwargs)
+        if len(calls) == 2:
+            raise RuntimeError("worker killed")
+        return result
+
+    monkeypatch.setattr(accesslog, "ingest_batch", crash_on_second_batch)
+    with pytest.raises(RuntimeError):
+        call_command("ingest_access_logs", str(log), hit_pattern="Mozilla", batch_size=3, stdout=io.StringIO())
+    assert Link.objects.get(short_code="resume").click_count == 3
+    assert AccessLogProgress.objects.get(source=log_fingerprint(log_line("resume"))).read == 3
+
+    monkeypatch.setattr(accesslog, "ingest_batch", ingest_batch)
+    with log.open("a") as f:
+        f.write(log_line("resume"))
+    out = io.StringIO()
+    call_command("ingest_access_logs", str(log), hit_pattern="Mozilla", stdout=out)
+    assert "Resuming after line 3." in out.getvalue()
+    assert "Read 6 lines: 6 clicks added" in out.getvalue()
+    assert Link.objects.get(short_code="resume").click_count == 6
+
+
+@pytest.mark.django_db
+def test_ingest_access_logs_requires_hit_pattern_or_window(tmp_path):
+    """
+    測試沒有 --hit-pattern 或時間範圍時拒絕匯入，避免重複累加已由 Django 記錄的點擊。
+
+    驗證：
+    - 兩者都未指定時以錯誤結束，不修改點擊數
+    - 指定 --hit-pattern 時只計入快取命中的行
+    """
+    Link.objects.create(original_url="https://example.com/hit", short_code="hit1")
+    log = tmp_path / "access.log"
+    log.write_text(log_line("hit1", extra=' "-" "ua" HIT') + log_line("hit1", extra=' "-" "ua" MISS'))
+
+    with pytest.raises(CommandError, match="--hit-pattern"):
+        call_command("ingest_access_logs", str(log), stdout=io.StringIO())
+    with pytest.raises(CommandError, match="Invalid --since"):
+        call_command("ingest_access_logs", str(log), since="yesterday", stdout=io.StringIO())
+    assert Link.objects.get(short_code="hit1").click_count == 0
+
+    call_command("ingest_access_logs", str(log), hit_pattern=r" HIT$", stdout=io.StringIO())
+    assert Link.objects.get(short_code="hit1").click_count == 1
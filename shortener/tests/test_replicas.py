@@ -0,0 +1,272 @@
+import base64
+import json
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.db import OperationalError, connections, transaction
+from django.http import HttpResponse
+from django.test import Client, RequestFactory
+from django.test.utils import override_settings
+
+from shortener import cache, export, replicas
+from shortener.cache import aload_resolved_link, load_resolved_link
+from shortener.checks import check_replica_pinning_cache
+from shortener.export import astream_links, stream_links
+from shortener.models import Link
+from shortener.replicas import (
+    ReadReplicaRouter,
+    ReplicaPinningMiddleware,
+    read_alias,
+    read_from_replica,
+    use_primary,
+    use_replica,
+)
+
+REPLICAS = {"REPLICAS": ["replica1", "replica2"], "RETRY_INTERVAL": 60}
+
+
+class FakeReplica:
+    """模擬副本的連線，up 為 False 時建立連線失敗。"""
+
+    def __init__(self, up):
+        self.up = up
+        self.attempts = 0
+
+    def ensure_connection(self):
+        self.attempts += 1
+        if not self.up:
+            raise OperationalError("could not connect to server")
+
+
+@pytest.fixture
+def fake_replicas(monkeypatch):
+    handler = {"default": connections["default"], "replica1": FakeReplica(True), "replica2": FakeReplica(False)}
+    monkeypatch.setattr(replicas, "connections", handler)
+    return handler
+
+
+@pytest.mark.django_db(transaction=True)
+@override_settings(SHORTENER_READ_REPLICAS=REPLICAS)
+def test_router_reads_replica_only_inside_use_replica(fake_replicas):
+    """
+    測試讀取只在 use_replica 區塊中走副本。
+
+    驗證：
+    - 區塊外由 Django 預設走主庫，寫入一律走主庫
+    - 連線失敗的副本不會被選到
+    - use_primary 與交易中的讀取走主庫
+    """
+    router = ReadReplicaRouter()
+    assert router.db_for_read(Link) is None
+    with use_replica() as alias:
+        assert alias == "replica1"
+        assert router.db_for_read(Link) == "replica1"
+        assert router.db_for_write(Link) == "default"
+        with transaction.atomic():
+            assert router.db_for_read(Link) == "default"
+    with use_primary(), use_replica() as alias:
+        assert alias == "default"
+        assert router.db_for_read(Link) is None
+    assert not router.allow_migrate("replica1", "shortener")
+    assert router.allow_migrate("default", "shortener") is None
+
+
+@override_settings(SHORTENER_READ_REPLICAS=REPLICAS)
+def test_unavailable_replicas_fall_back_to_primary(fake_replicas):
+    """測試所有副本都無法連線時改讀主庫，且 RETRY_INTERVAL 內不再嘗試連線。"""
+    fake_replicas["replica1"].up = False
+    with use_replica() as alias:
+        assert alias == "default"
+    with use_replica() as alias:
+        assert alias == "default"
+    assert fake_replicas["replica1"].attempts == 1
+    assert fake_replicas["replica2"].attempts == 1
+
+
+@pytest.mark.django_db
+@override_settings(SHORTENER_READ_REPLICAS={"REPLICAS": ["replica1"], "RETRY_INTERVAL": 60})
+def test_redirect_works_when_replica_is_down(fake_replicas):
+    """測試副本無法連線時，重定向解析改由主庫完成。"""
+    fake_replicas["replica1"].up = False
+    Link.objects.create(original_url="https://example.com", short_code="replica1")
+    response = Client().get("/replica1")
+    assert response.status_code == 302
+    assert response.url == "https://example.com"
+
+
+@override_settings(SHORTENER_READ_REPLICAS=REPLICAS)
+def test_pinning_middleware_reads_primary_after_write(fake_replicas):
+    """
+    測試寫入後的讀取固定走主庫 (read-your-writes)。
+
+    驗證：
+    - 寫入請求期間讀主庫，成功後設定 cookie
+    - 帶有 cookie 的讀取請求走主庫，沒有 cookie 時讀副本
+    """
+    seen = []
+
+    def view(request):
+        with use_replica() as alias:
+            seen.append(alias)
+        return HttpResponse()
+
+    middleware = ReplicaPinningMiddleware(view)
+    factory = RequestFactory()
+
+    response = middleware(factory.post("/shorten/"))
+    assert response.cookies["shortener_use_primary"]["max-age"] == 10
+
+    pinned = factory.get("/dashboard/")
+    pinned.COOKIES["shortener_use_primary"] = "1"
+    middleware(pinned)
+    middleware(factory.get("/dashboard/"))
+    assert seen == ["default", "default", "replica1"]
+
+
+def bearer(user_id):
+    """只有 payload 的 JWT (簽章由 API 的驗證檢查，選擇讀取的資料庫時不驗證)。"""
+    payload = base64.urlsafe_b64encode(json.dumps({"user_id": user_id}).encode()).decode().rstrip("=")
+    return f"Bearer header.{payload}.signature"
+
+
+@override_settings(SHORTENER_READ_REPLICAS=REPLICAS)
+def test_pinning_middleware_pins_jwt_clients_by_user(fake_replicas):
+    """
+    測試不保存 cookie 的 JWT 用戶端寫入後同樣讀主庫。
+
+    驗證：
+    - 成功的寫入在共用快取記錄 token 中的使用者 id
+    - 同一個使用者之後的讀取 (同步與非同步) 走主庫，其他使用者與無法解析的 token 讀副本
+    - 失敗的寫入不記錄
+    """
+    seen = []
+
+    def view(request):
+        with use_replica() as alias:
+            seen.append(alias)
+        return HttpResponse(status=400 if request.path == "/bad/" else 200)
+
+    async def async_view(request):
+        return view(request)
+
+    middleware = ReplicaPinningMiddleware(view)
+    factory = RequestFactory()
+    middleware(factory.post("/api/shorten", HTTP_AUTHORIZATION=bearer(7)))
+    middleware(factory.post("/bad/", HTTP_AUTHORIZATION=bearer(8)))
+    seen.clear()
+
+    for user_id in (7, 8):
+        middleware(factory.get("/api/links", HTTP_AUTHORIZATION=bearer(user_id)))
+    middleware(factory.get("/api/links", HTTP_AUTHORIZATION="Bearer not-a-jwt"))
+    async_to_sync(ReplicaPinningMiddleware(async_view))(factory.get("/api/links", HTTP_AUTHORIZATION=bearer(7)))
+    assert seen == ["default", "replica1", "replica1", "default"]
+
+
+class BrokenQuery:
+    """模擬副本連線可建立但查詢失敗 (例如連線在查詢中斷開)。"""
+
+    def _fail(self, *args, **kwargs):
+        raise OperationalError("server closed the connection unexpectedly")
+
+    first = afirst = iterator = aiterator = _fail
+
+
+@pytest.fixture
+def failing_replica_queries(monkeypatch):
+    """讓 replica1 上的解析與匯出查詢失敗，主庫照常。"""
+    resolved_row = cache._resolved_row
+    monkeypatch.setattr(cache, "_resolved_row", lambda qs, code: BrokenQuery() if qs.db == "replica1" else resolved_row(qs, code))
+    export_queryset = export.export_queryset
+    monkeypatch.setattr(export, "export_queryset",
+                        lambda owner, using=None: BrokenQuery() if using == "replica1" else export_queryset(owner, using))
+
+
+@pytest.mark.django_db
+@override_settings(SHORTENER_READ_REPLICAS={"REPLICAS": ["replica1"], "RETRY_INTERVAL": 60})
+def test_view_retries_on_primary_when_replica_query_fails(fake_replicas):
+    """
+    測試 @read_from_replica 的視圖在副本查詢失敗時改在主庫重新執行。
+
+    驗證：
+    - 同步與非同步視圖都先讀副本，失敗後以主庫回傳結果
+    - 失敗的副本被標記為不可用，之後的請求直接讀主庫
+    """
+    seen = []
+
+    def query():
+        seen.append(read_alias() or "default")
+        if read_alias() == "replica1":
+            raise OperationalError("server closed the connection unexpectedly")
+        return "ok"
+
+    @read_from_replica
+    def view():
+        return query()
+
+    @read_from_replica
+    async def aview():
+        return query()
+
+    assert view() == "ok"
+    assert seen == ["replica1", "default"]
+    assert view() == "ok"
+    assert seen == ["replica1", "default", "default"]
+
+    replicas.reset_replica_health()
+    seen.clear()
+    assert async_to_sync(aview)() == "ok"
+    assert seen == ["replica1", "default"]
+    assert async_to_sync(aview)() == "ok"
+    assert seen == ["replica1", "default", "default"]
+
+
+@pytest.mark.django_db(transaction=True)
+@override_settings(SHORTENER_READ_REPLICAS={"REPLICAS": ["replica1"], "RETRY_INTERVAL": 60})
+def test_resolve_falls_back_when_replica_query_fails(fake_replicas, failing_replica_queries):
+    """
+    測試重定向解析在副本查詢失敗時改由主庫完成。
+
+    驗證：
+    - 同步與非同步 (事件迴圈中不事先確認連線) 的解析都回傳主庫的資料
+    - 失敗的副本被標記為不可用
+    """
+    Link.objects.create(original_url="https://example.com/fallback", short_code="fallbk1")
+    assert load_resolved_link("fallbk1").original_url == "https://example.com/fallback"
+    assert not replicas.replica_available("replica1")
+
+    replicas.reset_replica_health()
+    assert async_to_sync(aload_resolved_link)("fallbk1").original_url == "https://example.com/fallback"
+    assert not replicas.replica_available("replica1")
+
+
+@pytest.mark.django_db(transaction=True)
+@override_settings(SHORTENER_READ_REPLICAS={"REPLICAS": ["replica1"], "RETRY_INTERVAL": 60})
+def test_export_stream_falls_back_when_replica_query_fails(fake_replicas, failing_replica_queries, django_user_model):
+    """測試匯出的串流在輸出任何連結之前副本失敗時，改在主庫讀取 (同步與非同步)。"""
+    user = django_user_model.objects.create_user(username="exporter", password="password123")
+    Link.objects.create(original_url="https://example.com/export", short_code="export1", owner=user)
+
+    body = "".join(stream_links(user, "csv", using="replica1"))
+    assert "export1" in body
+    assert not replicas.replica_available("replica1")
+
+    async def collect():
+        return "".join([chunk async for chunk in astream_links(user, "csv", using="replica1")])
+
+    replicas.reset_replica_health()
+    assert "export1" in async_to_sync(collect)()
+
+
+def test_check_warns_about_process_local_pinning_cache():
+    """測試設定副本但使用者標記存放在行程內的快取 (或未設定) 時回報 shortener.W003。"""
+    locmem = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+    shared = {**locmem, "shared": {"BACKEND": "django.core.cache.backends.redis.RedisCache",
+                                   "LOCATION": "redis://127.0.0.1:6379"}}
+    with override_settings(DEBUG=False, CACHES=locmem, SHORTENER_READ_REPLICAS=REPLICAS):
+        assert [warning.id for warning in check_replica_pinning_cache(None)] == ["shortener.W003"]
+        with override_settings(SHORTENER_READ_REPLICAS={**REPLICAS, "CACHE_ALIAS": None}):
+            assert [warning.id for warning in check_replica_pinning_cache(None)] == ["shortener.W003"]
+    with override_settings(DEBUG=False, CACHES=shared, SHORTENER_READ_REPLICAS={**REPLICAS, "CACHE_ALIAS": "shared"}):
+        assert check_replica_pinning_cache(None) == []
+    with override_settings(DEBUG=False, CACHES=locmem, SHORTENER_READ_REPLICAS={"REPLICAS": []}):
+        assert check_replica_pinning_cache(None) == []
@@ -0,0 +1,88 @@
+import json
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+from django.conf import settings
+from django.urls import resolve
+from ninja import NinjaAPI
+
+# 正式環境啟動時不應匯入的模組：API 與 JWT 驗證延遲載入，開發用的 app 與 admin 不載入
+LAZY_MODULES = (
+    "ninja_shortener.api",
+    "shortener.api",
+    "ninja_jwt.authentication",
+    "ninja_jwt.controller",
+    "django_browser_reload",
+    "django.contrib.admin.sites",
+)
+
+PROBE = textwrap.dedent("""
+    import json, resource, sys, time
+    started = time.perf_counter()
+    import ninja_shortener.wsgi
+    seconds = time.perf_counter() - started
+    from django.conf import settings
+
+    def peak_rss_mb():
+        # Linux 的 ru_maxrss 會保留 fork 前父行程 (pytest) 的峰值，優先讀取 exec 後重新計算的 VmHWM
+        try:
+            with open("/proc/self/status") as f:
+                for line in f:
+                    if line.startswith("VmHWM:"):
+                        return int(line.split()[1]) / 1024
+        except OSError:
+            pass
+        # macOS 以 bytes 回報，其他平台以 KB 回報
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+    print(json.dumps({
+        "seconds": seconds,
+        "rss_mb": peak_rss_mb(),
+        "budget": settings.SHORTENER_STARTUP_BUDGET,
+        "modules": [name for name in %r if name in sys.modules],
+    }))
+""") % (LAZY_MODULES,)
+
+
+@pytest.fixture(autouse=True)
+def reset_ninja_registry():
+    """清除 Ninja 的內部註冊表以防止 ConfigError。"""
+    yield
+    if hasattr(NinjaAPI, "_registry"):
+        NinjaAPI._registry = []
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="resource 模組只在 Unix 上提供")
+def test_production_startup_budget():
+    """
+    以新的行程在正式環境設定下匯入 WSGI 應用程式。
+
+    驗證：
+    - 匯入時間與最大常駐記憶體不超過 SHORTENER_STARTUP_BUDGET
+    - API、JWT 驗證、admin 與開發用的 app 都沒有在啟動時匯入
+    """
+    env = {key: value for key, value in os.environ.items() if not key.startswith("DJANGO_")}
+    env.update({
+        "DJANGO_SETTINGS_MODULE": "ninja_shortener.settings_production",
+        "DJANGO_SECRET_KEY": "startup-budget-test",
+        "PYTHONPATH": str(settings.BASE_DIR),
+    })
+    result = subprocess.run([sys.executable, "-c", PROBE], env=env, cwd=settings.BASE_DIR,
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    report = json.loads(result.stdout)
+
+    assert report["modules"] == []
+    assert report["seconds"] <= report["budget"]["IMPORT_SECONDS"], report
+    assert report["rss_mb"] <= report["budget"]["MAX_RSS_MB"], report
+
+
+def test_api_routes_resolve_lazily():
+    """測試延遲載入的 /api/ 路由在第一次解析時載入，並保留原本的 URL namespace。"""
+    match = resolve("/api/stats")
+    assert match.namespace == "shortener_api"
+    assert resolve("/api/token/pair").namespace == "shortener_api"
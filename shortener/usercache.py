@@ -0,0 +1,29 @@
+"""
+JWT 驗證使用者快取的設定與失效 (快取本身見 shortener/auth.py)。
+
+與 auth.py 分開，讓 signals 在啟動時不需匯入 ninja_jwt；
+只有 API 路由第一次被使用時才會載入 ninja_jwt。
+"""
+from django.conf import settings
+from django.core.cache import caches
+
+DEFAULT_SETTINGS = {
+    'ENABLED': True,
+    'CACHE_ALIAS': 'default',
+    'KEY_PREFIX': 'shortener:jwt-user',
+    'MAX_TTL': None,
+}
+
+
+def get_user_cache_settings():
+    return {**DEFAULT_SETTINGS, **getattr(settings, 'SHORTENER_JWT_USER_CACHE', {})}
+
+
+def user_cache_key(user_id):
+    return f"{get_user_cache_settings()['KEY_PREFIX']}:{user_id}"
+
+
+def invalidate_cached_user(user_id):
+    """讓指定使用者的快取失效，下一個請求會重新從資料庫載入。"""
+    conf = get_user_cache_settings()
+    caches[conf['CACHE_ALIAS']].delete(user_cache_key(user_id))
@@ -1,20 +1,200 @@
-import string
-import random
-from .models import Link
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError, transaction
 
-def generate_short_code(length=7):
+from .bloom import add_short_codes
+from .codes import get_code_allocator
+from .dedup import dedup_enabled, hash_url, lock_url_hashes
+from .metrics import record_links_created
+from .models import DELETE_FIELDS, Link  # noqa: F401
+from .stats import record_links_added
+
+# 與舊有隨機代碼碰撞時的最大重試次數
+MAX_CREATE_ATTEMPTS = 5
+
+
+def generate_short_code(length=None):
     """
     生成一個指定長度的、唯一的短代碼。
 
+    代碼由 ``ShortCodeAllocator`` 依序號編碼產生，不需要查詢資料庫確認是否重複。
+
+    Args:
+        length (int): 短代碼的長度，預設使用 ``SHORTENER_SHORT_CODES['LENGTH']`` (7)。
+
+    Returns:
+        str: 一個唯一的短代碼。
+    """
+    return get_code_allocator().allocate(length)
+
+
+def find_duplicate(owner, url_hash):
+    """透過 (owner, url_hash) 索引找出已存在的相同網址。"""
+    return Link.objects.filter(owner=owner, url_hash=url_hash).first()
+
+
+def _dedup_applies(expires_at, redirect_permanent, cache_max_age):
+    """有到期時間或自訂重定向策略的連結不參與去重，避免沿用策略不同的既有連結。"""
+    return dedup_enabled() and expires_at is None and not redirect_permanent and cache_max_age is None
+
+
+def _insert_link(original_url, owner, url_hash, expires_at, redirect_permanent=False, cache_max_age=None):
+    allocator = get_code_allocator()
+    for attempt in range(MAX_CREATE_ATTEMPTS):
+        short_code = allocator.allocate()
+        try:
+            with transaction.atomic():
+                return Link.objects.create(
+                    original_url=original_url,
+                    short_code=short_code,
+                    owner=owner,
+                    url_hash=url_hash,
+                    expires_at=expires_at,
+                    redirect_permanent=redirect_permanent,
+                    cache_max_age=cache_max_age,
+                )
+        except IntegrityError:
+            if attempt == MAX_CREATE_ATTEMPTS - 1:
+                raise
+
+
+def create_link(original_url, owner=None, expires_at=None, redirect_permanent=False, cache_max_age=None):
+    """
+    建立一個新的 Link，並分配短代碼。
+
+    正常情況下只會產生一個 INSERT；只有在與分配器上線前的舊隨機代碼
+    碰撞 (IntegrityError) 時才會改用下一個代碼重試。
+    啟用 ``SHORTENER_DEDUP`` 時，同一擁有者的相同網址會直接回傳既有的 Link；
+    (owner, url_hash) 沒有唯一約束，同時送出的重複請求以 advisory lock 排隊後再確認，
+    後到的一方同樣回傳既有的 Link。
+    有到期時間 (例如活動連結) 或自訂重定向策略的連結不參與去重，每次都會建立新的 Link。
+
+    Args:
+        original_url (str): 原始長網址。
+        owner (User | None): 擁有者，匿名建立時為 None。
+        expires_at (datetime | None): 到期時間，None 表示永久有效。
+        redirect_permanent (bool): 以 301 取代 302 重定向。
+        cache_max_age (int | None): 重定向的 Cache-Control max-age (秒)，None 表示使用預設值。
+
+    Returns:
+        Link: 新建立 (或既有) 的 Link。
+    """
+    url_hash = None
+    if _dedup_applies(expires_at, redirect_permanent, cache_max_age):
+        url_hash = hash_url(original_url)
+        if existing := find_duplicate(owner, url_hash):
+            return existing
+        with transaction.atomic():
+            lock_url_hashes(owner, [url_hash])
+            if existing := find_duplicate(owner, url_hash):
+                return existing
+            return _insert_link(original_url, owner, url_hash, expires_at)
+    return _insert_link(original_url, owner, url_hash, expires_at, redirect_permanent, cache_max_age)
+
+
+async def acreate_link(original_url, owner=None, expires_at=None, redirect_permanent=False, cache_max_age=None):
+    """create_link 的非同步版本。"""
+    if _dedup_applies(expires_at, redirect_permanent, cache_max_age):
+        url_hash = hash_url(original_url)
+        if existing := await Link.objects.filter(owner=owner, url_hash=url_hash).afirst():
+            return existing
+        # advisory lock 需要交易，交由同步版本處理
+        return await sync_to_async(create_link)(original_url, owner)
+
+    allocator = get_code_allocator()
+    for attempt in range(MAX_CREATE_ATTEMPTS):
+        short_code = await allocator.aallocate()
+        try:
+            return await Link.objects.acreate(
+                original_url=original_url,
+                short_code=short_code,
+                owner=owner,
+                expires_at=expires_at,
+                redirect_permanent=redirect_permanent,
+                cache_max_age=cache_max_age,
+            )
+        except IntegrityError:
+            if attempt == MAX_CREATE_ATTEMPTS - 1:
+                raise
+
+
+def bulk_create_links(original_urls, owner=None, expires_at=None, redirect_permanent=False, cache_max_age=None):
+    """
+    以一次 ``bulk_create`` 建立多個 Link，短代碼一次分配。
+
+    啟用 ``SHORTENER_DEDUP`` 時，以一次查詢找出已存在的網址並直接沿用，
+    同一批次內重複的網址也只會建立一筆。
+    若與舊有隨機代碼碰撞或同時有重複請求導致整批失敗，改為逐筆以 create_link 建立。
+
+    Args:
+        original_urls (list[str]): 已驗證過的原始長網址。
+        owner (User | None): 擁有者。
+        expires_at (datetime | None): 所有連結的到期時間；有到期時間時不去重。
+        redirect_permanent (bool): 所有連結以 301 重定向；自訂重定向策略時不去重。
+        cache_max_age (int | None): 所有連結重定向的 Cache-Control max-age (秒)。
+
+    Returns:
+        list[Link]: 與 original_urls 順序相同的 Link。
+    """
+    hashes = [None] * len(original_urls)
+    existing = {}
+    if _dedup_applies(expires_at, redirect_permanent, cache_max_age):
+        hashes = [hash_url(url) for url in original_urls]
+        existing = {
+            link.url_hash: link
+            for link in Link.objects.filter(owner=owner, url_hash__in=set(hashes))
+        }
+
+    new_links = []
+    for url, url_hash in zip(original_urls, hashes):
+        if url_hash is None or url_hash not in existing:
+            link = Link(original_url=url, owner=owner, url_hash=url_hash, expires_at=expires_at,
+                        redirect_permanent=redirect_permanent, cache_max_age=cache_max_age)
+            new_links.append(link)
+            if url_hash is not None:
+                existing[url_hash] = link
+
+    codes = get_code_allocator().allocate_many(len(new_links))
+    for link, code in zip(new_links, codes):
+        link.short_code = code
+    try:
+        with transaction.atomic():
+            new_hashes = [link.url_hash for link in new_links if link.url_hash]
+            if new_hashes:
+                # (owner, url_hash) 沒有唯一約束：上鎖後若已有人建立，改逐筆建立 (沿用既有的連結)
+                lock_url_hashes(owner, new_hashes)
+                if Link.objects.filter(owner=owner, url_hash__in=new_hashes).exists():
+                    raise IntegrityError('duplicate url_hash')
+            Link.objects.bulk_create(new_links)
+            # bulk_create 不會送出 post_save，需自行更新擁有者統計、加入 Bloom filter 並計數
+            record_links_added(new_links)
+    except IntegrityError:
+        return [create_link(url, owner=owner, expires_at=expires_at, redirect_permanent=redirect_permanent,
+                            cache_max_age=cache_max_age) for url in original_urls]
+    add_short_codes(new_links)
+    record_links_created(len(new_links))
+
+    new_links = iter(new_links)
+    return [
+        existing[url_hash] if url_hash is not None else next(new_links)
+        for url_hash in hashes
+    ]
+
+
+def delete_links(links):
+    """
+    刪除一批已讀取的連結，不需再讀取一次。
+
+    擁有者統計的扣除與刪除紀錄由 LinkQuerySet.delete_rows 在同一個交易中寫入，整批只多一個 UPDATE 與一個 INSERT。
+
     Args:
-        length (int): 短代碼的長度，預設為 7。
+        links (iterable[dict]): 要刪除的連結，需包含 DELETE_FIELDS，
+            例如 ``Link.objects.filter(...).values(*DELETE_FIELDS)``。
 
     Returns:
-        str: 一個在資料庫中唯一的短代碼。
-    """
-    characters = string.ascii_letters + string.digits
-    while True:
-        code = ''.join(random.choice(characters) for _ in range(length))
-        # 檢查生成的代碼是否已經存在於資料庫中
-        if not Link.objects.filter(short_code=code).exists():
-            return code
+        int: 刪除的連結數。
+    """
+    links = list(links)
+    if not links:
+        return 0
+    _, deleted = Link.objects.delete_rows(links)
+    return deleted.get(Link._meta.label, 0)
@@ -1,12 +1,20 @@
-from django.shortcuts import render, get_object_or_404, redirect
-from django.utils import timezone
+from django.http import Http404, HttpResponseGone, StreamingHttpResponse
+from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib import messages
 from django.urls import reverse_lazy
 from django.views import generic
+from .cache import aresolve_short_code, resolve_short_code
+from .clicks import arecord_click, record_click
+from .export import CONTENT_TYPES, astream_links, stream_links
 from .models import Link
-import shortuuid
+from .pagination import clamp_page_size, paginate_newest_first
+from .ratelimit import rate_limit
+from .redirects import redirect_response
+from .replicas import read_alias, read_from_replica
+from .stats import get_owner_stats
+from .utils import acreate_link, create_link
 
 def home_view(request):
     context = {}
@@ -16,33 +24,76 @@ def home_view(request):
     return render(request, 'home.html', context)
 
 @login_required
+@read_from_replica
 def dashboard_view(request):
-    links = Link.objects.filter(owner=request.user).order_by('-created_at')
-    return render(request, 'dashboard.html', {'links': links})
+    # 以游標分頁取代一次載入全部連結，翻頁成本不隨頁數增加
+    page_size = clamp_page_size(request.GET.get('page_size'))
+    try:
+        page = paginate_newest_first(
+            Link.objects.filter(owner=request.user),
+            after=request.GET.get('after'),
+            before=request.GET.get('before'),
+            page_size=page_size,
+        )
+    except ValueError:
+        # 游標無效時回到第一頁
+        page = paginate_newest_first(Link.objects.filter(owner=request.user), page_size=page_size)
+    return render(request, 'dashboard.html', {
+        # 總連結數、總點擊數與點擊最多的連結來自增量維護的統計列，不需掃描所有連結
+        'stats': get_owner_stats(request.user),
+        'links': page.items,
+        'page': page,
+        'page_size': page_size,
+    })
+
+def _export_response(content, fmt):
+    response = StreamingHttpResponse(content, content_type=CONTENT_TYPES[fmt])
+    response['Content-Disposition'] = f'attachment; filename="links.{fmt}"'
+    return response
+
+@login_required
+@read_from_replica
+def export_links_view(request, fmt):
+    # 以串流輸出所有連結，不會把整個帳號的連結載入記憶體
+    return _export_response(stream_links(request.user, fmt, using=read_alias()), fmt)
+
+@login_required
+@read_from_replica
+async def export_links_view_async(request, fmt):
+    """export_links_view 的非同步版本，供 ASGI 部署使用。"""
+    user = await request.auser()
+    return _export_response(astream_links(user, fmt, using=read_alias()), fmt)
 
 def redirect_view(request, short_code):
-    link = get_object_or_404(Link, short_code=short_code)
-    link.click_count += 1
-    link.last_clicked_at = timezone.now()
-    link.save()
-    return redirect(link.original_url)
+    # 先透過解析快取取得目標網址，熱門連結不需每次查詢資料庫
+    resolved = resolve_short_code(short_code)
+    if resolved is None:
+        raise Http404("No Link matches the given query.")
+    if resolved.is_expired():
+        # 到期的連結在被清除之前回傳 410，與從未存在的代碼 (404) 區分
+        return HttpResponseGone("This link has expired.")
+    record_click(resolved.pk)
+    # 依連結的策略回傳 301 / 302 與 Cache-Control，CDN 快取的點擊由 ingest_access_logs 補回
+    return redirect_response(resolved)
 
+async def redirect_view_async(request, short_code):
+    """redirect_view 的非同步版本，供 ASGI 部署使用。"""
+    resolved = await aresolve_short_code(short_code)
+    if resolved is None:
+        raise Http404("No Link matches the given query.")
+    if resolved.is_expired():
+        return HttpResponseGone("This link has expired.")
+    await arecord_click(resolved.pk)
+    return redirect_response(resolved)
+
+@rate_limit('shorten')
 def shorten_url_view(request):
     if request.method == 'POST':
         if original_url := request.POST.get('original_url'):
-            # 產生不重複的 short_code
-            while True:
-                short_code = shortuuid.uuid()[:8]
-                if not Link.objects.filter(short_code=short_code).exists():
-                    break
-
             owner = request.user if request.user.is_authenticated else None
 
-            link = Link.objects.create(
-                original_url=original_url,
-                short_code=short_code,
-                owner=owner
-            )
+            # 短代碼由分配器產生，不需要查詢資料庫確認是否重複
+            link = create_link(original_url, owner=owner)
 
             full_short_url = request.build_absolute_uri(f'/{link.short_code}')
             messages.success(request, "成功建立短網址！")
@@ -51,6 +102,23 @@ def shorten_url_view(request):
 
     return redirect('home')
 
+@rate_limit('shorten')
+async def shorten_url_view_async(request):
+    """shorten_url_view 的非同步版本，供 ASGI 部署使用。"""
+    if request.method == 'POST':
+        if original_url := request.POST.get('original_url'):
+            user = await request.auser()
+            owner = user if user.is_authenticated else None
+
+            link = await acreate_link(original_url, owner=owner)
+
+            full_short_url = request.build_absolute_uri(f'/{link.short_code}')
+            messages.success(request, "成功建立短網址！")
+            await request.session.aset('latest_short_url', full_short_url)
+            return redirect('home')
+
+    return redirect('home')
+
 
 class RegisterView(generic.CreateView):
     form_class = UserCreationForm